@@ -52,7 +52,7 @@ import os
 from _decimal import Decimal
 from dataclasses import dataclass, asdict, field
 from datetime import datetime
-from typing import Generator, List, Dict, Tuple, Any, Callable
+from typing import Generator, List, Dict, Tuple, Any, Callable, Set
 from typing import Optional
 
 from fastlane_bot.config import Config
@@ -64,7 +64,9 @@ from fastlane_bot.helpers import (
     SolidlyV2StablePoolsNotSupported,
     add_wrap_or_unwrap_trades_to_route,
     split_carbon_trades,
-    maximize_last_trade_per_tkn
+    maximize_last_trade_per_tkn,
+    CurveCache,
+    SolutionCache,
 )
 from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer, T
 from .config.constants import FLASHLOAN_FEE_MAP
@@ -76,6 +78,8 @@ from .modes.pairwise_single import FindArbitrageSinglePairwise
 from .modes.triangle_multi import ArbitrageFinderTriangleMulti
 from .modes.triangle_single import ArbitrageFinderTriangleSingle
 from .modes.triangle_bancor_v3_two_hop import ArbitrageFinderTriangleBancor3TwoHop
+from .modes.cycle_multi import ArbitrageFinderCycleMulti
+from .modes.market_multi import ArbitrageFinderMarketMulti
 from .utils import num_format
 
 
@@ -90,6 +94,10 @@ class CarbonBot:
         the database manager.
     tx_helpers: TxHelpers
         the tx-helpers utility.
+    curve_cache: CurveCache
+        if set, the curves are built incrementally across calls to get_curves.
+    solution_cache: SolutionCache
+        if set, the optimizer solutions of the miniverses are reused across blocks.
     """
 
     __VERSION__ = __VERSION__
@@ -98,6 +106,8 @@ class CarbonBot:
     db: QueryInterface = field(init=False)
     tx_helpers: TxHelpers = None
     ConfigObj: Config = None
+    curve_cache: CurveCache = None
+    solution_cache: SolutionCache = None
 
     SCALING_FACTOR = 0.999
 
@@ -107,6 +117,8 @@ class CarbonBot:
         "triangle": ArbitrageFinderTriangleSingle,
         "multi_triangle": ArbitrageFinderTriangleMulti,
         "b3_two_hop": ArbitrageFinderTriangleBancor3TwoHop,
+        "multi_cycle": ArbitrageFinderCycleMulti,
+        "multi_market": ArbitrageFinderMarketMulti,
         "multi_pairwise_pol": FindArbitrageMultiPairwisePol,
         "multi_pairwise_all": FindArbitrageMultiPairwiseAll,
     }
@@ -137,6 +149,11 @@ class CarbonBot:
         CPCContainer
             The container of curves.
         """
+        if self.curve_cache is not None:
+            tokens = self.db.get_tokens()
+            ADDRDEC = {t.address: (t.address, int(t.decimals)) for t in tokens}
+            return self.curve_cache.update(self.db, lambda p: self._pool_to_curves(p, ADDRDEC))
+
         self.db.refresh_pool_data()
         pools_and_tokens = self.db.get_pool_data_with_tokens()
         curves = []
@@ -144,48 +161,68 @@ class CarbonBot:
         ADDRDEC = {t.address: (t.address, int(t.decimals)) for t in tokens}
 
         for p in pools_and_tokens:
-            p.ADDRDEC = ADDRDEC
-            try:
-                curves += [
-                    curve for curve in p.to_cpc()
-                    if all(curve.params[tkn] not in self.ConfigObj.TAX_TOKENS for tkn in ['tknx_addr', 'tkny_addr'])
-                ]
-            except SolidlyV2StablePoolsNotSupported as e:
-                self.ConfigObj.logger.debug(
-                    f"[bot.get_curves] Solidly V2 stable pools not supported: {e}\n"
-                )
-            except NotImplementedError as e:
-                self.ConfigObj.logger.error(
-                    f"[bot.get_curves] Not supported: {e}\n"
-                )
-            except ZeroDivisionError as e:
-                self.ConfigObj.logger.error(
-                    f"[bot.get_curves] MUST FIX INVALID CURVE {p} [{e}]\n"
-                )
-            except CPC.CPCValidationError as e:
-                self.ConfigObj.logger.error(
-                    f"[bot.get_curves] MUST FIX INVALID CURVE {p} [{e}]\n"
-                )
-            except TypeError as e:
-                self.ConfigObj.logger.error(
-                    f"[bot.get_curves] MUST FIX DECIMAL ERROR CURVE {p} [{e}]\n"
-                )
-            except p.DoubleInvalidCurveError as e:
-                self.ConfigObj.logger.error(
-                    f"[bot.get_curves] MUST FIX DOUBLE INVALID CURVE {p} [{e}]\n"
-                )
-            except Univ3Calculator.DecimalsMissingError as e:
-                self.ConfigObj.logger.error(
-                    f"[bot.get_curves] MUST FIX DECIMALS MISSING [{e}]\n"
-                )
-            except Exception as e:
-                # TODO: unexpected exception should possibly be raised
-                self.ConfigObj.logger.error(
-                    f"[bot.get_curves] MUST FIX UNEXPECTED ERROR converting pool to curve {p}\n[ERR={e}]\n\n"
-                )
+            curves += self._pool_to_curves(p, ADDRDEC)
 
         return CPCContainer(curves)
 
+    def _pool_to_curves(self, p: Any, ADDRDEC: Dict[str, Tuple[str, int]]) -> List[CPC]:
+        """
+        Converts a pool into its curves, logging (and skipping) pools that cannot be converted.
+
+        Parameters
+        ----------
+        p: PoolAndTokens
+            The pool.
+        ADDRDEC: Dict[str, Tuple[str, int]]
+            The token address to (address, decimals) mapping.
+
+        Returns
+        -------
+        List[CPC]
+            The curves of the pool (empty if the conversion failed).
+        """
+        p.ADDRDEC = ADDRDEC
+        try:
+            return [
+                curve for curve in p.to_cpc()
+                if all(curve.params[tkn] not in self.ConfigObj.TAX_TOKENS for tkn in ['tknx_addr', 'tkny_addr'])
+            ]
+        except SolidlyV2StablePoolsNotSupported as e:
+            self.ConfigObj.logger.debug(
+                f"[bot.get_curves] Solidly V2 stable pools not supported: {e}\n"
+            )
+        except NotImplementedError as e:
+            self.ConfigObj.logger.error(
+                f"[bot.get_curves] Not supported: {e}\n"
+            )
+        except ZeroDivisionError as e:
+            self.ConfigObj.logger.error(
+                f"[bot.get_curves] MUST FIX INVALID CURVE {p} [{e}]\n"
+            )
+        except CPC.CPCValidationError as e:
+            self.ConfigObj.logger.error(
+                f"[bot.get_curves] MUST FIX INVALID CURVE {p} [{e}]\n"
+            )
+        except TypeError as e:
+            self.ConfigObj.logger.error(
+                f"[bot.get_curves] MUST FIX DECIMAL ERROR CURVE {p} [{e}]\n"
+            )
+        except p.DoubleInvalidCurveError as e:
+            self.ConfigObj.logger.error(
+                f"[bot.get_curves] MUST FIX DOUBLE INVALID CURVE {p} [{e}]\n"
+            )
+        except Univ3Calculator.DecimalsMissingError as e:
+            self.ConfigObj.logger.error(
+                f"[bot.get_curves] MUST FIX DECIMALS MISSING [{e}]\n"
+            )
+        except Exception as e:
+            # TODO: unexpected exception should possibly be raised
+            self.ConfigObj.logger.error(
+                f"[bot.get_curves] MUST FIX UNEXPECTED ERROR converting pool to curve {p}\n[ERR={e}]\n\n"
+            )
+
+        return []
+
     def _simple_ordering_by_src_token(
         self, best_trade_instructions_dic, best_src_token
     ):
@@ -262,11 +299,9 @@ class CarbonBot:
         int
             The deadline (as UNIX epoch).
         """
-        block_number = (
-            self.ConfigObj.w3.eth.block_number if block_number is None else block_number
-        )
+        block_identifier = "latest" if block_number is None else block_number
         return (
-            self.ConfigObj.w3.eth.get_block(block_number).timestamp
+            self.ConfigObj.w3.eth.get_block(block_identifier).timestamp
             + self.ConfigObj.DEFAULT_BLOCKTIME_DEVIATION
         )
 
@@ -279,7 +314,9 @@ class CarbonBot:
         flashloan_tokens: List[str],
         CCm: CPCContainer,
         arb_mode: str,
-        randomizer: int
+        randomizer: int,
+        n_jobs: int = 1,
+        dirty_pairs: Set[str] = None,
     ) -> dict:
         arb_finder = self._get_arb_finder(arb_mode)
         random_mode = arb_finder.AO_CANDIDATES if randomizer else None
@@ -289,6 +326,9 @@ class CarbonBot:
             mode="bothin",
             result=random_mode,
             ConfigObj=self.ConfigObj,
+            n_jobs=n_jobs,
+            dirty_pairs=dirty_pairs,
+            solution_cache=self.solution_cache,
         )
         return {"finder": finder, "r": finder.find_arbitrage()}
 
@@ -303,6 +343,8 @@ class CarbonBot:
         logging_path: str = None,
         replay_mode: bool = False,
         replay_from_block: int = None,
+        n_jobs: int = 1,
+        dirty_pairs: Set[str] = None,
     ):
         """
         Runs the bot.
@@ -325,9 +367,13 @@ class CarbonBot:
             whether to run in replay mode (default: False)
         replay_from_block: int
             the block number to start replaying from (default: None)
+        n_jobs: int
+            the number of processes used to solve the miniverses (default: 1; -1 = all CPUs)
+        dirty_pairs: Set[str]
+            only search miniverses containing one of these pairs (default: None = all pairs)
 
         """
-        arbitrage = self._find_arbitrage(flashloan_tokens=flashloan_tokens, CCm=CCm, arb_mode=arb_mode, randomizer=randomizer)
+        arbitrage = self._find_arbitrage(flashloan_tokens=flashloan_tokens, CCm=CCm, arb_mode=arb_mode, randomizer=randomizer, n_jobs=n_jobs, dirty_pairs=dirty_pairs)
         finder, r = [arbitrage[key] for key in ["finder", "r"]]
 
         if r is None or len(r) == 0:
@@ -900,6 +946,8 @@ class CarbonBot:
         logging_path: str = None,
         replay_mode: bool = False,
         replay_from_block: int = None,
+        n_jobs: int = 1,
+        dirty_pairs: Set[str] = None,
     ):
         """
         Runs the bot.
@@ -922,6 +970,10 @@ class CarbonBot:
             whether to run in replay mode (default: False)
         replay_from_block: int
             the block number to start replaying from (default: None)
+        n_jobs: int
+            the number of processes used to solve the miniverses (default: 1; -1 = all CPUs)
+        dirty_pairs: Set[str]
+            only search miniverses containing one of these pairs (default: None = all pairs)
         """
 
         if flashloan_tokens is None:
@@ -939,6 +991,8 @@ class CarbonBot:
                 logging_path=logging_path,
                 replay_mode=replay_mode,
                 replay_from_block=replay_from_block,
+                n_jobs=n_jobs,
+                dirty_pairs=dirty_pairs,
             )
         except self.NoArbAvailable as e:
             self.ConfigObj.logger.info(e)
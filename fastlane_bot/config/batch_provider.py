@@ -0,0 +1,345 @@
+"""
+Batching JSON-RPC providers (provides ``BatchHTTPProvider`` and ``AsyncBatchHTTPProvider``)
+
+The providers are drop-in replacements for ``HTTPProvider`` and ``AsyncHTTPProvider``. Requests issued concurrently
+-- eg by the threads of ``update_pools_from_contracts`` or by the tasks gathered in ``async_event_update_utils`` --
+are sent together as one JSON-RPC batch request of at most ``max_batch_size`` requests, so that callers get the round
+trips of a batch without any change. A request is sent right away when no other request is in flight; otherwise it is
+held back for ``batch_window`` seconds to collect the requests issued meanwhile. The batch size defaults to the limit
+of the endpoint (see ``MAX_BATCH_SIZES``) and is halved whenever the node rejects a batch, in which case its requests
+are sent one by one.
+
+The providers are installed on the web3 objects of a config instance (see ``batching_web3``), not on the shared network
+connection.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+import requests
+from eth_utils import to_bytes, to_text
+from requests.adapters import HTTPAdapter
+from web3 import AsyncHTTPProvider, AsyncWeb3, HTTPProvider, Web3
+from web3._utils.encoding import FriendlyJsonSerde, Web3JsonEncoder
+from web3.middleware import async_geth_poa_middleware, geth_poa_middleware
+from web3.types import RPCEndpoint, RPCResponse
+
+logger = logging.getLogger(__name__)
+
+# the maximum number of requests in a batch, by (a substring of) the endpoint url
+MAX_BATCH_SIZES = {
+    "alchemy.com": 1000,
+}
+DEFAULT_MAX_BATCH_SIZE = 100
+DEFAULT_TIMEOUT = 60
+
+
+def max_batch_size_for(endpoint_uri: str) -> int:
+    """
+    The maximum number of requests in a batch sent to `endpoint_uri`.
+    """
+    for key, max_batch_size in MAX_BATCH_SIZES.items():
+        if key in endpoint_uri:
+            return max_batch_size
+    return DEFAULT_MAX_BATCH_SIZE
+
+
+@dataclass
+class BatchStats:
+    """
+    Counters of a batching provider.
+
+    Parameters
+    ----------
+    requests : int
+        The number of JSON-RPC requests made.
+    posts : int
+        The number of HTTP requests sent (single requests and batches).
+    rejected : int
+        The number of batches rejected by the node (whose requests were then sent one by one).
+    """
+    requests: int = 0
+    posts: int = 0
+    rejected: int = 0
+
+
+def batching_web3(endpoint_uri: str, inject_poa_middleware: bool = False) -> Tuple[Web3, AsyncWeb3]:
+    """
+    A Web3 and an AsyncWeb3 object connected to `endpoint_uri` through the batching providers.
+    """
+    w3 = Web3(BatchHTTPProvider(endpoint_uri, request_kwargs={"timeout": DEFAULT_TIMEOUT}))
+    w3_async = AsyncWeb3(AsyncBatchHTTPProvider(endpoint_uri))
+    if inject_poa_middleware:
+        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        w3_async.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+    return w3, w3_async
+
+
+class _PendingRequest:
+    __slots__ = ("data", "response", "error", "lead", "done")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.response = None
+        self.error = None
+        self.lead = False
+        self.done = None
+
+
+def _encode(data: Any) -> bytes:
+    return to_bytes(text=FriendlyJsonSerde().json_encode(data, Web3JsonEncoder))
+
+
+def _decode(raw_response: bytes) -> Any:
+    return FriendlyJsonSerde().json_decode(to_text(raw_response))
+
+
+class _BatchMixin:
+    """
+    The logic shared by the sync and the async provider: encoding the requests of a batch and distributing the
+    responses to them.
+    """
+
+    def _init_batching(self, batch_window: float, max_batch_size: Optional[int]):
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size or max_batch_size_for(self.endpoint_uri)
+        self.stats = BatchStats()
+        self._ids = itertools.count()
+        self._in_flight = 0
+
+    def _new_request(self, method: RPCEndpoint, params: Any) -> _PendingRequest:
+        self.stats.requests += 1
+        return _PendingRequest({"jsonrpc": "2.0", "method": method, "params": params or [], "id": next(self._ids)})
+
+    def _split(self, pending: List[_PendingRequest]) -> List[List[_PendingRequest]]:
+        return [pending[i:i + self.max_batch_size] for i in range(0, len(pending), self.max_batch_size)]
+
+    def _reject(self, batch: List[_PendingRequest], reason: Any):
+        """
+        Records that the node rejected `batch` as a whole, and halves the batch size.
+        """
+        self.stats.rejected += 1
+        self.max_batch_size = max(1, self.max_batch_size // 2)
+        logger.warning(
+            f"[config.batch_provider] Batch of {len(batch)} requests rejected, "
+            f"reducing the batch size to {self.max_batch_size}: {reason}"
+        )
+
+    def _deliver(self, batch: List[_PendingRequest], raw_response: Optional[bytes]) -> bool:
+        """
+        Sets the responses of the requests in `batch` from the response to the batch, or returns False if the node
+        rejected the batch as a whole (`raw_response` is None if it did so at the HTTP level).
+        """
+        if raw_response is None:
+            return False
+        responses = _decode(raw_response)
+        if not isinstance(responses, list):
+            self._reject(batch, responses)
+            return False
+        responses = {response.get("id"): response for response in responses}
+        for request in batch:
+            if request.data["id"] in responses:
+                request.response = responses[request.data["id"]]
+            else:
+                request.error = ValueError(f"No response to request {request.data} in the batch response")
+        return True
+
+
+class BatchHTTPProvider(_BatchMixin, HTTPProvider):
+    """
+    HTTPProvider that sends concurrent requests as JSON-RPC batches.
+
+    :param endpoint_uri:    the url of the node
+    :param request_kwargs:  the keyword arguments of the HTTP requests (eg timeout)
+    :param batch_window:    the time in seconds that requests are collected for while others are in flight
+    :param max_batch_size:  the maximum number of requests in a batch (None = the limit of the endpoint)
+    :param max_connections: the size of the connection pool shared by all threads
+    """
+
+    def __init__(
+        self,
+        endpoint_uri: str,
+        request_kwargs: Optional[Any] = None,
+        batch_window: float = 0.002,
+        max_batch_size: Optional[int] = None,
+        max_connections: int = 32,
+    ):
+        super().__init__(endpoint_uri, request_kwargs)
+        self._init_batching(batch_window, max_batch_size)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._pending: List[_PendingRequest] = []
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request = self._new_request(method, params)
+        request.done = threading.Event()
+        with self._lock:
+            self._pending.append(request)
+            # the first request of a window sends the batch; the others wait for their response
+            request.lead = len(self._pending) == 1
+            in_flight = self._in_flight > 0
+        if request.lead:
+            if in_flight:
+                # other threads are making requests: collect theirs
+                time.sleep(self.batch_window)
+        else:
+            request.done.wait()
+        if request.lead:
+            # also true for a waiting request that was left first in line by a full batch
+            self._flush()
+        if request.error is not None:
+            raise request.error
+        return request.response
+
+    def _flush(self):
+        with self._lock:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:len(batch)]
+            if self._pending:
+                self._pending[0].lead = True
+                self._pending[0].done.set()
+            self._in_flight += 1
+        try:
+            self._send(batch)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        for request in batch:
+            request.done.set()
+
+    def _send(self, batch: List[_PendingRequest]):
+        if len(batch) == 1:
+            batch[0].response = _decode(self._post(_encode(batch[0].data)))
+            return
+        try:
+            raw_response = self._post(_encode([request.data for request in batch]))
+        except requests.HTTPError as e:
+            self._reject(batch, e)
+            raw_response = None
+        if not self._deliver(batch, raw_response):
+            for request in batch:
+                try:
+                    self._send([request])
+                except Exception as e:
+                    request.error = e
+
+    def _post(self, data: bytes) -> bytes:
+        self.stats.posts += 1
+        kwargs = self.get_request_kwargs()
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        response = self._session.post(self.endpoint_uri, data=data, **kwargs)
+        response.raise_for_status()
+        return response.content
+
+
+class AsyncBatchHTTPProvider(_BatchMixin, AsyncHTTPProvider):
+    """
+    AsyncHTTPProvider that sends concurrent requests as JSON-RPC batches.
+
+    Requests are collected per event loop, and each loop has a pooled aiohttp session of its own.
+
+    :param endpoint_uri:    the url of the node
+    :param request_kwargs:  the keyword arguments of the HTTP requests (eg timeout)
+    :param batch_window:    the time in seconds that requests are collected for while others are in flight (the
+                            requests of the tasks that run before the loop gets to sending are always collected)
+    :param max_batch_size:  the maximum number of requests in a batch (None = the limit of the endpoint)
+    :param max_connections: the size of the connection pool of each session
+    """
+
+    def __init__(
+        self,
+        endpoint_uri: str,
+        request_kwargs: Optional[Any] = None,
+        batch_window: float = 0.002,
+        max_batch_size: Optional[int] = None,
+        max_connections: int = 32,
+    ):
+        super().__init__(endpoint_uri, request_kwargs)
+        self._init_batching(batch_window, max_batch_size)
+        self.max_connections = max_connections
+        self._pending: Dict[asyncio.AbstractEventLoop, List[_PendingRequest]] = {}
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        loop = asyncio.get_event_loop()
+        request = self._new_request(method, params)
+        request.done = loop.create_future()
+        pending = self._pending.setdefault(loop, [])
+        pending.append(request)
+        if len(pending) == 1:
+            flush = lambda: asyncio.ensure_future(self._flush(loop))
+            if self._in_flight > 0:
+                loop.call_later(self.batch_window, flush)
+            else:
+                loop.call_soon(flush)
+        return await request.done
+
+    async def _flush(self, loop: asyncio.AbstractEventLoop):
+        pending = self._pending.pop(loop)
+        self._in_flight += 1
+        try:
+            await asyncio.gather(*[self._send_batch(batch) for batch in self._split(pending)])
+        finally:
+            self._in_flight -= 1
+
+    async def _send_batch(self, batch: List[_PendingRequest]):
+        try:
+            await self._send(batch)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        for request in batch:
+            if request.done.done():
+                continue
+            if request.error is not None:
+                request.done.set_exception(request.error)
+            else:
+                request.done.set_result(request.response)
+
+    async def _send(self, batch: List[_PendingRequest]):
+        if len(batch) == 1:
+            batch[0].response = _decode(await self._post(_encode(batch[0].data)))
+            return
+        try:
+            raw_response = await self._post(_encode([request.data for request in batch]))
+        except aiohttp.ClientResponseError as e:
+            self._reject(batch, e)
+            raw_response = None
+        if not self._deliver(batch, raw_response):
+            errors = await asyncio.gather(*[self._send([request]) for request in batch], return_exceptions=True)
+            for request, error in zip(batch, errors):
+                request.error = error
+
+    async def _post(self, data: bytes) -> bytes:
+        self.stats.posts += 1
+        kwargs = self.get_request_kwargs()
+        kwargs.setdefault("timeout", aiohttp.ClientTimeout(DEFAULT_TIMEOUT))
+        async with self._session().post(self.endpoint_uri, data=data, **kwargs) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    def _session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_event_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            for other in [other for other in self._sessions if other.is_closed()]:
+                del self._sessions[other]
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_connections))
+            self._sessions[loop] = session
+        return session
@@ -6,13 +6,31 @@ MultiCaller class
 All rights reserved.
 Licensed under MIT.
 """
-from typing import Any, List, Dict
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, List, Dict, Optional, Tuple
 
 from eth_abi import decode
+from eth_abi.grammar import ABIType, TupleType, parse
 from web3.contract.contract import ContractFunction
+from web3.exceptions import ContractLogicError
 
 from fastlane_bot.data.abi import MULTICALL_ABI
 
+logger = logging.getLogger(__name__)
+
+# the gas budget of a chunk (well below the eth_call gas cap of the common nodes)
+MAX_CHUNK_GAS = 25_000_000
+# the maximum calldata size of a chunk
+MAX_CHUNK_CALLDATA_BYTES = 100_000
+# the gas estimate of a call added without one
+DEFAULT_CALL_GAS = 50_000
+# the calldata size of a call in a chunk besides its own calldata (target, offsets and length)
+CALL_OVERHEAD_BYTES = 128
+# the errors with which a node rejects a chunk as a whole, as opposed to connection errors which are raised
+CHUNK_ERRORS = (ValueError, ContractLogicError)
+
 
 def collapse_if_tuple(abi: Dict[str, Any]) -> str:
     """
@@ -37,32 +55,205 @@ def collapse_if_tuple(abi: Dict[str, Any]) -> str:
     return abi["type"]
 
 
+def static_size(abi_type: ABIType) -> Optional[int]:
+    """
+    The size in bytes of the encoding of a static ABI type, or None if the type is dynamic.
+
+    >>> static_size(parse("(uint256,address[2],(bool,bytes32))"))
+    160
+    """
+    if abi_type.is_dynamic:
+        return None
+    if abi_type.is_array:
+        return abi_type.arrlist[-1][0] * static_size(abi_type.item_type)
+    if isinstance(abi_type, TupleType):
+        return sum(static_size(component) for component in abi_type.components)
+    return 32
+
+
+@dataclass
+class MultiCallerStats:
+    """
+    Counters of a MultiCaller.
+
+    :param chunks:  the number of tryAggregate calls sent (including the halves of split chunks)
+    :param splits:  the number of chunks split in two after an error
+    :param failed:  the number of calls that failed on their own (returned as None)
+    """
+    chunks: int = 0
+    splits: int = 0
+    failed: int = 0
+
+
 class MultiCaller:
     """
     Context manager for multicalls.
+
+    The calls are sent in chunks that stay within a gas budget and a calldata size, concurrently if an async web3
+    object is given. A chunk that fails as a whole (eg out of gas or a response that is too large) is split in two
+    until the failing calls are isolated; a call that fails on its own yields None like a reverting call does.
+
+    :param web3:                        the web3 object
+    :param multicall_contract_address:  the address of the Multicall contract
+    :param w3_async:                    the async web3 object used for sending chunks concurrently (optional)
+    :param max_gas:                     the gas budget of a chunk
+    :param max_calldata_bytes:          the maximum calldata size of a chunk
+    :param max_concurrency:             the maximum number of chunks in flight
     """
-    __DATE__ = "2022-09-26"
-    __VERSION__ = "0.0.2"
+    __DATE__ = "2026-10-18"
+    __VERSION__ = "0.1.0"
 
-    def __init__(self, web3: Any, multicall_contract_address: str):
+    def __init__(
+        self,
+        web3: Any,
+        multicall_contract_address: str,
+        w3_async: Any = None,
+        max_gas: int = MAX_CHUNK_GAS,
+        max_calldata_bytes: int = MAX_CHUNK_CALLDATA_BYTES,
+        max_concurrency: int = 8,
+    ):
         self.multicall_contract = web3.eth.contract(abi=MULTICALL_ABI, address=multicall_contract_address)
+        self.async_multicall_contract = (
+            w3_async.eth.contract(abi=MULTICALL_ABI, address=multicall_contract_address) if w3_async else None
+        )
+        self.max_gas = max_gas
+        self.max_calldata_bytes = max_calldata_bytes
+        self.max_concurrency = max_concurrency
         self.contract_calls: List[ContractFunction] = []
         self.output_types_list: List[List[str]] = []
+        self.gas_estimates: List[int] = []
+        self.stats = MultiCallerStats()
 
-    def add_call(self, call: ContractFunction):
+    def add_call(self, call: ContractFunction, gas: int = DEFAULT_CALL_GAS):
+        """
+        Adds a call.
+
+        :param call:    the contract function call
+        :param gas:     an estimate of the gas the call uses, for chunking
+        """
         self.contract_calls.append({'target': call.address, 'callData': call._encode_transaction_data()})
         self.output_types_list.append([collapse_if_tuple(item) for item in call.abi['outputs']])
+        self.gas_estimates.append(gas)
+
+    def chunks(self) -> List[Tuple[int, int]]:
+        """
+        The (start, end) index ranges of the chunks in which the calls are sent.
+        """
+        chunks = []
+        start = gas = size = 0
+        for i, (call, call_gas) in enumerate(zip(self.contract_calls, self.gas_estimates)):
+            call_size = CALL_OVERHEAD_BYTES + (len(call['callData']) - 2) // 2
+            if i > start and (gas + call_gas > self.max_gas or size + call_size > self.max_calldata_bytes):
+                chunks.append((start, i))
+                start = i
+                gas = size = 0
+            gas += call_gas
+            size += call_size
+        if start < len(self.contract_calls):
+            chunks.append((start, len(self.contract_calls)))
+        return chunks
 
     def run_calls(self, block_identifier: Any = 'latest') -> List[Any]:
-        encoded_data = self.multicall_contract.functions.tryAggregate(
-            False,
-            self.contract_calls
-        ).call(block_identifier=block_identifier)
+        if self.async_multicall_contract is not None:
+            encoded_data = asyncio.get_event_loop().run_until_complete(self._async_run_chunks(block_identifier))
+        else:
+            encoded_data = [
+                output
+                for start, end in self.chunks()
+                for output in self._run_chunk(start, end, block_identifier)
+            ]
+        return self._decode_all(encoded_data)
+
+    def _decode_all(self, encoded_data: List[Tuple[bool, bytes]]) -> List[Any]:
+        """
+        Decodes the outputs of the calls, grouped by output types.
 
-        result_list = [
-            decode(output_types, encoded_output[1]) if encoded_output[0] else (None,)
-            for output_types, encoded_output in zip(self.output_types_list, encoded_data)
-        ]
+        The outputs of a group of static types (eg the balances or reserves of many pools) are concatenated and
+        decoded in a single pass; those of dynamic types, or of a group that does not decode as a whole, are decoded
+        one by one.
+        """
+        results = [None] * len(encoded_data)
+        groups = {}
+        for i, (output_types, (success, _)) in enumerate(zip(self.output_types_list, encoded_data)):
+            if success:
+                groups.setdefault(tuple(output_types), []).append(i)
+        for output_types, indices in groups.items():
+            outputs = [encoded_data[i][1] for i in indices]
+            size = static_size(parse(f"({','.join(output_types)})"))
+            if len(indices) > 1 and size and all(len(data) == size for data in outputs):
+                try:
+                    values = decode(list(output_types) * len(indices), b"".join(outputs))
+                except Exception:
+                    pass
+                else:
+                    n = len(output_types)
+                    for j, i in enumerate(indices):
+                        results[i] = self._result(values[j * n:(j + 1) * n])
+                    continue
+            for i in indices:
+                results[i] = self._decode(list(output_types), encoded_data[i])
+        return results
 
+    def _decode(self, output_types: List[str], encoded_output: Tuple[bool, bytes]) -> Any:
+        success, data = encoded_output
+        if not success:
+            return None
+        try:
+            result = decode(output_types, data)
+        except Exception:
+            self.stats.failed += 1
+            return None
+        return self._result(result)
+
+    @staticmethod
+    def _result(result: Tuple[Any, ...]) -> Any:
         # Convert every single-value tuple into a single value
-        return [result if len(result) > 1 else result[0] for result in result_list]
+        return result if len(result) > 1 else result[0]
+
+    def _run_chunk(self, start: int, end: int, block_identifier: Any) -> List[Tuple[bool, bytes]]:
+        self.stats.chunks += 1
+        try:
+            return self.multicall_contract.functions.tryAggregate(
+                False,
+                self.contract_calls[start:end]
+            ).call(block_identifier=block_identifier)
+        except CHUNK_ERRORS as e:
+            if end - start == 1:
+                return self._failed_call(start, e)
+            self.stats.splits += 1
+            mid = (start + end) // 2
+            return self._run_chunk(start, mid, block_identifier) + self._run_chunk(mid, end, block_identifier)
+
+    async def _async_run_chunks(self, block_identifier: Any) -> List[Tuple[bool, bytes]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        outputs = await asyncio.gather(*[
+            self._async_run_chunk(start, end, block_identifier, semaphore)
+            for start, end in self.chunks()
+        ])
+        return [output for chunk_outputs in outputs for output in chunk_outputs]
+
+    async def _async_run_chunk(
+        self, start: int, end: int, block_identifier: Any, semaphore: asyncio.Semaphore
+    ) -> List[Tuple[bool, bytes]]:
+        try:
+            async with semaphore:
+                self.stats.chunks += 1
+                return await self.async_multicall_contract.functions.tryAggregate(
+                    False,
+                    self.contract_calls[start:end]
+                ).call(block_identifier=block_identifier)
+        except CHUNK_ERRORS as e:
+            if end - start == 1:
+                return self._failed_call(start, e)
+            self.stats.splits += 1
+            mid = (start + end) // 2
+            halves = await asyncio.gather(
+                self._async_run_chunk(start, mid, block_identifier, semaphore),
+                self._async_run_chunk(mid, end, block_identifier, semaphore),
+            )
+            return halves[0] + halves[1]
+
+    def _failed_call(self, index: int, e: Exception) -> List[Tuple[bool, bytes]]:
+        self.stats.failed += 1
+        logger.warning(f"[MultiCaller] call {self.contract_calls[index]} failed: {e}")
+        return [(False, b'')]
@@ -717,6 +717,24 @@ BALANCER_VAULT_ABI = [
         "anonymous": False,
         "inputs": [{"indexed": True, "internalType": "contract IAuthorizer", "name": "newAuthorizer", "type": "address"}]
     },
+    {
+        "type": "event",
+        "name": "Swap",
+        "anonymous": False,
+        "inputs": [{"indexed": True, "internalType": "bytes32", "name": "poolId", "type": "bytes32"}, {"indexed": True, "internalType": "contract IERC20", "name": "tokenIn", "type": "address"}, {"indexed": True, "internalType": "contract IERC20", "name": "tokenOut", "type": "address"}, {"indexed": False, "internalType": "uint256", "name": "amountIn", "type": "uint256"}, {"indexed": False, "internalType": "uint256", "name": "amountOut", "type": "uint256"}]
+    },
+    {
+        "type": "event",
+        "name": "PoolBalanceChanged",
+        "anonymous": False,
+        "inputs": [{"indexed": True, "internalType": "bytes32", "name": "poolId", "type": "bytes32"}, {"indexed": True, "internalType": "address", "name": "liquidityProvider", "type": "address"}, {"indexed": False, "internalType": "contract IERC20[]", "name": "tokens", "type": "address[]"}, {"indexed": False, "internalType": "int256[]", "name": "deltas", "type": "int256[]"}, {"indexed": False, "internalType": "uint256[]", "name": "protocolFeeAmounts", "type": "uint256[]"}]
+    },
+    {
+        "type": "event",
+        "name": "PoolBalanceManaged",
+        "anonymous": False,
+        "inputs": [{"indexed": True, "internalType": "bytes32", "name": "poolId", "type": "bytes32"}, {"indexed": True, "internalType": "address", "name": "assetManager", "type": "address"}, {"indexed": True, "internalType": "contract IERC20", "name": "token", "type": "address"}, {"indexed": False, "internalType": "int256", "name": "cashDelta", "type": "int256"}, {"indexed": False, "internalType": "int256", "name": "managedDelta", "type": "int256"}]
+    },
     {
         "type": "function",
         "name": "getPoolTokens",
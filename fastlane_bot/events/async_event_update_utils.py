@@ -473,6 +473,8 @@ def async_update_pools_from_contracts(mgr: Any, current_block: int):
     )
 
     mgr.pool_data = all_pools
+    for pool_info in new_pool_data:
+        mgr.mark_pool_dirty(pool_info)
     new_num_pools_in_data = len(mgr.pool_data)
     new_pools_added = new_num_pools_in_data - orig_num_pools_in_data
 
@@ -0,0 +1,251 @@
+"""
+This module contains the BlockStream, the source of new blocks and their events in push mode.
+
+Instead of polling eth_blockNumber and eth_getLogs, the BlockStream subscribes to `newHeads` and to the topics of
+all EventGatherer subscriptions over a websocket connection. The logs of a block are collected as they are pushed,
+and the block is handed to the main loop shortly (`settle_time`) after its head arrived. Missed heads, reorgs and
+logs arriving late are handled by backfilling the affected block range through the EventGatherer.
+
+Unlike polling, push mode does not stay `reorg_delay` blocks behind the head, so the events of a block may already
+have been applied to the pools when the block is reorged out. Backfilling only applies the events of the new chain,
+which leaves a pool that was only touched by orphaned (or removed) logs in the state they put it in; the addresses
+of those logs are therefore collected (see `pop_reverted_addresses`), for the pools to be re-read from the chain.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from hexbytes import HexBytes
+from web3 import AsyncWeb3
+from web3.datastructures import AttributeDict
+
+from fastlane_bot.config import Config
+from .event_gatherer import EventGatherer
+from .interfaces.event import Event
+from .interfaces.subscription import Subscription
+
+
+def _as_int(value: Any) -> int:
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def _as_hex(value: Any) -> str:
+    return HexBytes(value).hex()
+
+
+def _format_log(log: Dict[str, Any]) -> AttributeDict:
+    """
+    A pushed log in the format of an eth_getLogs result.
+    """
+    return AttributeDict({
+        **log,
+        "blockNumber": _as_int(log["blockNumber"]),
+        "logIndex": _as_int(log["logIndex"]),
+        "transactionIndex": _as_int(log["transactionIndex"]),
+        "topics": [HexBytes(topic) for topic in log["topics"]],
+        "data": HexBytes(log["data"]),
+    })
+
+
+class BlockStream:
+    """
+    Push-driven source of new blocks and their events.
+
+    Parameters
+    ----------
+    config : Config
+        The config.
+    w3 : AsyncWeb3
+        A persistent websocket connection, eg ``AsyncWeb3.persistent_websocket(WebsocketProviderV2(ws_uri))``.
+    event_gatherer : EventGatherer
+        The event gatherer whose subscriptions are subscribed to, and through which missing blocks are backfilled.
+    settle_time : float
+        The time in seconds that the logs of a block are collected for after its head arrived.
+    max_history : int
+        The number of block hashes kept for detecting reorgs.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        w3: AsyncWeb3,
+        event_gatherer: EventGatherer,
+        settle_time: float = 0.05,
+        max_history: int = 128,
+    ):
+        self._config = config
+        self._w3 = w3
+        self._event_gatherer = event_gatherer
+        self.settle_time = settle_time
+        self.max_history = max_history
+        self._last_block = None
+        self._hashes: Dict[int, str] = {}
+        self._events: Dict[int, List[Event]] = {}
+        self._addresses: Dict[int, Set[str]] = {}
+        self._reverted_addresses: Set[str] = set()
+        self._head: Optional[Tuple[int, float]] = None
+        self._backfill_from: Optional[int] = None
+        self._heads_subscription_id = None
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._connected = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._reader: Optional[asyncio.Future] = None
+
+    def next_block(self, last_block: int) -> Tuple[int, int, List[Event]]:
+        """
+        Waits for the next block and returns its events.
+
+        Parameters
+        ----------
+        last_block : int
+            The last block whose events were processed before the first call.
+
+        Returns
+        -------
+        Tuple[int, int, List[Event]]
+            The first and last block of the range whose events are returned (more than one block after missed
+            heads or a reorg), and the events.
+        """
+        if self._last_block is None:
+            self._last_block = last_block
+        return asyncio.get_event_loop().run_until_complete(self._next_block())
+
+    def pop_reverted_addresses(self) -> Set[str]:
+        """
+        Gets the addresses whose logs were reverted since the last call, and resets them.
+
+        Returns
+        -------
+        Set[str]
+            The lower case addresses of the removed logs, and of the logs of processed blocks that a reorg orphaned.
+        """
+        reverted_addresses, self._reverted_addresses = self._reverted_addresses, set()
+        return reverted_addresses
+
+    def close(self):
+        """
+        Stops reading from the websocket and disconnects.
+        """
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._connected:
+            asyncio.get_event_loop().run_until_complete(self._w3.provider.disconnect())
+            self._connected = False
+
+    async def _connect(self):
+        if self._connected:
+            await self._w3.provider.disconnect()
+        await self._w3.provider.connect()
+        self._connected = True
+        self._heads_subscription_id = await self._w3.eth.subscribe("newHeads")
+        self._subscriptions = {}
+        for sub in self._event_gatherer.subscriptions:
+            await sub.subscribe(self._w3)
+            self._subscriptions[sub.subscription_id] = sub
+        self._queue = asyncio.Queue()
+        self._reader = asyncio.ensure_future(self._read())
+        self._config.logger.info(
+            f"[events.block_stream] Subscribed to newHeads and {len(self._subscriptions)} log topics"
+        )
+
+    async def _read(self):
+        try:
+            async for response in self._w3.ws.process_subscriptions():
+                self._queue.put_nowait(response["params"])
+        except Exception as e:
+            self._queue.put_nowait(e)
+
+    async def _next_block(self) -> Tuple[int, int, List[Event]]:
+        if self._reader is None:
+            await self._connect()
+        while True:
+            timeout = None
+            if self._head is not None:
+                timeout = self._head[1] - time.monotonic()
+                if timeout <= 0:
+                    return await self._emit()
+            try:
+                message = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                continue
+            if isinstance(message, Exception):
+                # the next call reconnects; the blocks missed in the meantime are backfilled
+                self._reader = None
+                raise message
+            if message["subscription"] == self._heads_subscription_id:
+                await self._handle_head(message["result"])
+            elif message["subscription"] in self._subscriptions:
+                self._handle_log(self._subscriptions[message["subscription"]], message["result"])
+
+    async def _handle_head(self, head: Dict[str, Any]):
+        number = _as_int(head["number"])
+        parent_hash = _as_hex(head["parentHash"])
+        if number <= self._last_block or self._hashes.get(number - 1, parent_hash) != parent_hash:
+            fork_block = await self._fork_block(number)
+            self._config.logger.info(f"[events.block_stream] Reorg from block {fork_block} to block {number}")
+            self._mark_backfill(fork_block)
+            self._hashes = {n: h for n, h in self._hashes.items() if n < fork_block}
+            for n in [n for n in self._addresses if n >= fork_block]:
+                self._reverted_addresses |= self._addresses.pop(n)
+        self._hashes[number] = _as_hex(head["hash"])
+        for n in [n for n in self._hashes if n <= number - self.max_history]:
+            del self._hashes[n]
+        self._head = (number, time.monotonic() + self.settle_time)
+
+    def _handle_log(self, subscription: Subscription, log: Dict[str, Any]):
+        log = _format_log(log)
+        block_number = log["blockNumber"]
+        if log.get("removed") or block_number <= self._last_block:
+            # the log was reorged out, or its block has already been processed
+            self._mark_backfill(block_number)
+            if log.get("removed"):
+                self._reverted_addresses.add(str(log["address"]).lower())
+            return
+        self._events.setdefault(block_number, []).append(subscription.parse_log(log))
+
+    async def _fork_block(self, number: int) -> int:
+        """
+        The first block of the new chain whose hash differs from the one seen before.
+        """
+        block_number = number - 1
+        while block_number in self._hashes:
+            block = await self._w3.eth.get_block(block_number)
+            if _as_hex(block["hash"]) == self._hashes[block_number]:
+                break
+            block_number -= 1
+        return block_number + 1
+
+    def _mark_backfill(self, block_number: int):
+        if self._backfill_from is None or block_number < self._backfill_from:
+            self._backfill_from = block_number
+
+    async def _emit(self) -> Tuple[int, int, List[Event]]:
+        to_block = self._head[0]
+        self._head = None
+        from_block = self._last_block + 1
+
+        missing_blocks = [n for n in range(from_block, to_block + 1) if n not in self._hashes]
+        if missing_blocks:
+            self._mark_backfill(missing_blocks[0])
+
+        blocks = sorted(n for n in self._events if n <= to_block)
+        events = [event for n in blocks for event in self._events.pop(n)]
+        if self._backfill_from is not None:
+            from_block = min(from_block, self._backfill_from)
+            self._config.logger.info(f"[events.block_stream] Backfilling blocks {from_block} to {to_block}")
+            events = await self._event_gatherer.async_get_all_events(from_block, to_block, head=to_block)
+            self._backfill_from = None
+
+        for event in events:
+            self._addresses.setdefault(event.block_number, set()).add(str(event.address).lower())
+        for n in [n for n in self._addresses if n <= to_block - self.max_history]:
+            del self._addresses[n]
+
+        self._last_block = to_block
+        return from_block, to_block, events
@@ -1,6 +1,7 @@
 import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
 from itertools import chain
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from traceback import format_exc
 
 import nest_asyncio
@@ -10,6 +11,9 @@ from web3.contract import Contract
 
 from fastlane_bot.config import Config
 from fastlane_bot.config.constants import BLOCK_CHUNK_SIZE_MAP
+from .interfaces.event import Event
+from .log_cache import LogCache
+from .log_fetcher import AdaptiveLogFetcher, LogFetcherStats
 from .interfaces.subscription import Subscription
 from .exchanges.base import Exchange
 
@@ -17,6 +21,22 @@ from .exchanges.base import Exchange
 nest_asyncio.apply()
 
 
+def _missing_ranges(from_block: int, to_block: int, covered_from: int, covered_to: int) -> List[Tuple[int, int]]:
+    """
+    The parts of the block range [from_block, to_block] which are not in [covered_from, covered_to].
+    """
+    ranges = []
+    if from_block < covered_from:
+        ranges.append((from_block, min(to_block, covered_from - 1)))
+    if to_block > covered_to:
+        ranges.append((max(from_block, covered_to + 1), to_block))
+    return ranges
+
+
+def _init_prefetch_thread():
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+
 class EventGatherer:
     """
     The EventGatherer manages event gathering using eth.get_logs.
@@ -27,15 +47,31 @@ class EventGatherer:
         config: Config,
         w3: AsyncWeb3,
         exchanges: Dict[str, Exchange],
+        log_cache: Optional[LogCache] = None,
+        reorg_delay: int = 0,
+        max_concurrency: int = 8,
     ):
         """ Initializes the EventManager.
         Args:
             manager: The Manager object
             w3: The connected AsyncWeb3 object.
+            log_cache: If given, logs are read from this cache and only the uncovered block ranges are fetched.
+            reorg_delay: Logs within this many blocks of the chain head are not cached.
+            max_concurrency: The maximum number of eth_getLogs requests in flight.
         """
         self._config = config
         self._w3 = w3
+        self._log_cache = log_cache
+        self._reorg_delay = reorg_delay
+        self._log_fetcher = AdaptiveLogFetcher(
+            w3,
+            config.logger,
+            max_chunk_size=BLOCK_CHUNK_SIZE_MAP[config.network.NETWORK] or None,
+            max_concurrency=max_concurrency,
+        )
         self._subscriptions = []
+        self._prefetch_executor = None
+        self._prefetch: Optional[Future] = None
 
         for exchange in exchanges.values():
             subscriptions = exchange.get_subscriptions(w3)
@@ -43,57 +79,173 @@ class EventGatherer:
                 if sub.topic not in [s.topic for s in self._subscriptions]:
                     self._subscriptions.append(sub)
 
-    def get_all_events(self, from_block: int, to_block: int):
+    @property
+    def subscriptions(self) -> List[Subscription]:
+        """
+        The subscriptions, one per event topic.
+        """
+        return self._subscriptions
+
+    @property
+    def log_fetcher_stats(self) -> LogFetcherStats:
+        """
+        The request, log, byte, retry and split counters of the eth_getLogs requests.
+        """
+        return self._log_fetcher.stats
+
+    def get_all_events(self, from_block: int, to_block: int, head: Optional[int] = None):
+        return asyncio.get_event_loop().run_until_complete(self.async_get_all_events(from_block, to_block, head))
+
+    async def async_get_all_events(self, from_block: int, to_block: int, head: Optional[int] = None):
+        head = await self._get_head(head)
         coroutines = []
         for sub in self._subscriptions:
             if sub.collect_all:
                 from_block_ = 0
             else:
                 from_block_ = from_block
-            coroutines.append(self._get_events_for_subscription(from_block_, to_block, sub))
-        results = asyncio.get_event_loop().run_until_complete(asyncio.gather(*coroutines))
+            coroutines.append(self._get_events_for_subscription(from_block_, to_block, sub, head))
+        results = await asyncio.gather(*coroutines)
         return list(chain.from_iterable(results))
 
-    async def _get_events_for_subscription(self, from_block: int, to_block: int, subscription: Subscription):
-        return [subscription.parse_log(log) for log in await self._get_logs_for_topics(from_block, to_block, [subscription.topic])]
-
-    async def _get_logs_for_topics(self, from_block: int, to_block: int, topics: List[str]):
-        chunk_size = BLOCK_CHUNK_SIZE_MAP[self._config.network.NETWORK]
-        if chunk_size > 0:
-            return await self._get_logs_iterative(from_block, to_block, topics, chunk_size)
-        else:
-            return await self._get_logs_recursive(from_block, to_block, topics)
-
-    async def _get_logs_iterative(self, from_block: int, to_block: int, topics: List[str], chunk_size: int) -> list:
-        block_numbers = list(range(from_block, to_block + 1, chunk_size)) + [to_block + 1]
-        log_lists = await asyncio.gather(*[
-            self._w3.eth.get_logs(filter_params={
-                "fromBlock": r[0],
-                "toBlock": r[1],
-                "topics": topics
-            })
-            for r in zip(block_numbers, map(lambda n: n - 1, block_numbers[1:]))
+    def stream_all_events(
+        self, from_block: int, to_block: int, handler: Callable[[Event], Any], head: Optional[int] = None
+    ) -> List[Event]:
+        """
+        Gets the same events as `get_all_events`, but passes each subscription's events to `handler` as soon as
+        they have arrived, while the logs of the other subscriptions are still being fetched.
+
+        Events fetched in the background by `prefetch_events` are used for the blocks they cover, and only the
+        remaining blocks are fetched.
+
+        Args:
+            from_block: The first block.
+            to_block: The last block.
+            handler: Called with every event, in the order in which the events arrive.
+            head: The chain head, if known (only used with a log cache, which otherwise requests it).
+
+        Returns:
+            All events that were passed to the handler.
+        """
+        prefetched = self._take_prefetched()
+        return asyncio.get_event_loop().run_until_complete(
+            self._stream_all_events(from_block, to_block, prefetched, handler, head)
+        )
+
+    def prefetch_events(self, from_block: int, reorg_delay: int):
+        """
+        Starts fetching the events from `from_block` up to `reorg_delay` blocks before the chain head in a
+        background thread. The next call to `stream_all_events` picks them up.
+
+        Args:
+            from_block: The first block.
+            reorg_delay: The number of blocks to stay behind the chain head.
+        """
+        if self._prefetch_executor is None:
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=1, initializer=_init_prefetch_thread)
+        self._prefetch = self._prefetch_executor.submit(
+            lambda: asyncio.get_event_loop().run_until_complete(self._prefetch_all_events(from_block, reorg_delay))
+        )
+
+    def _take_prefetched(self) -> Dict[str, Tuple[int, int, List[Event]]]:
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is None:
+            return {}
+        try:
+            return prefetch.result()
+        except Exception:
+            self._config.logger.warning(f"Prefetching events failed, fetching them again: {format_exc()}")
+            return {}
+
+    async def _prefetch_all_events(self, from_block: int, reorg_delay: int) -> Dict[str, Tuple[int, int, List[Event]]]:
+        head = await self._w3.eth.block_number
+        to_block = head - reorg_delay
+        subscriptions = [(0 if sub.collect_all else from_block, sub) for sub in self._subscriptions]
+        results = await asyncio.gather(*[
+            self._get_events_for_subscription(from_block_, to_block, sub, head) for from_block_, sub in subscriptions
         ])
-        return [log for log_list in log_lists for log in log_list]
+        return {sub.topic: (from_block_, to_block, events) for (from_block_, sub), events in zip(subscriptions, results)}
 
-    async def _get_logs_recursive(self, from_block: int, to_block: int, topics: List[str]) -> list:
-        if from_block <= to_block:
+    async def _stream_all_events(
+        self,
+        from_block: int,
+        to_block: int,
+        prefetched: Dict[str, Tuple[int, int, List[Event]]],
+        handler: Callable[[Event], Any],
+        head: Optional[int] = None,
+    ) -> List[Event]:
+        queue = asyncio.Queue()
+        head = await self._get_head(head)
+
+        async def produce(from_block_: int, to_block_: int, sub: Subscription):
+            await queue.put(await self._get_events_for_subscription(from_block_, to_block_, sub, head))
+
+        producers = []
+        for sub in self._subscriptions:
+            from_block_ = 0 if sub.collect_all else from_block
+            ranges = [(from_block_, to_block)]
+            if sub.topic in prefetched:
+                covered_from, covered_to, events = prefetched[sub.topic]
+                queue.put_nowait([event for event in events if from_block_ <= event.block_number <= to_block])
+                ranges = _missing_ranges(from_block_, to_block, covered_from, covered_to)
+            producers += [produce(start, end, sub) for start, end in ranges]
+
+        async def fetch():
             try:
-                return await self._w3.eth.get_logs(filter_params={
-                    "fromBlock": from_block,
-                    "toBlock": to_block,
-                    "topics": topics
-                })
-            except Exception as e:
-                if "eth_getLogs" not in str(e):
-                    self._config.logger.error(f"Unexpected exception in EventGatherer: {format_exc()}")
-                if from_block < to_block:
-                    mid_block = (from_block + to_block) // 2
-                    log_lists = await asyncio.gather(
-                        self._get_logs_recursive(from_block, mid_block, topics),
-                        self._get_logs_recursive(mid_block + 1, to_block, topics)
-                    )
-                    return [log for log_list in log_lists for log in log_list]
-                else:
-                    raise e
-        raise Exception(f"Illegal log query range: {from_block} -> {to_block}")
+                await asyncio.gather(*producers)
+            finally:
+                await queue.put(None)
+
+        fetcher = asyncio.ensure_future(fetch())
+        all_events = []
+        while (events := await queue.get()) is not None:
+            for event in events:
+                handler(event)
+            all_events += events
+        await fetcher
+        return all_events
+
+    async def _get_head(self, head: Optional[int]) -> Optional[int]:
+        """
+        The chain head, requested once per call from the node if it is not known and the log cache needs it.
+        """
+        if head is None and self._log_cache is not None:
+            head = await self._w3.eth.block_number
+        return head
+
+    async def _get_events_for_subscription(
+        self, from_block: int, to_block: int, subscription: Subscription, head: Optional[int] = None
+    ):
+        return [
+            subscription.parse_log(log)
+            for log in await self._get_logs_for_topics(from_block, to_block, [subscription.topic], head)
+        ]
+
+    async def _get_logs_for_topics(self, from_block: int, to_block: int, topics: List[str], head: Optional[int] = None):
+        if self._log_cache is None:
+            return await self._fetch_logs(from_block, to_block, topics)
+        return await self._get_logs_cached(from_block, to_block, topics[0], await self._get_head(head))
+
+    async def _get_logs_cached(self, from_block: int, to_block: int, topic: str, head: int):
+        network = self._config.network.NETWORK
+        safe_block = head - self._reorg_delay
+        if self._log_cache.last_block(network) > safe_block:
+            # the head is lower than when the logs were cached, ie the chain was reorged
+            self._config.logger.info(
+                f"[events.event_gatherer] Chain head {head} is below the cached logs, dropping those after block {safe_block}"
+            )
+            self._log_cache.drop_after(network, safe_block)
+
+        cache_to_block = min(to_block, safe_block)
+        missing_ranges = self._log_cache.missing_ranges(network, topic, from_block, cache_to_block)
+        log_lists = await asyncio.gather(*[self._fetch_logs(r[0], r[1], [topic]) for r in missing_ranges])
+        for r, log_list in zip(missing_ranges, log_lists):
+            self._log_cache.put(network, topic, r[0], r[1], log_list)
+
+        logs = self._log_cache.get(network, topic, from_block, cache_to_block)
+        if to_block > cache_to_block:
+            logs += await self._fetch_logs(max(from_block, cache_to_block + 1), to_block, [topic])
+        return logs
+
+    async def _fetch_logs(self, from_block: int, to_block: int, topics: List[str]):
+        return await self._log_fetcher.get_logs(from_block, to_block, topics)
@@ -31,6 +31,7 @@ class Balancer(Exchange):
 
     exchange_name: str = "balancer"
     _tokens: List[str] = None
+    multicall_touched_only: bool = False
 
     def add_pool(self, pool: Pool):
         self.pools[pool.state["cid"]] = pool
@@ -50,7 +51,16 @@ class Balancer(Exchange):
         return [contract.events.AuthorizerChanged]
 
     def get_subscriptions(self, w3: Union[Web3, AsyncWeb3]) -> List[Subscription]:
-        return []
+        # The pools are updated by multicall; these events only tell which pools to refresh (see `mark_pool_touched`),
+        # so they are not needed unless multicall is restricted to the touched pools
+        if not self.multicall_touched_only:
+            return []
+        contract = self.get_event_contract(w3)
+        return [
+            Subscription(contract.events.Swap),
+            Subscription(contract.events.PoolBalanceChanged),
+            Subscription(contract.events.PoolBalanceManaged),
+        ]
 
     async def get_fee(self, pool_id: str, contract: Contract) -> Tuple[str, float]:
         pool = self.get_pool(pool_id)
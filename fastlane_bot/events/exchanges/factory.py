@@ -36,7 +36,7 @@ class ExchangeFactory:
         """
         self._creators[key] = creator
 
-    def get_exchange(self, key, cfg: Any, exchange_initialized: bool = None):
+    def get_exchange(self, key, cfg: Any, exchange_initialized: bool = None, multicall_touched_only: bool = False):
         """
         Get an exchange from the factory
 
@@ -48,6 +48,8 @@ class ExchangeFactory:
             The Config object
         exchange_initialized : bool
             If the exchange has been initialized - this flag signals if an exchange that has data updated through events has already been initialized in order to avoid duplicate event filters.
+        multicall_touched_only : bool
+            If multicall only refreshes the pools touched by events - the exchanges whose pools are only updated by multicall then subscribe to the events that touch them.
         Returns
         -------
         Exchange
@@ -62,6 +64,8 @@ class ExchangeFactory:
                 creator = self._creators.get(fork_name)
 
         args = self.get_fork_extras(exchange_name=key, cfg=cfg, exchange_initialized=exchange_initialized)
+        if key == cfg.network.BALANCER_NAME:
+            args['multicall_touched_only'] = multicall_touched_only
         exchange = creator(**args)
 
         base_exchange_name = cfg.network.exchange_name_base_from_fork(exchange_name=key)
@@ -0,0 +1,237 @@
+"""
+This module contains the append-only journal of the pool state, which records per block only the pools that changed.
+
+A journal is a directory of checkpoints and segments. A checkpoint (``checkpoint-<block>``) is a ``PoolSnapshot`` of
+all pools at a block, and its segment (``segment-<block>.jsonl``) holds the changes of the blocks after it, one JSON
+line per changed pool (its cid, the block, the fields that were set and the fields that were removed) followed by one
+line that ends the block. Every ``compaction_period`` blocks the state is compacted into a new checkpoint, which
+starts a new segment. The state of the pools at any block since the first checkpoint kept is rebuilt by replaying
+the segment of the last checkpoint before it.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .snapshot import PoolSnapshot
+
+
+@dataclass
+class JournalStats:
+    """
+    Counters of a pool journal.
+
+    Parameters
+    ----------
+    blocks : int
+        The number of blocks journaled.
+    records : int
+        The number of pool records appended.
+    checkpoints : int
+        The number of checkpoints written.
+    """
+    blocks: int = 0
+    records: int = 0
+    checkpoints: int = 0
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class PoolJournal:
+    """
+    Append-only journal of the changes of the pool state, compacted periodically into checkpoints.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the journal (created if it does not exist).
+    compaction_period : int, optional
+        The number of blocks after which the state is compacted into a new checkpoint, by default 1000
+    max_checkpoints : int, optional
+        The number of checkpoints (and segments) kept, by default None (all, so the whole history can be read)
+    key : str, optional
+        The field that identifies a pool, by default "cid"
+    """
+
+    def __init__(self, path: str, compaction_period: int = 1000, max_checkpoints: int = None, key: str = "cid"):
+        self.path = path
+        self.compaction_period = compaction_period
+        self.max_checkpoints = max_checkpoints
+        self.key = key
+        self.stats = JournalStats()
+        self._state: Optional[Dict[Any, Tuple]] = None
+        self._checkpoint_block = None
+        self._block = None
+        os.makedirs(path, exist_ok=True)
+
+    def checkpoints(self) -> List[int]:
+        """
+        The blocks of the checkpoints in the journal, in ascending order.
+        """
+        return sorted(int(name.split("-")[1]) for name in os.listdir(self.path) if name.startswith("checkpoint-"))
+
+    def write(self, pools: List[Dict[str, Any]], block: int, info: Dict[str, Any] = None):
+        """
+        Appends the changes of the pools since the last write as the changes of `block`.
+
+        The first write of a journal object, and every write `compaction_period` blocks after the last
+        checkpoint, writes a checkpoint instead. Checkpoints at or after the block of the first write are
+        removed, as they belong to an earlier run.
+
+        Parameters
+        ----------
+        pools : List[Dict[str, Any]]
+            The pool data.
+        block : int
+            The block that the pool data is up to date with.
+        info : Dict[str, Any], optional
+            Information about the run to store with the checkpoints, by default None
+        """
+        if self._state is None:
+            for checkpoint in self.checkpoints():
+                if checkpoint >= block:
+                    self._remove_checkpoint(checkpoint)
+        elif block <= self._block:
+            raise ValueError(f"Block {block} is not after the last journaled block {self._block}")
+
+        if self._state is None or block - self._checkpoint_block >= self.compaction_period:
+            self._compact(pools, block, info)
+            return
+
+        lines = []
+        seen = set()
+        for pool in pools:
+            cid = pool[self.key]
+            if cid in seen:
+                continue
+            seen.add(cid)
+            items = tuple(pool.items())
+            old = self._state.get(cid)
+            if old == items:
+                continue
+            record = {"block": block, "cid": cid}
+            if old is None:
+                record["set"] = pool
+            else:
+                old = dict(old)
+                record["set"] = {
+                    name: value
+                    for name, value in pool.items()
+                    if name not in old or not (old[name] is value or old[name] == value)
+                }
+                record["unset"] = [name for name in old if name not in pool]
+            lines.append(json.dumps(record, default=_json_default))
+            self._state[cid] = items
+        for cid in [cid for cid in self._state if cid not in seen]:
+            lines.append(json.dumps({"block": block, "cid": cid, "deleted": True}))
+            del self._state[cid]
+        lines.append(json.dumps({"block": block, "end": True}))
+
+        # the block is written with a single call, and replayed only if its end line was written
+        with open(self._segment_file(self._checkpoint_block), "a") as f:
+            f.write("\n".join(lines) + "\n")
+        self._block = block
+        self.stats.blocks += 1
+        self.stats.records += len(lines) - 1
+
+    def read(self, block: int = None) -> Optional[Tuple[int, List[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Rebuilds the state of the pools at a block.
+
+        Parameters
+        ----------
+        block : int, optional
+            The block, by default None (the last block journaled)
+
+        Returns
+        -------
+        Optional[Tuple[int, List[Dict[str, Any]], Dict[str, Any]]]
+            The last block journaled at or before `block`, the pool data at that block and the information stored
+            with its checkpoint, or None if the journal has no checkpoint at or before `block`.
+        """
+        for checkpoint in reversed(self.checkpoints()):
+            if block is not None and checkpoint > block:
+                continue
+            result = PoolSnapshot(self._checkpoint_dir(checkpoint)).read()
+            if result is None:
+                # an incomplete checkpoint
+                continue
+            last_block, tables, info = result
+            pools = {pool[self.key]: pool for pool in tables["pools"]}
+            for records_block, records in self._segment_blocks(checkpoint):
+                if block is not None and records_block > block:
+                    break
+                for record in records:
+                    if record.get("deleted"):
+                        pools.pop(record["cid"], None)
+                        continue
+                    pool = pools.setdefault(record["cid"], {})
+                    pool.update(record["set"])
+                    for name in record.get("unset", []):
+                        pool.pop(name, None)
+                last_block = records_block
+            return last_block, list(pools.values()), info
+        return None
+
+    def _compact(self, pools: List[Dict[str, Any]], block: int, info: Dict[str, Any] = None):
+        """
+        Writes a checkpoint of the pools at `block`, which starts a new segment.
+        """
+        state = {}
+        for pool in pools:
+            state.setdefault(pool[self.key], pool)
+        PoolSnapshot(self._checkpoint_dir(block)).write(dict(pools=list(state.values())), block, info)
+        open(self._segment_file(block), "w").close()
+
+        self._state = {cid: tuple(pool.items()) for cid, pool in state.items()}
+        self._checkpoint_block = self._block = block
+        self.stats.checkpoints += 1
+
+        if self.max_checkpoints:
+            for checkpoint in self.checkpoints()[:-self.max_checkpoints]:
+                self._remove_checkpoint(checkpoint)
+
+    def _segment_blocks(self, checkpoint: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        The records of the complete blocks in the segment of a checkpoint, by block.
+        """
+        try:
+            f = open(self._segment_file(checkpoint))
+        except FileNotFoundError:
+            return
+        with f:
+            records = []
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # a partially written block
+                    return
+                if record.get("end"):
+                    yield record["block"], records
+                    records = []
+                else:
+                    records.append(record)
+
+    def _remove_checkpoint(self, checkpoint: int):
+        shutil.rmtree(self._checkpoint_dir(checkpoint), ignore_errors=True)
+        if os.path.exists(self._segment_file(checkpoint)):
+            os.remove(self._segment_file(checkpoint))
+
+    def _checkpoint_dir(self, block: int) -> str:
+        return os.path.join(self.path, f"checkpoint-{block:012d}")
+
+    def _segment_file(self, block: int) -> str:
+        return os.path.join(self.path, f"segment-{block:012d}.jsonl")
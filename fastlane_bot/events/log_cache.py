@@ -0,0 +1,139 @@
+"""
+This module contains the on-disk cache of the logs fetched by the EventGatherer.
+
+The cache is an append-only SQLite database which, per chain and topic, stores the logs and the block ranges
+for which all logs have been fetched. The EventGatherer only requests the ranges that are not covered from
+the RPC node.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+import pickle
+import sqlite3
+import threading
+from typing import Any, List, Tuple
+
+
+class LogCache:
+    """
+    Persistent cache of eth_getLogs results, keyed by (chain, topic, block range).
+
+    Parameters
+    ----------
+    path : str
+        The path of the SQLite database (created if it does not exist).
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._last_block = {}
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS logs ("
+                "chain TEXT, topic TEXT, block_number INTEGER, log_index INTEGER, log BLOB, "
+                "PRIMARY KEY (chain, topic, block_number, log_index))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ranges (chain TEXT, topic TEXT, from_block INTEGER, to_block INTEGER)"
+            )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._path!r})"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def ranges(self, chain: str, topic: str) -> List[Tuple[int, int]]:
+        """
+        The sorted, disjoint block ranges (inclusive) for which all logs of `topic` are cached.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT from_block, to_block FROM ranges WHERE chain = ? AND topic = ? ORDER BY from_block",
+                (chain, topic),
+            ).fetchall()
+
+    def last_block(self, chain: str) -> int:
+        """
+        The last block for which logs of any topic are cached (-1 if none are); kept in memory after the first call.
+        """
+        with self._lock:
+            if chain not in self._last_block:
+                row = self._conn.execute("SELECT MAX(to_block) FROM ranges WHERE chain = ?", (chain,)).fetchone()
+                self._last_block[chain] = -1 if row[0] is None else row[0]
+            return self._last_block[chain]
+
+    def missing_ranges(self, chain: str, topic: str, from_block: int, to_block: int) -> List[Tuple[int, int]]:
+        """
+        The parts of [from_block, to_block] for which the logs of `topic` are not cached.
+        """
+        missing = []
+        for covered_from, covered_to in self.ranges(chain, topic):
+            if covered_to < from_block:
+                continue
+            if covered_from > to_block:
+                break
+            if covered_from > from_block:
+                missing.append((from_block, covered_from - 1))
+            from_block = covered_to + 1
+        if from_block <= to_block:
+            missing.append((from_block, to_block))
+        return missing
+
+    def get(self, chain: str, topic: str, from_block: int, to_block: int) -> List[Any]:
+        """
+        The cached logs of `topic` in [from_block, to_block], ordered by block number and log index.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT log FROM logs WHERE chain = ? AND topic = ? AND block_number BETWEEN ? AND ? "
+                "ORDER BY block_number, log_index",
+                (chain, topic, from_block, to_block),
+            ).fetchall()
+        return [pickle.loads(row[0]) for row in rows]
+
+    def put(self, chain: str, topic: str, from_block: int, to_block: int, logs: List[Any]):
+        """
+        Stores all logs of `topic` in [from_block, to_block].
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO logs VALUES (?, ?, ?, ?, ?)",
+                [(chain, topic, log["blockNumber"], log["logIndex"], pickle.dumps(log)) for log in logs],
+            )
+            ranges = self._conn.execute(
+                "SELECT from_block, to_block FROM ranges WHERE chain = ? AND topic = ? ORDER BY from_block",
+                (chain, topic),
+            ).fetchall()
+            merged = []
+            for range_ in sorted(ranges + [(from_block, to_block)]):
+                if merged and range_[0] <= merged[-1][1] + 1:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], range_[1]))
+                else:
+                    merged.append(range_)
+            self._conn.execute("DELETE FROM ranges WHERE chain = ? AND topic = ?", (chain, topic))
+            self._conn.executemany(
+                "INSERT INTO ranges VALUES (?, ?, ?, ?)", [(chain, topic, *range_) for range_ in merged]
+            )
+            if chain in self._last_block:
+                self._last_block[chain] = max(self._last_block[chain], to_block)
+
+    def drop_after(self, chain: str, block_number: int):
+        """
+        Drops the logs and range coverage of all topics after `block_number`, eg because they may be reorged.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM logs WHERE chain = ? AND block_number > ?", (chain, block_number))
+            self._conn.execute(
+                "DELETE FROM ranges WHERE chain = ? AND from_block > ?", (chain, block_number)
+            )
+            self._conn.execute(
+                "UPDATE ranges SET to_block = ? WHERE chain = ? AND to_block > ?", (block_number, chain, block_number)
+            )
+            if chain in self._last_block:
+                self._last_block[chain] = min(self._last_block[chain], block_number)
@@ -0,0 +1,205 @@
+"""
+This module contains the adaptive eth_getLogs fetcher used by the EventGatherer.
+
+The fetcher splits a block range into windows whose size follows the observed number of logs per block: windows
+grow while responses are small and shrink when they are large or when the node rejects a query because the range
+or the response is too large. The number of requests in flight is capped per provider, and failed requests are
+retried with exponential backoff.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from web3 import AsyncWeb3
+
+
+# substrings (lower case) of the errors with which nodes reject eth_getLogs queries whose range or result is too large
+RANGE_ERROR_MESSAGES = (
+    "eth_getlogs",
+    "more than",
+    "too many results",
+    "response size",
+    "block range",
+    "range is too",
+    "range too",
+)
+
+# approximate size of a log without its data and topics (address, hashes, numbers and json overhead)
+LOG_OVERHEAD_BYTES = 200
+
+
+@dataclass
+class LogFetcherStats:
+    """
+    Counters of an AdaptiveLogFetcher.
+
+    Parameters
+    ----------
+    requests : int
+        The number of eth_getLogs requests sent (including retries).
+    logs : int
+        The number of logs received.
+    bytes : int
+        The approximate number of bytes received.
+    retries : int
+        The number of requests retried after an error.
+    splits : int
+        The number of windows split because the node rejected them as too large.
+    """
+    requests: int = 0
+    logs: int = 0
+    bytes: int = 0
+    retries: int = 0
+    splits: int = 0
+
+
+def is_range_error(e: Exception) -> bool:
+    """
+    Whether the node rejected a query because its block range or its result is too large.
+    """
+    message = str(e).lower()
+    return any(m in message for m in RANGE_ERROR_MESSAGES)
+
+
+def log_size(log: Any) -> int:
+    """
+    The approximate size in bytes of a log.
+    """
+    data = log.get("data", b"")
+    if isinstance(data, str):
+        data = bytes.fromhex(data[2:] if data.startswith("0x") else data)
+    return LOG_OVERHEAD_BYTES + len(data) + 32 * len(log.get("topics", []))
+
+
+class AdaptiveLogFetcher:
+    """
+    Fetches the logs of a block range in adaptively sized windows.
+
+    Parameters
+    ----------
+    w3 : AsyncWeb3
+        The connected AsyncWeb3 object.
+    logger : Any
+        The logger.
+    max_chunk_size : int, optional
+        The largest window in blocks (None = unlimited).
+    min_chunk_size : int
+        The smallest window in blocks.
+    target_logs : int
+        The number of logs per response that the window size aims for.
+    max_concurrency : int
+        The maximum number of requests in flight.
+    max_retries : int
+        The number of times a request is retried after an error.
+    backoff : float
+        The delay in seconds before the first retry; it doubles with every retry.
+    """
+
+    def __init__(
+        self,
+        w3: AsyncWeb3,
+        logger: Any,
+        max_chunk_size: Optional[int] = None,
+        min_chunk_size: int = 1,
+        target_logs: int = 2000,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+    ):
+        self._w3 = w3
+        self._logger = logger
+        self.max_chunk_size = max_chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.target_logs = target_logs
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.chunk_size = max_chunk_size
+        self.stats = LogFetcherStats()
+        self._semaphores = {}
+
+    @property
+    def _semaphore(self) -> asyncio.Semaphore:
+        # a semaphore is bound to the event loop it is used in, and the gatherer may run on several (eg prefetching)
+        loop = asyncio.get_event_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def get_logs(self, from_block: int, to_block: int, topics: List[str]) -> List[Any]:
+        """
+        Gets the logs for `topics` in [from_block, to_block], in block order.
+        """
+        tasks = []
+        pending = set()
+        start = from_block
+        while start <= to_block:
+            # wait for a free slot first, so that the window size reflects the latest responses
+            while len(pending) >= self.max_concurrency:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            size = to_block - start + 1 if self.chunk_size is None else self.chunk_size
+            end = min(to_block, start + size - 1)
+            task = asyncio.ensure_future(self._get_logs_window(start, end, topics))
+            tasks.append(task)
+            pending.add(task)
+            start = end + 1
+        log_lists = await asyncio.gather(*tasks)
+        return [log for log_list in log_lists for log in log_list]
+
+    async def _get_logs_window(self, from_block: int, to_block: int, topics: List[str]) -> List[Any]:
+        try:
+            logs = await self._request(from_block, to_block, topics)
+        except Exception as e:
+            if not is_range_error(e) or from_block >= to_block:
+                raise
+            self.stats.splits += 1
+            self._resize(max(self.min_chunk_size, (to_block - from_block + 1) // 2))
+            mid_block = (from_block + to_block) // 2
+            log_lists = await asyncio.gather(
+                self._get_logs_window(from_block, mid_block, topics),
+                self._get_logs_window(mid_block + 1, to_block, topics),
+            )
+            return [log for log_list in log_lists for log in log_list]
+        self._adapt(to_block - from_block + 1, len(logs))
+        return logs
+
+    async def _request(self, from_block: int, to_block: int, topics: List[str]) -> List[Any]:
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                self.stats.requests += 1
+                try:
+                    logs = await self._w3.eth.get_logs(filter_params={
+                        "fromBlock": from_block,
+                        "toBlock": to_block,
+                        "topics": topics
+                    })
+                except Exception as e:
+                    if is_range_error(e) or attempt == self.max_retries:
+                        raise
+                    self._logger.debug(f"[AdaptiveLogFetcher] retrying {from_block} -> {to_block}: {e}")
+                else:
+                    self.stats.logs += len(logs)
+                    self.stats.bytes += sum(log_size(log) for log in logs)
+                    return logs
+            self.stats.retries += 1
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    def _adapt(self, num_blocks: int, num_logs: int):
+        """
+        Adjusts the window size after a successful response of `num_logs` logs for `num_blocks` blocks.
+        """
+        if num_logs > self.target_logs:
+            self._resize(num_blocks * self.target_logs // num_logs)
+        elif num_logs < self.target_logs // 4 and self.chunk_size is not None and num_blocks >= self.chunk_size:
+            self._resize(2 * self.chunk_size)
+
+    def _resize(self, chunk_size: int):
+        chunk_size = max(self.min_chunk_size, chunk_size)
+        if self.max_chunk_size is not None:
+            chunk_size = min(self.max_chunk_size, chunk_size)
+        self.chunk_size = chunk_size
@@ -8,9 +8,10 @@ Contains the base class for the managers modules.
 All rights reserved.
 Licensed under MIT.
 """
+import itertools
 import time
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Type, Optional, Tuple
+from typing import List, Dict, Any, Type, Optional, Set, Tuple
 
 from web3 import Web3, AsyncWeb3
 from web3.contract import Contract
@@ -23,8 +24,53 @@ from fastlane_bot.events.exchanges import exchange_factory
 from fastlane_bot.events.exchanges.base import Exchange
 from fastlane_bot.events.pools.utils import get_pool_cid
 from fastlane_bot.events.pools import pool_factory
+from fastlane_bot.events.pools.base import Pool
+from .store import PoolStore
 from ..interfaces.event import Event
 
+# the pool info field identifying the pool that an event of a multicall-refreshed exchange may have changed, and the
+# event argument holding its value
+MULTICALL_TOUCH_KEYS = {
+    "TradingLiquidityUpdated": ("tkn1_address", "pool"),
+    "TokenTraded": ("tkn0_address", "token"),
+    "TradingEnabled": ("tkn0_address", "token"),
+    "StrategyCreated": ("strategy_id", "id"),
+    "StrategyUpdated": ("strategy_id", "id"),
+    "Swap": ("anchor", "poolId"),
+    "PoolBalanceChanged": ("anchor", "poolId"),
+    "PoolBalanceManaged": ("anchor", "poolId"),
+}
+
+# the fields of MULTICALL_TOUCH_KEYS whose values are hex strings, which events may give as bytes or without the 0x
+# prefix (eg the Balancer poolId, which `complex_handler` turns into `bytes.hex()`)
+MULTICALL_TOUCH_HEX_KEYS = {"tkn0_address", "tkn1_address", "anchor"}
+
+
+def touch_value(key: str, value: Any) -> str:
+    """
+    Normalizes the value of a pool info field of ``MULTICALL_TOUCH_KEYS``, for matching events to pools.
+
+    Parameters
+    ----------
+    key : str
+        The pool info field.
+    value : Any
+        Its value, in the pool info or in an event.
+
+    Returns
+    -------
+    str
+        The value in lower case, and for the hex fields as a 0x-prefixed hex string.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        value = value.hex()
+    value = str(value).lower()
+    if key in MULTICALL_TOUCH_HEX_KEYS:
+        value = "0x" + (value[2:] if value.startswith("0x") else value)
+    return value
+
+# the gas estimate of a `strategiesByPair` call, which reads up to 5000 strategies, for chunking the multicall
+STRATEGIES_BY_PAIR_GAS = 2_000_000
 
 @dataclass
 class BaseManager:
@@ -38,7 +84,7 @@ class BaseManager:
     cfg : Config
         The Config instance.
     pool_data : List[Dict[str, Any]]
-        The pool data.
+        The pool data; stored as an indexed PoolStore (see store.py).
     alchemy_max_block_fetch : int
         The maximum number of blocks to fetch from Alchemy.
     event_contracts : Dict[str, Contract or Type[Contract]]
@@ -61,6 +107,24 @@ class BaseManager:
         The supported exchanges.
     read_only : bool
         Whether the bot is running in read only mode.
+    multicall_touched_only : bool
+        Whether multicall only refreshes the touched pools (the exchanges whose pools are only
+        updated by multicall then subscribe to the events that touch them).
+    dirty_pairs : Set[str]
+        The token pairs (as sorted "tkn0/tkn1" address strings) whose pools changed since the last
+        call to ``pop_dirty_pairs``.
+    all_pairs_dirty : bool
+        Whether a change affected all pairs (eg a fee update); initially True.
+    touched_pools : Dict[str, Set[str]]
+        The pools that events may have changed since the last call to ``pop_touched_pools``, as the
+        values of their pool info fields (see ``MULTICALL_TOUCH_KEYS``).
+    all_pools_touched : bool
+        Whether all pools must be considered touched; initially True.
+    event_routes : Dict[str, List[Tuple[int, str, Type[Pool]]]]
+        The routing table of ``exchange_name_from_event`` for the pools in ``static_pools``: the
+        candidate (priority, exchange name, pool class) routes of every pool address.
+    generic_event_routes : List[Tuple[int, str, Type[Pool]]]
+        The candidate routes of the pool classes that do not match events by their address.
     """
 
     web3: Web3
@@ -107,10 +171,25 @@ class BaseManager:
     replay_from_block: int = None
 
     forked_exchanges: List[str] = field(default_factory=list)
-    static_pools: Dict[str, List[str]] = field(default_factory=dict)
+    static_pools: Dict[str, Set[str]] = field(default_factory=dict)
 
     prefix_path: str = ""
     read_only: bool = False
+    multicall_touched_only: bool = False
+
+    dirty_pairs: Set[str] = field(default_factory=set)
+    all_pairs_dirty: bool = True
+    touched_pools: Dict[str, Set[str]] = field(default_factory=dict)
+    all_pools_touched: bool = True
+
+    event_routes: Dict[str, List[Tuple[int, str, Type[Pool]]]] = field(default_factory=dict)
+    generic_event_routes: List[Tuple[int, str, Type[Pool]]] = field(default_factory=list)
+    _carbon_controller_exchanges: Dict[str, str] = field(default_factory=dict)
+
+    def __setattr__(self, name, value):
+        if name == "pool_data" and not isinstance(value, PoolStore):
+            value = PoolStore(value if value is not None else [])
+        super().__setattr__(name, value)
 
     def __post_init__(self):
         initialized_exchanges = []
@@ -127,11 +206,17 @@ class BaseManager:
             if base_exchange_name not in self.SUPPORTED_BASE_EXCHANGES:
                 self.SUPPORTED_BASE_EXCHANGES.append(base_exchange_name)
 
-            self.exchanges[exchange_name] = exchange_factory.get_exchange(key=exchange_name, cfg=self.cfg, exchange_initialized=initialize_events)
+            self.exchanges[exchange_name] = exchange_factory.get_exchange(
+                key=exchange_name,
+                cfg=self.cfg,
+                exchange_initialized=initialize_events,
+                multicall_touched_only=self.multicall_touched_only,
+            )
 
         self.init_exchange_contracts()
         self.set_carbon_v1_fee_pairs()
         self.init_tenderly_event_contracts()
+        self.build_event_routes()
 
     @property
     def fee_pairs(self) -> Dict:
@@ -226,6 +311,65 @@ class BaseManager:
         )
         return fee_pairs
 
+    def build_event_routes(self):
+        """
+        Builds the routing table of ``exchange_name_from_event``.
+
+        Every supported exchange is paired with the pool classes of its base exchange, in the order in which
+        ``exchange_name_from_event`` tries them. The routes of the exchanges with a ``static_pools`` entry
+        (which match events by the address of the emitting pool) are indexed by pool address; the others are
+        tried for every event. Must be called again whenever ``static_pools`` or the supported exchanges change.
+        """
+        routes = []
+        for exchange_name, pool_class in pool_factory._creators.items():
+            for _ex_name in self.SUPPORTED_EXCHANGES:
+                if exchange_name in self.cfg.network.exchange_name_base_from_fork(_ex_name):
+                    routes.append((len(routes), _ex_name, pool_class))
+
+        event_routes = {}
+        generic_event_routes = []
+        for route in routes:
+            pools = self.static_pools.get(f"{route[1]}_pools")
+            if pools is None:
+                generic_event_routes.append(route)
+                continue
+            for address in pools:
+                event_routes.setdefault(address, []).append(route)
+
+        self.event_routes = event_routes
+        self.generic_event_routes = generic_event_routes
+        self._carbon_controller_exchanges = {
+            address: ex for ex, address in reversed(list(self.cfg.CARBON_CONTROLLER_MAPPING.items()))
+        }
+
+    def route_event(self, event: Event) -> Tuple[Optional[str], Optional[Type[Pool]]]:
+        """
+        Get the exchange name and the pool class of an event.
+
+        Parameters
+        ----------
+        event : Event
+            The event.
+
+        Returns
+        -------
+        Tuple[Optional[str], Optional[Type[Pool]]]
+            The exchange name and the pool class, or (None, None) if the event does not match any exchange.
+        """
+        if 'id' in event.args and event.address in self._carbon_controller_exchanges:
+            exchange_name = self._carbon_controller_exchanges[event.address]
+            return exchange_name, pool_factory.get_pool(exchange_name, self.cfg)
+
+        routes = self.event_routes.get(event.address)
+        if routes:
+            routes = sorted(routes + self.generic_event_routes)
+        else:
+            routes = self.generic_event_routes
+        for _, exchange_name, pool_class in routes:
+            if pool_class.event_matches_format(event, self.static_pools, exchange_name=exchange_name):
+                return exchange_name, pool_class
+        return None, None
+
     def exchange_name_from_event(self, event: Event) -> str:
         """
         Get the exchange name from the event.
@@ -240,19 +384,7 @@ class BaseManager:
         str
             The exchange name.
         """
-        if 'id' in event.args:
-            carbon_controller_address = event.address
-            for ex in self.cfg.CARBON_CONTROLLER_MAPPING:
-                if self.cfg.CARBON_CONTROLLER_MAPPING[ex] == carbon_controller_address:
-                    return ex
-
-        for exchange_name, pool_class in pool_factory._creators.items():
-            for _ex_name in self.SUPPORTED_EXCHANGES:
-                if exchange_name not in self.cfg.network.exchange_name_base_from_fork(_ex_name):
-                    continue
-                if pool_class.event_matches_format(event, self.static_pools, exchange_name=_ex_name):
-                    return _ex_name
-        return None
+        return self.route_event(event)[0]
 
     def check_forked_exchange_names(
             self, exchange_name_default: str = None, address: str = None, event: Event = None
@@ -473,8 +605,7 @@ class BaseManager:
         """
         return [
             (p["tkn0_address"], p["tkn1_address"])
-            for p in self.pool_data
-            if p["exchange_name"] == exchange_name
+            for p in self.pool_data.get_by_exchange(exchange_name)
         ]
 
     def create_or_get_carbon_controller(self, exchange_name: str):
@@ -530,11 +661,13 @@ class BaseManager:
             The strategies.
 
         """
-        multicaller = MultiCaller(self.web3, self.cfg.MULTICALL_CONTRACT_ADDRESS)
+        multicaller = MultiCaller(self.web3, self.cfg.MULTICALL_CONTRACT_ADDRESS, w3_async=self.w3_async)
 
         for pair in pairs:
             # Loading the strategies for each pair without executing the calls yet
-            multicaller.add_call(carbon_controller.functions.strategiesByPair(*pair, 0, 5000))
+            multicaller.add_call(
+                carbon_controller.functions.strategiesByPair(*pair, 0, 5000), gas=STRATEGIES_BY_PAIR_GAS
+            )
 
         # Fetch strategies for each pair from the CarbonController contract object
         strategies_by_pair = multicaller.run_calls(self.replay_from_block or "latest")
@@ -579,7 +712,7 @@ class BaseManager:
         ]
         strategies = []
         for cid in cids:
-            pool_data = [pool for pool in self.pool_data if pool["cid"] == cid][0]
+            pool_data = self.pool_data.get_by_cid(cid)
             strategy_id = pool_data["strategy_id"]
 
             # Constructing the orders based on the values from the pool_data dictionary
@@ -658,7 +791,7 @@ class BaseManager:
             The fees by pair.
 
         """
-        multicaller = MultiCaller(self.web3, self.cfg.MULTICALL_CONTRACT_ADDRESS)
+        multicaller = MultiCaller(self.web3, self.cfg.MULTICALL_CONTRACT_ADDRESS, w3_async=self.w3_async)
 
         for pair in all_pairs:
             multicaller.add_call(carbon_controller.functions.pairTradingFeePPM(*pair))
@@ -823,6 +956,76 @@ class BaseManager:
             f"[managers.base.get_key_and_value] Exchange {ex_name} not supported"
         )
 
+    def mark_pool_dirty(self, pool_info: Dict[str, Any]) -> None:
+        """
+        Record the token pairs of a pool as changed.
+
+        Parameters
+        ----------
+        pool_info : Dict[str, Any]
+            The pool info.
+        """
+        tkns = set()
+        for idx in range(8):
+            tkn = pool_info.get(f"tkn{idx}_address")
+            if type(tkn) != str:
+                break
+            tkns.add(tkn.replace(self.cfg.NATIVE_GAS_TOKEN_ADDRESS, self.cfg.WRAPPED_GAS_TOKEN_ADDRESS))
+        self.dirty_pairs.update(
+            "/".join(pair) for pair in itertools.combinations(sorted(tkns), 2)
+        )
+
+    def mark_all_pairs_dirty(self) -> None:
+        """
+        Record that a change affected all pairs.
+        """
+        self.all_pairs_dirty = True
+
+    def pop_dirty_pairs(self) -> Optional[Set[str]]:
+        """
+        Get the pairs that changed since the last call, and reset the change tracking.
+
+        Returns
+        -------
+        Optional[Set[str]]
+            The dirty pairs (as sorted "tkn0/tkn1" address strings), or None if all pairs must be
+            considered dirty.
+        """
+        dirty_pairs = None if self.all_pairs_dirty else self.dirty_pairs
+        self.dirty_pairs = set()
+        self.all_pairs_dirty = False
+        return dirty_pairs
+
+    def mark_pool_touched(self, event: Event) -> None:
+        """
+        Record the pool that an event may have changed, for refreshing only those pools by multicall.
+
+        Parameters
+        ----------
+        event : Event
+            The event.
+        """
+        if event.event not in MULTICALL_TOUCH_KEYS:
+            return
+        key, arg = MULTICALL_TOUCH_KEYS[event.event]
+        if arg in event.args:
+            self.touched_pools.setdefault(key, set()).add(touch_value(key, event.args[arg]))
+
+    def pop_touched_pools(self) -> Optional[Dict[str, Set[str]]]:
+        """
+        Get the pools touched since the last call, and reset the tracking.
+
+        Returns
+        -------
+        Optional[Dict[str, Set[str]]]
+            The values of the pool info fields identifying the touched pools (see ``touch_value``), by field, or
+            None if all pools must be considered touched.
+        """
+        touched_pools = None if self.all_pools_touched else self.touched_pools
+        self.touched_pools = {}
+        self.all_pools_touched = False
+        return touched_pools
+
     def handle_strategy_deleted(self, event: Event) -> None:
         """
         Handle the strategy deleted event.
@@ -834,9 +1037,11 @@ class BaseManager:
         """
         strategy_id = event.args["id"]
         exchange_name = self.exchange_name_from_event(event)
-        cids = [p["cid"] for p in self.pool_data if
-                p["strategy_id"] == strategy_id and p["exchange_name"] == exchange_name]
-        self.pool_data = [p for p in self.pool_data if p["cid"] not in cids]
+        pools = self.pool_data.get_all(exchange_name, "strategy_id", strategy_id)
+        for pool in pools:
+            self.mark_pool_dirty(pool)
+        cids = [p["cid"] for p in pools]
+        self.pool_data.remove_cids(cids)
         for x in cids:
             self.exchanges[exchange_name].delete_strategy(x)
 
@@ -34,10 +34,12 @@ class Manager(PoolManager, EventManager, ContractsManager):
         ex_name = self.exchange_name_from_event(event)
         if event.event in ["TradingFeePPMUpdated", "PairTradingFeePPMUpdated"]:
             self.handle_trading_fee_updated()
+            self.mark_all_pairs_dirty()
             return
 
         if event.event == "PairCreated":
             self.set_carbon_v1_fee_pairs()
+            self.mark_all_pairs_dirty()
             return
 
         if event.event == "StrategyDeleted":
@@ -65,6 +67,7 @@ class Manager(PoolManager, EventManager, ContractsManager):
         pool = self.get_or_init_pool(pool_info)
         data = pool.update_from_event(event, pool.get_common_data(event, pool_info))
         self.update_pool_data(pool_info, data)
+        self.mark_pool_dirty(pool_info)
 
     def update_from_pool_info(
             self, pool_info: Dict[str, Any], current_block: int = None
@@ -123,10 +126,8 @@ class Manager(PoolManager, EventManager, ContractsManager):
             pool_info["descr"] = self.pool_descr_from_info(pool_info)
 
         # update the pool_data where the cids match
-        for idx, pool in enumerate(self.pool_data):
-            if pool["cid"] == pool_info["cid"]:
-                self.pool_data[idx] = pool_info
-                break
+        self.pool_data.replace_by_cid(pool_info)
+        self.mark_pool_dirty(pool_info)
 
     def update(
             self,
@@ -182,19 +183,10 @@ class Manager(PoolManager, EventManager, ContractsManager):
 
                 fee = self.fee_pairs[exchange_name][(tkn0_address, tkn1_address)]
 
-                for idx, pool in enumerate(self.pool_data):
-                    if (
-                            pool["tkn0_address"] == tkn0_address
-                            and pool["tkn1_address"] == tkn1_address
-                            and pool["exchange_name"] == exchange_name
-                    ):
-                        self._handle_pair_trading_fee_updated(fee, pool, idx)
-                    elif (
-                            pool["tkn0_address"] == tkn1_address
-                            and pool["tkn1_address"] == tkn0_address
-                            and pool["exchange_name"] == exchange_name
-                    ):
-                        self._handle_pair_trading_fee_updated(fee, pool, idx)
+                pools = self.pool_data.get_by_pair(exchange_name, tkn0_address, tkn1_address)
+                pools += self.pool_data.get_by_pair(exchange_name, tkn1_address, tkn0_address)
+                for pool in pools:
+                    self._handle_pair_trading_fee_updated(fee, pool, self.pool_data.position(pool))
 
     def _handle_pair_trading_fee_updated(
             self, fee: int, pool: Dict[str, Any], idx: int
@@ -234,14 +226,13 @@ class Manager(PoolManager, EventManager, ContractsManager):
                 self.fee_pairs[exchange_name] = self.get_fee_pairs(pairs, carbon_controller)
 
                 # Update pool info
-                for idx, pool in enumerate(self.pool_data):
-                    if pool["exchange_name"] == exchange_name:
-                        pool["fee"] = self.fee_pairs[exchange_name][
-                            (pool["tkn0_address"], pool["tkn1_address"])
-                        ]
-                        pool["fee_float"] = pool["fee"] / 1e6
-                        pool["descr"] = self.pool_descr_from_info(pool)
-                        self.pool_data[idx] = pool
+                # (fee fields are not indexed, so the pools can be updated in place)
+                for pool in self.pool_data.get_by_exchange(exchange_name):
+                    pool["fee"] = self.fee_pairs[exchange_name][
+                        (pool["tkn0_address"], pool["tkn1_address"])
+                    ]
+                    pool["fee_float"] = pool["fee"] / 1e6
+                    pool["descr"] = self.pool_descr_from_info(pool)
 
 
     def update_remaining_pools(self):
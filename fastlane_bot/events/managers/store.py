@@ -0,0 +1,331 @@
+"""
+Contains the indexed pool store used by the managers to hold the pool data.
+
+The store is a ``list`` of pool info dicts (so all existing code that iterates,
+indexes or appends to ``mgr.pool_data`` keeps working) that additionally keeps
+hash indexes by cid, by exchange name and by ``(exchange_name, key)`` for the
+keys in ``PoolStore.INDEXED_KEYS``. Lookups that used to scan the whole list for
+every event are O(1) against these indexes.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class PoolStore(list):
+    """
+    List of pool info dicts with hash indexes that are kept in sync on insert, update and delete.
+
+    Every index maps a key to an insertion-ordered bucket of pools, so that lookups return the same
+    pool as the first match of a linear scan would (modulo in-place replacements).
+
+    Notes
+    -----
+    Indexed fields of a pool must not be changed by mutating the dict directly; use ``update_pool``
+    instead so that the indexes are refreshed. Non-indexed fields can be mutated freely.
+
+    The order of the list is not kept: ``remove_cids`` moves the last pool into the place of every
+    removed pool, and the managers re-add a pool that is fetched again at the end of the list. Callers
+    must not depend on the position of a pool; the journal keys the pools by cid, the snapshot restores
+    them in the order they were written and ``deduplicate_pool_data`` sorts them by block itself.
+    """
+
+    INDEXED_KEYS = ("address", "tkn0_address", "tkn1_address", "strategy_id")
+
+    def __init__(self, pools: Iterable[Dict[str, Any]] = ()):
+        super().__init__(pools)
+        self._reindex()
+
+    # ------------------------------------------------------------------
+    # index maintenance
+    # ------------------------------------------------------------------
+    def _reindex(self):
+        """
+        Rebuild all indexes from scratch.
+        """
+        self._refs: Dict[int, int] = {}
+        self._by_cid: Dict[Hashable, Dict[int, Dict[str, Any]]] = {}
+        self._by_exchange: Dict[Hashable, Dict[int, Dict[str, Any]]] = {}
+        self._by_key: Dict[Tuple, Dict[int, Dict[str, Any]]] = {}
+        self._by_pair: Dict[Tuple, Dict[int, Dict[str, Any]]] = {}
+        self._positions: Optional[Dict[int, int]] = None
+        for pool in self:
+            self._index(pool)
+
+    @staticmethod
+    def _keys(pool: Dict[str, Any]) -> List[Tuple[str, Hashable]]:
+        """
+        Returns the ``(index_name, key)`` pairs under which ``pool`` is indexed.
+        """
+        ex_name = pool.get("exchange_name")
+        keys = [("_by_cid", pool.get("cid")), ("_by_exchange", ex_name)]
+        keys += [("_by_key", (ex_name, k, pool.get(k))) for k in PoolStore.INDEXED_KEYS]
+        keys += [("_by_pair", (ex_name, pool.get("tkn0_address"), pool.get("tkn1_address")))]
+        return keys
+
+    def _index(self, pool: Dict[str, Any]):
+        """
+        Add ``pool`` to the indexes.
+        """
+        pid = id(pool)
+        self._refs[pid] = self._refs.get(pid, 0) + 1
+        if self._refs[pid] > 1:
+            return
+        for index_name, key in self._keys(pool):
+            try:
+                getattr(self, index_name).setdefault(key, {})[pid] = pool
+            except TypeError:
+                # unhashable key values are simply not indexed
+                pass
+
+    def _unindex(self, pool: Dict[str, Any]):
+        """
+        Remove ``pool`` from the indexes (only once its last occurrence in the list is gone).
+        """
+        pid = id(pool)
+        self._refs[pid] = self._refs.get(pid, 1) - 1
+        if self._refs[pid] > 0:
+            return
+        del self._refs[pid]
+        for index_name, key in self._keys(pool):
+            index = getattr(self, index_name)
+            try:
+                bucket = index.get(key)
+            except TypeError:
+                continue
+            if bucket is None:
+                continue
+            bucket.pop(pid, None)
+            if not bucket:
+                del index[key]
+
+    # ------------------------------------------------------------------
+    # list interface
+    # ------------------------------------------------------------------
+    def append(self, pool: Dict[str, Any]):
+        if self._positions is not None:
+            self._positions.setdefault(id(pool), len(self))
+        super().append(pool)
+        self._index(pool)
+
+    def extend(self, pools: Iterable[Dict[str, Any]]):
+        for pool in pools:
+            self.append(pool)
+
+    def __iadd__(self, pools: Iterable[Dict[str, Any]]):
+        self.extend(pools)
+        return self
+
+    def insert(self, idx: int, pool: Dict[str, Any]):
+        super().insert(idx, pool)
+        self._index(pool)
+        self._positions = None
+
+    def __setitem__(self, idx, value):
+        if isinstance(idx, slice):
+            old = self[idx]
+            value = list(value)
+            super().__setitem__(idx, value)
+            for pool in old:
+                self._unindex(pool)
+            for pool in value:
+                self._index(pool)
+            self._positions = None
+            return
+        old = self[idx]
+        super().__setitem__(idx, value)
+        if old is value:
+            return
+        self._unindex(old)
+        self._index(value)
+        if self._positions is not None:
+            self._positions.pop(id(old), None)
+            self._positions[id(value)] = idx % len(self)
+
+    def __delitem__(self, idx):
+        old = self[idx] if isinstance(idx, slice) else [self[idx]]
+        super().__delitem__(idx)
+        for pool in old:
+            self._unindex(pool)
+        self._positions = None
+
+    def pop(self, idx: int = -1) -> Dict[str, Any]:
+        pool = super().pop(idx)
+        self._unindex(pool)
+        self._positions = None
+        return pool
+
+    def remove(self, pool: Dict[str, Any]):
+        super().remove(pool)
+        self._unindex(pool)
+        self._positions = None
+
+    def clear(self):
+        super().clear()
+        self._reindex()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._positions = None
+
+    def reverse(self):
+        super().reverse()
+        self._positions = None
+
+    def copy(self) -> "PoolStore":
+        return PoolStore(self)
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+    # ------------------------------------------------------------------
+    # lookups
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _first(bucket: Optional[Dict[int, Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        return next(iter(bucket.values()), None) if bucket else None
+
+    def get_by_cid(self, cid: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        Get the pool info with the given cid (or None).
+        """
+        return self._first(self._by_cid.get(cid))
+
+    def get_all_by_cid(self, cid: Hashable) -> List[Dict[str, Any]]:
+        """
+        Get all pool infos with the given cid.
+        """
+        return list(self._by_cid.get(cid, {}).values())
+
+    def get_by_exchange(self, exchange_name: str) -> List[Dict[str, Any]]:
+        """
+        Get all pool infos of the given exchange.
+        """
+        return list(self._by_exchange.get(exchange_name, {}).values())
+
+    def get(self, exchange_name: str, key: str, value: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        Get the first pool info of the given exchange where ``pool[key] == value``.
+
+        Parameters
+        ----------
+        exchange_name : str
+            The exchange name.
+        key : str
+            The key; either "cid" or one of ``INDEXED_KEYS``.
+        value : Hashable
+            The key value.
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            The pool info, or None if not found.
+        """
+        return next(iter(self.get_all(exchange_name, key, value)), None)
+
+    def get_all(self, exchange_name: str, key: str, value: Hashable) -> List[Dict[str, Any]]:
+        """
+        Get all pool infos of the given exchange where ``pool[key] == value``.
+
+        See ``get`` for the parameters.
+        """
+        if key == "cid":
+            return [p for p in self.get_all_by_cid(value) if p.get("exchange_name") == exchange_name]
+        if key not in self.INDEXED_KEYS:
+            raise KeyError(f"[PoolStore.get_all] key {key} is not indexed")
+        try:
+            return list(self._by_key.get((exchange_name, key, value), {}).values())
+        except TypeError:
+            return []
+
+    def get_by_pair(self, exchange_name: str, tkn0_address: str, tkn1_address: str) -> List[Dict[str, Any]]:
+        """
+        Get all pool infos of the given exchange with the given (ordered) token addresses.
+        """
+        return list(self._by_pair.get((exchange_name, tkn0_address, tkn1_address), {}).values())
+
+    def position(self, pool: Dict[str, Any]) -> int:
+        """
+        Get the position of ``pool`` (by identity) in the list.
+        """
+        if self._positions is None:
+            self._positions = {}
+            for idx, p in enumerate(self):
+                self._positions.setdefault(id(p), idx)
+        return self._positions[id(pool)]
+
+    # ------------------------------------------------------------------
+    # updates
+    # ------------------------------------------------------------------
+    def update_pool(self, pool: Dict[str, Any], data: Dict[str, Any]):
+        """
+        Update ``pool`` in place with ``data``, refreshing the indexes if an indexed field changed.
+        """
+        reindex = id(pool) in self._refs and any(
+            k in data and pool.get(k) != data[k]
+            for k in ("cid", "exchange_name") + self.INDEXED_KEYS
+        )
+        if not reindex:
+            pool.update(data)
+            return
+        refs = self._refs[id(pool)]
+        self._refs[id(pool)] = 1
+        self._unindex(pool)
+        pool.update(data)
+        self._index(pool)
+        self._refs[id(pool)] = refs
+
+    def replace_by_cid(self, pool_info: Dict[str, Any]) -> bool:
+        """
+        Replace the first pool with the cid of ``pool_info`` by ``pool_info``.
+
+        Returns
+        -------
+        bool
+            True if a pool was replaced, False if no pool with this cid exists.
+        """
+        existing = self.get_by_cid(pool_info["cid"])
+        if existing is None:
+            return False
+        if existing is not pool_info:
+            self[self.position(existing)] = pool_info
+        return True
+
+    def remove_cids(self, cids: Iterable[Hashable]):
+        """
+        Remove all pools whose cid is in ``cids``.
+
+        Every pool is removed by moving the last pool of the list into its place, so only the removed
+        pools are unindexed and the cost does not depend on the size of the store; the order of the
+        remaining pools is therefore not preserved.
+        """
+        cids = set(cids)
+        pools = [p for cid in cids for p in self.get_all_by_cid(cid)]
+        if not pools:
+            return
+        if any(self._refs[id(p)] > 1 for p in pools):
+            # pools held more than once are rare enough to be removed the slow way
+            self[:] = [p for p in self if p.get("cid") not in cids]
+            return
+        for pool in pools:
+            self._swap_remove(self.position(pool))
+
+    def _swap_remove(self, idx: int):
+        """
+        Remove the pool at ``idx`` by moving the last pool of the list into its place.
+        """
+        pool = self[idx]
+        last = super().pop()
+        if last is not pool:
+            super().__setitem__(idx, last)
+            if self._refs[id(last)] > 1:
+                # the position of a duplicate is that of its first occurrence
+                self._positions = None
+            else:
+                self._positions[id(last)] = idx
+        if self._positions is not None:
+            self._positions.pop(id(pool), None)
+        self._unindex(pool)
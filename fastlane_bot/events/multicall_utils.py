@@ -9,10 +9,11 @@ All rights reserved.
 Licensed under MIT.
 """
 from decimal import Decimal
-from typing import Dict, Any
-from typing import List, Tuple
+from typing import Dict, Any, Optional, Set
+from typing import List
 
 from fastlane_bot.config.multicaller import MultiCaller
+from fastlane_bot.events.managers.base import touch_value
 from fastlane_bot.events.pools import CarbonV1Pool
 from fastlane_bot.events.pools.base import Pool
 
@@ -137,11 +138,10 @@ def multicall_helper(exchange: str, rows_to_update: List, target_contract: Any,
         The current block.
 
     """
-    multicaller = MultiCaller(mgr.web3, mgr.cfg.MULTICALL_CONTRACT_ADDRESS)
+    multicaller = MultiCaller(mgr.web3, mgr.cfg.MULTICALL_CONTRACT_ADDRESS, w3_async=mgr.w3_async)
 
     for row in rows_to_update:
         pool_info = mgr.pool_data[row]
-        pool_info["last_updated_block"] = current_block
         if exchange == "bancor_v3":
             multicaller.add_call(target_contract.functions.tradingLiquidity(pool_info["tkn1_address"]))
         elif exchange == "bancor_pol":
@@ -157,18 +157,29 @@ def multicall_helper(exchange: str, rows_to_update: List, target_contract: Any,
     result_list = multicaller.run_calls(current_block)
 
     if exchange == "bancor_pol":
-        # Assert that all `amountAvailableForTrading` results are valid
-        assert all(result is not None for result in result_list[1::2])
         # Rearrange the results as a list of `(tokenPrice, amountAvailableForTrading)` tuples
+        # (a failed `tokenPrice` call means that the token has no price yet)
         result_list = [result for result in zip(result_list[0::2], result_list[1::2])]
+        failed = [tkn_balance is None for _, tkn_balance in result_list]
     else:
-        # Assert that all results are valid
-        assert all(result is not None for result in result_list)
-
-    for row, result in zip(rows_to_update, result_list):
+        failed = [result is None for result in result_list]
+
+    if any(failed):
+        # The pools whose calls failed keep their previous state
+        mgr.cfg.logger.warning(
+            f"[events.multicall_utils.multicall_helper] {sum(failed)} of {len(failed)} {exchange} pools "
+            f"could not be updated in block {current_block}"
+        )
+
+    for row, result, row_failed in zip(rows_to_update, result_list, failed):
+        if row_failed:
+            continue
         pool_info = mgr.pool_data[row]
+        pool_info["last_updated_block"] = current_block
         pool = mgr.get_or_init_pool(pool_info)
         params = extract_params_for_multicall(exchange, result, pool_info, mgr)
+        if any(pool_info.get(key) != value for key, value in params.items()):
+            mgr.mark_pool_dirty(pool_info)
         update_pool_for_multicall(params, pool_info, pool)
         update_mgr_exchanges_for_multicall(mgr, exchange, pool, pool_info)
 
@@ -318,7 +329,32 @@ def get_pool_contract_for_exchange(mgr: Any, exchange: str) -> str:
         raise ValueError(f"Exchange {exchange} not supported.")
 
 
-def multicall_every_iteration(current_block: int, mgr: Any):
+def get_touched_pools_for_exchange(rows: List[int], mgr: Any, touched_pools: Dict[str, Set[str]]) -> List[int]:
+    """
+    Get the rows of the pools that events may have changed.
+
+    Parameters
+    ----------
+    rows : List[int]
+        The rows of the pools of an exchange.
+    mgr : Any
+        Manager object containing configuration and pool data.
+    touched_pools : Dict[str, Set[str]]
+        The touched pools, as returned by ``mgr.pop_touched_pools``.
+
+    Returns
+    -------
+    List[int]
+        The rows of the touched pools.
+    """
+    return [
+        row
+        for row in rows
+        if any(touch_value(key, mgr.pool_data[row].get(key)) in values for key, values in touched_pools.items())
+    ]
+
+
+def multicall_every_iteration(current_block: int, mgr: Any, touched_pools: Optional[Dict[str, Set[str]]] = None):
     """
     For each exchange that supports Multicall, use multicall to update the state of the pools on every search iteration.
 
@@ -328,6 +364,8 @@ def multicall_every_iteration(current_block: int, mgr: Any):
         The current block.
     mgr : Any
         Manager object containing configuration and pool data.
+    touched_pools : Dict[str, Set[str]], optional
+        If given, only the pools that events may have changed are updated (see ``mgr.pop_touched_pools``).
 
     """
     multicallable_exchanges = [exchange for exchange in mgr.cfg.MULTICALLABLE_EXCHANGES if exchange in mgr.exchanges]
@@ -340,4 +378,8 @@ def multicall_every_iteration(current_block: int, mgr: Any):
     for idx, exchange in enumerate(multicallable_exchanges):
         pool_contract = get_pool_contract_for_exchange(mgr, exchange)
         rows_to_update = multicallable_pool_rows[idx]
+        if touched_pools is not None:
+            rows_to_update = get_touched_pools_for_exchange(rows_to_update, mgr, touched_pools)
+            if not rows_to_update:
+                continue
         multicall_helper(exchange, rows_to_update, pool_contract, mgr, current_block)
@@ -0,0 +1,349 @@
+"""
+This module contains the binary snapshot of the pool state, which lets the bot resume from the last block after a
+restart instead of rebuilding the pools from the static pool data and backdating them.
+
+A snapshot is a directory with a ``CURRENT`` file that names the active generation, a subdirectory holding one
+``.npy`` array per column and table (pools, tokens and the event mappings) plus a ``.mask.npy`` array telling
+which rows have a value, and a ``meta.json`` file with the block, the column types and some run information. The
+arrays are memory-mapped on load. Writes are incremental: rows that changed since the last write are patched in
+place, and a new generation is only written (and swapped in atomically) when the rows or the columns of a table
+no longer fit the arrays. A ``DIRTY`` marker is written to the generation before it is patched and removed once
+its ``meta.json`` is up to date, so that a snapshot torn by a crash in between is discarded on load.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+
+# the values of the mask arrays
+ABSENT, PRESENT, NAN, NONE = 0, 1, 2, 3
+
+INT64_MIN, INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+@dataclass
+class SnapshotStats:
+    """
+    Counters of a pool snapshot.
+
+    Parameters
+    ----------
+    rewrites : int
+        The number of generations written.
+    patches : int
+        The number of writes that patched the current generation in place.
+    patched_rows : int
+        The total number of rows patched in place.
+    """
+    rewrites: int = 0
+    patches: int = 0
+    patched_rows: int = 0
+
+
+def _kind_of(value: Any) -> str:
+    """
+    The column kind that can hold `value` (one of "bool", "int", "float", "str" and "json").
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return "bool"
+    if isinstance(value, (int, np.integer)):
+        return "int" if INT64_MIN <= value <= INT64_MAX else "json"
+    if isinstance(value, (float, np.floating)):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    return "json"
+
+
+def _mask_of(value: Any) -> int:
+    if value is None:
+        return NONE
+    if isinstance(value, (float, np.floating)) and value != value:
+        return NAN
+    return PRESENT
+
+
+def _padded(width: int) -> int:
+    """
+    The width of a string column, with room for longer values to be patched in later.
+    """
+    return max(8, 1 << (width - 1).bit_length())
+
+
+class _Column:
+    """
+    The kind and the NumPy dtype of a column, and the encoding of its values.
+    """
+
+    def __init__(self, name: str, kind: str, width: int = 0):
+        self.name = name
+        self.kind = kind
+        self.width = width
+
+    @classmethod
+    def for_values(cls, name: str, values: List[Any]) -> "_Column":
+        kinds = {_kind_of(value) for value in values}
+        kind = kinds.pop() if len(kinds) == 1 else "json"
+        column = cls(name, kind)
+        if kind in ("str", "json"):
+            column.width = _padded(max([len(column.encode(value)) for value in values] or [1]))
+        return column
+
+    @classmethod
+    def from_meta(cls, meta: Dict[str, Any]) -> "_Column":
+        return cls(meta["name"], meta["kind"], meta.get("width", 0))
+
+    def to_meta(self) -> Dict[str, Any]:
+        return dict(name=self.name, kind=self.kind, width=self.width)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype({"bool": "?", "int": "<i8", "float": "<f8"}.get(self.kind, f"S{self.width}"))
+
+    def encode(self, value: Any) -> Any:
+        if self.kind == "str":
+            return value.encode("utf-8")
+        if self.kind == "json":
+            return json.dumps(value, separators=(",", ":")).encode("utf-8")
+        return value
+
+    def fits(self, value: Any) -> bool:
+        """
+        Whether `value` can be written to the column without changing its kind or width.
+        """
+        if _mask_of(value) != PRESENT:
+            return True
+        if self.kind != "json" and _kind_of(value) != self.kind:
+            return False
+        return self.kind not in ("str", "json") or len(self.encode(value)) <= self.width
+
+    def decode(self, values: np.ndarray) -> List[Any]:
+        if self.kind == "str":
+            return [value.decode("utf-8") for value in values.tolist()]
+        if self.kind == "json":
+            return [json.loads(value) if value else None for value in values.tolist()]
+        return values.tolist()
+
+    def empty_value(self) -> Any:
+        return {"bool": False, "int": 0, "float": 0.0}.get(self.kind, b"")
+
+
+class PoolSnapshot:
+    """
+    Columnar snapshot of tables of records (lists of dicts), written incrementally and memory-mapped on load.
+
+    Values are stored as booleans, 64-bit integers, floats or UTF-8 strings when all the values of a column
+    are of that type, and as JSON otherwise (eg for integers beyond 64 bits). NaN and None are preserved, as
+    is the absence of a key from a record.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the snapshot (created if it does not exist).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stats = SnapshotStats()
+        self._generation = None
+        self._meta = None
+        self._fingerprints: Dict[str, List[Tuple]] = {}
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def block(self) -> Optional[int]:
+        """
+        The block of the last snapshot written or read, if any.
+        """
+        return self._meta["block"] if self._meta else None
+
+    def read(self) -> Optional[Tuple[int, Dict[str, List[Dict[str, Any]]], Dict[str, Any]]]:
+        """
+        Reads the current snapshot.
+
+        Returns
+        -------
+        Optional[Tuple[int, Dict[str, List[Dict[str, Any]]], Dict[str, Any]]]
+            The block, the tables and the info of the snapshot, or None if there is no snapshot.
+        """
+        generation = self._current_generation()
+        if generation is None:
+            return None
+        with open(os.path.join(self.path, generation, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != SNAPSHOT_VERSION or os.path.exists(self._dirty_marker(generation)):
+            return None
+
+        tables = {}
+        for table, table_meta in meta["tables"].items():
+            records = [{} for _ in range(table_meta["num_rows"])]
+            for index, column_meta in enumerate(table_meta["columns"]):
+                column = _Column.from_meta(column_meta)
+                values, mask = self._load(generation, table, index, "r")
+                values = column.decode(values)
+                name = column.name
+                for record, value, m in zip(records, values, mask.tolist()):
+                    if m == PRESENT:
+                        record[name] = value
+                    elif m == NAN:
+                        record[name] = float("nan")
+                    elif m == NONE:
+                        record[name] = None
+            tables[table] = records
+
+        self._generation, self._meta = generation, meta
+        self._fingerprints = {table: [tuple(record.items()) for record in records] for table, records in tables.items()}
+        return meta["block"], tables, meta["info"]
+
+    def write(self, tables: Dict[str, List[Dict[str, Any]]], block: int, info: Dict[str, Any] = None):
+        """
+        Writes the tables as the snapshot at `block`.
+
+        The rows that changed since the last write are patched in place if the columns of their tables can
+        hold them; otherwise a new generation is written and made current.
+
+        Parameters
+        ----------
+        tables : Dict[str, List[Dict[str, Any]]]
+            The records by table name.
+        block : int
+            The block that the records are up to date with.
+        info : Dict[str, Any], optional
+            Information about the run to store with the snapshot, by default None
+        """
+        info = info or {}
+        fingerprints = {table: [tuple(record.items()) for record in records] for table, records in tables.items()}
+        if not self._patch(tables, fingerprints):
+            self._rewrite(tables)
+        self._meta["block"] = block
+        self._meta["info"] = info
+        self._write_meta(self._generation, self._meta)
+        if os.path.exists(self._dirty_marker(self._generation)):
+            os.remove(self._dirty_marker(self._generation))
+        self._fingerprints = fingerprints
+
+    def _patch(self, tables: Dict[str, List[Dict[str, Any]]], fingerprints: Dict[str, List[Tuple]]) -> bool:
+        """
+        Patches the changed rows of the current generation in place, or returns False if it cannot hold them.
+        """
+        if self._meta is None or set(tables) != set(self._meta["tables"]):
+            return False
+
+        changes = {}
+        for table, records in tables.items():
+            table_meta = self._meta["tables"][table]
+            previous = self._fingerprints.get(table)
+            if previous is None or len(previous) != len(records) or table_meta["num_rows"] != len(records):
+                return False
+            rows = [i for i, (new, old) in enumerate(zip(fingerprints[table], previous)) if new != old]
+            if not rows:
+                continue
+            columns = {column_meta["name"]: (index, _Column.from_meta(column_meta))
+                       for index, column_meta in enumerate(table_meta["columns"])}
+            changed_columns = {}
+            for i in rows:
+                old, new = dict(previous[i]), records[i]
+                for name in set(old) | set(new):
+                    if name in old and name in new and (old[name] is new[name] or old[name] == new[name]):
+                        continue
+                    if name not in columns or not columns[name][1].fits(new.get(name)):
+                        return False
+                    changed_columns.setdefault(name, []).append(i)
+            changes[table] = (rows, [(*columns[name], column_rows) for name, column_rows in changed_columns.items()])
+
+        if changes:
+            self._replace(self._dirty_marker(self._generation), "")
+        for table, (rows, changed_columns) in changes.items():
+            records = tables[table]
+            self.stats.patched_rows += len(rows)
+            for index, column, column_rows in changed_columns:
+                values, mask = self._load(self._generation, table, index, "r+")
+                for i in column_rows:
+                    m = ABSENT if column.name not in records[i] else _mask_of(records[i][column.name])
+                    mask[i] = m
+                    values[i] = column.encode(records[i][column.name]) if m == PRESENT else column.empty_value()
+                values.flush()
+                mask.flush()
+                del values, mask
+        self.stats.patches += 1
+        return True
+
+    def _rewrite(self, tables: Dict[str, List[Dict[str, Any]]]):
+        """
+        Writes all tables to a new generation and makes it current.
+        """
+        generations = self._generations()
+        generation = f"gen-{int(generations[-1][4:]) + 1 if generations else 0:06d}"
+        os.makedirs(os.path.join(self.path, generation))
+
+        meta = dict(version=SNAPSHOT_VERSION, block=None, info={}, tables={})
+        for table, records in tables.items():
+            names = list(dict.fromkeys(name for record in records for name in record))
+            columns = []
+            for index, name in enumerate(names):
+                masks = [ABSENT if name not in record else _mask_of(record[name]) for record in records]
+                present = [record[name] for record, m in zip(records, masks) if m == PRESENT]
+                column = _Column.for_values(name, present)
+                values = np.array(
+                    [column.encode(record[name]) if m == PRESENT else column.empty_value()
+                     for record, m in zip(records, masks)],
+                    dtype=column.dtype,
+                )
+                np.save(self._file(generation, table, index), values)
+                np.save(self._file(generation, table, index, "mask"), np.array(masks, dtype=np.uint8))
+                columns.append(column.to_meta())
+            meta["tables"][table] = dict(num_rows=len(records), columns=columns)
+        self._write_meta(generation, meta)
+
+        self._replace(os.path.join(self.path, "CURRENT"), generation)
+        for previous in generations:
+            shutil.rmtree(os.path.join(self.path, previous), ignore_errors=True)
+        self._generation, self._meta = generation, meta
+        self.stats.rewrites += 1
+
+    def _current_generation(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                generation = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return generation if os.path.isfile(os.path.join(self.path, generation, "meta.json")) else None
+
+    def _generations(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.path) if name.startswith("gen-"))
+
+    def _file(self, generation: str, table: str, index: int, suffix: str = "") -> str:
+        return os.path.join(self.path, generation, f"{table}.{index}{'.' + suffix if suffix else ''}.npy")
+
+    def _load(self, generation: str, table: str, index: int, mode: str) -> Tuple[np.memmap, np.memmap]:
+        return (
+            np.load(self._file(generation, table, index), mmap_mode=mode),
+            np.load(self._file(generation, table, index, "mask"), mmap_mode=mode),
+        )
+
+    def _dirty_marker(self, generation: str) -> str:
+        return os.path.join(self.path, generation, "DIRTY")
+
+    def _write_meta(self, generation: str, meta: Dict[str, Any]):
+        self._replace(os.path.join(self.path, generation, "meta.json"), json.dumps(meta))
+
+    @staticmethod
+    def _replace(filename: str, content: str):
+        """
+        Atomically replaces the content of a file.
+        """
+        with open(f"{filename}.tmp", "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{filename}.tmp", filename)
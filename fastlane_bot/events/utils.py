@@ -15,7 +15,7 @@ import random
 import time
 from _decimal import Decimal
 from glob import glob
-from typing import Any, Union, Dict, Set, Tuple, Hashable
+from typing import Any, Union, Dict, Set, Tuple, Hashable, Optional
 from typing import List
 
 import numpy as np
@@ -23,20 +23,71 @@ import pandas as pd
 import requests
 from hexbytes import HexBytes
 from joblib import Parallel, delayed
-from web3 import AsyncWeb3, Web3
+from web3 import Web3
 from web3.datastructures import AttributeDict
 
 from fastlane_bot import Config
 from fastlane_bot.bot import CarbonBot
+from fastlane_bot.config.batch_provider import batching_web3
 from fastlane_bot.data.abi import FAST_LANE_CONTRACT_ABI
 from fastlane_bot.exceptions import ReadOnlyException
 from fastlane_bot.events.interface import QueryInterface
+from fastlane_bot.events.journal import PoolJournal
+from fastlane_bot.events.snapshot import PoolSnapshot
 
 from fastlane_bot.helpers import TxHelpers
 from fastlane_bot.utils import safe_int
 from .interfaces.event import Event
 
 
+def _latest_event_key(mgr: Any, event: Event, bancor_v2_anchor_addresses: Set[str]) -> Hashable:
+    """
+    The key of the pool that an event belongs to, or None if the event is not tracked per pool.
+    """
+    pool_type = mgr.pool_type_from_exchange_name(mgr.exchange_name_from_event(event))
+    if pool_type:
+        key = pool_type.unique_key()
+    else:
+        return None
+    if key == "cid":
+        key = "id"
+    elif key == "tkn1_address":
+        if event.args["pool"] != mgr.cfg.BNT_ADDRESS:
+            key = "pool"
+        else:
+            key = "tkn_address"
+
+    # Skip events for Bancor v2 anchors
+    if (
+        key == "address"
+        and "_token1" in event.args
+        and (
+            event.args["_token1"] in bancor_v2_anchor_addresses
+            or event.args["_token2"] in bancor_v2_anchor_addresses
+        )
+    ):
+        return None
+
+    return event.address if key == "address" else event.args[key]
+
+
+def _is_later_event(event: Event, other: Event) -> bool:
+    """
+    Whether `event` comes after `other` on chain.
+    """
+    if event.block_number != other.block_number:
+        return event.block_number > other.block_number
+    if event.transaction_index != other.transaction_index:
+        return event.transaction_index > other.transaction_index
+    return event.log_index > other.log_index
+
+
+def _bancor_v2_anchor_addresses(mgr: Any) -> Set[str]:
+    return {
+        pool["anchor"] for pool in mgr.pool_data if pool["exchange_name"] == "bancor_v2"
+    }
+
+
 def filter_latest_events(
     mgr: Any, events: List[Event]
 ) -> List[Event]:
@@ -58,52 +109,14 @@ def filter_latest_events(
     # Handles the case where multiple pools are created in the same block
     events.reverse()
 
-    bancor_v2_anchor_addresses = {
-        pool["anchor"] for pool in mgr.pool_data if pool["exchange_name"] == "bancor_v2"
-    }
+    bancor_v2_anchor_addresses = _bancor_v2_anchor_addresses(mgr)
 
     for event in events:
-        pool_type = mgr.pool_type_from_exchange_name(mgr.exchange_name_from_event(event))
-        if pool_type:
-            key = pool_type.unique_key()
-        else:
+        mgr.mark_pool_touched(event)
+        unique_key = _latest_event_key(mgr, event, bancor_v2_anchor_addresses)
+        if unique_key is None:
             continue
-        if key == "cid":
-            key = "id"
-        elif key == "tkn1_address":
-            if event.args["pool"] != mgr.cfg.BNT_ADDRESS:
-                key = "pool"
-            else:
-                key = "tkn_address"
-
-        unique_key = event.address if key == "address" else event.args[key]
-        # unique_key = event.args[key]
-
-        # Skip events for Bancor v2 anchors
-        if (
-            key == "address"
-            and "_token1" in event.args
-            and (
-                event.args["_token1"] in bancor_v2_anchor_addresses
-                or event.args["_token2"] in bancor_v2_anchor_addresses
-            )
-        ):
-            continue
-
-        if unique_key in latest_entry_per_pool:
-            if event.block_number > latest_entry_per_pool[unique_key].block_number:
-                latest_entry_per_pool[unique_key] = event
-            elif event.block_number == latest_entry_per_pool[unique_key].block_number:
-                if event.transaction_index == latest_entry_per_pool[unique_key].transaction_index:
-                    if event.log_index > latest_entry_per_pool[unique_key].log_index:
-                        latest_entry_per_pool[unique_key] = event
-                elif event.transaction_index > latest_entry_per_pool[unique_key].transaction_index:
-                    latest_entry_per_pool[unique_key] = event
-                else:
-                    continue
-            else:
-                continue
-        else:
+        if unique_key not in latest_entry_per_pool or _is_later_event(event, latest_entry_per_pool[unique_key]):
             latest_entry_per_pool[unique_key] = event
 
     return list(latest_entry_per_pool.values())
@@ -295,7 +308,16 @@ def get_static_data(
             f"Tokens file {tokens_filepath} does not exist. Please run the bot in non-read-only mode to create it."
         )
     tokens = read_csv_file(tokens_filepath)
-    tokens["address"] = tokens["address"].apply(lambda x: Web3.to_checksum_address(x))
+
+    # checksum every distinct address once
+    checksum_addresses = {}
+
+    def to_checksum_address(address: str) -> str:
+        if address not in checksum_addresses:
+            checksum_addresses[address] = Web3.to_checksum_address(address)
+        return checksum_addresses[address]
+
+    tokens["address"] = tokens["address"].map(to_checksum_address)
     tokens = tokens.drop_duplicates(subset=["address"])
     tokens = tokens.dropna(subset=["decimals", "symbol", "address"])
     tokens["symbol"] = (
@@ -305,31 +327,15 @@ def get_static_data(
         .str.replace("-", "_")
     )
 
-    def correct_tkn(tkn_address, keyname):
-        try:
-            return tokens[tokens["address"] == tkn_address][keyname].values[0]
-        except IndexError:
-            return np.nan
-
-    static_pool_data["tkn0_address"] = static_pool_data["tkn0_address"].apply(
-        lambda x: Web3.to_checksum_address(x)
-    )
-    static_pool_data["tkn1_address"] = static_pool_data["tkn1_address"].apply(
-        lambda x: Web3.to_checksum_address(x)
-    )
-    static_pool_data["tkn0_decimals"] = static_pool_data["tkn0_address"].apply(
-        lambda x: correct_tkn(x, "decimals")
-    )
-    static_pool_data["tkn1_decimals"] = static_pool_data["tkn1_address"].apply(
-        lambda x: correct_tkn(x, "decimals")
-    )
+    decimals = dict(zip(tokens["address"], tokens["decimals"]))
+    symbols = dict(zip(tokens["address"], tokens["symbol"]))
 
-    static_pool_data["tkn0_symbol"] = static_pool_data["tkn0_address"].apply(
-        lambda x: correct_tkn(x, "symbol")
-    )
-    static_pool_data["tkn1_symbol"] = static_pool_data["tkn1_address"].apply(
-        lambda x: correct_tkn(x, "symbol")
-    )
+    static_pool_data["tkn0_address"] = static_pool_data["tkn0_address"].map(to_checksum_address)
+    static_pool_data["tkn1_address"] = static_pool_data["tkn1_address"].map(to_checksum_address)
+    static_pool_data["tkn0_decimals"] = static_pool_data["tkn0_address"].map(decimals)
+    static_pool_data["tkn1_decimals"] = static_pool_data["tkn1_address"].map(decimals)
+    static_pool_data["tkn0_symbol"] = static_pool_data["tkn0_address"].map(symbols)
+    static_pool_data["tkn1_symbol"] = static_pool_data["tkn1_address"].map(symbols)
     static_pool_data["pair_name"] = (
         static_pool_data["tkn0_address"] + "/" + static_pool_data["tkn1_address"]
     )
@@ -354,8 +360,7 @@ def get_static_data(
     )
     # Initialize web3
     static_pool_data["cid"] = [
-        cfg.w3.keccak(text=f"{row['descr']}").hex()
-        for index, row in static_pool_data.iterrows()
+        cfg.w3.keccak(text=f"{descr}").hex() for descr in static_pool_data["descr"]
     ]
 
     static_pool_data = static_pool_data.drop_duplicates(subset=["cid"])
@@ -609,9 +614,11 @@ def get_config(
         )
         cfg.logger.info("[events.utils.get_config] Using mainnet config")
 
+    # The web3 objects of this config batch their concurrent requests; the shared network connection is left as is
+    if rpc_url or cfg.RPC_URL:
+        cfg.w3, cfg.w3_async = batching_web3(rpc_url or cfg.RPC_URL, cfg.network.IS_INJECT_POA_MIDDLEWARE)
+
     if rpc_url:
-        cfg.w3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"timeout": 60}))
-        cfg.w3_async = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(rpc_url))
         if 'tenderly' in rpc_url:
             cfg.NETWORK = cfg.NETWORK_TENDERLY
         cfg.WEB3_ALCHEMY_PROJECT_ID = rpc_url.split("/")[-1]
@@ -848,16 +855,164 @@ def write_pool_data_to_disk(
             os.mkdir("pool_data")
         path = f"pool_data/{mgr.SUPPORTED_EXCHANGES}_{current_block}.json"
     try:
-        df = pd.DataFrame(mgr.pool_data)
+        # Drop the missing values of each pool
+        cleaned_pool_data = [
+            {col: val for col, val in pool.items() if val is not None and val == val}
+            for pool in mgr.pool_data
+        ]
+        with open(path, "w") as f:
+            json.dump(
+                cleaned_pool_data,
+                f,
+                default=lambda obj: obj.item() if isinstance(obj, np.generic) else complex_handler(obj),
+            )
+    except Exception as e:
+        mgr.cfg.logger.error(f"Error writing pool data to disk: {e}")
 
-        def remove_nan(row):
-            return {col: val for col, val in row.items() if pd.notna(val)}
 
-        # Apply the function to each row
-        cleaned_df = df.apply(remove_nan, axis=1)
-        cleaned_df.to_json(path, orient="records")
+def write_pool_journal(journal: PoolJournal, mgr: Any, current_block: int, info: Dict[str, Any]) -> None:
+    """
+    Appends the pools that changed since the last iteration to the pool journal.
+
+    Parameters
+    ----------
+    journal : PoolJournal
+        The pool journal.
+    mgr : Any
+        The manager object.
+    current_block : int
+        The block that the pool data is up to date with.
+    info : Dict[str, Any]
+        The run information that the journal must match to be resumed from (see ``read_pool_journal``).
+    """
+    try:
+        start_time = time.time()
+        journal.write(mgr.pool_data, current_block, info)
+        mgr.cfg.logger.debug(
+            f"[events.utils] Journaled the pools at block {current_block} in {time.time() - start_time:.3f}s, "
+            f"{journal.stats}"
+        )
     except Exception as e:
-        mgr.cfg.logger.error(f"Error writing pool data to disk: {e}")
+        mgr.cfg.logger.error(f"Error writing the pool journal: {e}")
+
+
+def read_pool_journal(
+    cfg: Config, journal: PoolJournal, info: Dict[str, Any]
+) -> Optional[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Reads the latest pool data from the pool journal.
+
+    Parameters
+    ----------
+    cfg : Config
+        The config object.
+    journal : PoolJournal
+        The pool journal.
+    info : Dict[str, Any]
+        The run information (blockchain, exchanges, etc.), which must match the one the journal was written with.
+
+    Returns
+    -------
+    Optional[Tuple[int, List[Dict[str, Any]]]]
+        The last block journaled and the pool data at that block, or None if there is no usable journal.
+    """
+    start_time = time.time()
+    try:
+        result = journal.read()
+    except Exception as e:
+        cfg.logger.warning(f"[events.utils] Failed to read the pool journal from {journal.path}: {e}")
+        return None
+    if result is None:
+        return None
+    block, pool_data, journal_info = result
+    if journal_info != info:
+        cfg.logger.info(
+            f"[events.utils] Ignoring the pool journal from {journal.path}, which was written for {journal_info}"
+        )
+        return None
+    cfg.logger.info(
+        f"[events.utils] Read {len(pool_data)} pools at block {block} from the pool journal "
+        f"in {time.time() - start_time:.3f}s"
+    )
+    return block, pool_data
+
+
+SNAPSHOT_EVENT_MAPPINGS = ("uniswap_v2_event_mappings", "uniswap_v3_event_mappings", "solidly_v2_event_mappings")
+
+
+def write_pool_snapshot(snapshot: PoolSnapshot, mgr: Any, current_block: int, info: Dict[str, Any]) -> None:
+    """
+    Writes the pool data, the tokens and the event mappings to the pool snapshot.
+
+    Parameters
+    ----------
+    snapshot : PoolSnapshot
+        The pool snapshot.
+    mgr : Any
+        The manager object.
+    current_block : int
+        The block that the pool data is up to date with.
+    info : Dict[str, Any]
+        The run information that a snapshot must match to be resumed from (see ``read_pool_snapshot``).
+    """
+    # the pool data is reordered by deduplicate_pool_data, so the rows are kept in cid order to be patched in place
+    tables = dict(pools=sorted(mgr.pool_data, key=lambda pool: pool["cid"]), tokens=mgr.tokens)
+    for name in SNAPSHOT_EVENT_MAPPINGS:
+        tables[name] = [dict(address=address, exchange=exchange) for address, exchange in getattr(mgr, name).items()]
+    try:
+        start_time = time.time()
+        snapshot.write(tables, current_block, info)
+        mgr.cfg.logger.debug(
+            f"[events.utils] Wrote the pool snapshot at block {current_block} in {time.time() - start_time:.3f}s, "
+            f"{snapshot.stats}"
+        )
+    except Exception as e:
+        mgr.cfg.logger.error(f"Error writing the pool snapshot: {e}")
+
+
+def read_pool_snapshot(
+    cfg: Config, snapshot: PoolSnapshot, info: Dict[str, Any]
+) -> Optional[Tuple[int, List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, str], Dict[str, str], Dict[str, str]]]:
+    """
+    Reads the pool data, the tokens and the event mappings from the pool snapshot.
+
+    Parameters
+    ----------
+    cfg : Config
+        The config object.
+    snapshot : PoolSnapshot
+        The pool snapshot.
+    info : Dict[str, Any]
+        The run information (blockchain, exchanges, etc.), which must match the one the snapshot was written with.
+
+    Returns
+    -------
+    Optional[Tuple[int, List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, str], Dict[str, str], Dict[str, str]]]
+        The block of the snapshot, the pool data, the tokens, and the Uniswap v2, Uniswap v3 and Solidly v2 event
+        mappings, or None if there is no usable snapshot.
+    """
+    start_time = time.time()
+    try:
+        result = snapshot.read()
+    except Exception as e:
+        cfg.logger.warning(f"[events.utils] Failed to read the pool snapshot from {snapshot.path}: {e}")
+        return None
+    if result is None:
+        return None
+    block, tables, snapshot_info = result
+    if snapshot_info != info:
+        cfg.logger.info(
+            f"[events.utils] Ignoring the pool snapshot from {snapshot.path}, which was written for {snapshot_info}"
+        )
+        return None
+    cfg.logger.info(
+        f"[events.utils] Read {len(tables['pools'])} pools at block {block} from the pool snapshot "
+        f"in {time.time() - start_time:.3f}s"
+    )
+    mappings = [
+        {row["address"]: row["exchange"] for row in tables[name]} for name in SNAPSHOT_EVENT_MAPPINGS
+    ]
+    return (block, tables["pools"], tables["tokens"], *mappings)
 
 
 def parse_non_multicall_rows_to_update(
@@ -888,7 +1043,7 @@ def parse_non_multicall_rows_to_update(
     return other_pool_rows
 
 
-def init_bot(mgr: Any) -> CarbonBot:
+def init_bot(mgr: Any, curve_cache: Any = None, solution_cache: Any = None) -> CarbonBot:
     """
     Initializes the bot.
 
@@ -896,6 +1051,10 @@ def init_bot(mgr: Any) -> CarbonBot:
     ----------
     mgr : Base
         The manager object.
+    curve_cache : CurveCache, optional
+        The curve cache that persists across iterations (None to rebuild all curves every time).
+    solution_cache : SolutionCache, optional
+        The cache of the optimizer solutions that persists across iterations (None to solve all miniverses from scratch).
 
     Returns
     -------
@@ -909,7 +1068,7 @@ def init_bot(mgr: Any) -> CarbonBot:
         uniswap_v2_event_mappings=mgr.uniswap_v2_event_mappings,
         exchanges=mgr.exchanges,
     )
-    bot = CarbonBot(ConfigObj=mgr.cfg)
+    bot = CarbonBot(ConfigObj=mgr.cfg, curve_cache=curve_cache, solution_cache=solution_cache)
     bot.db = db
 
     assert isinstance(
@@ -948,6 +1107,48 @@ def update_pools_from_contracts(
     )
 
 
+def update_reverted_pools(mgr: Any, n_jobs: int, reverted_addresses: Set[str], current_block: int) -> None:
+    """
+    Re-reads the pools whose events were reverted (see ``BlockStream.pop_reverted_addresses``) from the chain.
+
+    Events are only ever applied on top of the pool state, so a pool that is not touched by any event of the new
+    chain keeps the state of the reverted events until it is re-read: the pools at the reverted addresses are updated
+    from their contracts, the Carbon strategies are reloaded if the address of their controller is reverted, and all
+    multicall pools (whose events are emitted by a vault or network contract) are marked as touched.
+
+    Parameters
+    ----------
+    mgr : Any
+        The manager object.
+    n_jobs : int
+        The number of jobs to run in parallel.
+    reverted_addresses : Set[str]
+        The lower case addresses of the reverted logs.
+    current_block : int
+        The current block number.
+
+    """
+    if not reverted_addresses:
+        return
+    rows_to_update = []
+    carbon_exchanges = set()
+    for idx, pool_info in enumerate(mgr.pool_data):
+        if str(pool_info.get("address")).lower() not in reverted_addresses:
+            continue
+        if pool_info["exchange_name"] in mgr.cfg.CARBON_V1_FORKS:
+            carbon_exchanges.add(pool_info["exchange_name"])
+        elif pool_info["exchange_name"] not in mgr.cfg.MULTICALLABLE_EXCHANGES:
+            rows_to_update.append(idx)
+    mgr.cfg.logger.info(
+        f"[events.utils.update_reverted_pools] Re-reading {len(rows_to_update)} pools and "
+        f"{len(carbon_exchanges)} Carbon forks at {len(reverted_addresses)} reverted addresses"
+    )
+    update_pools_from_contracts(mgr, n_jobs=n_jobs, rows_to_update=rows_to_update, current_block=current_block)
+    for exchange_name in sorted(carbon_exchanges):
+        mgr.update_carbon(current_block, exchange_name)
+    mgr.all_pools_touched = True
+
+
 def get_cached_events(mgr: Any, logging_path: str) -> List[Any]:
     """
     Gets the cached events.
@@ -990,6 +1191,8 @@ def handle_subsequent_iterations(
     tenderly_uri: str = None,
     mgr: Any = None,
     forked_from_block: int = None,
+    n_jobs: int = 1,
+    dirty_pairs: Set[str] = None,
 ):
     """
     Handles the subsequent iterations of the bot.
@@ -1020,6 +1223,10 @@ def handle_subsequent_iterations(
         The manager object.
     forked_from_block : int
         The block number to fork from.
+    n_jobs : int, optional
+        The number of processes used to solve the arbitrage miniverses, by default 1
+    dirty_pairs : Set[str], optional
+        The pairs that changed since the last iteration, by default None (search all pairs)
 
     """
     if loop_idx > 0 or replay_from_block:
@@ -1053,6 +1260,8 @@ def handle_subsequent_iterations(
             logging_path=logging_path,
             replay_mode=True if replay_from_block else False,
             replay_from_block=forked_from_block,
+            n_jobs=n_jobs,
+            dirty_pairs=dirty_pairs,
         )
 
 
@@ -1252,6 +1461,75 @@ def get_latest_events(
     return latest_events
 
 
+def stream_latest_events(
+    current_block: int,
+    mgr: Any,
+    start_block: int,
+    cache_latest_only: bool,
+    logging_path: str,
+    event_gatherer: "EventGatherer"
+) -> List[Event]:
+    """
+    Gets the latest events like `get_latest_events`, but updates the pools with each event as soon as its
+    subscription's logs have arrived, instead of waiting for all subscriptions (see
+    `EventGatherer.stream_all_events`).
+
+    An event is applied only if it is later than all events applied so far for its pool, so that the pools end
+    up in the same state as with `filter_latest_events` followed by `update_pools_from_events`.
+
+    Parameters
+    ----------
+    current_block : int
+        The current block number.
+    mgr : Any
+        The manager object.
+    start_block : int
+        The starting block number.
+    cache_latest_only : bool
+        Whether to cache the latest events only.
+    logging_path : str
+        The logging path.
+    event_gatherer : EventGatherer
+        The event gatherer.
+
+    Returns
+    -------
+    List[Event]
+        A list of the latest events.
+    """
+    bancor_v2_anchor_addresses = _bancor_v2_anchor_addresses(mgr)
+    latest_entry_per_pool = {}
+
+    def handle_event(event: Event):
+        mgr.mark_pool_touched(event)
+        unique_key = _latest_event_key(mgr, event, bancor_v2_anchor_addresses)
+        if unique_key is None:
+            return
+        if unique_key in latest_entry_per_pool and not _is_later_event(event, latest_entry_per_pool[unique_key]):
+            return
+        latest_entry_per_pool[unique_key] = event
+        mgr.update_from_event(event=event)
+
+    event_gatherer.stream_all_events(from_block=start_block, to_block=current_block, handler=handle_event)
+
+    latest_events = list(latest_entry_per_pool.values())
+    carbon_pol_events = [event for event in latest_events if "token" in event.args]
+    mgr.cfg.logger.info(
+        f"[events.utils.stream_latest_events] Found {len(latest_events)} new events, {len(carbon_pol_events)} carbon_pol_events"
+    )
+
+    # Save the latest events to disk
+    save_events_to_json(
+        cache_latest_only,
+        logging_path,
+        mgr,
+        latest_events,
+        start_block,
+        current_block,
+    )
+    return latest_events
+
+
 def get_start_block(
     alchemy_max_block_fetch: int,
     last_block: int,
@@ -1741,23 +2019,28 @@ def handle_static_pools_update(mgr: Any):
         .to_dict(orient="records")
     )
     if "uniswap_v2_pools" not in mgr.static_pools:
-        mgr.static_pools["uniswap_v2_pools"] = []
+        mgr.static_pools["uniswap_v2_pools"] = set()
     if "uniswap_v3_pools" not in mgr.static_pools:
-        mgr.static_pools["uniswap_v3_pools"] = []
+        mgr.static_pools["uniswap_v3_pools"] = set()
     if "solidly_v2_pools" not in mgr.static_pools:
-        mgr.static_pools["solidly_v2_pools"] = []
+        mgr.static_pools["solidly_v2_pools"] = set()
+
+    pools_by_exchange = {}
+    for e in all_event_mappings:
+        pools_by_exchange.setdefault(e["exchange_name"], set()).add(e["address"])
 
     for ex in mgr.forked_exchanges:
         if ex in mgr.exchanges:
-            exchange_pools = [
-                e["address"] for e in all_event_mappings if e["exchange_name"] == ex
-            ]
+            exchange_pools = pools_by_exchange.get(ex, set())
             mgr.cfg.logger.info(
                 f"[events.utils.handle_static_pools_update] Adding {len(exchange_pools)} {ex} pools to static pools"
             )
             attr_name = f"{ex}_pools"
             mgr.static_pools[attr_name] = exchange_pools
 
+    # Index the static pools for routing events to their exchanges
+    mgr.build_event_routes()
+
 
 def handle_tokens_csv(mgr, prefix_path, read_only: bool = False):
     tokens_filepath = os.path.normpath(
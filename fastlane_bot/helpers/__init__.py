@@ -16,3 +16,5 @@ from .univ3calc import Univ3Calculator
 from .wrap_unwrap_processor import add_wrap_or_unwrap_trades_to_route
 from .carbon_trade_splitter import split_carbon_trades
 from .routehandler import maximize_last_trade_per_tkn
+from .curvecache import CurveCache
+from .solutioncache import SolutionCache
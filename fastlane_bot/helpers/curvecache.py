@@ -0,0 +1,148 @@
+"""
+Defines the ``CurveCache`` class, an incremental cache of the curves built from the pool state.
+
+The bot is re-initialized every block, and building the ``CPCContainer`` used to mean converting
+every pool record into a ``PoolAndTokens`` object and then into curves. The cache keeps the
+``PoolAndTokens`` objects, their curves and the container across blocks, and only re-converts the
+pools whose state changed since the last call, patching the container in place.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+__VERSION__ = "1.0"
+__DATE__ = "18/Oct/2026"
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+
+from fastlane_bot.helpers.poolandtokens import PoolAndTokens
+from fastlane_bot.tools.cpc import ConstantProductCurve, CPCContainer
+
+
+@dataclass
+class CurveCache:
+    """
+    Incremental cache of the curves built from the pool state, keyed by cid.
+
+    A pool is considered unchanged if its ``last_updated_block`` and the values of its
+    ``STATE_KEYS`` are the same as at the time its curves were built.
+
+    Parameters
+    ----------
+    full_rebuild_period : int
+        Rebuild all curves from scratch every ``full_rebuild_period`` calls to ``update`` (0 = never)
+    """
+
+    __VERSION__ = __VERSION__
+    __DATE__ = __DATE__
+
+    STATE_KEYS = (
+        "exchange_name",
+        "pair_name",
+        "fee",
+        "tkn0_balance",
+        "tkn1_balance",
+        "liquidity",
+        "sqrt_price_q96",
+        "tick",
+        "y_0",
+        "z_0",
+        "A_0",
+        "B_0",
+        "y_1",
+        "z_1",
+        "A_1",
+        "B_1",
+    )
+
+    full_rebuild_period: int = 0
+    container: CPCContainer = field(default=None, init=False)
+    entries: Dict[str, Tuple[Tuple, PoolAndTokens, List[ConstantProductCurve]]] = field(
+        default_factory=dict, init=False
+    )
+    update_count: int = field(default=0, init=False)
+    last_num_updated: int = field(default=0, init=False)
+    last_num_removed: int = field(default=0, init=False)
+
+    @classmethod
+    def state_key(cls, record: Dict[str, Any]) -> Tuple:
+        """
+        Returns the key that identifies the state of the pool record.
+        """
+        return (record.get("last_updated_block"),) + tuple(record.get(k) for k in cls.STATE_KEYS)
+
+    def clear(self):
+        """
+        Clears the cache (the next call to ``update`` rebuilds all curves).
+        """
+        self.container = None
+        self.entries = {}
+
+    def update(self, db: Any, to_curves: Callable[[PoolAndTokens], List[ConstantProductCurve]]) -> CPCContainer:
+        """
+        Brings the cached pool objects and curves in line with the current state of ``db``.
+
+        Parameters
+        ----------
+        db : QueryInterface
+            The query interface; its ``state`` is read, and its pool data lookups are set (equivalent to
+            ``db.refresh_pool_data()``)
+        to_curves : Callable[[PoolAndTokens], List[ConstantProductCurve]]
+            Converts a ``PoolAndTokens`` object into its curves
+
+        Returns
+        -------
+        CPCContainer
+            The (patched) container of all curves.
+        """
+        self.update_count += 1
+        if self.full_rebuild_period and self.update_count % self.full_rebuild_period == 0:
+            self.clear()
+
+        pool_data_list = []
+        changed = []
+        for idx, record in enumerate(db.state):
+            cid = str(record.get("cid"))
+            key = self.state_key(record)
+            entry = self.entries.get(cid)
+            if entry is not None and entry[0] == key:
+                pool = entry[1]
+                pool.id = idx
+            else:
+                pool = db.create_pool_and_tokens(idx, record)
+                changed.append((cid, key, pool))
+            pool_data_list.append(pool)
+
+        db.pool_data_list = pool_data_list
+        db.pool_data = {str(pool.cid): pool for pool in pool_data_list}
+
+        removed = [cid for cid in self.entries if cid not in db.pool_data]
+        self.last_num_updated = len(changed)
+        self.last_num_removed = len(removed)
+
+        if self.container is None:
+            self.container = CPCContainer()
+        container = self.container
+
+        # curves are removed in one batch, as each removal rebuilds the container's curve list
+        remove_cids = []
+        for cid in removed:
+            remove_cids += [c.cid for c in self.entries.pop(cid)[2]]
+
+        new_curves_by_cid = {}
+        for cid, key, pool in changed:
+            old_curves = self.entries[cid][2] if cid in self.entries else []
+            new_curves = to_curves(pool)
+            new_cids = {c.cid for c in new_curves}
+            remove_cids += [c.cid for c in old_curves if c.cid not in new_cids]
+            new_curves_by_cid[cid] = new_curves
+            self.entries[cid] = (key, pool, new_curves)
+
+        container.remove(remove_cids)
+        for new_curves in new_curves_by_cid.values():
+            for c in new_curves:
+                container.replace(c)
+
+        return container
@@ -65,7 +65,9 @@ class PoolAndTokens:
     exchange_name : str
         The name of the exchange
     fee : Decimal
-        The fee of the pool
+        The fee of the pool, in the unit of its exchange
+    fee_float : float
+        The fee of the pool as a fraction (eg 0.003 for 0.3%)
     tkn0_balance : Decimal
         The balance of token 0
     tkn1_balance : Decimal
@@ -281,6 +283,11 @@ class PoolAndTokens:
         """
 
         self.fee = float(Decimal(str(self.fee)))
+        # the curves carry the fee as a fraction (eg 0.003 for 0.3%), which is what `fee_float` holds for every
+        # exchange; the unit of `fee` depends on the exchange (eg ppm for Carbon, 1e18 units for Balancer)
+        if self.fee_float is None or self.fee_float != self.fee_float:
+            self.fee_float = self.fee
+        self.fee_float = float(Decimal(str(self.fee_float)))
         if self.exchange_name in self.ConfigObj.UNI_V3_FORKS:
             out = self._univ3_to_cpc()
         elif self.exchange_name in [
@@ -353,7 +360,7 @@ class PoolAndTokens:
                         # "alpha": weight0,
                         "eta": eta,
                         "pair": _pair_name.replace(self.ConfigObj.NATIVE_GAS_TOKEN_ADDRESS, self.ConfigObj.WRAPPED_GAS_TOKEN_ADDRESS),
-                        "fee": self.fee,
+                        "fee": self.fee_float,
                         "cid": self.cid,
                         "descr": self.descr,
                         "params": self._params,
@@ -388,7 +395,7 @@ class PoolAndTokens:
             "x_tknb": tkn0_balance,
             "y_tknq": tkn1_balance,
             "pair": self.pair_name.replace(self.ConfigObj.NATIVE_GAS_TOKEN_ADDRESS, self.ConfigObj.WRAPPED_GAS_TOKEN_ADDRESS),
-            "fee": self.fee,
+            "fee": self.fee_float,
             "cid": self.cid,
             "descr": self.descr,
             "params": self._params,
@@ -508,7 +515,7 @@ class PoolAndTokens:
                 ),
                 "pair": self.pair_name.replace(self.ConfigObj.NATIVE_GAS_TOKEN_ADDRESS, self.ConfigObj.WRAPPED_GAS_TOKEN_ADDRESS),
                 "params": {"exchange": self.exchange_name},
-                "fee": self.fee,
+                "fee": self.fee_float,
                 "descr": self.descr,
                 "params": self._params,
             }
@@ -0,0 +1,155 @@
+"""
+Defines the ``SolutionCache`` class, a cache of the optimizer solutions of the miniverses across blocks.
+
+Most miniverses barely change from one block to the next. The cache keeps the equilibrium prices found
+for each miniverse, which are used as the starting prices of the optimizer when the miniverse is solved
+again, and remembers which miniverses had no arbitrage, so that they are not solved again as long as their
+curves are unchanged.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+__VERSION__ = "1.0"
+__DATE__ = "18/Oct/2026"
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class SolutionCacheStats:
+    """
+    Counters of a solution cache.
+
+    Parameters
+    ----------
+    skipped : int
+        The number of miniverses not solved, as their curves are unchanged and they had no arbitrage.
+    warm_started : int
+        The number of miniverses solved from the prices of their last solution.
+    cold_started : int
+        The number of miniverses solved from the starting prices of the arbitrage mode.
+    iterations : int
+        The total number of optimizer iterations of the solved miniverses.
+    """
+    skipped: int = 0
+    warm_started: int = 0
+    cold_started: int = 0
+    iterations: int = 0
+
+
+@dataclass
+class SolutionCache:
+    """
+    Cache of the optimizer solutions of the miniverses, keyed by their source token and cids.
+
+    A miniverse is considered unchanged if the ``blocklud`` param (the last updated block of the pool)
+    and the hash of each of its curves are the same as when it was last solved.
+
+    Parameters
+    ----------
+    max_entries : int
+        The maximum number of miniverses held; the least recently used ones are dropped beyond that
+    """
+
+    __VERSION__ = __VERSION__
+    __DATE__ = __DATE__
+
+    NO_ARB_RESULT = (None, None, None, None)
+
+    max_entries: int = 100000
+    entries: Dict[Tuple, Tuple[Tuple, Optional[Dict[str, float]], bool]] = field(default_factory=dict, init=False)
+    stats: SolutionCacheStats = field(default_factory=SolutionCacheStats, init=False)
+
+    @staticmethod
+    def key(curves: List[Any], src_token: str, pairwise: bool) -> Tuple:
+        """
+        Returns the key of a miniverse (its source token, optimizer and cids).
+        """
+        return (src_token, pairwise, tuple(sorted(c.cid for c in curves)))
+
+    @staticmethod
+    def state(curves: List[Any]) -> Tuple:
+        """
+        Returns the state of the curves of a miniverse (the last updated block and hash of each curve).
+        """
+        return tuple(sorted((c.cid, c.P("blocklud"), hash(c)) for c in curves))
+
+    def lookup(
+        self, curves: List[Any], src_token: str, pstart: Dict[str, float], pairwise: bool
+    ) -> Tuple[Optional[Tuple], Dict[str, float]]:
+        """
+        Looks up the last solution of a miniverse.
+
+        Parameters
+        ----------
+        curves : List[Any]
+            The curves of the miniverse
+        src_token : str
+            The source token
+        pstart : Dict[str, float]
+            The starting prices of the arbitrage mode
+        pairwise : bool
+            Whether the PairOptimizer is used
+
+        Returns
+        -------
+        Tuple[Optional[Tuple], Dict[str, float]]
+            ``NO_ARB_RESULT`` if the miniverse is unchanged and had no arbitrage (otherwise None), and the
+            starting prices to solve it with (the last equilibrium prices if there are any, otherwise ``pstart``)
+        """
+        key = self.key(curves, src_token, pairwise)
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.stats.cold_started += 1
+            return None, pstart
+        self.entries[key] = entry  # most recently used
+        state, p_optimal, has_arb = entry
+        if not has_arb and state == self.state(curves):
+            self.stats.skipped += 1
+            return self.NO_ARB_RESULT, pstart
+        if p_optimal is None:
+            self.stats.cold_started += 1
+            return None, pstart
+        self.stats.warm_started += 1
+        return None, p_optimal
+
+    def store(
+        self,
+        curves: List[Any],
+        src_token: str,
+        pairwise: bool,
+        result: Any,
+        p_optimal: Optional[Dict[str, float]],
+        n_iterations: Optional[int],
+    ):
+        """
+        Stores the solution of a miniverse.
+
+        Parameters
+        ----------
+        curves : List[Any]
+            The curves of the miniverse
+        src_token : str
+            The source token
+        pairwise : bool
+            Whether the PairOptimizer is used
+        result : Union[Tuple, Exception]
+            The result of ``solve_miniverse``; exceptions are not stored
+        p_optimal : Dict[str, float], optional
+            The equilibrium prices found by the optimizer, by token
+        n_iterations : int, optional
+            The number of optimizer iterations
+        """
+        self.stats.iterations += n_iterations or 0
+        key = self.key(curves, src_token, pairwise)
+        self.entries.pop(key, None)
+        if isinstance(result, Exception):
+            return
+        profit_src, _, trade_instructions_dic, _ = result
+        has_arb = profit_src is not None and profit_src > 0 and bool(trade_instructions_dic)
+        self.entries[key] = (self.state(curves), p_optimal, has_arb)
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
@@ -32,6 +32,8 @@ that are defined in this module
         - ``ArbitrageFinderTriangleSingle`` (``triangle_single``)
         - ``ArbitrageFinderTriangleMulti`` (``triangle_multi``)
         - ``ArbitrageFinderTriangleBancor3TwoHop`` (``triangle_bancor_v3_two_hop``)
+        - ``ArbitrageFinderCycleMulti`` (``cycle_multi``)
+    - ``ArbitrageFinderMarketMulti`` (``market_multi``)
 
 
 ---
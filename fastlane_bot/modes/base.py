@@ -1,7 +1,17 @@
 """
 Defines the base class for all arbitrage finder modes
 
-[DOC-TODO-OPTIONAL-longer description in rst format]
+The optimizations of the individual miniverses are independent of each other, and they can be
+spread over a pool of worker processes (see ``ArbitrageFinderBase.solve_miniverses``). If the
+finder is given the set of pairs that changed since the last block (``dirty_pairs``), only the
+miniverses that contain at least one of those pairs are generated. If it is given a solution cache
+(``solution_cache``), the miniverses are solved starting from their equilibrium prices of the last
+block, and those that are unchanged and had no arbitrage are not solved again.
+
+Before any miniverse is solved, it goes through a cheap prefilter (``max_cycle_rate``): the marginal
+price of a curve, less its fee, bounds the rate at which it trades, so a miniverse in which no cycle
+of tokens returns more than it puts in at those rates cannot have a profitable arbitrage, and it is
+pruned without running the optimizer.
 
 ---
 (c) Copyright Bprotocol foundation 2023-24.
@@ -9,14 +19,238 @@ All rights reserved.
 Licensed under MIT.
 """
 import abc
-from typing import Any, Tuple, Dict, List, Union
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Tuple, Dict, List, Optional, Set, Union
 from _decimal import Decimal
 import pandas as pd
 
-from fastlane_bot.tools.cpc import T
+from fastlane_bot.helpers.solutioncache import SolutionCache
+from fastlane_bot.tools.cpc import T, CPCContainer
+from fastlane_bot.tools.tokenregistry import TOKENS
+from fastlane_bot.tools.optimizer import MargPOptimizer, PairOptimizer
 from fastlane_bot.utils import num_format
 
 
+def solve_miniverse(
+    curves: List[Any], src_token: str, pstart: Dict[str, float] = None, pairwise: bool = False
+) -> Union[Tuple[float, pd.DataFrame, List[Dict[str, Any]], List[Any]], Exception]:
+    """
+    Runs the optimizer on a miniverse and returns the resulting trade instructions.
+
+    Parameters
+    ----------
+    curves : List[Any]
+        The curves of the miniverse
+    src_token : str
+        The source token (the target token of the optimization)
+    pstart : Dict[str, float], optional
+        The starting prices of the optimizer, by default None
+    pairwise : bool, optional
+        Whether to use the PairOptimizer instead of the MargPOptimizer, by default False
+
+    Returns
+    -------
+    Union[Tuple, Exception]
+        ``(profit_src, trade_instructions_df, trade_instructions_dic, trade_instructions)``, or the
+        exception raised while optimizing; the trade instructions are None if the optimizer failed
+    """
+    return _optimize_miniverse(curves, src_token, pstart, pairwise)[0]
+
+
+def _optimize_miniverse(
+    curves: List[Any], src_token: str, pstart: Dict[str, float] = None, pairwise: bool = False
+) -> Tuple[Union[Tuple, Exception], Optional[Dict[str, float]], Optional[int]]:
+    """
+    Runs ``solve_miniverse``, and also returns the equilibrium prices (by token, None for the
+    PairOptimizer, which does not take starting prices) and the number of optimizer iterations.
+    """
+    try:
+        CC_cc = CPCContainer(curves)
+        O = PairOptimizer(CC_cc) if pairwise else MargPOptimizer(CC_cc)
+        r = O.optimize(src_token, params=None if pstart is None else dict(pstart=pstart))
+        result = _miniverse_result(r)
+    except Exception as e:
+        return e, None, None
+    p_optimal = None
+    if not pairwise and r.p_optimal_t is not None:
+        p_optimal = dict(zip(r.tokens_t, r.p_optimal_t))
+    return result, p_optimal, r.n_iterations
+
+
+def _miniverse_result(r: Any) -> Tuple[float, pd.DataFrame, List[Dict[str, Any]], List[Any]]:
+    """
+    Returns the ``solve_miniverse`` result of an optimizer result.
+    """
+    return (
+        -r.result if r.result is not None else None,
+        r.trade_instructions(r.TIF_DFAGGR),
+        r.trade_instructions(r.TIF_DICTS),
+        r.trade_instructions(),
+    )
+
+
+def _optimize_miniverses(
+    miniverses: List[Tuple[List[Any], str, Dict[str, float]]], pairwise: bool
+) -> List[Tuple[Union[Tuple, Exception], Optional[Dict[str, float]], Optional[int]]]:
+    """
+    Runs ``_optimize_miniverse`` on the ``(curves, src_token, pstart)`` miniverses; with the PairOptimizer,
+    all miniverses are solved in one batch (see ``PairOptimizer.optimize_batch``), with the same results.
+    """
+    if not pairwise:
+        return [_optimize_miniverse(curves, src_token, pstart, pairwise) for curves, src_token, pstart in miniverses]
+    results = []
+    for r in PairOptimizer.optimize_batch([(curves, src_token) for curves, src_token, _ in miniverses]):
+        try:
+            if isinstance(r, Exception):
+                raise r
+            results.append((_miniverse_result(r), None, r.n_iterations))
+        except Exception as e:
+            results.append((e, None, None))
+    return results
+
+
+def fee_fraction(fee: Any) -> float:
+    """
+    Returns the fee of a curve as a fraction (eg 0.003 for 0.3%).
+
+    The curves carry their fee as a fraction whatever the unit of their exchange (see
+    ``PoolAndTokens.to_cpc``), so this only guards against a missing or negative fee.
+
+    Parameters
+    ----------
+    fee : Any
+        The ``fee`` of the curve (None is taken as no fee)
+
+    Returns
+    -------
+    float
+        The fee as a fraction
+    """
+    return 0.0 if fee is None else max(float(fee), 0.0)
+
+
+def marginal_rates(curve: Any) -> List[Tuple[str, str, float]]:
+    """
+    Returns the fee-adjusted marginal rates of a curve in the directions in which it can trade.
+
+    A curve sells its y tokens at a rate of at most ``p * (1 - fee)`` y per x, and its x tokens at a rate
+    of at most ``(1 - fee) / p`` x per y, as the rate only gets worse along the curve; a curve that is at
+    its boundary (no x or no y tokens left) does not trade in that direction.
+
+    Parameters
+    ----------
+    curve : Any
+        The curve
+
+    Returns
+    -------
+    List[Tuple[str, str, float]]
+        The ``(tkn_in, tkn_out, rate)`` of each direction, the rate in tkn_out per tkn_in
+    """
+    p = curve.p
+    if curve.tknx == curve.tkny or not 0 < p < math.inf:
+        return []
+    fee_factor = 1 - fee_fraction(curve.fee)
+    rates = []
+    if curve.y_act > 0:
+        rates.append((curve.tknx, curve.tkny, p * fee_factor))
+    if curve.x_act > 0:
+        rates.append((curve.tkny, curve.tknx, fee_factor / p))
+    return rates
+
+
+def max_cycle_rate(curves: List[Any]) -> float:
+    """
+    Returns the best rate around any cycle of tokens of a miniverse, at the marginal prices of its curves.
+
+    The best rates between each two tokens (see ``marginal_rates``) are combined along all the paths of
+    the token graph (max-product Floyd-Warshall), so the result bounds the output per unit of input of
+    any arbitrage of the miniverse: if it is not above 1, the miniverse provably has no profitable
+    arbitrage.
+
+    Parameters
+    ----------
+    curves : List[Any]
+        The curves of the miniverse
+
+    Returns
+    -------
+    float
+        The best rate around a cycle if none is above 1 (trading back and forth on a curve counts as a
+        cycle; 0 if the miniverse has no curves); otherwise a value above 1, which may be above the
+        rate of any single cycle, as those get compounded
+    """
+    tokens = {}
+    for c in curves:
+        tokens.setdefault(c.tknx, len(tokens))
+        tokens.setdefault(c.tkny, len(tokens))
+    n = len(tokens)
+    rates = [[0.0] * n for _ in range(n)]
+    for c in curves:
+        for tkn_in, tkn_out, rate in marginal_rates(c):
+            i, j = tokens[tkn_in], tokens[tkn_out]
+            rates[i][j] = max(rates[i][j], rate)
+    for k in range(n):
+        rates_k = rates[k]
+        for i in range(n):
+            rate_ik = rates[i][k]
+            if rate_ik == 0:
+                continue
+            rates_i = rates[i]
+            for j in range(n):
+                rate = rate_ik * rates_k[j]
+                if rate > rates_i[j]:
+                    rates_i[j] = rate
+    return max((rates[i][i] for i in range(n)), default=0.0)
+
+
+_executor = None
+_executor_workers = 0
+
+
+def _get_executor(num_workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the worker pool, which is created on first use and then kept for the life of the process
+    (it is only replaced if the number of workers changes); its workers are started by a forkserver
+    where available, else spawned, as forking a process that runs threads is not safe.
+    """
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != num_workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _executor = ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context(method))
+        _executor_workers = num_workers
+    return _executor
+
+
+def _drop_executor():
+    """
+    Drops the worker pool (eg after a worker died), so that the next call creates a new one.
+    """
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor, _executor_workers = None, 0
+
+
+def _solve_miniverses_ix(
+    curves: List[Any], tasks: List[Tuple[Tuple[int], str, Dict[str, float]]], pairwise: bool
+) -> List[Tuple[Union[Tuple, Exception], Optional[Dict[str, float]], Optional[int]]]:
+    """
+    Runs ``_optimize_miniverses`` in a worker process on ``(curve_ixs, src_token, pstart)`` tasks, the
+    curves given by their index in ``curves``.
+    """
+    return _optimize_miniverses(
+        [([curves[ix] for ix in curve_ixs], src_token, pstart) for curve_ixs, src_token, pstart in tasks],
+        pairwise,
+    )
+
+
 class ArbitrageFinderBase:
     """
     Base class for all arbitrage finder modes
@@ -25,6 +259,9 @@ class ArbitrageFinderBase:
     AO_TOKENS = "tokens"
     AO_CANDIDATES = "candidates"
 
+    PARALLEL_MIN_MINIVERSES = 16  # below that number the miniverses are always solved in process
+    PREFILTER_MAX_RATE = 1.0  # miniverses whose max_cycle_rate is not above that are not solved
+
     def __init__(
         self,
         flashloan_tokens,
@@ -33,6 +270,10 @@ class ArbitrageFinderBase:
         result=AO_CANDIDATES,
         ConfigObj: Any = None,
         arb_mode: str = None,
+        n_jobs: int = 1,
+        dirty_pairs: Set[str] = None,
+        solution_cache: SolutionCache = None,
+        prefilter: bool = True,
     ):
         self.flashloan_tokens = flashloan_tokens
         self.CCm = CCm
@@ -45,6 +286,11 @@ class ArbitrageFinderBase:
         self.best_trade_instructions_dic = None
         self.ConfigObj = ConfigObj
         self.base_exchange = "bancor_v3" if arb_mode == "bancor_v3" else "carbon_v1"
+        self.n_jobs = n_jobs
+        self.dirty_pairs = dirty_pairs
+        self.solution_cache = solution_cache
+        self.prefilter = prefilter
+        self.num_pruned = 0
 
     @abc.abstractmethod
     def find_arbitrage(
@@ -75,6 +321,169 @@ class ArbitrageFinderBase:
         """
         pass
 
+    def is_dirty_pair(self, pair: str) -> bool:
+        """
+        Returns whether a pair changed since the last block.
+
+        Parameters
+        ----------
+        pair : str
+            The pair, as "tkn0/tkn1" (in either order)
+
+        Returns
+        -------
+        bool
+            True if the pair is in ``dirty_pairs``, or if ``dirty_pairs`` is None (full sweep)
+        """
+        if self.dirty_pairs is None:
+            return True
+        return TOKENS.sortedpair(pair) in self.dirty_pairs
+
+    def is_dirty_miniverse(self, curves: List[Any]) -> bool:
+        """
+        Returns whether any of the curves of a miniverse is on a pair that changed since the last block.
+
+        Parameters
+        ----------
+        curves : List[Any]
+            The curves of the miniverse
+
+        Returns
+        -------
+        bool
+            True if any curve is on a pair in ``dirty_pairs``, or if ``dirty_pairs`` is None (full sweep)
+        """
+        if self.dirty_pairs is None:
+            return True
+        return any(self.is_dirty_pair(c.pair) for c in curves)
+
+    def num_workers(self, num_miniverses: int) -> int:
+        """
+        Returns the number of worker processes to use for solving the miniverses.
+
+        Parameters
+        ----------
+        num_miniverses : int
+            The number of miniverses to solve
+
+        Returns
+        -------
+        int
+            The number of workers (1 means solving them in process); ``n_jobs`` follows the joblib
+            convention, ie -1 means one worker per CPU, -2 all CPUs but one etc
+        """
+        if num_miniverses < self.PARALLEL_MIN_MINIVERSES:
+            return 1
+        n_jobs = self.n_jobs if self.n_jobs >= 1 else (os.cpu_count() or 1) + 1 + self.n_jobs
+        return max(1, min(n_jobs, num_miniverses))
+
+    def solve_miniverses(
+        self, miniverses: List[Tuple[List[Any], str, Dict[str, float]]], pairwise: bool = False
+    ) -> List[Union[Tuple, Exception]]:
+        """
+        Runs ``solve_miniverse`` on all miniverses, using a process pool if ``n_jobs`` allows it.
+
+        The worker pool is created on first use and kept across calls; every distinct curve of a chunk
+        of miniverses is sent with it only once, and the tasks only refer to the curves by their index. The results are returned in the order of ``miniverses``, so that
+        they can be merged exactly as if they had been computed sequentially.
+
+        If ``prefilter`` is set, the miniverses that provably have no arbitrage at the fee-adjusted
+        marginal prices of their curves (see ``max_cycle_rate``) are not solved; their number is added
+        to ``num_pruned``. With a ``solution_cache``, the miniverses whose curves are unchanged since they were last
+        found to have no arbitrage are not solved again, and the others are solved starting from
+        their last equilibrium prices, if any.
+
+        Parameters
+        ----------
+        miniverses : List[Tuple[List[Any], str, Dict[str, float]]]
+            The ``(curves, src_token, pstart)`` of each miniverse
+        pairwise : bool, optional
+            Whether to use the PairOptimizer instead of the MargPOptimizer, by default False
+
+        Returns
+        -------
+        List[Union[Tuple, Exception]]
+            The results of ``solve_miniverse``, in the order of ``miniverses``; the result of a miniverse
+            that is not solved is ``SolutionCache.NO_ARB_RESULT``
+        """
+        results = [None] * len(miniverses)
+        tasks = []
+        num_pruned = 0
+        for i, (curves, src_token, pstart) in enumerate(miniverses):
+            if self.prefilter and max_cycle_rate(curves) <= self.PREFILTER_MAX_RATE:
+                results[i] = SolutionCache.NO_ARB_RESULT
+                num_pruned += 1
+                continue
+            if self.solution_cache is not None:
+                results[i], pstart = self.solution_cache.lookup(curves, src_token, pstart, pairwise)
+                if results[i] is not None:
+                    continue
+            tasks.append((i, curves, src_token, pstart))
+
+        for (i, curves, src_token, _), (result, p_optimal, n_iterations) in zip(tasks, self._solve_tasks(tasks, pairwise)):
+            results[i] = result
+            if self.solution_cache is not None:
+                self.solution_cache.store(curves, src_token, pairwise, result, p_optimal, n_iterations)
+
+        if self.prefilter:
+            self.num_pruned += num_pruned
+            self.ConfigObj.logger.debug(
+                f"[modes.base.solve_miniverses] prefilter pruned {num_pruned} of {len(miniverses)} miniverses"
+            )
+        if self.solution_cache is not None:
+            self.ConfigObj.logger.debug(
+                f"[modes.base.solve_miniverses] solved {len(tasks)} of {len(miniverses)} miniverses; {self.solution_cache.stats}"
+            )
+        return results
+
+    def _solve_tasks(
+        self, tasks: List[Tuple[int, List[Any], str, Dict[str, float]]], pairwise: bool
+    ) -> List[Tuple[Union[Tuple, Exception], Optional[Dict[str, float]], Optional[int]]]:
+        """
+        Runs ``_optimize_miniverses`` on the ``(index, curves, src_token, pstart)`` tasks, in process or on
+        the worker pool (in chunks, each worker solving one chunk at a time, and each distinct curve of a
+        chunk being sent with it only once).
+        """
+        num_workers = self.num_workers(len(tasks))
+        miniverses = [(curves, src_token, pstart) for _, curves, src_token, pstart in tasks]
+        if num_workers == 1:
+            return _optimize_miniverses(miniverses, pairwise)
+
+        chunksize = max(1, len(tasks) // (4 * num_workers))
+        chunks_curves = []
+        chunks_tasks = []
+        for i in range(0, len(miniverses), chunksize):
+            curves = []
+            curve_ix_by_id = {}
+            tasks_ix = []
+            for task_curves, src_token, pstart in miniverses[i:i + chunksize]:
+                ixs = []
+                for c in task_curves:
+                    if id(c) not in curve_ix_by_id:
+                        curve_ix_by_id[id(c)] = len(curves)
+                        curves.append(c)
+                    ixs.append(curve_ix_by_id[id(c)])
+                tasks_ix.append((tuple(ixs), src_token, pstart))
+            chunks_curves.append(curves)
+            chunks_tasks.append(tasks_ix)
+
+        self.ConfigObj.logger.debug(
+            f"[modes.base.solve_miniverses] solving {len(tasks)} miniverses in {len(chunks_tasks)} chunks on {num_workers} workers"
+        )
+        try:
+            executor = _get_executor(num_workers)
+            return [
+                result
+                for chunk_results in executor.map(
+                    _solve_miniverses_ix, chunks_curves, chunks_tasks, [pairwise] * len(chunks_tasks)
+                )
+                for result in chunk_results
+            ]
+        except BrokenProcessPool as e:
+            _drop_executor()
+            self.ConfigObj.logger.warning(f"[modes.base.solve_miniverses] worker pool failed ({e}), solving in process")
+            return _optimize_miniverses(miniverses, pairwise)
+
     def _set_best_ops(
         self,
         best_profit: float,
@@ -1,7 +1,9 @@
 """
 Defines the base class for pairwise arbitrage finder modes
 
-[DOC-TODO-OPTIONAL-longer description in rst format]
+The combos of the pairwise modes are generated from the pair index of the container
+(``ArbitrageFinderPairwiseBase.get_pair_curves``): only the pairs of a flashloan token that have
+at least two curves, at least one of which on a base exchange of the mode, are considered.
 
 ---
 (c) Copyright Bprotocol foundation 2023-24.
@@ -10,10 +12,11 @@ Licensed under MIT.
 """
 import abc
 import itertools
-from typing import List, Tuple, Any, Union
+from typing import List, Tuple, Any, Union, Iterable
 
 from fastlane_bot.modes.base import ArbitrageFinderBase
 from fastlane_bot.tools.cpc import CPCContainer
+from fastlane_bot.tools.tokenregistry import TOKENS
 
 
 class ArbitrageFinderPairwiseBase(ArbitrageFinderBase):
@@ -58,3 +61,50 @@ class ArbitrageFinderPairwiseBase(ArbitrageFinderBase):
             if tkn0 != tkn1
         ]
         return all_tokens, combos
+
+    def get_pair_curves(
+        self, flashloan_tokens: Iterable[str], base_exchanges: Iterable[str] = None
+    ) -> List[Tuple[str, str, List[Any]]]:
+        """
+        Get the pairs for pairwise arbitrage and their curves, from the pair index of the container.
+
+        This yields the same combos as ``get_combos`` with the curves of each combo (ie
+        ``CCm.bypairs(f"{tkn0}/{tkn1}")``), minus the combos that have less than two curves or no
+        curve on a base exchange, without looking at the pairs that have no curve at all.
+
+        Parameters
+        ----------
+        flashloan_tokens : Iterable[str]
+            The flashloan tokens (the tokens tkn1 of the combos)
+        base_exchanges : Iterable[str], optional
+            At least one curve of a pair must be on one of these exchanges, by default None (no condition)
+
+        Returns
+        -------
+        List[Tuple[str, str, List[Any]]]
+            The ``(tkn0, tkn1, curves)`` of the combos, the curves in container order; tkn1 is the
+            flashloan token, and the quote token of the pair tkn0/tkn1
+        """
+        CCm = self.CCm
+        flashloan_tokens = set(flashloan_tokens)
+        if base_exchanges is None:
+            pairs = CCm.curves_by_primary_pair
+        else:
+            pairs = dict.fromkeys(
+                c.pairo.primary
+                for exchange in base_exchanges
+                for c in CCm.curves_by_exchange.get(exchange, {}).values()
+            )
+
+        pair_curves = []
+        for pair in pairs:
+            curves = CCm.curves_by_primary_pair.get(pair, {})
+            if len(curves) < 2:
+                continue
+            tknb, tknq = map(TOKENS.token, TOKENS.splitpair(pair))
+            if tknb == tknq:
+                continue
+            for tkn0, tkn1 in ((tknb, tknq), (tknq, tknb)):
+                if tkn1 in flashloan_tokens:
+                    pair_curves.append((tkn0, tkn1, list(curves.values())))
+        return pair_curves
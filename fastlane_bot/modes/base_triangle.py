@@ -1,7 +1,11 @@
 """
 Defines the base class for triangular arbitrage finder modes
 
-[DOC-TODO-OPTIONAL-longer description in rst format]
+Besides enumerating the triangles of the base exchange, the combos can be found by a search of the
+rate graph of all curves (``get_rate_graph``): the profitable cycles of up to ``max_length`` tokens
+through a flashloan token are found by a bounded Bellman-Ford pass from the token, which gives the
+best rate back to it from every other token, followed by a depth-first search that only extends the
+paths that can still be closed into a profitable cycle (``find_profitable_cycles``).
 
 ---
 (c) Copyright Bprotocol foundation 2023-24.
@@ -10,16 +14,19 @@ Licensed under MIT.
 """
 import abc
 import itertools
-from typing import List, Any, Tuple, Union
+import math
+from collections import defaultdict
+from typing import List, Any, Tuple, Union, Dict, Iterable
 
 import pandas as pd
 
-from fastlane_bot.modes.base import ArbitrageFinderBase
+from fastlane_bot.modes.base import ArbitrageFinderBase, marginal_rates
 from fastlane_bot.tools.cpc import T
+from fastlane_bot.tools.tokenregistry import TOKENS
 
 def sort_pairs(pairs):
-    # Clean up the pairs alphabetically
-    return ["/".join(sorted(pair.split('/'))) for pair in pairs]
+    # Clean up the pairs alphabetically (cached by the token registry)
+    return [TOKENS.sortedpair(pair) for pair in pairs]
 
 def flatten_nested_items_in_list(nested_list):
     # unpack nested items
@@ -38,8 +45,8 @@ def get_triangle_groups(flt, x_y_pairs):
     # Get groups of triangles that conform to (flt/x , x/y, y/flt) where x!=y
     triangle_groups = []
     for pair in x_y_pairs:
-        x,y = pair.split('/')
-        triangle_groups += [("/".join(sorted([flt,x])), pair, "/".join(sorted([flt,y])))]
+        x, y = map(TOKENS.token, TOKENS.splitpair(pair))
+        triangle_groups += [(TOKENS.sortedpair(f"{flt}/{x}"), pair, TOKENS.sortedpair(f"{flt}/{y}"))]
     return triangle_groups
 
 def get_triangle_groups_stats(triangle_groups, all_relevant_pairs_info):
@@ -57,6 +64,97 @@ def get_triangle_groups_stats(triangle_groups, all_relevant_pairs_info):
             valid_carbon_triangles.append(triangle)
     return valid_carbon_triangles
 
+def get_rate_graph(curves: Iterable[Any]) -> Dict[str, Dict[str, Tuple[float, List[Any]]]]:
+    """
+    Builds the graph of the fee-adjusted marginal rates of the curves (see ``marginal_rates``).
+
+    Parameters
+    ----------
+    curves : Iterable[Any]
+        The curves
+
+    Returns
+    -------
+    Dict[str, Dict[str, Tuple[float, List[Any]]]]
+        ``graph[tkn_in][tkn_out]`` is the log of the best rate from tkn_in to tkn_out and the curves
+        trading in that direction, best rate first
+    """
+    edges = defaultdict(list)
+    for c in curves:
+        for tkn_in, tkn_out, rate in marginal_rates(c):
+            edges[tkn_in, tkn_out].append((rate, c))
+    graph = defaultdict(dict)
+    for (tkn_in, tkn_out), rated_curves in edges.items():
+        rated_curves.sort(key=lambda rated_curve: -rated_curve[0])
+        graph[tkn_in][tkn_out] = (math.log(rated_curves[0][0]), [c for _, c in rated_curves])
+    return dict(graph)
+
+
+def find_profitable_cycles(
+    graph: Dict[str, Dict[str, Tuple[float, List[Any]]]], src_token: str, max_length: int = 4, max_cycles: int = None
+) -> List[Tuple[float, Tuple[str, ...]]]:
+    """
+    Finds the cycles through a token whose rate, at the best rates of the graph, is above 1.
+
+    A bounded Bellman-Ford pass, relaxing only the tokens updated in the previous round, first finds the
+    best log rate from every token back to ``src_token`` in at most 1, ..., ``max_length`` - 1 steps; the
+    cycles are then enumerated depth first from ``src_token``, a path only being extended if that bound
+    says it can still be closed into a profitable cycle.
+
+    Parameters
+    ----------
+    graph : Dict[str, Dict[str, Tuple[float, List[Any]]]]
+        The rate graph (see ``get_rate_graph``)
+    src_token : str
+        The token that starts and ends the cycles
+    max_length : int, optional
+        The maximum number of steps (ie tokens) of a cycle, by default 4
+    max_cycles : int, optional
+        The maximum number of cycles returned, the best ones first, by default None (all cycles)
+
+    Returns
+    -------
+    List[Tuple[float, Tuple[str, ...]]]
+        The log rate and the tokens of each cycle (starting and ending with ``src_token``), best first
+    """
+    into = defaultdict(dict)
+    for tkn_in, out_edges in graph.items():
+        for tkn_out, (log_rate, _) in out_edges.items():
+            into[tkn_out][tkn_in] = log_rate
+
+    # back[k][tkn] is the best log rate from tkn back to src_token in at most k steps
+    back = [{src_token: 0.0}]
+    updated = {src_token}
+    for _ in range(max_length - 1):
+        best = dict(back[-1])
+        newly_updated = set()
+        for tkn_out in updated:
+            log_rate_out = back[-1][tkn_out]
+            for tkn_in, log_rate in into[tkn_out].items():
+                if log_rate + log_rate_out > best.get(tkn_in, -math.inf):
+                    best[tkn_in] = log_rate + log_rate_out
+                    newly_updated.add(tkn_in)
+        back.append(best)
+        updated = newly_updated
+
+    cycles = []
+
+    def extend(path, log_rate):
+        steps_left = max_length - len(path)
+        for tkn_out, (edge_log_rate, _) in graph.get(path[-1], {}).items():
+            path_log_rate = log_rate + edge_log_rate
+            if tkn_out == src_token:
+                if path_log_rate > 0:
+                    cycles.append((path_log_rate, path + (src_token,)))
+            elif steps_left > 0 and tkn_out not in path:
+                if path_log_rate + back[steps_left].get(tkn_out, -math.inf) > 0:
+                    extend(path + (tkn_out,), path_log_rate)
+
+    extend((src_token,), 0.0)
+    cycles.sort(key=lambda cycle: -cycle[0])
+    return cycles[:max_cycles]
+
+
 class ArbitrageFinderTriangleBase(ArbitrageFinderBase):
     """
     Base class for triangular arbitrage finder modes
@@ -156,9 +254,17 @@ class ArbitrageFinderTriangleBase(ArbitrageFinderBase):
                 non_flt_base_exchange_curves = [
                     x for x in all_base_exchange_curves if flt not in x.pair
                 ]
+                flt_pairs = CCm.filter_pairs(onein=flt)
                 for non_flt_base_exchange_curve in non_flt_base_exchange_curves:
                     target_tkny = non_flt_base_exchange_curve.tkny
                     target_tknx = non_flt_base_exchange_curve.tknx
+                    if not (
+                        self.is_dirty_pair(f"{target_tknx}/{target_tkny}")
+                        or self.is_dirty_pair(f"{flt}/{target_tknx}")
+                        or self.is_dirty_pair(f"{flt}/{target_tkny}")
+                    ):
+                        # no curve of any of the triangle's pairs changed
+                        continue
                     base_exchange_curves = (
                         CCm.bypairs(f"{target_tknx}/{target_tkny}")
                         .byparams(exchange=self.base_exchange)
@@ -172,12 +278,10 @@ class ArbitrageFinderTriangleBase(ArbitrageFinderBase):
                     base_direction_two = [curve for curve in base_exchange_curves if curve.pair != base_direction_pair]
                     assert len(base_exchange_curves) == len(base_direction_one) + len(base_direction_two)
                     y_match_curves = CCm.bypairs(
-                        set(CCm.filter_pairs(onein=target_tknx))
-                        & set(CCm.filter_pairs(onein=flt))
+                        CCm.filter_pairs(flt_pairs, onein=target_tknx)
                     )
                     x_match_curves = CCm.bypairs(
-                        set(CCm.filter_pairs(onein=target_tkny))
-                        & set(CCm.filter_pairs(onein=flt))
+                        CCm.filter_pairs(flt_pairs, onein=target_tkny)
                     )
 
                     y_match_curves_not_carbon = [
@@ -212,8 +316,58 @@ class ArbitrageFinderTriangleBase(ArbitrageFinderBase):
                             arb_mode,
                             combos,
                         )
+            if self.dirty_pairs is not None:
+                combos = [(flt, miniverse) for flt, miniverse in combos if self.is_dirty_miniverse(miniverse)]
         return combos
     
+    def get_cycle_combos(
+        self, flashloan_tokens: List[str], CCm: Any, max_length: int = 4, max_cycles: int = None
+    ) -> List[Tuple[str, List[Any]]]:
+        """
+        Get combos for cyclic arbitrage from a search of the rate graph of all curves
+
+        Only the cycles through a flashloan token whose rate is above 1 at the fee-adjusted marginal
+        prices of the curves are considered (see ``find_profitable_cycles``). The miniverse of a cycle
+        holds, for each of its steps, the best curve that is not on a Carbon fork, and all the Carbon
+        curves, that trade in the direction of the step.
+
+        Parameters
+        ----------
+        flashloan_tokens : list
+            List of flashloan tokens
+        CCm : object
+            CCm object
+        max_length : int, optional
+            The maximum number of steps of a cycle, by default 4
+        max_cycles : int, optional
+            The maximum number of cycles per flashloan token, by default None (no limit)
+
+        Returns
+        -------
+        combos : list
+            List of combos ``(flt, curves)``
+
+        """
+        graph = get_rate_graph(CCm)
+        combos = []
+        for flt in flashloan_tokens:
+            cycles = find_profitable_cycles(graph, flt, max_length, max_cycles)
+            for _, tkns in cycles:
+                miniverse = {}
+                for tkn_in, tkn_out in zip(tkns, tkns[1:]):
+                    curves = graph[tkn_in][tkn_out][1]
+                    carbon_curves = [c for c in curves if c.params.exchange in self.ConfigObj.CARBON_V1_FORKS]
+                    other_curves = [c for c in curves if c.params.exchange not in self.ConfigObj.CARBON_V1_FORKS]
+                    for c in other_curves[:1] + carbon_curves:
+                        miniverse[c.cid] = c
+                miniverse = list(miniverse.values())
+                if self.is_dirty_miniverse(miniverse):
+                    combos.append((flt, miniverse))
+            self.ConfigObj.logger.debug(
+                f"[base_triangle.get_cycle_combos] {len(cycles)} profitable cycles through {flt}"
+            )
+        return combos
+
     def get_all_relevant_pairs_info(self, CCm, all_relevant_pairs):
         # Get pair info for the cohort to allow decision making at the triangle level
         all_relevant_pairs_info = {}
@@ -292,6 +446,9 @@ class ArbitrageFinderTriangleBase(ArbitrageFinderBase):
             
             # Generate valid triangles for the groups base on arb_mode
             valid_triangles = get_triangle_groups_stats(triangle_groups, all_relevant_pairs_info)
+
+            # Only keep the triangles with at least one changed pair
+            valid_triangles = [triangle for triangle in valid_triangles if any(self.is_dirty_pair(pair) for pair in triangle)]
             
             # Get [(flt,curves)] analysis set for the flt
             flt_triangle_analysis_set = self.get_analysis_set_per_flt(flt, valid_triangles, all_relevant_pairs_info)
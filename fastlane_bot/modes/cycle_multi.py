@@ -0,0 +1,90 @@
+"""
+Defines the Multi-cycle arbitrage finder class
+
+The combos are not enumerated combinatorially, but found by a search of the rate graph of all
+curves (see ``ArbitrageFinderTriangleBase.get_cycle_combos``), which allows for cycles of up to
+``MAX_CYCLE_LENGTH`` tokens; only the curves on the profitable cycles are passed to the optimizer.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+from typing import List, Any, Tuple, Union
+
+from fastlane_bot.modes.base_triangle import ArbitrageFinderTriangleBase
+from fastlane_bot.tools.cpc import CPCContainer
+
+
+class ArbitrageFinderCycleMulti(ArbitrageFinderTriangleBase):
+    """
+    Multi-cycle arbitrage finder mode
+    """
+
+    arb_mode = "multi_cycle"
+
+    MAX_CYCLE_LENGTH = 4
+    MAX_CYCLES_PER_TOKEN = 200
+
+    def find_arbitrage(self, candidates: List[Any] = None, ops: Tuple = None, best_profit: float = 0, profit_src: float = 0) -> Union[List, Tuple]:
+        """
+        see base.py
+        """
+
+        if candidates is None:
+            candidates = []
+
+        combos = self.get_cycle_combos(
+            self.flashloan_tokens, self.CCm, max_length=self.MAX_CYCLE_LENGTH, max_cycles=self.MAX_CYCLES_PER_TOKEN
+        )
+
+        miniverses = []
+        for src_token, miniverse in combos:
+            try:
+                CC_cc = CPCContainer(miniverse)
+                pstart = self.build_pstart(CC_cc, CC_cc.tokens(), src_token)
+            except Exception as e:
+                self.ConfigObj.logger.info(f"[cycle multi] {e}")
+                continue
+            miniverses.append((miniverse, src_token, pstart))
+
+        for (miniverse, src_token, pstart), result in zip(miniverses, self.solve_miniverses(miniverses)):
+            if isinstance(result, Exception):
+                self.ConfigObj.logger.info(f"[cycle multi] {result}")
+                continue
+            profit_src, trade_instructions_df, trade_instructions_dic, trade_instructions = result
+            if trade_instructions_dic is None or len(trade_instructions_dic) < 2:
+                # Failed to converge
+                continue
+
+            # Get the cids
+            cids = [ti["cid"] for ti in trade_instructions_dic]
+
+            # Calculate the profit
+            profit = self.calculate_profit(src_token, profit_src, self.CCm, cids)
+            if str(profit) == "nan":
+                self.ConfigObj.logger.debug("profit is nan, skipping")
+                continue
+
+            # Handle candidates based on conditions
+            candidates += self.handle_candidates(
+                best_profit,
+                profit,
+                trade_instructions_df,
+                trade_instructions_dic,
+                src_token,
+                trade_instructions,
+            )
+
+            # Find the best operations
+            best_profit, ops = self.find_best_operations(
+                best_profit,
+                ops,
+                profit,
+                trade_instructions_df,
+                trade_instructions_dic,
+                src_token,
+                trade_instructions,
+            )
+
+        return candidates if self.result == self.AO_CANDIDATES else ops
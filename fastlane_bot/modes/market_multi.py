@@ -0,0 +1,268 @@
+"""
+Defines the Market-wide arbitrage finder class
+
+Instead of cutting the market into many small miniverses, this mode runs a single MargP solve per
+flashloan token over all curves near it (the curves between the tokens within ``MAX_HOPS`` hops of
+the flashloan token, see ``get_market``); for a large market the optimizer uses a sparse Jacobian.
+The flow of that solution is then decomposed into routes from the flashloan token back to it (see
+``decompose_routes``), and each route is solved as a miniverse of its own, starting from the
+market-wide equilibrium prices, so that its trade instructions can be executed as one transaction.
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+All rights reserved.
+Licensed under MIT.
+"""
+import heapq
+import math
+from collections import defaultdict
+from typing import List, Any, Tuple, Union, Dict, Set
+
+import numpy as np
+
+from fastlane_bot.modes.base import ArbitrageFinderBase
+from fastlane_bot.tools.cpc import CPCContainer
+from fastlane_bot.tools.optimizer import MargPOptimizer
+
+
+def get_market(
+    CCm: Any, src_token: str, max_hops: int = 2, carbon_forks: Set[str] = ()
+) -> Tuple[List[Any], Dict[str, float]]:
+    """
+    Returns the curves near a token, and starting prices for the optimizer.
+
+    The tokens within ``max_hops`` hops of ``src_token`` are found by a breadth-first search of the
+    curves; the price of every token, in units of ``src_token``, is that of the first curve that
+    reaches it (the curves not on a Carbon fork first, as their marginal prices are market prices).
+
+    Parameters
+    ----------
+    CCm : object
+        CCm object
+    src_token : str
+        The token the market is built around
+    max_hops : int, optional
+        The maximum number of hops from ``src_token``, by default 2
+    carbon_forks : Set[str], optional
+        The Carbon forks, whose curves are only used for pricing if no other curve reaches a token
+
+    Returns
+    -------
+    Tuple[List[Any], Dict[str, float]]
+        The curves between any two of those tokens (in container order) and the starting prices
+    """
+    by_tkn = lambda tkn: sorted(
+        [*CCm.curves_by_tknx.get(tkn, {}).values(), *CCm.curves_by_tkny.get(tkn, {}).values()],
+        key=lambda c: c.P("exchange") in carbon_forks,
+    )
+    pstart = {src_token: 1.0}
+    frontier = [src_token]
+    for _ in range(max_hops):
+        next_frontier = []
+        for tkn in frontier:
+            for c in by_tkn(tkn):
+                other = c.tkny if c.tknx == tkn else c.tknx
+                if other in pstart or not 0 < c.p < math.inf:
+                    continue
+                pstart[other] = pstart[tkn] / c.p if c.tknx == tkn else pstart[tkn] * c.p
+                next_frontier.append(other)
+        frontier = next_frontier
+    curves = [c for tkn in pstart for c in by_tkn(tkn) if c.tknx in pstart and c.tkny in pstart]
+    curves = sorted(set(curves), key=CCm.curveix_by_curve.__getitem__)
+    return curves, pstart
+
+
+def decompose_routes(
+    trade_instructions_dic: List[Dict[str, Any]],
+    src_token: str,
+    prices: Dict[str, float],
+    max_routes: int = None,
+    min_share: float = 0.01,
+) -> List[Tuple[float, Tuple[str, ...], List[str]]]:
+    """
+    Decomposes the flow of a market-wide solution into routes from a token back to it.
+
+    The flow from one token to another is the value (at ``prices``) of all the tokens traded in that
+    direction. The routes are taken off the flow one by one, largest first: the widest path from
+    ``src_token`` to every token (the path whose smallest flow is largest) is found by a variant of
+    Dijkstra's algorithm, the route is the widest of those paths closed by a flow back to
+    ``src_token``, and its width is then subtracted from the flows along it.
+
+    Parameters
+    ----------
+    trade_instructions_dic : List[Dict[str, Any]]
+        The trade instructions of the solution
+    src_token : str
+        The token that starts and ends the routes
+    prices : Dict[str, float]
+        The equilibrium prices of the solution, in units of ``src_token``
+    max_routes : int, optional
+        The maximum number of routes, by default None (no limit)
+    min_share : float, optional
+        The routes whose value is below that share of the value of the first one are dropped, by
+        default 0.01
+
+    Returns
+    -------
+    List[Tuple[float, Tuple[str, ...], List[str]]]
+        The value, the tokens (starting and ending with ``src_token``) and the cids of each route,
+        largest first; the cids are those of all curves that trade, in either direction, between any
+        two consecutive tokens of the route
+    """
+    flows = defaultdict(float)
+    cids = defaultdict(list)
+    for ti in trade_instructions_dic:
+        flows[ti["tknin"], ti["tknout"]] += ti["amtin"] * prices[ti["tknin"]]
+        cids[ti["tknin"], ti["tknout"]].append(ti["cid"])
+    out_tkns = defaultdict(list)
+    for tkn_in, tkn_out in flows:
+        out_tkns[tkn_in].append(tkn_out)
+
+    routes = []
+    while max_routes is None or len(routes) < max_routes:
+        width = {src_token: math.inf}
+        parent = {}
+        heap = [(-math.inf, src_token)]
+        done = set()
+        while heap:
+            _, tkn = heapq.heappop(heap)
+            if tkn in done:
+                continue
+            done.add(tkn)
+            for tkn_out in out_tkns[tkn]:
+                new_width = min(width[tkn], flows[tkn, tkn_out])
+                if tkn_out != src_token and new_width > width.get(tkn_out, 0):
+                    width[tkn_out] = new_width
+                    parent[tkn_out] = tkn
+                    heapq.heappush(heap, (-new_width, tkn_out))
+        closing = [
+            (min(width[tkn], flows[tkn, src_token]), tkn)
+            for tkn in done
+            if tkn != src_token and flows.get((tkn, src_token), 0) > 0
+        ]
+        if not closing:
+            break
+        value, tkn = max(closing)
+        if routes and value < min_share * routes[0][0]:
+            break
+        path = [tkn]
+        while path[-1] != src_token:
+            path.append(parent[path[-1]])
+        tkns = tuple(reversed(path)) + (src_token,)
+        route_cids = {}
+        for tkn_in, tkn_out in zip(tkns, tkns[1:]):
+            flows[tkn_in, tkn_out] -= value
+            for cid in cids[tkn_in, tkn_out] + cids[tkn_out, tkn_in]:
+                route_cids[cid] = None
+        routes.append((value, tkns, list(route_cids)))
+    return routes
+
+
+class ArbitrageFinderMarketMulti(ArbitrageFinderBase):
+    """
+    Market-wide arbitrage finder mode
+    """
+
+    arb_mode = "multi_market"
+
+    MAX_HOPS = 2
+    MAX_ROUTES_PER_TOKEN = 20
+    ROUTE_MIN_SHARE = 0.01
+
+    def find_arbitrage(self, candidates: List[Any] = None, ops: Tuple = None, best_profit: float = 0, profit_src: float = 0) -> Union[List, Tuple]:
+        """
+        see base.py
+        """
+
+        if candidates is None:
+            candidates = []
+
+        miniverses = []
+        for src_token in self.flashloan_tokens:
+            miniverses += self.get_route_miniverses(src_token)
+
+        for (miniverse, src_token, pstart), result in zip(miniverses, self.solve_miniverses(miniverses)):
+            if isinstance(result, Exception):
+                self.ConfigObj.logger.info(f"[market multi] {result}")
+                continue
+            profit_src, trade_instructions_df, trade_instructions_dic, trade_instructions = result
+            if trade_instructions_dic is None or len(trade_instructions_dic) < 2:
+                # Failed to converge
+                continue
+
+            # Get the cids
+            cids = [ti["cid"] for ti in trade_instructions_dic]
+
+            # Calculate the profit
+            profit = self.calculate_profit(src_token, profit_src, self.CCm, cids)
+            if str(profit) == "nan":
+                self.ConfigObj.logger.debug("profit is nan, skipping")
+                continue
+
+            # Handle candidates based on conditions
+            candidates += self.handle_candidates(
+                best_profit,
+                profit,
+                trade_instructions_df,
+                trade_instructions_dic,
+                src_token,
+                trade_instructions,
+            )
+
+            # Find the best operations
+            best_profit, ops = self.find_best_operations(
+                best_profit,
+                ops,
+                profit,
+                trade_instructions_df,
+                trade_instructions_dic,
+                src_token,
+                trade_instructions,
+            )
+
+        return candidates if self.result == self.AO_CANDIDATES else ops
+
+    def get_route_miniverses(self, src_token: str) -> List[Tuple[List[Any], str, Dict[str, float]]]:
+        """
+        Get the miniverses of the routes of the market-wide solution for a flashloan token
+
+        Parameters
+        ----------
+        src_token : str
+            The flashloan token
+
+        Returns
+        -------
+        List[Tuple[List[Any], str, Dict[str, float]]]
+            The ``(curves, src_token, pstart)`` of each route (see ``decompose_routes``), largest first;
+            the starting prices are the market-wide equilibrium prices (none if the market-wide solve
+            fails)
+        """
+        curves, pstart = get_market(self.CCm, src_token, self.MAX_HOPS, self.ConfigObj.CARBON_V1_FORKS)
+        if len(curves) < 2 or not self.is_dirty_miniverse(curves):
+            return []
+        try:
+            r = MargPOptimizer(CPCContainer(curves)).optimize(src_token, params=dict(pstart=pstart))
+            if r.is_error:
+                self.ConfigObj.logger.debug(f"[market multi] {src_token}: {r.errormsg}")
+                return []
+            if not -r.result > 0:
+                return []
+            prices = {**dict(zip(r.tokens_t, r.p_optimal_t)), src_token: 1.0}
+            routes = decompose_routes(
+                r.trade_instructions(r.TIF_DICTS), src_token, prices, self.MAX_ROUTES_PER_TOKEN, self.ROUTE_MIN_SHARE
+            )
+        except (ArithmeticError, np.linalg.LinAlgError, MargPOptimizer.OptimizationError) as e:
+            self.ConfigObj.logger.warning(f"[market multi] skipping {src_token}, the market-wide solve failed: {e!r}")
+            return []
+        self.ConfigObj.logger.debug(
+            f"[market_multi.get_route_miniverses] {len(curves)} curves, {len(pstart)} tokens, "
+            f"{r.n_iterations} iterations and {len(routes)} routes for {src_token}"
+        )
+        curves_by_cid = {c.cid: c for c in curves}
+        miniverses = []
+        for _, tkns, cids in routes:
+            miniverses.append((
+                [curves_by_cid[cid] for cid in cids], src_token, {tkn: prices[tkn] for tkn in tkns}
+            ))
+        return miniverses
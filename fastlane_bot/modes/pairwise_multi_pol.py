@@ -14,7 +14,6 @@ import pandas as pd
 import itertools
 from fastlane_bot.modes.base_pairwise import ArbitrageFinderPairwiseBase
 from fastlane_bot.tools.cpc import CPCContainer
-from fastlane_bot.tools.optimizer import MargPOptimizer, PairOptimizer
 from fastlane_bot.tools.cpc import T
 
 
@@ -30,25 +29,27 @@ class FindArbitrageMultiPairwisePol(ArbitrageFinderPairwiseBase):
         see base.py
         """
 
-        all_tokens, combos = self.get_combos_pol(self.CCm, self.flashloan_tokens)
         if self.result == self.AO_TOKENS:
-            return all_tokens, combos
+            return self.get_combos_pol(self.CCm, self.flashloan_tokens)
+        pair_curves = self.get_pair_curves([T.ETH, T.WETH], ["bancor_pol"])
+        pair_curves = [
+            (tkn0, tkn1, curves)
+            for tkn0, tkn1, curves in pair_curves
+            if tkn0 not in [T.ETH, T.WETH] and self.is_dirty_pair(f"{tkn0}/{tkn1}")
+        ]
 
         candidates = []
         self.ConfigObj.logger.debug(
-            f"\n ************ combos: {len(combos)} ************\n"
+            f"\n ************ combos: {len(pair_curves)} ************\n"
         )
 
-        for tkn0, tkn1 in combos:
-            r = None
-            CC = self.CCm.bypairs(f"{tkn0}/{tkn1}")
-            if len(CC) < 2:
-                continue
-            pol_curves = [x for x in CC.curves if x.params.exchange == "bancor_pol"]
+        miniverses = []
+        for tkn0, tkn1, curves in pair_curves:
+            pol_curves = [x for x in curves if x.params.exchange == "bancor_pol"]
             not_bancor_pol_curves = [
-                x for x in CC.curves if x.params.exchange not in ["bancor_pol"] + self.ConfigObj.CARBON_V1_FORKS
+                x for x in curves if x.params.exchange not in ["bancor_pol"] + self.ConfigObj.CARBON_V1_FORKS
             ]
-            carbon_curves = [x for x in CC.curves if x.params.exchange in self.ConfigObj.CARBON_V1_FORKS]
+            carbon_curves = [x for x in curves if x.params.exchange in self.ConfigObj.CARBON_V1_FORKS]
             curve_combos = [[curve] + pol_curves for curve in not_bancor_pol_curves]
 
             if len(carbon_curves) > 0:
@@ -63,57 +64,51 @@ class FindArbitrageMultiPairwisePol(ArbitrageFinderPairwiseBase):
                     curve_combos += [[curve] + base_direction_two for curve in pol_curves]
 
             for curve_combo in curve_combos:
-                src_token = tkn1
                 if len(curve_combo) < 2:
                     continue
+                # the PairOptimizer does not take starting prices
+                miniverses.append((curve_combo, tkn1, None))
 
-                try:
-                    (
-                        O,
-                        profit_src,
-                        r,
-                        trade_instructions_df,
-                    ) = self.run_main_flow(curves=curve_combo, src_token=src_token, tkn0=tkn0, tkn1=tkn1)
+        for (curve_combo, src_token, _), result in zip(miniverses, self.solve_miniverses(miniverses, pairwise=True)):
+            if isinstance(result, Exception):
+                continue
+            profit_src, trade_instructions_df, trade_instructions_dic, trade_instructions = result
 
-                    trade_instructions_dic = r.trade_instructions(O.TIF_DICTS)
-                    trade_instructions = r.trade_instructions()
+            if trade_instructions_dic is None:
+                continue
+            if len(trade_instructions_dic) < 2:
+                continue
 
-                except Exception:
-                    continue
-                if trade_instructions_dic is None:
-                    continue
-                if len(trade_instructions_dic) < 2:
-                    continue
-                # Get the cids
-                cids = [ti["cid"] for ti in trade_instructions_dic]
+            # Get the cids
+            cids = [ti["cid"] for ti in trade_instructions_dic]
 
-                # Calculate the profit
-                profit = self.calculate_profit(src_token, profit_src, self.CCm, cids)
+            # Calculate the profit
+            profit = self.calculate_profit(src_token, profit_src, self.CCm, cids)
 
-                if str(profit) == "nan":
-                    self.ConfigObj.logger.debug("profit is nan, skipping")
-                    continue
+            if str(profit) == "nan":
+                self.ConfigObj.logger.debug("profit is nan, skipping")
+                continue
+
+            # Handle candidates based on conditions
+            candidates += self.handle_candidates(
+                best_profit,
+                profit,
+                trade_instructions_df,
+                trade_instructions_dic,
+                src_token,
+                trade_instructions,
+            )
 
-                # Handle candidates based on conditions
-                candidates += self.handle_candidates(
-                    best_profit,
-                    profit,
-                    trade_instructions_df,
-                    trade_instructions_dic,
-                    src_token,
-                    trade_instructions,
-                )
-
-                # Find the best operations
-                best_profit, ops = self.find_best_operations(
-                    best_profit,
-                    ops,
-                    profit,
-                    trade_instructions_df,
-                    trade_instructions_dic,
-                    src_token,
-                    trade_instructions,
-                )
+            # Find the best operations
+            best_profit, ops = self.find_best_operations(
+                best_profit,
+                ops,
+                profit,
+                trade_instructions_df,
+                trade_instructions_dic,
+                src_token,
+                trade_instructions,
+            )
 
         return candidates if self.result == self.AO_CANDIDATES else ops
 
@@ -145,23 +140,6 @@ class FindArbitrageMultiPairwisePol(ArbitrageFinderPairwiseBase):
             and ("-0" in idx or "-1" in idx)
         ]
 
-    @staticmethod
-    def run_main_flow(
-        curves: List[Any], src_token: str, tkn0: str, tkn1: str
-    ) -> Tuple[Any, float, Any, pd.DataFrame]:
-        """
-        Run main flow to find arbitrage.
-        """
-        CC_cc = CPCContainer(curves)
-        O = PairOptimizer(CC_cc)
-        pstart = {
-            tkn0: CC_cc.bypairs(f"{tkn0}/{tkn1}")[0].p
-        }  # this intentionally selects the non_carbon curve
-        r = O.optimize(src_token, params=dict(pstart=pstart))
-        profit_src = -r.result
-        trade_instructions_df = r.trade_instructions(O.TIF_DFAGGR)
-        return O, profit_src, r, trade_instructions_df
-
     def process_wrong_direction_pools(
         self, curve_combo: List[Any], wrong_direction_cids: List[Hashable]
     ) -> [str]:
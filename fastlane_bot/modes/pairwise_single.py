@@ -13,8 +13,6 @@ from typing import List, Any, Tuple, Union
 from tqdm.contrib import itertools
 
 from fastlane_bot.modes.base_pairwise import ArbitrageFinderPairwiseBase
-from fastlane_bot.tools.cpc import CPCContainer
-from fastlane_bot.tools.optimizer import MargPOptimizer, PairOptimizer
 
 
 class FindArbitrageSinglePairwise(ArbitrageFinderPairwiseBase):
@@ -32,21 +30,18 @@ class FindArbitrageSinglePairwise(ArbitrageFinderPairwiseBase):
         if candidates is None:
             candidates = []
 
-        all_tokens, combos = self.get_combos(self.CCm, self.flashloan_tokens)
-
         if self.result == self.AO_TOKENS:
-            return all_tokens, combos
+            return self.get_combos(self.CCm, self.flashloan_tokens)
+        pair_curves = self.get_pair_curves(self.flashloan_tokens, [self.base_exchange])
+        pair_curves = [(tkn0, tkn1, curves) for tkn0, tkn1, curves in pair_curves if self.is_dirty_pair(f"{tkn0}/{tkn1}")]
 
-        for tkn0, tkn1 in combos:
-            r = None
-            CC = self.CCm.bypairs(f"{tkn0}/{tkn1}")
-            if len(CC) < 2:
-                continue
+        miniverses = []
+        for tkn0, tkn1, curves in pair_curves:
             base_exchange_curves = [
-                x for x in CC.curves if x.params.exchange == self.base_exchange
+                x for x in curves if x.params.exchange == self.base_exchange
             ]
             not_base_exchange_curves = [
-                x for x in CC.curves if x.params.exchange != self.base_exchange
+                x for x in curves if x.params.exchange != self.base_exchange
             ]
             self.ConfigObj.logger.debug(
                 f"base_exchange: {self.base_exchange}, base_exchange_curves: {len(base_exchange_curves)}, not_base_exchange_curves: {len(not_base_exchange_curves)}"
@@ -60,52 +55,46 @@ class FindArbitrageSinglePairwise(ArbitrageFinderPairwiseBase):
                 continue
 
             for curve_combo in curve_combos:
-                CC_cc = CPCContainer(curve_combo)
-                O = PairOptimizer(CC_cc)
-                src_token = tkn1
-                try:
-                    pstart = {tkn0: CC_cc.bypairs(f"{tkn0}/{tkn1}")[0].p}
-                    r = O.optimize(src_token, params=dict(pstart=pstart))
-                    profit_src = -r.result
-                    trade_instructions_df = r.trade_instructions(O.TIF_DFAGGR)
-                    trade_instructions_dic = r.trade_instructions(O.TIF_DICTS)
-                    trade_instructions = r.trade_instructions()
-                except Exception as e:
-                    print("[FindArbitrageSinglePairwise] Exception: ", e)
-                    continue
-                if trade_instructions_dic is None:
-                    continue
-                if len(trade_instructions_dic) < 2:
-                    continue
-                # Get the candidate ids
-                cids = [ti["cid"] for ti in trade_instructions_dic]
-
-                # Calculate the profit
-                profit = self.calculate_profit(src_token, profit_src, self.CCm, cids)
-
-                if str(profit) == "nan":
-                    self.ConfigObj.logger.debug("profit is nan, skipping")
-                    continue
-
-                # Handle candidates based on conditions
-                candidates += self.handle_candidates(
-                    best_profit,
-                    profit,
-                    trade_instructions_df,
-                    trade_instructions_dic,
-                    src_token,
-                    trade_instructions,
-                )
-
-                # Find the best operations
-                best_profit, ops = self.find_best_operations(
-                    best_profit,
-                    ops,
-                    profit,
-                    trade_instructions_df,
-                    trade_instructions_dic,
-                    src_token,
-                    trade_instructions,
-                )
+                miniverses.append((curve_combo, tkn1, {tkn0: curve_combo[0].p}))
+
+        for (curve_combo, src_token, _), result in zip(miniverses, self.solve_miniverses(miniverses, pairwise=True)):
+            if isinstance(result, Exception):
+                print("[FindArbitrageSinglePairwise] Exception: ", result)
+                continue
+            profit_src, trade_instructions_df, trade_instructions_dic, trade_instructions = result
+            if trade_instructions_dic is None:
+                continue
+            if len(trade_instructions_dic) < 2:
+                continue
+            # Get the candidate ids
+            cids = [ti["cid"] for ti in trade_instructions_dic]
+
+            # Calculate the profit
+            profit = self.calculate_profit(src_token, profit_src, self.CCm, cids)
+
+            if str(profit) == "nan":
+                self.ConfigObj.logger.debug("profit is nan, skipping")
+                continue
+
+            # Handle candidates based on conditions
+            candidates += self.handle_candidates(
+                best_profit,
+                profit,
+                trade_instructions_df,
+                trade_instructions_dic,
+                src_token,
+                trade_instructions,
+            )
+
+            # Find the best operations
+            best_profit, ops = self.find_best_operations(
+                best_profit,
+                ops,
+                profit,
+                trade_instructions_df,
+                trade_instructions_dic,
+                src_token,
+                trade_instructions,
+            )
 
         return candidates if self.result == self.AO_CANDIDATES else ops
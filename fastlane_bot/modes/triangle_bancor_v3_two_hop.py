@@ -49,25 +49,21 @@ class ArbitrageFinderTriangleBancor3TwoHop(ArbitrageFinderTriangleBase):
 
         # Get the miniverse combinations
         all_miniverses = self.get_miniverse_combos(combos)
+        all_miniverses = [(src_token, miniverse) for src_token, miniverse in all_miniverses if self.is_dirty_miniverse(miniverse)]
 
         if len(all_miniverses) == 0:
             return None
 
-        # Check each source token and miniverse combination
+        # Solve each source token and miniverse combination
+        miniverses = []
         for src_token, miniverse in all_miniverses:
-            r = None
-
-            try:
-                # Run main flow with the new set of curves
-                (
-                    profit_src,
-                    trade_instructions,
-                    trade_instructions_df,
-                    trade_instructions_dic,
-                ) = self.run_main_flow(miniverse, src_token)
-
-            except Exception:
+            CC_cc = CPCContainer(miniverse)
+            miniverses.append((miniverse, src_token, self.build_pstart(CC_cc, CC_cc.tokens(), src_token)))
+
+        for (miniverse, src_token, _), result in zip(miniverses, self.solve_miniverses(miniverses)):
+            if isinstance(result, Exception):
                 continue
+            profit_src, trade_instructions_df, trade_instructions_dic, trade_instructions = result
             if trade_instructions_dic is None:
                 continue
             if len(trade_instructions_dic) < 3:
@@ -12,7 +12,6 @@ from typing import List, Any, Tuple, Union
 
 from fastlane_bot.modes.base_triangle import ArbitrageFinderTriangleBase
 from fastlane_bot.tools.cpc import CPCContainer
-from fastlane_bot.tools.optimizer import MargPOptimizer
 
 
 class ArbitrageFinderTriangleMulti(ArbitrageFinderTriangleBase):
@@ -35,23 +34,24 @@ class ArbitrageFinderTriangleMulti(ArbitrageFinderTriangleBase):
 
         combos = self.get_combos(self.flashloan_tokens, self.CCm, arb_mode=self.arb_mode)
 
+        miniverses = []
         for src_token, miniverse in combos:
             try:
                 CC_cc = CPCContainer(miniverse)
-                O = MargPOptimizer(CC_cc)
                 pstart = self.build_pstart(CC_cc, CC_cc.tokens(), src_token)
-                r = O.optimize(src_token, params=dict(pstart=pstart))
-                trade_instructions_dic = r.trade_instructions(O.TIF_DICTS)
-                if trade_instructions_dic is None or len(trade_instructions_dic) < 3:
-                    # Failed to converge
-                    continue
-                trade_instructions_df = r.trade_instructions(O.TIF_DFAGGR)
-                trade_instructions = r.trade_instructions()
-
             except Exception as e:
                 self.ConfigObj.logger.info(f"[triangle multi] {e}")
                 continue
-            profit_src = -r.result
+            miniverses.append((miniverse, src_token, pstart))
+
+        for (miniverse, src_token, pstart), result in zip(miniverses, self.solve_miniverses(miniverses)):
+            if isinstance(result, Exception):
+                self.ConfigObj.logger.info(f"[triangle multi] {result}")
+                continue
+            profit_src, trade_instructions_df, trade_instructions_dic, trade_instructions = result
+            if trade_instructions_dic is None or len(trade_instructions_dic) < 3:
+                # Failed to converge
+                continue
 
             # Get the cids
             cids = [ti["cid"] for ti in trade_instructions_dic]
@@ -11,8 +11,6 @@ Licensed under MIT.
 from typing import Union, List, Tuple, Any
 
 from fastlane_bot.modes.base_triangle import ArbitrageFinderTriangleBase
-from fastlane_bot.tools.cpc import CPCContainer
-from fastlane_bot.tools.optimizer import MargPOptimizer
 
 
 class ArbitrageFinderTriangleSingle(ArbitrageFinderTriangleBase):
@@ -35,27 +33,12 @@ class ArbitrageFinderTriangleSingle(ArbitrageFinderTriangleBase):
             self.flashloan_tokens, self.CCm, arb_mode=self.arb_mode
         )
 
-        # Check each source token and miniverse combination
-        for src_token, miniverse in combos:
-            r = None
-
-            # Instantiate the container and optimizer objects
-            CC_cc = CPCContainer(miniverse)
-            O = MargPOptimizer(CC_cc)
-
-            try:
-                # Perform the optimization
-                r = O.margp_optimizer(src_token)
-
-                # Get the profit in the source token
-                profit_src = -r.result
-
-                # Get trade instructions in different formats
-                trade_instructions_df = r.trade_instructions(O.TIF_DFAGGR)
-                trade_instructions_dic = r.trade_instructions(O.TIF_DICTS)
-                trade_instructions = r.trade_instructions()
-            except Exception:
+        # Solve each source token and miniverse combination
+        miniverses = [(miniverse, src_token, None) for src_token, miniverse in combos]
+        for (miniverse, src_token, _), result in zip(miniverses, self.solve_miniverses(miniverses)):
+            if isinstance(result, Exception):
                 continue
+            profit_src, trade_instructions_df, trade_instructions_dic, trade_instructions = result
 
             if trade_instructions_dic is None:
                 continue
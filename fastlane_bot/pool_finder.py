@@ -26,7 +26,8 @@ class PoolFinder:
         flashloan_tokens: List[str],
         exchanges: List[Exchange],
         web3: Any,
-        multicall_address: str
+        multicall_address: str,
+        w3_async: Any = None,
     ):
         self._carbon_forks = carbon_forks
         self._uni_v3_forks = uni_v3_forks
@@ -37,6 +38,7 @@ class PoolFinder:
         self._exchanges = list(filter(lambda e: e.base_exchange_name in [UNISWAP_V2_NAME, UNISWAP_V3_NAME, SOLIDLY_V2_NAME], exchanges.values()))
         self._web3 = web3
         self._multicall_address = multicall_address
+        self._w3_async = w3_async
 
     def extract_univ3_fee_tiers(self, pools: List[Dict[str, Any]]):
         """
@@ -70,7 +72,7 @@ class PoolFinder:
         if not carbon_pairs:
             return [], [], []
         self.extract_univ3_fee_tiers(pools)  # TODO: these should be configured per exchange
-        if arb_mode in ["triangle", "multi_triangle"]:
+        if arb_mode in ["triangle", "multi_triangle", "multi_cycle", "multi_market"]:
             unsupported_pairs = PoolFinder._find_unsupported_triangles(self._flashloan_tokens, carbon_pairs=carbon_pairs, external_pairs=other_pairs)
         else:
             unsupported_pairs = PoolFinder._find_unsupported_pairs(self._flashloan_tokens, carbon_pairs=carbon_pairs, external_pairs=other_pairs)
@@ -79,25 +81,21 @@ class PoolFinder:
             config.logger.info(pair)
 
         pairs = [(tkn, token) for pair in unsupported_pairs for tkn in pair for token in self._flashloan_tokens]
-        chunk_size = 400
-        # Create the list of chunks
-        chunked_pairs = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
         result = defaultdict(dict)
 
         for exchange in self._exchanges:
-            for pair_chunk in chunked_pairs:
-                mc = MultiCaller(self._web3, self._multicall_address)
-                for pair in pair_chunk:
-                    if exchange.base_exchange_name in [UNISWAP_V2_NAME, SOLIDLY_V2_NAME]:
-                        mc.add_call(exchange.get_pool_func_call(pair[0], pair[1]))
-                    elif exchange.base_exchange_name == UNISWAP_V3_NAME:
-                        for fee in self._uni_v3_fee_tiers[exchange.exchange_name]:
-                            mc.add_call(exchange.get_pool_func_call(pair[0], pair[1], fee))
-                addresses = mc.run_calls()
-                result[exchange.base_exchange_name].update({
-                    self._web3.to_checksum_address(address): exchange.exchange_name
-                    for address in addresses if address not in [None, ZERO_ADDRESS]
-                })
+            mc = MultiCaller(self._web3, self._multicall_address, w3_async=self._w3_async)
+            for pair in pairs:
+                if exchange.base_exchange_name in [UNISWAP_V2_NAME, SOLIDLY_V2_NAME]:
+                    mc.add_call(exchange.get_pool_func_call(pair[0], pair[1]))
+                elif exchange.base_exchange_name == UNISWAP_V3_NAME:
+                    for fee in self._uni_v3_fee_tiers[exchange.exchange_name]:
+                        mc.add_call(exchange.get_pool_func_call(pair[0], pair[1], fee))
+            addresses = mc.run_calls()
+            result[exchange.base_exchange_name].update({
+                self._web3.to_checksum_address(address): exchange.exchange_name
+                for address in addresses if address not in [None, ZERO_ADDRESS]
+            })
 
         return result[UNISWAP_V2_NAME], result[UNISWAP_V3_NAME], result[SOLIDLY_V2_NAME]
 
@@ -0,0 +1,153 @@
+# ------------------------------------------------------------
+# Auto generated test file `test_077_MargPVectorized.py`
+# ------------------------------------------------------------
+# source file   = NBTest_077_MargPVectorized.py
+# test id       = 077
+# test comment  = MargPVectorized
+# ------------------------------------------------------------
+
+
+
+try:
+    from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer, T, CPCInverter, Pair
+    from fastlane_bot.tools.optimizer import MargPOptimizer
+    from fastlane_bot.testing import *
+
+except:
+    from tools.cpc import ConstantProductCurve as CPC, CPCContainer, T, CPCInverter, Pair
+    from tools.optimizer import MargPOptimizer
+    from tools.testing import *
+
+import random
+import time
+
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(CPC))
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(MargPOptimizer))
+
+#plt.style.use('seaborn-dark')
+plt.rcParams['figure.figsize'] = [12,6]
+
+
+#
+
+def make_miniverse(ncurves, ntokens=6, seed=42):
+    """random miniverse of uni v2, uni v3, carbon and asymmetric curves around consistent prices"""
+    rng = random.Random(seed)
+    tokens = [f"TKN{i}" for i in range(ntokens)]
+    prices = {t: 10**rng.uniform(-2, 3) for t in tokens}
+    curves = []
+    for i in range(ncurves):
+        tknb, tknq = (tokens[0], tokens[i % (ntokens-1) + 1]) if i < ntokens-1 else rng.sample(tokens, 2)
+        pair = f"{tknb}/{tknq}"
+        p = prices[tknb] / prices[tknq] * rng.uniform(0.97, 1.03)
+        kind = i % 4
+        if kind == 0:
+            x = rng.uniform(10, 1000) / prices[tknb]
+            curves += [CPC.from_px(p=p, x=x, pair=pair, cid=f"v2-{i}", fee=0.003)]
+        elif kind == 1:
+            L = rng.uniform(10, 1000) / m.sqrt(prices[tknb] * prices[tknq])
+            curves += [CPC.from_univ3(Pmarg=p, uniL=L, uniPa=p*0.9, uniPb=p*1.1, pair=pair,
+                                      cid=f"v3-{i}", fee=0.003, descr="")]
+        elif kind == 2:
+            y = rng.uniform(10, 1000) / prices[tknq]
+            curves += [CPC.from_carbon(yint=y, y=y, pa=p*1.02, pb=p*0.98, pair=pair, tkny=tknq,
+                                      cid=f"c-{i}", fee=0.002)]
+        else:
+            x = rng.uniform(10, 1000) / prices[tknb]
+            alpha = rng.uniform(0.3, 0.7)
+            curves += [CPC.from_xyal(x=x, y=x*p*alpha/(1-alpha), alpha=alpha, pair=pair, cid=f"a-{i}", fee=0.003)]
+    return CPCContainer(curves), tokens[0], prices
+
+def pstart_for(O, targettkn, prices):
+    """pstart dict in units of targettkn"""
+    return {t: prices[t] / prices[targettkn] for t in prices}
+
+
+# ------------------------------------------------------------
+# Test      077
+# File      test_077_MargPVectorized.py
+# Segment   Vectorized and looping target functions are identical
+# ------------------------------------------------------------
+def test_vectorized_and_looping_target_functions_are_identical():
+# ------------------------------------------------------------
+    
+    # +
+    def optimize(O, targettkn, pstart, vectorized):
+        """runs the optimizer, returning the relevant result fields or the exception"""
+        try:
+            r = O.optimize(targettkn, params=dict(pstart=pstart, vectorized=vectorized))
+        except Exception as e:
+            return repr(e)
+        return r.result, r.p_optimal_t, r.dtokens, r.n_iterations, str(r.errormsg)
+    
+    nconverged = 0
+    for ncurves, seed in [(8, 1), (8, 5), (20, 2), (20, 6), (50, 3), (120, 4)]:
+        CC, targettkn, prices = make_miniverse(ncurves, seed=seed)
+        O = MargPOptimizer(CC)
+        pstart = pstart_for(O, targettkn, prices)
+        fv = O.optimize(targettkn, result=O.MO_DTKNFROMPF, params=dict(pstart=pstart))
+        fl = O.optimize(targettkn, result=O.MO_DTKNFROMPF, params=dict(pstart=pstart, vectorized=False))
+        tokens_t = O.optimize(targettkn, result=O.MO_DEBUG, params=dict(pstart=pstart))["tokens_t"]
+        rng = random.Random(seed)
+        for _ in range(20):
+            plog10 = np.log10([pstart[t] for t in tokens_t]) + [rng.uniform(-0.05, 0.05) for t in tokens_t]
+            assert np.array_equal(fv(plog10), fl(plog10))
+            dv, rv = fv(plog10, asdct=True)
+            dl, rl = fl(plog10, asdct=True)
+            assert dv == dl
+            assert np.array_equal(rv, rl)
+        assert np.array_equal(O.J(fv, plog10), O.J(fl, plog10))
+    
+        rv, rl = (optimize(O, targettkn, pstart, v) for v in (True, False))
+        assert rv == rl
+        nconverged += rv[0] is not None
+        print(ncurves, rv)
+    assert nconverged >= 3
+    # -
+    
+
+# ------------------------------------------------------------
+# Test      077
+# File      test_077_MargPVectorized.py
+# Segment   Debug mode uses the looping target function
+# ------------------------------------------------------------
+def test_debug_mode_uses_the_looping_target_function():
+# ------------------------------------------------------------
+    
+    CC, targettkn, prices = make_miniverse(8)
+    O = MargPOptimizer(CC)
+    assert O.optimize(targettkn, result=O.MO_DTKNFROMPF).__doc__.strip().startswith("vectorized")
+    assert not O.optimize(targettkn, result=O.MO_DTKNFROMPF, params=dict(debug2=True)).__doc__.strip().startswith("vectorized")
+    assert not O.optimize(targettkn, result=O.MO_DTKNFROMPF, params=dict(vectorized=False)).__doc__.strip().startswith("vectorized")
+    
+
+# ------------------------------------------------------------
+# Test      077
+# File      test_077_MargPVectorized.py
+# Segment   Benchmark iteration cost on miniverses with 50 to 500 curves
+# ------------------------------------------------------------
+def test_benchmark_iteration_cost_on_miniverses_with_50_to_500_curves():
+# ------------------------------------------------------------
+    
+    # +
+    def time_f(f, x, n):
+        """average time per call of f(x) over n calls"""
+        start = time.perf_counter()
+        for _ in range(n):
+            f(x)
+        return (time.perf_counter() - start) / n
+    
+    print(f"{'curves':>6} {'loop [ms]':>10} {'vec [ms]':>10} {'speedup':>8}")
+    for ncurves in [50, 100, 200, 500]:
+        CC, targettkn, prices = make_miniverse(ncurves, ntokens=10)
+        O = MargPOptimizer(CC)
+        pstart = pstart_for(O, targettkn, prices)
+        fv = O.optimize(targettkn, result=O.MO_DTKNFROMPF, params=dict(pstart=pstart))
+        fl = O.optimize(targettkn, result=O.MO_DTKNFROMPF, params=dict(pstart=pstart, vectorized=False))
+        tokens_t = O.optimize(targettkn, result=O.MO_DEBUG, params=dict(pstart=pstart))["tokens_t"]
+        plog10 = np.log10([pstart[t] for t in tokens_t])
+        # one Newton iteration = one evaluation plus the finite-difference Jacobian
+        tl = time_f(lambda x: (fl(x), O.J(fl, x)), plog10, 5)
+        tv = time_f(lambda x: (fv(x), O.J(fv, x)), plog10, 5)
+        print(f"{ncurves:6} {tl*1000:10.2f} {tv*1000:10.2f} {tl/tv:7.1f}x")
+        assert tv < tl
\ No newline at end of file
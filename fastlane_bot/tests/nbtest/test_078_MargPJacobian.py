@@ -0,0 +1,151 @@
+# ------------------------------------------------------------
+# Auto generated test file `test_078_MargPJacobian.py`
+# ------------------------------------------------------------
+# source file   = NBTest_078_MargPJacobian.py
+# test id       = 078
+# test comment  = MargPJacobian
+# ------------------------------------------------------------
+
+
+
+try:
+    from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer, T, CPCInverter, Pair
+    from fastlane_bot.tools.optimizer import MargPOptimizer
+    from fastlane_bot.testing import *
+
+except:
+    from tools.cpc import ConstantProductCurve as CPC, CPCContainer, T, CPCInverter, Pair
+    from tools.optimizer import MargPOptimizer
+    from tools.testing import *
+
+import random
+import time
+
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(CPC))
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(MargPOptimizer))
+
+#plt.style.use('seaborn-dark')
+plt.rcParams['figure.figsize'] = [12,6]
+
+
+#
+
+def make_miniverse(ncurves, ntokens=6, seed=42):
+    """random miniverse of uni v2, uni v3, carbon and asymmetric curves around consistent prices"""
+    rng = random.Random(seed)
+    tokens = [f"TKN{i}" for i in range(ntokens)]
+    prices = {t: 10**rng.uniform(-2, 3) for t in tokens}
+    curves = []
+    for i in range(ncurves):
+        tknb, tknq = (tokens[0], tokens[i % (ntokens-1) + 1]) if i < ntokens-1 else rng.sample(tokens, 2)
+        pair = f"{tknb}/{tknq}"
+        p = prices[tknb] / prices[tknq] * rng.uniform(0.97, 1.03)
+        kind = i % 4
+        if kind == 0:
+            x = rng.uniform(10, 1000) / prices[tknb]
+            curves += [CPC.from_px(p=p, x=x, pair=pair, cid=f"v2-{i}", fee=0.003)]
+        elif kind == 1:
+            L = rng.uniform(10, 1000) / m.sqrt(prices[tknb] * prices[tknq])
+            curves += [CPC.from_univ3(Pmarg=p, uniL=L, uniPa=p*0.9, uniPb=p*1.1, pair=pair,
+                                      cid=f"v3-{i}", fee=0.003, descr="")]
+        elif kind == 2:
+            y = rng.uniform(10, 1000) / prices[tknq]
+            curves += [CPC.from_carbon(yint=y, y=y, pa=p*1.02, pb=p*0.98, pair=pair, tkny=tknq,
+                                      cid=f"c-{i}", fee=0.002)]
+        else:
+            x = rng.uniform(10, 1000) / prices[tknb]
+            alpha = rng.uniform(0.3, 0.7)
+            curves += [CPC.from_xyal(x=x, y=x*p*alpha/(1-alpha), alpha=alpha, pair=pair, cid=f"a-{i}", fee=0.003)]
+    return CPCContainer(curves), tokens[0], prices
+
+def pstart_for(targettkn, prices):
+    """pstart dict in units of targettkn"""
+    return {t: prices[t] / prices[targettkn] for t in prices}
+
+
+# ------------------------------------------------------------
+# Test      078
+# File      test_078_MargPJacobian.py
+# Segment   Analytic Jacobian matches finite differences
+# ------------------------------------------------------------
+def test_analytic_jacobian_matches_finite_differences():
+# ------------------------------------------------------------
+    
+    # +
+    for ncurves, seed in [(6, 1), (20, 2), (50, 3), (120, 4)]:
+        CC, targettkn, prices = make_miniverse(ncurves, seed=seed)
+        O = MargPOptimizer(CC)
+        pstart = pstart_for(targettkn, prices)
+        d = O.optimize(targettkn, result=O.MO_DEBUG, params=dict(pstart=pstart))
+        f, jacobian_f, tokens_t = d["dtknfromp_f"], d["jacobian_f"], d["tokens_t"]
+        rng = random.Random(seed)
+        for _ in range(10):
+            plog10 = np.log10([pstart[t] for t in tokens_t]) + [rng.uniform(-0.01, 0.01) for t in tokens_t]
+            Ja = jacobian_f(plog10)
+            Jn = O.J(f, plog10, eps=1e-7)
+            assert Ja.shape == (len(tokens_t), len(tokens_t))
+            # the two only differ where a finite difference step crosses a range boundary
+            assert np.abs(Ja - Jn).max() <= 1e-3 * np.abs(Jn).max()
+    # -
+    
+
+# ------------------------------------------------------------
+# Test      078
+# File      test_078_MargPJacobian.py
+# Segment   Numeric Jacobian
+# ------------------------------------------------------------
+def test_numeric_jacobian():
+# ------------------------------------------------------------
+    
+    # +
+    CC, targettkn, prices = make_miniverse(20, seed=2)
+    O = MargPOptimizer(CC)
+    pstart = pstart_for(targettkn, prices)
+    d = O.optimize(targettkn, result=O.MO_DEBUG, params=dict(pstart=pstart, jacobian=O.JAC_NUMERIC))
+    plog10 = np.log10([pstart[t] for t in d["tokens_t"]])
+    assert np.array_equal(d["jacobian_f"](plog10), O.J(d["dtknfromp_f"], plog10))
+    
+    r = O.optimize(targettkn, params=dict(pstart=pstart, jacobian="meh"))
+    assert r.is_error
+    assert isinstance(r.errormsg, O.ParameterError)
+    assert raises(O.optimize, targettkn, params=dict(pstart=pstart, jacobian="meh", raiseonerror=True))
+    
+    # -
+    
+
+# ------------------------------------------------------------
+# Test      078
+# File      test_078_MargPJacobian.py
+# Segment   Optimizer results and timing
+# ------------------------------------------------------------
+def test_optimizer_results_and_timing():
+# ------------------------------------------------------------
+    
+    # +
+    ta = tn = 0
+    nboth = 0
+    for seed in range(60):
+        CC, targettkn, prices = make_miniverse([6, 20, 50][seed % 3], ntokens=4 + seed % 4, seed=seed)
+        O = MargPOptimizer(CC)
+        pstart = pstart_for(targettkn, prices)
+        try:
+            start = time.perf_counter()
+            ra = O.optimize(targettkn, params=dict(pstart=pstart))
+            ta += time.perf_counter() - start
+            start = time.perf_counter()
+            rn = O.optimize(targettkn, params=dict(pstart=pstart, jacobian=O.JAC_NUMERIC))
+            tn += time.perf_counter() - start
+        except ZeroDivisionError:
+            # a price went to zero; happens with either Jacobian
+            assert raises(O.optimize, targettkn, params=dict(pstart=pstart, jacobian=O.JAC_NUMERIC))
+            continue
+        assert (ra.result is None) == (rn.result is None)
+        if ra.result is None:
+            continue
+        nboth += 1
+        # both converge to the same optimum, the analytic one with residuals at least as small
+        assert abs(ra.result - rn.result) < 1e-6 * max(1, abs(rn.result))
+        assert max(abs(x) for x in ra.dtokens_t) <= max(abs(x) for x in rn.dtokens_t) + 1e-9
+    print(f"{nboth} converged; analytic: {ta:.3f}s, numeric: {tn:.3f}s, speedup: {tn/ta:.1f}x")
+    assert nboth >= 30
+    assert ta < tn
\ No newline at end of file
@@ -0,0 +1,150 @@
+# ------------------------------------------------------------
+# Auto generated test file `test_081_PairOptimizerBatch.py`
+# ------------------------------------------------------------
+# source file   = NBTest_081_PairOptimizerBatch.py
+# test id       = 081
+# test comment  = PairOptimizerBatch
+# ------------------------------------------------------------
+
+
+
+
+try:
+    from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer, T
+    from fastlane_bot.tools.optimizer import PairOptimizer
+    from fastlane_bot.testing import *
+
+except:
+    from tools.cpc import ConstantProductCurve as CPC, CPCContainer, T
+    from tools.optimizer import PairOptimizer
+    from tools.testing import *
+
+import random
+import time
+
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(CPC))
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(PairOptimizer))
+
+#plt.style.use('seaborn-dark')
+plt.rcParams['figure.figsize'] = [12,6]
+
+
+#
+
+def make_problem(i, rng):
+    """a random single pair problem with curves of all kinds"""
+    p = 10**rng.uniform(-2, 3)
+    pair = "TKNB/TKNQ" if rng.random() < 0.5 else "TKNQ/TKNB"
+    curves = []
+    for j in range(rng.randint(2, 8)):
+        pj = p * rng.uniform(0.97, 1.03)
+        kind = j % 4
+        if kind == 0:
+            curves += [CPC.from_px(p=pj, x=rng.uniform(10, 1000), pair=pair, cid=f"{i}-v2-{j}", fee=0.003)]
+        elif kind == 1:
+            curves += [CPC.from_univ3(Pmarg=pj, uniL=rng.uniform(10, 1000), uniPa=pj*0.9, uniPb=pj*1.1,
+                                      pair=pair, cid=f"{i}-v3-{j}", fee=0.003, descr="")]
+        elif kind == 2:
+            tkny = pair.split("/")[rng.randint(0, 1)]
+            pc = pj if tkny == pair.split("/")[1] else 1/pj
+            curves += [CPC.from_carbon(yint=100, y=100, pa=pc*1.02, pb=pc*0.98, pair=pair, tkny=tkny,
+                                       cid=f"{i}-c-{j}", fee=0.002)]
+        else:
+            curves += [CPC.from_xyal(x=rng.uniform(10, 1000), y=rng.uniform(10, 1000)*pj, alpha=0.2,
+                                     pair=pair, cid=f"{i}-a-{j}", fee=0.003)]
+    return curves, rng.choice(["TKNB", "TKNQ"])
+
+def optimize_scalar(problems):
+    """the results of optimize, problem by problem"""
+    results = []
+    for curves, targettkn in problems:
+        try:
+            results += [PairOptimizer(CPCContainer(curves)).optimize(targettkn)]
+        except Exception as e:
+            results += [e]
+    return results
+
+def assert_same_results(scalar, batch):
+    assert len(scalar) == len(batch)
+    for s, b in zip(scalar, batch):
+        if isinstance(s, Exception):
+            assert type(s) == type(b) and str(s) == str(b)
+            continue
+        assert s.result == b.result
+        assert s.p_optimal_t == b.p_optimal_t
+        assert s.trade_instructions(PairOptimizer.TIF_DICTS) == b.trade_instructions(PairOptimizer.TIF_DICTS)
+
+
+# ------------------------------------------------------------
+# Test      081
+# File      test_081_PairOptimizerBatch.py
+# Segment   Equivalence
+# ------------------------------------------------------------
+def test_equivalence():
+# ------------------------------------------------------------
+    
+    # +
+    rng = random.Random(1)
+    problems = [make_problem(i, rng) for i in range(200)]
+    scalar = optimize_scalar(problems)
+    batch = PairOptimizer.optimize_batch(problems)
+    assert_same_results(scalar, batch)
+    assert sum(isinstance(r, Exception) for r in batch) < len(batch) / 10
+    assert all(r.method == "margp-pair" for r in batch if not isinstance(r, Exception))
+    # -
+    
+    # +
+    # containers are accepted as well as lists of curves
+    rng = random.Random(2)
+    problems = [make_problem(i, rng) for i in range(20)]
+    batch = PairOptimizer.optimize_batch([(CPCContainer(curves), tkn) for curves, tkn in problems])
+    assert_same_results(optimize_scalar(problems), batch)
+    assert PairOptimizer.optimize_batch([]) == []
+    # -
+    
+
+# ------------------------------------------------------------
+# Test      081
+# File      test_081_PairOptimizerBatch.py
+# Segment   Errors and fallbacks
+# ------------------------------------------------------------
+def test_errors_and_fallbacks():
+# ------------------------------------------------------------
+    
+    # +
+    rng = random.Random(3)
+    curves, tkn = make_problem(0, rng)
+    mixed = curves + [CPC.from_px(p=10, x=100, pair="TKNB/TKNX", cid="x", fee=0.003)]
+    levered = [
+        CPC.from_pkpp(p=10, k=10000, p_min=5, p_max=20, pair="TKNB/TKNQ", cid="lev", fee=0.003),
+        CPC.from_px(p=10.5, x=100, pair="TKNB/TKNQ", cid="v2", fee=0.003),
+    ]
+    problems = [(curves, tkn), (mixed, "TKNB"), (curves, "TKNX"), (levered, "TKNQ"), (curves, tkn)]
+    batch = PairOptimizer.optimize_batch(problems)
+    assert_same_results(optimize_scalar(problems), batch)
+    assert [isinstance(r, Exception) for r in batch] == [False, True, True, False, False]
+    assert batch[0].result == batch[4].result
+    # -
+    
+
+# ------------------------------------------------------------
+# Test      081
+# File      test_081_PairOptimizerBatch.py
+# Segment   Benchmark
+# ------------------------------------------------------------
+def test_benchmark():
+# ------------------------------------------------------------
+    
+    # +
+    rng = random.Random(4)
+    problems = [make_problem(i, rng) for i in range(1000)]
+    start = time.time()
+    scalar = optimize_scalar(problems)
+    t_scalar = time.time()-start
+    start = time.time()
+    batch = PairOptimizer.optimize_batch(problems)
+    t_batch = time.time()-start
+    print(f"{len(problems)} problems: {t_scalar:.3f}s (scalar), {t_batch:.3f}s (batch)")
+    assert_same_results(scalar, batch)
+    assert t_batch < t_scalar
+    # -
\ No newline at end of file
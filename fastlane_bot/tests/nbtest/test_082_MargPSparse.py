@@ -0,0 +1,170 @@
+# ------------------------------------------------------------
+# Auto generated test file `test_082_MargPSparse.py`
+# ------------------------------------------------------------
+# source file   = NBTest_082_MargPSparse.py
+# test id       = 082
+# test comment  = MargPSparse
+# ------------------------------------------------------------
+
+
+
+
+try:
+    from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer, T
+    from fastlane_bot.tools.optimizer import MargPOptimizer
+    from fastlane_bot.tools.optimizer import margpoptimizer
+    from fastlane_bot.testing import *
+
+except:
+    from tools.cpc import ConstantProductCurve as CPC, CPCContainer, T
+    from tools.optimizer import MargPOptimizer
+    from tools.optimizer import margpoptimizer
+    from tools.testing import *
+
+import random
+import time
+import warnings
+import scipy.sparse as sp
+
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(CPC))
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(MargPOptimizer))
+
+#plt.style.use('seaborn-dark')
+plt.rcParams['figure.figsize'] = [12,6]
+
+
+#
+
+def make_market(ntokens, nhubs=5, noise=0.02, seed=7):
+    """a market in which most tokens trade against a few hubs, as on chain"""
+    rng = random.Random(seed)
+    tokens = ["WETH"] + [f"TKN{i}" for i in range(ntokens - 1)]
+    prices = {tkn: 10**rng.uniform(-2, 2) for tkn in tokens}
+    curves = []
+    for tkn in tokens[nhubs:]:
+        tknqs = rng.sample(tokens[:nhubs], rng.randint(1, 3))
+        if rng.random() < 0.2:
+            tknqs += [rng.choice([t for t in tokens if not t in tknqs + [tkn]])]
+        for tknq in tknqs:
+            p = prices[tkn] / prices[tknq] * (1 + rng.uniform(-noise, noise))
+            curves += [CPC.from_px(p=p, x=rng.uniform(100, 1000), pair=f"{tkn}/{tknq}", cid=f"c{len(curves)}", fee=0.003)]
+    for i, tknb in enumerate(tokens[:nhubs]):
+        for tknq in tokens[:i]:
+            curves += [CPC.from_px(p=prices[tknb] / prices[tknq], x=1e5, pair=f"{tknb}/{tknq}", cid=f"h{len(curves)}", fee=0.0005)]
+    pstart = {tkn: p / prices["WETH"] for tkn, p in prices.items()}
+    return CPCContainer(curves), pstart
+
+
+# ------------------------------------------------------------
+# Test      082
+# File      test_082_MargPSparse.py
+# Segment   Jacobian
+# ------------------------------------------------------------
+def test_jacobian():
+# ------------------------------------------------------------
+    
+    # +
+    CC, pstart = make_market(100)
+    O = MargPOptimizer(CC)
+    d = O.optimize("WETH", result=O.MO_DEBUG, params=dict(pstart=pstart, sparse=True))
+    plog10 = np.log10([pstart[t] for t in d["tokens_t"]])
+    J = d["jacobian_f"](plog10)
+    assert sp.issparse(J)
+    assert J.shape == (99, 99)
+    assert J.nnz < 99 * 99 / 10
+    
+    d = O.optimize("WETH", result=O.MO_DEBUG, params=dict(pstart=pstart, sparse=False))
+    J_dense = d["jacobian_f"](plog10)
+    assert isinstance(J_dense, np.ndarray)
+    assert np.allclose(J.toarray(), J_dense, rtol=1e-12, atol=0)
+    # -
+    
+
+# ------------------------------------------------------------
+# Test      082
+# File      test_082_MargPSparse.py
+# Segment   Equivalence
+# ------------------------------------------------------------
+def test_equivalence():
+# ------------------------------------------------------------
+    
+    # +
+    CC, pstart = make_market(300)
+    r_dense = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart, sparse=False))
+    r_sparse = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart, sparse=True))
+    r_auto = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart))
+    assert not r_dense.is_error and not r_sparse.is_error
+    assert r_sparse.result < 0
+    assert iseq(r_sparse.result, r_dense.result)
+    assert r_sparse.n_iterations == r_dense.n_iterations
+    assert np.allclose(r_sparse.p_optimal_t, r_dense.p_optimal_t, rtol=1e-9)
+    assert r_auto.result == r_sparse.result
+    # -
+    
+    # +
+    # below MOSPARSEMIN tokens the default is the dense Jacobian
+    CC, pstart = make_market(50)
+    r_dense = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart, sparse=False))
+    r_auto = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart))
+    assert 50 < MargPOptimizer.MOSPARSEMIN
+    assert r_auto.result == r_dense.result
+    # -
+    
+    # +
+    # a token whose only curve is out of range makes the Jacobian singular
+    CC, pstart = make_market(300)
+    carbon = CPC.from_carbon(pa=1.1, pb=1, yint=100, y=0, tkny="WETH", pair="TKNX/WETH", cid="carbon", fee=0.002)
+    CC = CPCContainer(CC.curves + [carbon])
+    pstart = {**pstart, "TKNX": 2}
+    r_dense = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart, sparse=False))
+    r_sparse = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart, sparse=True))
+    assert not r_dense.is_error and not r_sparse.is_error
+    assert iseq(r_sparse.result, r_dense.result)
+    # -
+    
+
+# ------------------------------------------------------------
+# Test      082
+# File      test_082_MargPSparse.py
+# Segment   Without scipy
+# ------------------------------------------------------------
+def test_without_scipy():
+# ------------------------------------------------------------
+    
+    # +
+    # from MOSPARSEMIN tokens the dense Jacobian is used with a warning, and asking for the sparse one is an error
+    CC, pstart = make_market(300)
+    margpoptimizer.sp = None
+    try:
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            r_auto = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart))
+        r_sparse = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart, sparse=True))
+    finally:
+        margpoptimizer.sp = sp
+    assert not r_auto.is_error
+    assert [str(x.message) for x in w if "scipy" in str(x.message)]
+    assert r_sparse.is_error
+    # -
+    
+
+# ------------------------------------------------------------
+# Test      082
+# File      test_082_MargPSparse.py
+# Segment   Benchmark
+# ------------------------------------------------------------
+def test_benchmark():
+# ------------------------------------------------------------
+    
+    # +
+    CC, pstart = make_market(2000)
+    start = time.time()
+    r_dense = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart, sparse=False))
+    t_dense = time.time()-start
+    start = time.time()
+    r_sparse = MargPOptimizer(CC).optimize("WETH", params=dict(pstart=pstart, sparse=True))
+    t_sparse = time.time()-start
+    print(f"{len(CC)} curves, {len(r_sparse.tokens_t)+1} tokens: {t_dense:.3f}s (dense), {t_sparse:.3f}s (sparse)")
+    assert iseq(r_sparse.result, r_dense.result)
+    assert t_sparse < t_dense
+    # -
\ No newline at end of file
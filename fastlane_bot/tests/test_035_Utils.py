@@ -46,6 +46,9 @@ class MockManager():
 
     def exchange_name_from_event(self, event):
         return 'uniswap_v2'
+
+    def mark_pool_touched(self, event):
+        pass
 mocked_mgr = MockManager()
 
 event1 = Event.from_dict({'args': {'reserve0': 100, 'reserve1': 100}, 'event': 'Sync', 'address': '0xabc', 'blockNumber': 5, 'transactionIndex': 0, 'logIndex': 0, 'transactionHash': '', 'blockHash': ''})
@@ -0,0 +1,102 @@
+import pickle
+
+from fastlane_bot.events.managers.store import PoolStore
+
+
+def make_pools():
+    return [
+        {"cid": "c1", "exchange_name": "uniswap_v2", "address": "0xA", "tkn0_address": "T0", "tkn1_address": "T1", "strategy_id": None},
+        {"cid": "c2", "exchange_name": "uniswap_v2", "address": "0xB", "tkn0_address": "T1", "tkn1_address": "T2", "strategy_id": None},
+        {"cid": "c3", "exchange_name": "carbon_v1", "address": "0xC", "tkn0_address": "T0", "tkn1_address": "T1", "strategy_id": 7},
+        {"cid": "c4", "exchange_name": "carbon_v1", "address": "0xC", "tkn0_address": "T1", "tkn1_address": "T0", "strategy_id": 8},
+    ]
+
+
+def test_lookups():
+    store = PoolStore(make_pools())
+    assert store.get_by_cid("c2")["address"] == "0xB"
+    assert store.get_by_cid("missing") is None
+    assert store.get("uniswap_v2", "address", "0xA")["cid"] == "c1"
+    assert store.get("carbon_v1", "address", "0xA") is None
+    assert [p["cid"] for p in store.get_all("carbon_v1", "address", "0xC")] == ["c3", "c4"]
+    assert store.get("carbon_v1", "strategy_id", 8)["cid"] == "c4"
+    assert store.get("carbon_v1", "cid", "c3")["cid"] == "c3"
+    assert store.get("uniswap_v2", "cid", "c3") is None
+    assert store.get("uniswap_v2", "tkn1_address", "T2")["cid"] == "c2"
+    assert [p["cid"] for p in store.get_by_pair("carbon_v1", "T1", "T0")] == ["c4"]
+    assert [p["cid"] for p in store.get_by_exchange("uniswap_v2")] == ["c1", "c2"]
+
+
+def test_indexes_follow_list_mutations():
+    store = PoolStore(make_pools())
+    new = {"cid": "c5", "exchange_name": "uniswap_v2", "address": "0xD", "tkn0_address": "T2", "tkn1_address": "T3"}
+    store.append(new)
+    assert store.get_by_cid("c5") is new
+    assert store.position(new) == 4
+
+    replacement = dict(store[0], address="0xE")
+    store[0] = replacement
+    assert store.get("uniswap_v2", "address", "0xA") is None
+    assert store.get("uniswap_v2", "address", "0xE") is replacement
+
+    del store[1]
+    assert store.get_by_cid("c2") is None
+    assert store.position(new) == 3
+
+    store.remove_cids(["c3", "c4"])
+    assert store.get_by_exchange("carbon_v1") == []
+    assert [p["cid"] for p in store] == ["c1", "c5"]
+
+    store.pop()
+    assert store.get_by_cid("c5") is None
+    store.clear()
+    assert store.get_by_cid("c1") is None
+
+
+def test_update_pool_and_replace_by_cid():
+    store = PoolStore(make_pools())
+    pool = store.get_by_cid("c1")
+    store.update_pool(pool, {"address": "0xF", "tkn0_balance": 10})
+    assert store.get("uniswap_v2", "address", "0xA") is None
+    assert store.get("uniswap_v2", "address", "0xF") is pool
+    assert pool["tkn0_balance"] == 10
+
+    new_info = dict(store.get_by_cid("c2"), tkn0_balance=5)
+    assert store.replace_by_cid(new_info)
+    assert store[1] is new_info
+    assert store.get_by_cid("c2") is new_info
+    assert not store.replace_by_cid({"cid": "missing"})
+
+
+def test_duplicates_and_pickle():
+    pools = make_pools()
+    store = PoolStore(pools + [pools[0]])
+    store.pop()
+    assert store.get_by_cid("c1") is pools[0]
+
+    restored = pickle.loads(pickle.dumps(store))
+    assert isinstance(restored, PoolStore)
+    assert restored.get_by_cid("c4")["strategy_id"] == 8
+    assert len(restored) == len(store)
+
+
+def test_remove_cids_only_unindexes_the_removed_pools():
+    pools = make_pools() + [
+        {"cid": f"u{i}", "exchange_name": "uniswap_v2", "address": f"0x{i}", "tkn0_address": "T0", "tkn1_address": "T3"}
+        for i in range(5)
+    ]
+    store = PoolStore(pools)
+    reindexed = []
+    store._index = lambda pool, _index=store._index: reindexed.append(pool) or _index(pool)
+    store.remove_cids(["c2", "u4", "missing"])
+    assert reindexed == []
+    assert sorted(p["cid"] for p in store) == sorted(p["cid"] for p in pools if p["cid"] not in ["c2", "u4"])
+    assert store.get_by_cid("c2") is None and store.get_by_cid("u4") is None
+    assert all(store.position(p) == i for i, p in enumerate(store))
+    assert [p["cid"] for p in store.get_by_pair("uniswap_v2", "T0", "T3")] == ["u0", "u1", "u2", "u3"]
+
+    # duplicates are removed as well
+    store.append(store[0])
+    store.remove_cids([store[0]["cid"]])
+    assert store.get_by_cid(pools[0]["cid"]) is None
+    assert all(p["cid"] != pools[0]["cid"] for p in store)
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+from fastlane_bot.helpers import CurveCache
+from fastlane_bot.tools.cpc import ConstantProductCurve as CPC
+
+
+class MockDB:
+    def __init__(self, state):
+        self.state = state
+        self.created = []
+
+    def create_pool_and_tokens(self, idx, record):
+        self.created.append(record["cid"])
+        return SimpleNamespace(id=idx, **record)
+
+
+def make_state():
+    return [
+        {"cid": "a", "pair_name": "ETH/USDC", "tkn0_balance": 1, "tkn1_balance": 2000, "last_updated_block": 1},
+        {"cid": "b", "pair_name": "WBTC/USDC", "tkn0_balance": 1, "tkn1_balance": 30000, "last_updated_block": 1},
+        {"cid": "c", "pair_name": "WBTC/ETH", "tkn0_balance": 1, "tkn1_balance": 15, "last_updated_block": 1},
+    ]
+
+
+def to_curves(pool):
+    tknx, tkny = pool.pair_name.split("/")
+    return [CPC.from_xy(x=pool.tkn0_balance, y=pool.tkn1_balance, pair=f"{tkny}/{tknx}", cid=pool.cid)]
+
+
+def test_only_changed_pools_are_rebuilt():
+    db = MockDB(make_state())
+    cache = CurveCache()
+    cc = cache.update(db, to_curves)
+    assert len(cc) == 3
+    assert sorted(db.created) == ["a", "b", "c"]
+    assert set(db.pool_data) == {"a", "b", "c"}
+
+    db.created = []
+    db.state[1] = dict(db.state[1], tkn1_balance=31000, last_updated_block=2)
+    cc2 = cache.update(db, to_curves)
+    assert cc2 is cc
+    assert db.created == ["b"]
+    assert cache.last_num_updated == 1
+    assert [c.cid for c in cc] == ["a", "b", "c"]
+    assert cc.bycid("b").y == 31000
+    assert len(cc.curves_by_primary_pair["WBTC/USDC"]) == 1
+
+
+def test_removed_pools_and_full_rebuild():
+    db = MockDB(make_state())
+    cache = CurveCache(full_rebuild_period=3)
+    cc = cache.update(db, to_curves)
+
+    del db.state[0]
+    cache.update(db, to_curves)
+    assert cache.last_num_removed == 1
+    assert [c.cid for c in cc] == ["b", "c"]
+    assert cc.bycid("a") is None
+    assert "ETH/USDC" not in cc.curves_by_primary_pair
+    assert set(cc.curveix_by_curve.values()) == {0, 1}
+
+    db.created = []
+    cc3 = cache.update(db, to_curves)
+    assert cc3 is not cc
+    assert sorted(db.created) == ["b", "c"]
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import threading
+import time
+
+import aiohttp
+import requests
+from web3 import AsyncWeb3, Web3
+
+from fastlane_bot.config.batch_provider import (
+    AsyncBatchHTTPProvider,
+    BatchHTTPProvider,
+    max_batch_size_for,
+)
+
+
+def respond(data, max_batch_size):
+    """answers eth_getBalance with the number in the address, and rejects batches larger than `max_batch_size`"""
+    requests = json.loads(data)
+    if isinstance(requests, list) and len(requests) > max_batch_size:
+        return json.dumps({"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch too large"}})
+    responses = [
+        {"jsonrpc": "2.0", "id": request["id"], "result": hex(int(request["params"][0], 16))}
+        for request in (requests if isinstance(requests, list) else [requests])
+    ]
+    return json.dumps(responses if isinstance(requests, list) else responses[0])
+
+
+def http_error(data, max_batch_size):
+    """whether a node that rejects batches larger than `max_batch_size` at the HTTP level rejects `data`"""
+    requests = json.loads(data)
+    return isinstance(requests, list) and len(requests) > max_batch_size
+
+
+class FakeBatchHTTPProvider(BatchHTTPProvider):
+    def __init__(self, node_max_batch_size=1000, http_max_batch_size=1000, **kwargs):
+        super().__init__("http://localhost:8545", **kwargs)
+        self.node_max_batch_size = node_max_batch_size
+        self.http_max_batch_size = http_max_batch_size
+        self.sizes = []
+        self.post_lock = threading.Lock()
+
+    def _post(self, data):
+        with self.post_lock:
+            requests_ = json.loads(data)
+            self.sizes.append(len(requests_) if isinstance(requests_, list) else 1)
+        time.sleep(0.01)
+        if http_error(data, self.http_max_batch_size):
+            raise requests.HTTPError("413 Client Error: Payload Too Large")
+        return respond(data, self.node_max_batch_size).encode()
+
+
+class FakeAsyncBatchHTTPProvider(AsyncBatchHTTPProvider):
+    def __init__(self, node_max_batch_size=1000, http_max_batch_size=1000, **kwargs):
+        super().__init__("http://localhost:8545", **kwargs)
+        self.node_max_batch_size = node_max_batch_size
+        self.http_max_batch_size = http_max_batch_size
+        self.sizes = []
+
+    async def _post(self, data):
+        requests_ = json.loads(data)
+        self.sizes.append(len(requests_) if isinstance(requests_, list) else 1)
+        await asyncio.sleep(0.001)
+        if http_error(data, self.http_max_batch_size):
+            request_info = aiohttp.RequestInfo(self.endpoint_uri, "POST", {}, self.endpoint_uri)
+            raise aiohttp.ClientResponseError(request_info, (), status=413, message="Payload Too Large")
+        return respond(data, self.node_max_batch_size).encode()
+
+
+def address(i):
+    return Web3.to_checksum_address(f"0x{i:040x}")
+
+
+def test_max_batch_size_for():
+    assert max_batch_size_for("https://eth-mainnet.alchemyapi.io/v2/") == 100
+    assert max_batch_size_for("https://eth-mainnet.g.alchemy.com/v2/") == 1000
+
+
+def test_concurrent_requests_are_batched():
+    provider = FakeBatchHTTPProvider(batch_window=0.05, max_batch_size=16)
+    w3 = Web3(provider)
+    results = {}
+
+    def get_balance(i):
+        results[i] = w3.eth.get_balance(address(i))
+
+    threads = [threading.Thread(target=get_balance, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {i: i for i in range(40)}
+    assert sum(provider.sizes) == 40
+    assert max(provider.sizes) == 16
+    assert len(provider.sizes) < 40
+
+    # a single caller gets a plain request, sent without waiting for the batch window
+    provider.sizes.clear()
+    provider.batch_window = 1
+    start = time.monotonic()
+    assert w3.eth.get_balance(address(7)) == 7
+    assert time.monotonic() - start < 0.5
+    assert provider.sizes == [1]
+
+
+def test_rejected_batches_are_resent_one_by_one():
+    provider = FakeBatchHTTPProvider(node_max_batch_size=4, batch_window=0.05, max_batch_size=16)
+    w3 = Web3(provider)
+    results = {}
+    threads = [
+        threading.Thread(target=lambda i: results.update({i: w3.eth.get_balance(address(i))}), args=(i,))
+        for i in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {i: i for i in range(10)}
+    assert provider.stats.rejected >= 1
+    assert provider.max_batch_size <= 8
+
+    # also if the node rejects them with an HTTP error
+    provider = FakeBatchHTTPProvider(http_max_batch_size=4, batch_window=0.05, max_batch_size=16)
+    w3 = Web3(provider)
+    results = {}
+    threads = [
+        threading.Thread(target=lambda i: results.update({i: w3.eth.get_balance(address(i))}), args=(i,))
+        for i in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {i: i for i in range(10)}
+    assert provider.stats.rejected >= 1
+
+
+def test_async_requests_are_batched():
+    provider = FakeAsyncBatchHTTPProvider(max_batch_size=16)
+    w3 = AsyncWeb3(provider)
+
+    async def get_balances():
+        return await asyncio.gather(*[w3.eth.get_balance(address(i)) for i in range(40)])
+
+    assert asyncio.get_event_loop().run_until_complete(get_balances()) == list(range(40))
+    assert provider.sizes == [16, 16, 8]
+    assert provider.stats.requests == 40
+
+    provider = FakeAsyncBatchHTTPProvider(node_max_batch_size=4, max_batch_size=16)
+    w3 = AsyncWeb3(provider)
+    assert asyncio.get_event_loop().run_until_complete(
+        asyncio.gather(*[w3.eth.get_balance(address(i)) for i in range(10)])
+    ) == list(range(10))
+    assert provider.sizes == [10] + [1] * 10
+    assert provider.max_batch_size == 8
+
+    provider = FakeAsyncBatchHTTPProvider(http_max_batch_size=4, max_batch_size=16)
+    w3 = AsyncWeb3(provider)
+    assert asyncio.get_event_loop().run_until_complete(
+        asyncio.gather(*[w3.eth.get_balance(address(i)) for i in range(10)])
+    ) == list(range(10))
+    assert provider.sizes == [10] + [1] * 10
+    assert provider.stats.rejected == 1
@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+
+from eth_abi import decode, encode
+from web3 import Web3
+
+from fastlane_bot.config.multicaller import MultiCaller
+from fastlane_bot.data.abi import ERC20_ABI
+
+BALANCE_OF = Web3.keccak(text="balanceOf(address)")[:4]
+TOKEN = Web3().eth.contract(address=Web3.to_checksum_address("0x" + "11" * 20), abi=ERC20_ABI)
+REVERT = 13  # balanceOf reverts for this account
+BOMB = 42  # a chunk with a balanceOf call for this account fails as a whole (eg out of gas)
+
+
+def account(i):
+    return Web3.to_checksum_address(f"0x{i:040x}")
+
+
+class FakeMulticall:
+    """executes balanceOf calls, which return the number in the account, and fails chunks of more than
+    `max_calls` calls or with a call for the BOMB account"""
+
+    def __init__(self, max_calls, is_async):
+        self.max_calls = max_calls
+        self.is_async = is_async
+        self.chunk_sizes = []
+        self.functions = SimpleNamespace(tryAggregate=self.try_aggregate)
+
+    def execute(self, calls):
+        self.chunk_sizes.append(len(calls))
+        accounts = [decode(["address"], Web3.to_bytes(hexstr=call["callData"])[4:])[0] for call in calls]
+        if len(calls) > self.max_calls or account(BOMB).lower() in accounts:
+            raise ValueError({"code": -32000, "message": "out of gas"})
+        return [
+            (int(acc, 16) != REVERT, encode(["uint256"], [int(acc, 16)]) if int(acc, 16) != REVERT else b"")
+            for acc in accounts
+        ]
+
+    def try_aggregate(self, require_success, calls):
+        async def async_call(block_identifier):
+            return self.execute(calls)
+
+        def call(block_identifier):
+            return self.execute(calls)
+
+        return SimpleNamespace(call=async_call if self.is_async else call)
+
+
+def fake_web3(multicall):
+    return SimpleNamespace(eth=SimpleNamespace(contract=lambda abi, address: multicall))
+
+
+def run(n, max_calls=1000, is_async=False, **kwargs):
+    multicall = FakeMulticall(max_calls, is_async)
+    w3 = fake_web3(FakeMulticall(max_calls, False))
+    mc = MultiCaller(w3, "0x", w3_async=fake_web3(multicall) if is_async else None, **kwargs)
+    if not is_async:
+        multicall = mc.multicall_contract
+    for i in range(n):
+        mc.add_call(TOKEN.functions.balanceOf(account(i)))
+    return mc, multicall, mc.run_calls()
+
+
+def expected(n):
+    return [None if i in (REVERT, BOMB) else i for i in range(n)]
+
+
+def test_chunks_follow_the_gas_and_calldata_limits():
+    mc, _, _ = run(10, max_gas=100_000)
+    assert mc.chunks() == [(0, 2), (2, 4), (4, 6), (6, 8), (8, 10)]
+    mc, _, _ = run(10, max_calldata_bytes=3 * (128 + 36))
+    assert mc.chunks() == [(0, 3), (3, 6), (6, 9), (9, 10)]
+
+    mc, _, _ = run(0)
+    mc.add_call(TOKEN.functions.balanceOf(account(1)), gas=1_000_000_000)
+    mc.add_call(TOKEN.functions.balanceOf(account(2)))
+    assert mc.chunks() == [(0, 1), (1, 2)]
+
+
+def test_failing_chunks_are_bisected():
+    for is_async in [False, True]:
+        mc, multicall, results = run(100, is_async=is_async)
+        assert results == expected(100)
+        assert mc.stats.failed == 1
+        assert mc.stats.splits == 7
+
+        mc, multicall, results = run(40, max_calls=8, is_async=is_async)
+        assert results == expected(40)
+        assert max(size for size in multicall.chunk_sizes if size <= 8) == 5
+
+
+def test_async_chunks_are_sent_concurrently():
+    mc, multicall, results = run(100, is_async=True, max_gas=10 * 50_000)
+    assert results == expected(100)
+    assert len(mc.chunks()) == 10
+    assert mc.stats.chunks == 10 + 2 * mc.stats.splits
+
+
+def test_outputs_are_decoded_by_output_types(monkeypatch):
+    from fastlane_bot.config import multicaller
+
+    mc, _, _ = run(0)
+    for i in range(3):
+        mc.add_call(TOKEN.functions.balanceOf(account(i)))
+        mc.add_call(TOKEN.functions.symbol())
+        mc.add_call(TOKEN.functions.decimals())
+    encoded_data = []
+    for i in range(3):
+        encoded_data += [
+            (True, encode(["uint256"], [i])),
+            (i != 1, encode(["string"], [f"TKN{i}"]) if i != 1 else b""),
+            (True, encode(["uint8"], [18])),
+        ]
+    calls = []
+    monkeypatch.setattr(multicaller, "decode", lambda types, data: calls.append(len(types)) or decode(types, data))
+    assert mc._decode_all(encoded_data) == [0, "TKN0", 18, 1, None, 18, 2, "TKN2", 18]
+    # one pass for each group of static outputs, one per output for the dynamic ones
+    assert sorted(calls) == [1, 1, 3, 3]
+
+    # a group that does not decode as a whole (an uint8 out of range) is decoded one by one
+    encoded_data[5] = (True, encode(["uint256"], [256]))
+    calls.clear()
+    assert mc._decode_all(encoded_data) == [0, "TKN0", 18, 1, None, None, 2, "TKN2", 18]
+    assert mc.stats.failed == 1
@@ -0,0 +1,125 @@
+import logging
+from types import SimpleNamespace
+
+from eth_abi import encode
+from hexbytes import HexBytes
+from web3 import Web3
+
+from fastlane_bot.data.abi import BALANCER_VAULT_ABI
+from fastlane_bot.events import multicall_utils
+from fastlane_bot.events.exchanges.balancer import Balancer
+from fastlane_bot.events.interfaces.subscription import Subscription
+from fastlane_bot.events.interfaces.event import Event
+from fastlane_bot.events.managers.manager import Manager
+from fastlane_bot.events.utils import filter_latest_events
+
+
+POOL_ID = "0x" + "ab" * 32
+CONFIG = SimpleNamespace(
+    logger=logging.getLogger(__name__),
+    MULTICALLABLE_EXCHANGES=["bancor_v3", "bancor_pol", "balancer"],
+    BANCOR_V3_NETWORK_INFO_ADDRESS="0xinfo",
+    BANCOR_POL_ADDRESS="0xpol",
+    BALANCER_VAULT_ADDRESS="0xvault",
+)
+POOL_DATA = [
+    dict(exchange_name="bancor_v3", tkn0_address="0xBNT", tkn1_address="0xLINK"),
+    dict(exchange_name="bancor_v3", tkn0_address="0xBNT", tkn1_address="0xUSDC"),
+    dict(exchange_name="bancor_pol", tkn0_address="0xLINK", tkn1_address="0xETH"),
+    dict(exchange_name="bancor_pol", tkn0_address="0xDAI", tkn1_address="0xETH"),
+    dict(exchange_name="balancer", anchor=POOL_ID),
+    dict(exchange_name="balancer", anchor="0x" + "cd" * 32),
+    dict(exchange_name="uniswap_v2", tkn0_address="0xLINK", tkn1_address="0xUSDC"),
+]
+
+
+def make_event(name, **args):
+    return Event(args=args, event=name, log_index=0, transaction_index=0, transaction_hash=None, address="0x",
+                 block_hash=None, block_number=1)
+
+
+def make_manager():
+    mgr = Manager.__new__(Manager)
+    mgr.cfg = CONFIG
+    mgr.pool_data = [dict(pool) for pool in POOL_DATA]
+    mgr.exchanges = {ex: None for ex in CONFIG.MULTICALLABLE_EXCHANGES}
+    mgr.pool_contracts = {"bancor_v3": {"0xinfo": "info"}, "bancor_pol": {"0xpol": "pol"},
+                          "balancer": {"0xvault": "vault"}}
+    mgr.touched_pools = {}
+    mgr.all_pools_touched = True
+    return mgr
+
+
+def refreshed_rows(mgr, monkeypatch, touched_pools):
+    calls = {}
+    monkeypatch.setattr(
+        multicall_utils, "multicall_helper",
+        lambda exchange, rows, contract, mgr, block: calls.update({exchange: sorted(rows)}),
+    )
+    multicall_utils.multicall_every_iteration(current_block=1, mgr=mgr, touched_pools=touched_pools)
+    return calls
+
+
+def test_manager_tracks_touched_pools():
+    mgr = make_manager()
+    mgr.mark_pool_touched(make_event("TradingLiquidityUpdated", pool="0xLINK", token="0xBNT"))
+    assert mgr.pop_touched_pools() is None
+    assert mgr.pop_touched_pools() == {}
+
+    mgr.mark_pool_touched(make_event("TradingLiquidityUpdated", pool="0xLINK", token="0xBNT"))
+    mgr.mark_pool_touched(make_event("TokenTraded", token="0xDAI", amount=1))
+    mgr.mark_pool_touched(make_event("Swap", poolId=POOL_ID.upper().replace("0X", "0x")))
+    mgr.mark_pool_touched(make_event("Swap", sender="0x", amount0In=1))  # a Uniswap V2 swap
+    mgr.mark_pool_touched(make_event("Sync", reserve0=1, reserve1=2))
+    assert mgr.pop_touched_pools() == {"tkn1_address": {"0xlink"}, "tkn0_address": {"0xdai"}, "anchor": {POOL_ID}}
+
+
+def test_only_touched_pools_are_refreshed(monkeypatch):
+    mgr = make_manager()
+    assert refreshed_rows(mgr, monkeypatch, None) == {"bancor_v3": [0, 1], "bancor_pol": [2, 3], "balancer": [4, 5]}
+
+    touched_pools = {"tkn1_address": {"0xlink"}, "anchor": {POOL_ID}}
+    assert refreshed_rows(mgr, monkeypatch, touched_pools) == {"bancor_v3": [0], "balancer": [4]}
+    assert refreshed_rows(mgr, monkeypatch, {}) == {}
+
+
+def test_latest_event_filtering_marks_touched_pools():
+    mgr = make_manager()
+    mgr.pop_touched_pools()
+    mgr.exchange_name_from_event = lambda event: None
+    mgr.pool_type_from_exchange_name = lambda exchange_name: None
+    mgr.exchanges = {}
+    # the Balancer events are not kept as latest events, but their pools are refreshed
+    assert filter_latest_events(mgr, [make_event("PoolBalanceChanged", poolId=POOL_ID)]) == []
+    assert mgr.pop_touched_pools() == {"anchor": {POOL_ID}}
+
+
+def test_balancer_pool_ids_of_parsed_logs_match_the_anchors(monkeypatch):
+    vault = Web3().eth.contract(abi=BALANCER_VAULT_ABI, address=Web3.to_checksum_address("0x" + "ba" * 20))
+    subscription = Subscription(vault.events.Swap)
+    token_in, token_out = "0x" + "11" * 20, "0x" + "22" * 20
+    log = dict(
+        address=vault.address,
+        topics=[HexBytes(subscription.topic), HexBytes(POOL_ID), HexBytes("0x" + "00" * 12 + token_in[2:]),
+                HexBytes("0x" + "00" * 12 + token_out[2:])],
+        data=HexBytes(encode(["uint256", "uint256"], [10, 20])),
+        blockNumber=1, logIndex=0, transactionIndex=0, transactionHash=HexBytes("0x" + "00" * 32),
+        blockHash=HexBytes("0x" + "00" * 32),
+    )
+    event = subscription.parse_log(log)
+    assert event.event == "Swap"
+
+    mgr = make_manager()
+    mgr.pool_data[4]["anchor"] = POOL_ID.upper().replace("0X", "0x")
+    mgr.pop_touched_pools()
+    mgr.mark_pool_touched(event)
+    touched_pools = mgr.pop_touched_pools()
+    assert touched_pools == {"anchor": {POOL_ID}}
+    assert refreshed_rows(mgr, monkeypatch, touched_pools) == {"balancer": [4]}
+
+
+def test_balancer_subscribes_to_the_vault_events_only_for_touched_pools():
+    w3 = Web3()
+    assert Balancer().get_subscriptions(w3) == []
+    subscriptions = Balancer(multicall_touched_only=True).get_subscriptions(w3)
+    assert [s._event.event_name for s in subscriptions] == ["Swap", "PoolBalanceChanged", "PoolBalanceManaged"]
@@ -0,0 +1,122 @@
+import math
+import os
+
+import pytest
+
+from fastlane_bot.events.snapshot import PoolSnapshot
+
+
+def make_pools(n):
+    return [
+        dict(
+            cid=f"0x{i:064x}",
+            exchange_name="uniswap_v2" if i % 2 else "carbon_v1",
+            last_updated_block=100,
+            fee=0.003,
+            tkn0_decimals=18,
+            reserve0=i * 10 ** 20,  # beyond 64 bits
+            liquidity=float("nan") if i % 3 else 1.5,
+            tick=None,
+            is_active=True,
+            **({"strategy_id": i, "y_0": "mixed"} if i % 2 == 0 else {"strategy_id": str(i)}),
+        )
+        for i in range(n)
+    ]
+
+
+def make_tables(n):
+    return dict(
+        pools=make_pools(n),
+        tokens=[dict(address="0xTKN", symbol="TKN", decimals=18)],
+        uniswap_v2_event_mappings=[],
+    )
+
+
+def assert_same_records(records, expected):
+    assert len(records) == len(expected)
+    for record, expected_record in zip(records, expected):
+        assert set(record) == set(expected_record)
+        for key, value in expected_record.items():
+            if isinstance(value, float) and math.isnan(value):
+                assert math.isnan(record[key])
+            else:
+                assert record[key] == value and type(record[key]) is type(value), (key, record[key], value)
+
+
+def test_round_trip(tmp_path):
+    tables = make_tables(10)
+    PoolSnapshot(str(tmp_path)).write(tables, 123, dict(blockchain="ethereum", exchanges=["carbon_v1"]))
+
+    block, read_tables, info = PoolSnapshot(str(tmp_path)).read()
+    assert block == 123
+    assert info == dict(blockchain="ethereum", exchanges=["carbon_v1"])
+    assert set(read_tables) == set(tables)
+    for table in tables:
+        assert_same_records(read_tables[table], tables[table])
+
+    assert PoolSnapshot(str(tmp_path / "empty")).read() is None
+
+
+def test_changed_rows_are_patched_in_place(tmp_path):
+    snapshot = PoolSnapshot(str(tmp_path))
+    tables = make_tables(10)
+    snapshot.write(tables, 100)
+    generation = os.listdir(tmp_path)
+
+    tables["pools"][3].update(last_updated_block=101, liquidity=2.5, tick=-7, reserve0=1)
+    tables["pools"][4]["y_0"] = "changed"
+    del tables["pools"][5]["liquidity"]
+    snapshot.write(tables, 101)
+    assert (snapshot.stats.rewrites, snapshot.stats.patches, snapshot.stats.patched_rows) == (1, 1, 3)
+    assert os.listdir(tmp_path) == generation
+
+    # a resumed snapshot keeps patching the same generation
+    resumed = PoolSnapshot(str(tmp_path))
+    block, read_tables, _ = resumed.read()
+    assert block == 101
+    assert_same_records(read_tables["pools"], tables["pools"])
+    resumed.write(read_tables, 102)
+    assert (resumed.stats.rewrites, resumed.stats.patches, resumed.stats.patched_rows) == (0, 1, 0)
+
+
+def test_new_generation_when_the_rows_do_not_fit(tmp_path):
+    snapshot = PoolSnapshot(str(tmp_path))
+    tables = make_tables(10)
+    snapshot.write(tables, 100)
+
+    for change in [
+        lambda: tables["pools"].append(make_pools(11)[-1]),  # a new row
+        lambda: tables["pools"][0].update(new_column=1),  # a new column
+        lambda: tables["pools"][0].update(tkn0_decimals="18"),  # a different type
+        lambda: tables["pools"][0].update(exchange_name="x" * 100),  # a longer string
+    ]:
+        change()
+        snapshot.write(tables, 101)
+        _, read_tables, _ = PoolSnapshot(str(tmp_path)).read()
+        assert_same_records(read_tables["pools"], tables["pools"])
+
+    assert (snapshot.stats.rewrites, snapshot.stats.patches) == (5, 0)
+    assert sorted(os.listdir(tmp_path)) == ["CURRENT", "gen-000004"]
+
+
+def test_snapshot_torn_by_a_crash_is_discarded(tmp_path, monkeypatch):
+    snapshot = PoolSnapshot(str(tmp_path))
+    tables = make_tables(10)
+    snapshot.write(tables, 100)
+
+    # a crash after the rows are patched but before the meta is updated
+    def crash(generation, meta):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(snapshot, "_write_meta", crash)
+    tables["pools"][3]["last_updated_block"] = 101
+    with pytest.raises(KeyboardInterrupt):
+        snapshot.write(tables, 101)
+    resumed = PoolSnapshot(str(tmp_path))
+    assert resumed.read() is None
+
+    # the next write starts a new generation
+    resumed.write(tables, 102)
+    assert resumed.stats.rewrites == 1
+    block, read_tables, _ = PoolSnapshot(str(tmp_path)).read()
+    assert block == 102
+    assert_same_records(read_tables["pools"], tables["pools"])
@@ -0,0 +1,80 @@
+import copy
+import os
+
+import pytest
+
+from fastlane_bot.events.journal import PoolJournal
+
+
+def make_pools(n):
+    return [
+        dict(cid=f"0x{i:02x}", exchange_name="uniswap_v2", last_updated_block=100, reserve0=i * 10 ** 20, fee=0.003)
+        for i in range(n)
+    ]
+
+
+def by_cid(pools):
+    return {pool["cid"]: pool for pool in pools}
+
+
+def test_only_changed_pools_are_journaled(tmp_path):
+    journal = PoolJournal(str(tmp_path), compaction_period=100)
+    pools = make_pools(10)
+    history = {}
+
+    journal.write(pools, 100, dict(blockchain="ethereum"))
+    history[100] = copy.deepcopy(pools)
+
+    pools[3].update(last_updated_block=101, reserve0=1)
+    journal.write(pools, 101)
+    history[101] = copy.deepcopy(pools)
+
+    journal.write(pools, 102)  # nothing changed
+    history[102] = copy.deepcopy(pools)
+
+    pools.append(dict(cid="0xff", exchange_name="carbon_v1", last_updated_block=103))
+    del pools[0]
+    del pools[4]["fee"]
+    journal.write(pools, 103)
+    history[103] = copy.deepcopy(pools)
+
+    assert (journal.stats.checkpoints, journal.stats.blocks, journal.stats.records) == (1, 3, 4)
+    with open(tmp_path / "segment-000000000100.jsonl") as f:
+        assert len(f.readlines()) == 3 + 4
+
+    for block, pools_at_block in history.items():
+        read_block, read_pools, info = PoolJournal(str(tmp_path)).read(block)
+        assert read_block == block
+        assert by_cid(read_pools) == by_cid(pools_at_block)
+        assert info == dict(blockchain="ethereum")
+    assert PoolJournal(str(tmp_path)).read()[0] == 103
+    assert PoolJournal(str(tmp_path)).read(99) is None
+
+    with pytest.raises(ValueError):
+        journal.write(pools, 103)
+
+
+def test_compaction_and_restarts(tmp_path):
+    journal = PoolJournal(str(tmp_path), compaction_period=2, max_checkpoints=2)
+    pools = make_pools(3)
+    for block in range(100, 107):
+        pools[block % 3]["last_updated_block"] = block
+        journal.write(pools, block)
+    assert journal.checkpoints() == [104, 106]
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("segment")) == [
+        "segment-000000000104.jsonl", "segment-000000000106.jsonl"
+    ]
+    assert PoolJournal(str(tmp_path)).read(105)[1][105 % 3]["last_updated_block"] == 105
+
+    # a partially written block is not replayed
+    with open(tmp_path / "segment-000000000106.jsonl", "a") as f:
+        f.write('{"block": 107, "cid": "0x00", "set": {"last_updated_block": 107}}\n{"block": 107, "cid": "0x01"')
+    block, pools, _ = PoolJournal(str(tmp_path)).read(200)
+    assert block == 106 and pools[0]["last_updated_block"] == 105
+
+    # a restarted journal starts with a checkpoint, and drops the checkpoints of later blocks
+    restarted = PoolJournal(str(tmp_path), compaction_period=2)
+    block, pools, _ = restarted.read()
+    restarted.write(pools, 105)
+    assert restarted.checkpoints() == [104, 105]
+    assert by_cid(restarted.read()[1]) == by_cid(pools)
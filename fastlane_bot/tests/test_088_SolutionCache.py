@@ -0,0 +1,80 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from fastlane_bot.helpers import SolutionCache
+from fastlane_bot.modes.pairwise_multi import FindArbitrageMultiPairwise
+from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer
+
+
+CONFIG = SimpleNamespace(
+    logger=logging.getLogger(__name__),
+    CARBON_V1_FORKS=["carbon_v1"],
+)
+
+
+def make_miniverse(name, p0, p1, block=100):
+    curves = [
+        CPC.from_px(p=p, x=1000, pair=f"{name}/WETH", cid=f"{name}-{i}", fee=0.003,
+                    params=dict(exchange="uniswap_v2", blocklud=block))
+        for i, p in enumerate([p0, p1])
+    ]
+    return curves, "WETH", {name: p0}
+
+
+def make_finder(n_jobs=1, solution_cache=None):
+    finder = FindArbitrageMultiPairwise(flashloan_tokens=["WETH"], CCm=CPCContainer(), ConfigObj=CONFIG,
+                                        n_jobs=n_jobs, solution_cache=solution_cache, prefilter=False)
+    finder.PARALLEL_MIN_MINIVERSES = 1
+    return finder
+
+
+def test_unchanged_miniverses_without_arb_are_skipped():
+    cache = SolutionCache()
+    finder = make_finder(solution_cache=cache)
+    miniverses = [make_miniverse("NOARB", 10, 10), make_miniverse("ARB", 10, 10.5)]
+
+    first = finder.solve_miniverses(miniverses)
+    assert first[0][0] == 0 and first[1][0] > 0
+    assert (cache.stats.skipped, cache.stats.warm_started, cache.stats.cold_started) == (0, 0, 2)
+    cold_iterations = cache.stats.iterations
+
+    second = finder.solve_miniverses(miniverses)
+    assert second[0] == SolutionCache.NO_ARB_RESULT
+    assert second[1][0] == pytest.approx(first[1][0])
+    assert (cache.stats.skipped, cache.stats.warm_started, cache.stats.cold_started) == (1, 1, 2)
+    assert cache.stats.iterations - cold_iterations < cold_iterations
+
+    # a miniverse is solved again once one of its curves changed
+    changed = [make_miniverse("NOARB", 10, 10.5, block=101), make_miniverse("ARB", 10, 10.5)]
+    third = finder.solve_miniverses(changed)
+    assert third[0][0] == pytest.approx(first[1][0])
+    assert cache.stats.skipped == 1 and cache.stats.warm_started == 3
+
+
+def test_cached_solves_match_uncached_ones():
+    miniverses = [make_miniverse(f"TKN{i}", 10, 10 + i / 10) for i in range(6)]
+    expected = make_finder().solve_miniverses(miniverses)
+
+    cache = SolutionCache()
+    for n_jobs in [1, 2, 2]:
+        results = make_finder(n_jobs, cache).solve_miniverses(miniverses)
+        for result, expected_result in zip(results, expected):
+            if result == SolutionCache.NO_ARB_RESULT:
+                assert expected_result[0] == 0
+            else:
+                assert result[0] == pytest.approx(expected_result[0])
+                assert [ti["cid"] for ti in result[2]] == [ti["cid"] for ti in expected_result[2]]
+    assert cache.stats.skipped == 2
+
+
+def test_exceptions_are_not_cached_and_entries_are_bounded():
+    cache = SolutionCache(max_entries=2)
+    finder = make_finder(solution_cache=cache)
+    curves, _, _ = make_miniverse("TKN", 10, 10)
+    assert isinstance(finder.solve_miniverses([(curves, "MEH", {"TKN": 10})], pairwise=True)[0], Exception)
+    assert cache.entries == {}
+
+    finder.solve_miniverses([make_miniverse(f"TKN{i}", 10, 10) for i in range(3)])
+    assert [key[2] for key in cache.entries] == [("TKN1-0", "TKN1-1"), ("TKN2-0", "TKN2-1")]
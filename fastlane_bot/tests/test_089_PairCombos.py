@@ -0,0 +1,85 @@
+import logging
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from fastlane_bot.modes.pairwise_multi import FindArbitrageMultiPairwise
+from fastlane_bot.modes.pairwise_multi_all import FindArbitrageMultiPairwiseAll
+from fastlane_bot.modes.pairwise_multi_pol import FindArbitrageMultiPairwisePol
+from fastlane_bot.modes.pairwise_single import FindArbitrageSinglePairwise
+from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer, T
+
+
+CONFIG = SimpleNamespace(
+    logger=logging.getLogger(__name__),
+    CARBON_V1_FORKS=["carbon_v1"],
+)
+EXCHANGES = ["uniswap_v2", "uniswap_v3", "bancor_pol", "carbon_v1"]
+FLASHLOAN_TOKENS = [T.WETH, T.USDC]
+
+
+def make_curves(ncurves=400, ntokens=12, seed=42):
+    rng = random.Random(seed)
+    tokens = [f"TKN{i:02d}" for i in range(ntokens)] + FLASHLOAN_TOKENS
+    curves = []
+    for i in range(ncurves):
+        tknb, tknq = rng.sample(tokens, 2)
+        curves += [CPC.from_xy(x=rng.uniform(1, 100), y=rng.uniform(1, 100), pair=f"{tknb}/{tknq}", cid=f"cid{i}",
+                               fee=0.003, params=dict(exchange=rng.choice(EXCHANGES)))]
+    return CPCContainer(curves)
+
+
+def reference_pair_curves(CCm, combos, base_exchanges):
+    """the combos with their curves, as found by scanning all combos"""
+    result = []
+    for tkn0, tkn1 in combos:
+        curves = CCm.bypairs(f"{tkn0}/{tkn1}").curves
+        if len(curves) < 2:
+            continue
+        if base_exchanges is not None and not any(c.params.exchange in base_exchanges for c in curves):
+            continue
+        result.append((tkn0, tkn1, curves))
+    return result
+
+
+def cids(pair_curves):
+    return sorted((tkn0, tkn1, tuple(c.cid for c in curves)) for tkn0, tkn1, curves in pair_curves)
+
+
+@pytest.mark.parametrize("finder_class, base_exchanges", [
+    (FindArbitrageMultiPairwise, ["carbon_v1"]),
+    (FindArbitrageMultiPairwiseAll, None),
+    (FindArbitrageSinglePairwise, ["carbon_v1"]),
+])
+def test_pair_curves_match_the_combo_scan(finder_class, base_exchanges):
+    CCm = make_curves()
+    finder = finder_class(flashloan_tokens=FLASHLOAN_TOKENS, CCm=CCm, ConfigObj=CONFIG)
+    _, combos = finder.get_combos(CCm, FLASHLOAN_TOKENS)
+    expected = reference_pair_curves(CCm, combos, base_exchanges)
+    assert len(expected) > 10
+    assert cids(finder.get_pair_curves(FLASHLOAN_TOKENS, base_exchanges)) == cids(expected)
+
+
+def test_pol_pair_curves_match_the_combo_scan():
+    CCm = make_curves()
+    finder = FindArbitrageMultiPairwisePol(flashloan_tokens=FLASHLOAN_TOKENS, CCm=CCm, ConfigObj=CONFIG)
+    _, combos = finder.get_combos_pol(CCm, FLASHLOAN_TOKENS)
+    # T.ETH and T.WETH are the same address, so the combo scan yields every combo twice
+    expected = reference_pair_curves(CCm, dict.fromkeys(combos), ["bancor_pol"])
+    pair_curves = [
+        (tkn0, tkn1, curves)
+        for tkn0, tkn1, curves in finder.get_pair_curves([T.ETH, T.WETH], ["bancor_pol"])
+        if tkn0 not in [T.ETH, T.WETH]
+    ]
+    assert len(expected) > 5
+    assert cids(pair_curves) == cids(expected)
+
+
+def test_tokens_result_is_unchanged():
+    CCm = make_curves()
+    finder = FindArbitrageMultiPairwise(flashloan_tokens=FLASHLOAN_TOKENS, CCm=CCm, ConfigObj=CONFIG,
+                                        result=FindArbitrageMultiPairwise.AO_TOKENS)
+    all_tokens, combos = finder.find_arbitrage()
+    assert all_tokens == CCm.tokens()
+    assert len(combos) == len(FLASHLOAN_TOKENS) * (len(all_tokens) - 1)
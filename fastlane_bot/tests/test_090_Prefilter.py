@@ -0,0 +1,102 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from fastlane_bot.helpers import SolutionCache
+from fastlane_bot.helpers.poolandtokens import PoolAndTokens
+from fastlane_bot.modes.base import fee_fraction, max_cycle_rate
+from fastlane_bot.modes.pairwise_multi import FindArbitrageMultiPairwise
+from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer
+
+
+CONFIG = SimpleNamespace(
+    logger=logging.getLogger(__name__),
+    CARBON_V1_FORKS=["carbon_v1"],
+)
+
+
+def uni(p, pair="TKN/WETH", cid="uni", fee=0.003):
+    return CPC.from_px(p=p, x=1000, pair=pair, cid=cid, fee=fee, params=dict(exchange="uniswap_v2"))
+
+
+def make_finder(prefilter=True):
+    return FindArbitrageMultiPairwise(flashloan_tokens=["WETH"], CCm=CPCContainer(), ConfigObj=CONFIG,
+                                      prefilter=prefilter)
+
+
+def test_fee_fraction():
+    assert fee_fraction(None) == 0
+    assert fee_fraction(0.003) == 0.003
+    assert fee_fraction("0.003") == 0.003
+    assert fee_fraction(-0.001) == 0
+
+
+def test_curves_carry_the_fee_as_a_fraction():
+    config = SimpleNamespace(
+        UNI_V3_FORKS=[], BANCOR_POL_NAME="bancor_pol", CARBON_V1_FORKS=["carbon_v1"], BALANCER_NAME="balancer",
+        SOLIDLY_V2_FORKS=[], SUPPORTED_EXCHANGES=["bancor_v2"], NATIVE_GAS_TOKEN_ADDRESS="0xETH",
+        WRAPPED_GAS_TOKEN_ADDRESS="0xWETH",
+    )
+    fields = {name: None for name in PoolAndTokens.__dataclass_fields__ if name != "ConfigObj"}
+    fields.update(
+        id=0, cid="bancor", descr="bancor_v2", last_updated_block=1, exchange_name="bancor_v2",
+        pair_name="0xTKN/0xWETH", tkn0_address="0xTKN", tkn1_address="0xWETH", tkn0_decimals=18, tkn1_decimals=18,
+        tkn0_balance=10 ** 21, tkn1_balance=10 ** 22,
+    )
+    # the Bancor V2 fee is in ppm
+    [curve] = PoolAndTokens(ConfigObj=config, **{**fields, "fee": 3000, "fee_float": 0.003}).to_cpc()
+    assert curve.fee == 0.003
+    [curve] = PoolAndTokens(ConfigObj=config, **{**fields, "fee": "0.003", "fee_float": None}).to_cpc()
+    assert curve.fee == 0.003
+
+
+def test_max_cycle_rate_of_pairs():
+    # the price gap must exceed both fees for an arbitrage to be possible
+    assert max_cycle_rate([uni(10, cid="0"), uni(10.05, cid="1")]) < 1
+    assert max_cycle_rate([uni(10, cid="0"), uni(10.1, cid="1")]) > 1
+    assert max_cycle_rate([uni(10, cid="0"), uni(10.05, cid="1", fee=0)]) > 1
+
+    # curves on the reversed pair are the same market
+    assert max_cycle_rate([uni(10, cid="0"), uni(1 / 10.1, pair="WETH/TKN", cid="1")]) > 1
+
+    # a single curve, or curves with no cycle, never have an arbitrage
+    assert max_cycle_rate([uni(10)]) == pytest.approx(0.997 ** 2)
+    assert max_cycle_rate([uni(10, pair="A/B", cid="0"), uni(10, pair="B/C", cid="1")]) < 1
+    assert max_cycle_rate([]) == 0
+
+
+def test_max_cycle_rate_respects_the_curve_boundaries():
+    # a carbon order that only sells TKN: it can not take the TKN bought cheaply on uniswap
+    sells_tkn = CPC.from_carbon(pa=9, pb=8, yint=100, y=100, tkny="TKN", pair="TKN/WETH", cid="carbon", fee=0.002)
+    assert sells_tkn.x_act == 0 and sells_tkn.y_act > 0
+    assert max_cycle_rate([uni(1 / 10), sells_tkn.from_px(p=8.5, x=1, pair="WETH/TKN", cid="c")]) > 1
+    assert max_cycle_rate([uni(1 / 10), sells_tkn]) < 1
+
+
+def test_max_cycle_rate_of_triangles():
+    triangle = [uni(10, pair="A/WETH", cid="0"), uni(2, pair="B/A", cid="1"), uni(1 / 20, pair="WETH/B", cid="2")]
+    assert max_cycle_rate(triangle) < 1
+    triangle[2] = uni(1 / 20.1, pair="WETH/B", cid="2")
+    assert max_cycle_rate(triangle) < 1
+    triangle[2] = uni(1 / 21, pair="WETH/B", cid="2")
+    assert max_cycle_rate(triangle) > 1
+    # none of the pairs of the triangle has an arbitrage on its own
+    assert all(max_cycle_rate([c]) < 1 for c in triangle)
+
+
+def test_pruned_miniverses_are_not_solved():
+    miniverses = [
+        ([uni(10, cid=f"{i}-0"), uni(10 + dp, cid=f"{i}-1")], "WETH", {"TKN": 10})
+        for i, dp in enumerate([0, 0.01, 0.5, 0.04, 1])
+    ]
+    finder = make_finder()
+    results = finder.solve_miniverses(miniverses, pairwise=True)
+    assert finder.num_pruned == 3
+    assert [result == SolutionCache.NO_ARB_RESULT for result in results] == [True, True, False, True, False]
+
+    expected = make_finder(prefilter=False).solve_miniverses(miniverses, pairwise=True)
+    for result, expected_result in zip(results, expected):
+        if result != SolutionCache.NO_ARB_RESULT:
+            assert result[0] == pytest.approx(expected_result[0])
+            assert [ti["cid"] for ti in result[2]] == [ti["cid"] for ti in expected_result[2]]
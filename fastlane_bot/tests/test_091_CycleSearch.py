@@ -0,0 +1,96 @@
+import itertools
+import logging
+import math
+import random
+from types import SimpleNamespace
+
+from fastlane_bot.modes.base_triangle import find_profitable_cycles, get_rate_graph
+from fastlane_bot.modes.cycle_multi import ArbitrageFinderCycleMulti
+from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer
+
+
+CONFIG = SimpleNamespace(
+    logger=logging.getLogger(__name__),
+    CARBON_V1_FORKS=["carbon_v1"],
+    NATIVE_GAS_TOKEN_ADDRESS="ETH",
+    WRAPPED_GAS_TOKEN_ADDRESS="WETH",
+    DEFAULT_MIN_PROFIT_GAS_TOKEN=0.0001,
+)
+
+
+def uni(p, pair, cid, fee=0.003, exchange="uniswap_v2"):
+    return CPC.from_px(p=p, x=1000, pair=pair, cid=cid, fee=fee, params=dict(exchange=exchange))
+
+
+def make_market(ntokens=8, ncurves=80, noise=0.02, seed=7):
+    rng = random.Random(seed)
+    tokens = ["WETH"] + [f"TKN{i}" for i in range(ntokens - 1)]
+    prices = {tkn: rng.uniform(0.1, 10) for tkn in tokens}
+    curves = []
+    for i in range(ncurves):
+        tknb, tknq = rng.sample(tokens, 2)
+        p = prices[tknb] / prices[tknq] * (1 + rng.uniform(-noise, noise))
+        curves += [uni(p, f"{tknb}/{tknq}", f"cid{i}")]
+    return CPCContainer(curves)
+
+
+def brute_force_cycles(graph, src_token, max_length):
+    tokens = [tkn for tkn in graph if tkn != src_token]
+    cycles = set()
+    for length in range(1, max_length):
+        for path in itertools.permutations(tokens, length):
+            tkns = (src_token,) + path + (src_token,)
+            if all(tkn_out in graph.get(tkn_in, {}) for tkn_in, tkn_out in zip(tkns, tkns[1:])):
+                if sum(graph[tkn_in][tkn_out][0] for tkn_in, tkn_out in zip(tkns, tkns[1:])) > 0:
+                    cycles.add(tkns)
+    return cycles
+
+
+def test_rate_graph():
+    graph = get_rate_graph([uni(10, "TKN/WETH", "0"), uni(10.1, "TKN/WETH", "1", fee=0)])
+    log_rate, curves = graph["TKN"]["WETH"]
+    assert log_rate == math.log(10.1) and [c.cid for c in curves] == ["1", "0"]
+    log_rate, curves = graph["WETH"]["TKN"]
+    assert log_rate == math.log(0.997 / 10) and [c.cid for c in curves] == ["0", "1"]
+
+
+def test_cycles_match_brute_force():
+    graph = get_rate_graph(make_market())
+    for max_length in [2, 3, 4]:
+        cycles = find_profitable_cycles(graph, "WETH", max_length)
+        assert {tkns for _, tkns in cycles} == brute_force_cycles(graph, "WETH", max_length)
+        assert [log_rate for log_rate, _ in cycles] == sorted((log_rate for log_rate, _ in cycles), reverse=True)
+    assert len(cycles) > 10
+    assert max(len(tkns) for _, tkns in cycles) == 5
+    assert len(find_profitable_cycles(graph, "WETH", 4, max_cycles=3)) == 3
+
+    # without the price noise, no cycle beats the fees
+    assert find_profitable_cycles(get_rate_graph(make_market(noise=0.002)), "WETH", 4) == []
+
+
+def test_cycle_mode_finds_a_triangle():
+    curves = [
+        uni(10, "A/WETH", "uni-a"),
+        uni(2, "B/A", "uni-b-a"),
+        uni(1 / 21, "WETH/B", "uni-b"),
+        uni(1 / 20.9, "WETH/B", "uni-b-2"),
+        # sells B for A at a better price than uni-b-a, and does not buy B
+        CPC.from_carbon(pa=1 / 1.98, pb=1 / 2, yint=100, y=100, tkny="B", pair="B/A", cid="carbon", fee=0.002,
+                        params=dict(exchange="carbon_v1")),
+        CPC.from_carbon(pa=1.9, pb=1.8, yint=100, y=100, tkny="A", pair="B/A", cid="carbon-2", fee=0.002,
+                        params=dict(exchange="carbon_v1")),
+    ]
+    finder = ArbitrageFinderCycleMulti(flashloan_tokens=["WETH"], CCm=CPCContainer(curves), ConfigObj=CONFIG,
+                                       result=ArbitrageFinderCycleMulti.AO_CANDIDATES)
+    combos = finder.get_cycle_combos(["WETH"], finder.CCm)
+    assert len(combos) == 1
+    src_token, miniverse = combos[0]
+    assert src_token == "WETH"
+    # the best non-carbon curve of each step of WETH -> A -> B -> WETH, and the carbon curve selling B
+    assert sorted(c.cid for c in miniverse) == ["carbon", "uni-a", "uni-b", "uni-b-a"]
+
+    candidates = finder.find_arbitrage()
+    assert len(candidates) == 1
+    profit, _, trade_instructions_dic, src_token, _ = candidates[0]
+    assert profit > 0 and src_token == "WETH"
+    assert {ti["cid"] for ti in trade_instructions_dic} <= {c.cid for c in miniverse}
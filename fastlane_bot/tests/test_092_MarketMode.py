@@ -0,0 +1,131 @@
+import logging
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from fastlane_bot.modes.market_multi import ArbitrageFinderMarketMulti, decompose_routes, get_market
+from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer
+from fastlane_bot.tools.optimizer import MargPOptimizer
+
+
+CONFIG = SimpleNamespace(
+    logger=logging.getLogger(__name__),
+    CARBON_V1_FORKS=["carbon_v1"],
+    NATIVE_GAS_TOKEN_ADDRESS="ETH",
+    WRAPPED_GAS_TOKEN_ADDRESS="WETH",
+    DEFAULT_MIN_PROFIT_GAS_TOKEN=0.0001,
+)
+
+
+def uni(p, pair, cid, fee=0.003, x=1000):
+    return CPC.from_px(p=p, x=x, pair=pair, cid=cid, fee=fee, params=dict(exchange="uniswap_v2"))
+
+
+def make_market(ntokens=40, seed=7):
+    """a market without arbitrage, with every token traded against one or two hubs"""
+    rng = random.Random(seed)
+    hubs = ["WETH", "USDC", "DAI"]
+    tokens = hubs + [f"TKN{i}" for i in range(ntokens)]
+    prices = {tkn: rng.uniform(0.1, 10) for tkn in tokens}
+    curves = [uni(prices["USDC"] / prices["WETH"], "USDC/WETH", "hub-0"),
+              uni(prices["DAI"] / prices["USDC"], "DAI/USDC", "hub-1")]
+    for i, tkn in enumerate(tokens[3:]):
+        for tknq in rng.sample(hubs, rng.randint(1, 2)):
+            curves += [uni(prices[tkn] / prices[tknq], f"{tkn}/{tknq}", f"cid{len(curves)}")]
+    return curves, prices
+
+
+def test_get_market():
+    curves = [
+        uni(10, "A/WETH", "a"),
+        uni(2, "B/A", "b"),
+        uni(3, "C/B", "c"),
+        uni(5, "B/WETH", "b-weth"),
+        uni(1 / 4, "WETH/D", "d"),
+        CPC.from_carbon(pa=11, pb=10, yint=100, y=100, tkny="WETH", pair="E/WETH", cid="carbon", fee=0.002,
+                        params=dict(exchange="carbon_v1")),
+        uni(10.5, "E/WETH", "e"),
+    ]
+    CCm = CPCContainer(curves)
+    market, pstart = get_market(CCm, "WETH", max_hops=1, carbon_forks=CONFIG.CARBON_V1_FORKS)
+    # the curve between two tokens one hop away is included, those to C are not
+    assert [c.cid for c in market] == ["a", "b", "b-weth", "d", "carbon", "e"]
+    assert pstart == pytest.approx({"WETH": 1, "A": 10, "B": 5, "D": 4, "E": 10.5})
+
+    market, pstart = get_market(CCm, "WETH", max_hops=2, carbon_forks=CONFIG.CARBON_V1_FORKS)
+    assert [c.cid for c in market] == [c.cid for c in curves]
+    assert pstart["C"] == pytest.approx(15)
+
+
+def test_decompose_routes():
+    ti = lambda cid, tknin, amtin, tknout: dict(cid=cid, tknin=tknin, amtin=amtin, tknout=tknout, amtout=0)
+    prices = {"WETH": 1, "A": 10, "B": 5}
+    trade_instructions_dic = [
+        # WETH -> A -> B -> WETH, worth 2 WETH
+        ti("weth-a", "WETH", 2, "A"),
+        ti("a-b", "A", 0.2, "B"),
+        ti("b-weth", "B", 0.4, "WETH"),
+        # WETH -> B -> WETH, worth 1 WETH
+        ti("weth-b", "WETH", 1, "B"),
+        ti("b-weth-2", "B", 0.2, "WETH"),
+        # A -> B -> A, which does not go through WETH
+        ti("a-b-2", "A", 1, "B"),
+        ti("b-a", "B", 2, "A"),
+    ]
+    routes = decompose_routes(trade_instructions_dic, "WETH", prices)
+    assert [(value, tkns) for value, tkns, _ in routes] == [(2, ("WETH", "A", "B", "WETH")), (1, ("WETH", "B", "WETH"))]
+    assert routes[0][2] == ["weth-a", "a-b", "a-b-2", "b-a", "b-weth", "b-weth-2", "weth-b"]
+    assert routes[1][2] == ["weth-b", "b-weth", "b-weth-2"]
+
+    assert len(decompose_routes(trade_instructions_dic, "WETH", prices, max_routes=1)) == 1
+    assert len(decompose_routes(trade_instructions_dic, "WETH", prices, min_share=0.6)) == 1
+    assert decompose_routes(trade_instructions_dic[-2:], "WETH", prices) == []
+
+
+def test_market_mode_finds_the_arbitrage():
+    curves, prices = make_market()
+    finder = ArbitrageFinderMarketMulti(flashloan_tokens=["WETH"], CCm=CPCContainer(curves), ConfigObj=CONFIG,
+                                        result=ArbitrageFinderMarketMulti.AO_CANDIDATES)
+    assert finder.get_route_miniverses("WETH") == []
+    assert finder.find_arbitrage() == []
+
+    # a mispriced curve of a token that is not traded against WETH
+    tkn = next(c.tknx for c in curves if c.tkny == "DAI" and not any(c1.pair == f"{c.tknx}/WETH" for c1 in curves))
+    curves += [uni(prices[tkn] / prices["DAI"] * 1.1, f"{tkn}/DAI", "mispriced")]
+    finder = ArbitrageFinderMarketMulti(flashloan_tokens=["WETH"], CCm=CPCContainer(curves), ConfigObj=CONFIG,
+                                        result=ArbitrageFinderMarketMulti.AO_CANDIDATES)
+    miniverses = finder.get_route_miniverses("WETH")
+    assert len(miniverses) > 0
+    miniverse, src_token, pstart = miniverses[0]
+    assert src_token == "WETH" and "mispriced" in [c.cid for c in miniverse]
+    assert set(pstart) == {tkn for c in miniverse for tkn in (c.tknx, c.tkny)}
+
+    candidates = finder.find_arbitrage()
+    assert len(candidates) > 0
+    profit, _, trade_instructions_dic, src_token, _ = candidates[0]
+    assert profit > 0 and src_token == "WETH"
+    assert "mispriced" in [ti["cid"] for ti in trade_instructions_dic]
+
+
+def test_market_mode_skips_a_failed_market_solve(monkeypatch, caplog):
+    curves, prices = make_market()
+    curves += [uni(prices["TKN0"] / prices["WETH"] * 1.1, "TKN0/WETH", "mispriced")]
+    finder = ArbitrageFinderMarketMulti(flashloan_tokens=["WETH"], CCm=CPCContainer(curves), ConfigObj=CONFIG,
+                                        result=ArbitrageFinderMarketMulti.AO_CANDIDATES)
+
+    def fail(self, targettkn, **kwargs):
+        raise np.linalg.LinAlgError("singular market")
+    monkeypatch.setattr(MargPOptimizer, "optimize", fail)
+    with caplog.at_level(logging.WARNING):
+        assert finder.get_route_miniverses("WETH") == []
+    assert "WETH" in caplog.text and "singular market" in caplog.text
+    assert finder.find_arbitrage() == []
+
+    # other errors are bugs, and are not hidden
+    def bug(self, targettkn, **kwargs):
+        raise KeyError("bug")
+    monkeypatch.setattr(MargPOptimizer, "optimize", bug)
+    with pytest.raises(KeyError):
+        finder.get_route_miniverses("WETH")
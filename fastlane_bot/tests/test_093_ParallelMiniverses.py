@@ -0,0 +1,68 @@
+import logging
+from types import SimpleNamespace
+
+from fastlane_bot.modes.pairwise_multi import FindArbitrageMultiPairwise
+from fastlane_bot.modes import base
+from fastlane_bot.modes.base import solve_miniverse
+from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer
+
+
+CONFIG = SimpleNamespace(
+    logger=logging.getLogger(__name__),
+    CARBON_V1_FORKS=["carbon_v1"],
+    DEFAULT_MIN_PROFIT_GAS_TOKEN=0,
+    NATIVE_GAS_TOKEN_ADDRESS="ETH",
+    WRAPPED_GAS_TOKEN_ADDRESS="WETH",
+)
+
+
+def make_curves():
+    curves = []
+    for i in range(8):
+        tkn, p = f"TKN{i}", 10 + i
+        for j, dp in enumerate([1.0, 1.01]):
+            curves += [CPC.from_px(p=p * dp, x=1000, pair=f"{tkn}/WETH", cid=f"v2-{i}-{j}", fee=0.003,
+                                   params=dict(exchange="uniswap_v2"))]
+        curves += [CPC.from_carbon(pa=p * 1.06, pb=p * 1.04, yint=1000, y=1000, pair=f"{tkn}/WETH", tkny="WETH",
+                                   cid=f"c-{i}", fee=0.002, params=dict(exchange="carbon_v1"))]
+    return CPCContainer(curves)
+
+
+def find_arbitrage(CCm, n_jobs, min_miniverses):
+    finder = FindArbitrageMultiPairwise(flashloan_tokens=["WETH"], CCm=CCm, ConfigObj=CONFIG, n_jobs=n_jobs)
+    finder.PARALLEL_MIN_MINIVERSES = min_miniverses
+    return finder.find_arbitrage()
+
+
+def summary(candidates):
+    return [(profit, src_token, dic) for profit, df, dic, src_token, trade_instructions in candidates]
+
+
+def test_parallel_candidates_match_sequential():
+    CCm = make_curves()
+    sequential = find_arbitrage(CCm, n_jobs=1, min_miniverses=1)
+    parallel = find_arbitrage(CCm, n_jobs=2, min_miniverses=1)
+    assert len(sequential) == 16
+    assert summary(parallel) == summary(sequential)
+    assert all(p[1].equals(s[1]) for p, s in zip(parallel, sequential))
+    assert [[ti.cid for ti in p[4]] for p in parallel] == [[ti.cid for ti in s[4]] for s in sequential]
+
+    # the worker pool is kept across calls
+    executor = base._executor
+    assert executor is not None and executor._mp_context.get_start_method() in ("forkserver", "spawn")
+    assert summary(find_arbitrage(CCm, n_jobs=2, min_miniverses=1)) == summary(sequential)
+    assert base._executor is executor
+
+
+def test_num_workers_and_errors():
+    finder = FindArbitrageMultiPairwise(flashloan_tokens=["WETH"], CCm=make_curves(), ConfigObj=CONFIG, n_jobs=4)
+    assert finder.num_workers(finder.PARALLEL_MIN_MINIVERSES - 1) == 1
+    assert finder.num_workers(100) == 4
+    finder.n_jobs = -1
+    assert finder.num_workers(100) >= 1
+    finder.n_jobs = 1
+    assert finder.num_workers(100) == 1
+
+    c = make_curves()[0]
+    assert solve_miniverse([c], "WETH") == (None, None, None, None)
+    assert isinstance(solve_miniverse([c], "MEH", {"TKN0": 10}, pairwise=True), AssertionError)
@@ -0,0 +1,99 @@
+import logging
+import random
+from types import SimpleNamespace
+
+from fastlane_bot.events.managers.manager import Manager
+from fastlane_bot.modes.pairwise_multi import FindArbitrageMultiPairwise
+from fastlane_bot.modes.triangle_multi import ArbitrageFinderTriangleMulti
+from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer
+
+
+CONFIG = SimpleNamespace(
+    logger=logging.getLogger(__name__),
+    CARBON_V1_FORKS=["carbon_v1"],
+    DEFAULT_MIN_PROFIT_GAS_TOKEN=0,
+    NATIVE_GAS_TOKEN_ADDRESS="ETH",
+    WRAPPED_GAS_TOKEN_ADDRESS="WETH",
+)
+
+
+def make_pairwise_curves():
+    curves = []
+    for i in range(4):
+        tkn, p = f"TKN{i}", 10 + i
+        for j, dp in enumerate([1.0, 1.01]):
+            curves += [CPC.from_px(p=p * dp, x=1000, pair=f"{tkn}/WETH", cid=f"v2-{i}-{j}", fee=0.003,
+                                   params=dict(exchange="uniswap_v2"))]
+        curves += [CPC.from_carbon(pa=p * 1.06, pb=p * 1.04, yint=1000, y=1000, pair=f"{tkn}/WETH", tkny="WETH",
+                                   cid=f"c-{i}", fee=0.002, params=dict(exchange="carbon_v1"))]
+    return CPCContainer(curves)
+
+
+def make_triangle_curves():
+    rng = random.Random(1)
+    tokens = ["WETH"] + [f"TKN{i}" for i in range(6)]
+    curves = []
+    for i in range(60):
+        b, q = rng.sample(tokens, 2)
+        exchange = "carbon_v1" if i % 3 == 0 else "uniswap_v2"
+        curves += [CPC.from_xy(x=rng.uniform(10, 100), y=rng.uniform(10, 100), pair=f"{b}/{q}", cid=f"cid{i}",
+                               fee=0.003, params=dict(exchange=exchange))]
+    return CPCContainer(curves)
+
+
+def test_manager_tracks_dirty_pairs():
+    mgr = Manager.__new__(Manager)
+    mgr.cfg = CONFIG
+    mgr.dirty_pairs = set()
+    mgr.all_pairs_dirty = True
+    assert mgr.pop_dirty_pairs() is None
+
+    mgr.mark_pool_dirty({"tkn0_address": "TKN1", "tkn1_address": "ETH"})
+    mgr.mark_pool_dirty({"tkn0_address": "C", "tkn1_address": "B", "tkn2_address": "A", "tkn3_address": None})
+    assert mgr.pop_dirty_pairs() == {"TKN1/WETH", "B/C", "A/C", "A/B"}
+    assert mgr.pop_dirty_pairs() == set()
+
+    mgr.mark_pool_dirty({"tkn0_address": "TKN1", "tkn1_address": "WETH"})
+    mgr.mark_all_pairs_dirty()
+    assert mgr.pop_dirty_pairs() is None
+    assert mgr.pop_dirty_pairs() == set()
+
+
+def test_pairwise_finder_only_searches_dirty_pairs():
+    CCm = make_pairwise_curves()
+    full = FindArbitrageMultiPairwise(flashloan_tokens=["WETH"], CCm=CCm, ConfigObj=CONFIG).find_arbitrage()
+    dirty = FindArbitrageMultiPairwise(flashloan_tokens=["WETH"], CCm=CCm, ConfigObj=CONFIG,
+                                       dirty_pairs={"TKN2/WETH"}).find_arbitrage()
+    assert len(full) == 8
+    assert len(dirty) == 2
+    assert [r[2] for r in dirty] == [r[2] for r in full if r[2][0]["cid"] in {"v2-2-0", "v2-2-1", "c-2"}]
+
+    none = FindArbitrageMultiPairwise(flashloan_tokens=["WETH"], CCm=CCm, ConfigObj=CONFIG, dirty_pairs=set())
+    assert none.find_arbitrage() == []
+
+
+def test_triangle_combos_only_contain_dirty_miniverses():
+    CCm = make_triangle_curves()
+    finder = ArbitrageFinderTriangleMulti(["WETH"], CCm, ConfigObj=CONFIG)
+    full = finder.get_combos(["WETH"], CCm, arb_mode="multi_triangle")
+
+    finder.dirty_pairs = {"TKN0/TKN3"}
+    dirty = finder.get_combos(["WETH"], CCm, arb_mode="multi_triangle")
+    expected = [(flt, m) for flt, m in full if any(sorted(c.pair.split("/")) == ["TKN0", "TKN3"] for c in m)]
+    assert 0 < len(dirty) < len(full)
+    assert [[c.cid for c in m] for _, m in dirty] == [[c.cid for c in m] for _, m in expected]
+
+
+def test_added_pools_mark_their_pairs_dirty():
+    mgr = Manager.__new__(Manager)
+    mgr.cfg = CONFIG
+    mgr.pool_data = []
+    mgr.dirty_pairs = set()
+    mgr.all_pairs_dirty = False
+    mgr.get_tkn_info = lambda address: (address, 18)
+    mgr.get_or_init_pool = lambda pool_info: object()
+
+    pool_info = mgr.add_pool_info(address="0xpool", exchange_name="uniswap_v2", fee="0.003", fee_float=0.003,
+                                  tkn0_address="TKN1", tkn1_address="ETH", block_number=1)
+    assert pool_info in mgr.pool_data
+    assert mgr.pop_dirty_pairs() == {"TKN1/WETH"}
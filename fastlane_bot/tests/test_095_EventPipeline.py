@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from fastlane_bot.events.event_gatherer import EventGatherer
+from fastlane_bot.events.interfaces.event import Event
+from fastlane_bot.events.utils import filter_latest_events, stream_latest_events
+
+
+CONFIG = SimpleNamespace(logger=logging.getLogger(__name__), network=SimpleNamespace(NETWORK="ethereum"))
+
+
+class FakeSubscription:
+    def __init__(self, topic, delay, collect_all=False):
+        self.topic = topic
+        self.delay = delay
+        self.collect_all = collect_all
+
+    def parse_log(self, log):
+        return Event(args={}, event=self.topic, log_index=log["logIndex"], transaction_index=0, transaction_hash=None,
+                     address=log["address"], block_hash=None, block_number=log["blockNumber"])
+
+
+class FakeEth:
+    def __init__(self, subscriptions, head):
+        self.subscriptions = {sub.topic: sub for sub in subscriptions}
+        self.head = head
+        self.requests = []
+
+    @property
+    async def block_number(self):
+        return self.head
+
+    async def get_logs(self, filter_params):
+        topic = filter_params["topics"][0]
+        from_block, to_block = filter_params["fromBlock"], filter_params["toBlock"]
+        self.requests.append((topic, from_block, to_block))
+        await asyncio.sleep(self.subscriptions[topic].delay)
+        return [dict(address=f"pool{block % 3}", blockNumber=block, logIndex=i)
+                for block in range(max(from_block, 1), to_block + 1) for i, t in enumerate(self.subscriptions) if t == topic]
+
+
+def make_gatherer(head=20):
+    subscriptions = [FakeSubscription("slow", 0.05), FakeSubscription("fast", 0), FakeSubscription("all", 0, True)]
+    w3 = SimpleNamespace(eth=FakeEth(subscriptions, head))
+    exchange = SimpleNamespace(get_subscriptions=lambda w3: subscriptions)
+    return EventGatherer(config=CONFIG, w3=w3, exchanges={"fake": exchange})
+
+
+def key(events):
+    return sorted((e.event, e.block_number, e.log_index) for e in events)
+
+
+def test_stream_all_events_matches_get_all_events():
+    gatherer = make_gatherer()
+    handled = []
+    streamed = gatherer.stream_all_events(5, 10, handled.append)
+    assert key(streamed) == key(gatherer.get_all_events(5, 10))
+    assert handled == streamed
+    # the fast subscriptions are handled while the slow one is still being fetched
+    assert [e.event for e in handled[-6:]] == ["slow"] * 6
+    assert {e.event for e in handled[:-6]} == {"fast", "all"}
+
+
+def test_stream_all_events_uses_prefetched_events():
+    gatherer = make_gatherer(head=12)
+    gatherer.prefetch_events(from_block=8, reorg_delay=2)
+    gatherer._prefetch.result()
+    eth = gatherer._w3.eth
+    eth.requests.clear()
+
+    streamed = gatherer.stream_all_events(6, 14, lambda event: None)
+    assert sorted(eth.requests) == [("all", 11, 14), ("fast", 6, 7), ("fast", 11, 14), ("slow", 6, 7), ("slow", 11, 14)]
+    assert key(streamed) == key(make_gatherer().get_all_events(6, 14))
+
+    # prefetched events beyond the range are dropped
+    gatherer.prefetch_events(from_block=8, reorg_delay=0)
+    assert key(gatherer.stream_all_events(8, 9, lambda event: None)) == key(make_gatherer().get_all_events(8, 9))
+    assert gatherer._prefetch is None
+
+
+def test_stream_latest_events_matches_filter_latest_events(tmp_path):
+    updated = []
+    pool_type = SimpleNamespace(unique_key=lambda: "address")
+    mgr = SimpleNamespace(
+        cfg=CONFIG,
+        pool_data=[],
+        pool_type_from_exchange_name=lambda exchange_name: pool_type,
+        exchange_name_from_event=lambda event: "fake",
+        update_from_event=lambda event: updated.append(event),
+        mark_pool_touched=lambda event: None,
+    )
+    gatherer = make_gatherer()
+    latest_events = stream_latest_events(10, mgr, 5, True, str(tmp_path), gatherer)
+    expected = filter_latest_events(mgr, gatherer.get_all_events(5, 10))
+    assert key(latest_events) == key(expected)
+    # every pool ends with its latest event
+    final = {}
+    for event in updated:
+        final[event.address] = event
+    assert key(final.values()) == key(expected)
+    assert (tmp_path / "latest_event_data.json").exists()
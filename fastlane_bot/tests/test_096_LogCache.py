@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from fastlane_bot.events.event_gatherer import EventGatherer
+from fastlane_bot.events.log_cache import LogCache
+
+
+CONFIG = SimpleNamespace(logger=logging.getLogger(__name__), network=SimpleNamespace(NETWORK="ethereum"))
+
+
+class FakeSubscription:
+    def __init__(self, topic, collect_all=False):
+        self.topic = topic
+        self.collect_all = collect_all
+
+    def parse_log(self, log):
+        return (self.topic, log["blockNumber"], log["logIndex"])
+
+
+class FakeEth:
+    def __init__(self, head):
+        self.head = head
+        self.requests = []
+        self.num_block_number = 0
+
+    @property
+    async def block_number(self):
+        self.num_block_number += 1
+        return self.head
+
+    async def get_logs(self, filter_params):
+        topic = filter_params["topics"][0]
+        from_block, to_block = filter_params["fromBlock"], filter_params["toBlock"]
+        self.requests.append((topic, from_block, to_block))
+        await asyncio.sleep(0)
+        return [dict(blockNumber=block, logIndex=i) for block in range(from_block, to_block + 1) for i in range(2)]
+
+
+def make_gatherer(log_cache, head, reorg_delay=0):
+    subscriptions = [FakeSubscription("a"), FakeSubscription("b", collect_all=True)]
+    w3 = SimpleNamespace(eth=FakeEth(head))
+    exchange = SimpleNamespace(get_subscriptions=lambda w3: subscriptions)
+    return EventGatherer(config=CONFIG, w3=w3, exchanges={"fake": exchange}, log_cache=log_cache,
+                         reorg_delay=reorg_delay)
+
+
+def expected_events(from_block, to_block, b_from_block=0):
+    return ([("a", block, i) for block in range(from_block, to_block + 1) for i in range(2)] +
+            [("b", block, i) for block in range(b_from_block, to_block + 1) for i in range(2)])
+
+
+def test_log_cache_ranges(tmp_path):
+    cache = LogCache(str(tmp_path / "logs.sqlite"))
+    assert cache.missing_ranges("eth", "a", 10, 20) == [(10, 20)]
+
+    cache.put("eth", "a", 10, 12, [dict(blockNumber=11, logIndex=0), dict(blockNumber=12, logIndex=3)])
+    cache.put("eth", "a", 16, 18, [dict(blockNumber=17, logIndex=1)])
+    assert cache.ranges("eth", "a") == [(10, 12), (16, 18)]
+    assert cache.missing_ranges("eth", "a", 5, 20) == [(5, 9), (13, 15), (19, 20)]
+    assert cache.missing_ranges("eth", "a", 11, 17) == [(13, 15)]
+    assert cache.missing_ranges("eth", "b", 11, 17) == [(11, 17)]
+    assert cache.missing_ranges("polygon", "a", 11, 12) == [(11, 12)]
+
+    cache.put("eth", "a", 13, 15, [])
+    assert cache.ranges("eth", "a") == [(10, 18)]
+    assert [log["blockNumber"] for log in cache.get("eth", "a", 0, 100)] == [11, 12, 17]
+
+    cache.drop_after("eth", 16)
+    assert cache.ranges("eth", "a") == [(10, 16)]
+    assert [log["blockNumber"] for log in cache.get("eth", "a", 0, 100)] == [11, 12]
+    cache.close()
+
+    cache = LogCache(str(tmp_path / "logs.sqlite"))
+    assert cache.ranges("eth", "a") == [(10, 16)]
+    assert cache.get("eth", "a", 12, 12) == [dict(blockNumber=12, logIndex=3)]
+
+
+def test_gatherer_only_fetches_uncovered_ranges(tmp_path):
+    path = str(tmp_path / "logs.sqlite")
+    gatherer = make_gatherer(LogCache(path), head=30, reorg_delay=5)
+    assert sorted(gatherer.get_all_events(10, 28)) == sorted(expected_events(10, 28))
+    assert sorted(gatherer._w3.eth.requests) == [("a", 10, 25), ("a", 26, 28), ("b", 0, 25), ("b", 26, 28)]
+
+    # a restart with the same cache only fetches the new blocks and those within reorg_delay of the head
+    gatherer = make_gatherer(LogCache(path), head=40, reorg_delay=5)
+    assert sorted(gatherer.get_all_events(8, 38)) == sorted(expected_events(8, 38))
+    assert sorted(gatherer._w3.eth.requests) == [
+        ("a", 8, 9), ("a", 26, 35), ("a", 36, 38), ("b", 26, 35), ("b", 36, 38)
+    ]
+
+    # a lower head drops the cached logs that are now within reorg_delay of it
+    gatherer = make_gatherer(LogCache(path), head=30, reorg_delay=5)
+    assert sorted(gatherer.get_all_events(20, 30)) == sorted(expected_events(20, 30))
+    assert sorted(gatherer._w3.eth.requests) == [("a", 26, 30), ("b", 26, 30)]
+
+
+def test_gatherer_only_drops_cached_logs_on_a_reorg(tmp_path, monkeypatch):
+    path = str(tmp_path / "logs.sqlite")
+    cache = LogCache(path)
+    drops = []
+    drop_after = cache.drop_after
+    monkeypatch.setattr(cache, "drop_after", lambda chain, block_number: drops.append(block_number) or drop_after(chain, block_number))
+
+    gatherer = make_gatherer(cache, head=30, reorg_delay=5)
+    gatherer.get_all_events(10, 28)
+    assert gatherer._w3.eth.num_block_number == 1
+    gatherer.get_all_events(10, 28, head=30)
+    assert gatherer._w3.eth.num_block_number == 1
+    assert drops == [] and cache.last_block("ethereum") == 25
+
+    gatherer._w3.eth.head = 28
+    assert sorted(gatherer.get_all_events(10, 28)) == sorted(expected_events(10, 28))
+    assert drops == [23] and cache.last_block("ethereum") == 23
+    assert LogCache(path).last_block("ethereum") == 23
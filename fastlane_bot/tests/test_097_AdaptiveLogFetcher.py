@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from fastlane_bot.events.log_fetcher import AdaptiveLogFetcher, is_range_error
+
+
+class FakeEth:
+    """returns `density` logs per block, rejects responses of more than `max_results` logs and fails `failures`
+    requests with a transient error"""
+
+    def __init__(self, density, max_results=10000, failures=0):
+        self.density = density
+        self.max_results = max_results
+        self.failures = failures
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def get_logs(self, filter_params):
+        from_block, to_block = filter_params["fromBlock"], filter_params["toBlock"]
+        self.requests.append((from_block, to_block))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError("429 Too Many Requests")
+            if (to_block - from_block + 1) * self.density > self.max_results:
+                raise ValueError({"code": -32005, "message": "query returned more than 10000 results"})
+            return [dict(blockNumber=block, logIndex=i, data="0x" + "00" * 64, topics=["0x01"])
+                    for block in range(from_block, to_block + 1) for i in range(self.density)]
+        finally:
+            self.in_flight -= 1
+
+
+def get_logs(fetcher, from_block, to_block):
+    logs = asyncio.get_event_loop().run_until_complete(fetcher.get_logs(from_block, to_block, ["0x01"]))
+    return [(log["blockNumber"], log["logIndex"]) for log in logs]
+
+
+def make_fetcher(eth, **kwargs):
+    return AdaptiveLogFetcher(SimpleNamespace(eth=eth), logging.getLogger(__name__), backoff=0, **kwargs)
+
+
+def expected(from_block, to_block, density):
+    return [(block, i) for block in range(from_block, to_block + 1) for i in range(density)]
+
+
+def test_is_range_error():
+    assert is_range_error(ValueError({"code": -32005, "message": "query returned more than 10000 results"}))
+    assert is_range_error(Exception("Log response size exceeded."))
+    assert is_range_error(Exception("eth_getLogs is limited to a 10,000 range"))
+    assert not is_range_error(ConnectionError("429 Too Many Requests"))
+
+
+def test_window_shrinks_on_range_errors_and_grows_on_small_responses():
+    eth = FakeEth(density=10)
+    fetcher = make_fetcher(eth, target_logs=2000)
+    assert get_logs(fetcher, 0, 9999) == expected(0, 9999, 10)
+    assert fetcher.stats.splits > 0
+    assert fetcher.chunk_size <= 200
+    assert fetcher.stats.logs == 100000
+    assert fetcher.stats.bytes == 100000 * (200 + 64 + 32)
+
+    eth.density = 1
+    requests = fetcher.stats.requests
+    assert get_logs(fetcher, 10000, 14999) == expected(10000, 14999, 1)
+    assert fetcher.chunk_size > 200
+    assert fetcher.stats.requests - requests < 5000 / 200
+
+    fetcher = make_fetcher(FakeEth(density=1), max_chunk_size=100)
+    assert get_logs(fetcher, 0, 999) == expected(0, 999, 1)
+    assert fetcher.stats.requests == 10
+    assert fetcher.chunk_size == 100
+
+
+def test_concurrency_limit_and_retries():
+    eth = FakeEth(density=1, failures=3)
+    fetcher = make_fetcher(eth, max_chunk_size=10, max_concurrency=3)
+    assert get_logs(fetcher, 0, 999) == expected(0, 999, 1)
+    assert eth.max_in_flight <= 3
+    assert fetcher.stats.retries == 3
+    assert fetcher.stats.requests == 103
+
+    eth = FakeEth(density=1, failures=10)
+    fetcher = make_fetcher(eth, max_retries=2)
+    with pytest.raises(ConnectionError):
+        get_logs(fetcher, 0, 9)
+    assert fetcher.stats.requests == 3
+
+    eth = FakeEth(density=10, max_results=5)
+    with pytest.raises(ValueError):
+        get_logs(make_fetcher(eth), 0, 9)
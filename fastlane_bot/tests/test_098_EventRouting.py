@@ -0,0 +1,87 @@
+import random
+from types import SimpleNamespace
+
+from fastlane_bot.config.network import ConfigNetwork
+from fastlane_bot.events.interfaces.event import Event
+from fastlane_bot.events.managers.manager import Manager
+from fastlane_bot.events.pools import pool_factory
+
+
+NETWORK = ConfigNetwork.new(network="ethereum")
+ETH = "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE"
+SUPPORTED_EXCHANGES = ["carbon_v1", "bancor_v3", "bancor_v2", "bancor_pol", "uniswap_v2", "uniswap_v3",
+                       "sushiswap_v2", "pancakeswap_v2", "pancakeswap_v3"]
+
+
+def make_manager(static_pools):
+    mgr = Manager.__new__(Manager)
+    mgr.cfg = SimpleNamespace(network=NETWORK, CARBON_CONTROLLER_MAPPING=NETWORK.CARBON_CONTROLLER_MAPPING)
+    mgr.SUPPORTED_EXCHANGES = SUPPORTED_EXCHANGES
+    mgr.static_pools = static_pools
+    mgr.build_event_routes()
+    return mgr
+
+
+def scan_exchange_name_from_event(mgr, event):
+    """the exchange_name_from_event implementation without a routing table"""
+    if 'id' in event.args:
+        for ex in mgr.cfg.CARBON_CONTROLLER_MAPPING:
+            if mgr.cfg.CARBON_CONTROLLER_MAPPING[ex] == event.address:
+                return ex
+    for exchange_name, pool_class in pool_factory._creators.items():
+        for _ex_name in mgr.SUPPORTED_EXCHANGES:
+            if exchange_name not in mgr.cfg.network.exchange_name_base_from_fork(_ex_name):
+                continue
+            if pool_class.event_matches_format(event, mgr.static_pools, exchange_name=_ex_name):
+                return _ex_name
+    return None
+
+
+def make_event(args, address):
+    return Event(args=args, event="", log_index=0, transaction_index=0, transaction_hash=None, address=address,
+                 block_hash=None, block_number=1)
+
+
+def test_routes_match_the_scan():
+    rng = random.Random(7)
+    static_pools = {
+        f"{ex}_pools": {f"0x{ex}{i}" for i in range(50)}
+        for ex in ["uniswap_v2", "sushiswap_v2", "pancakeswap_v2", "uniswap_v3", "pancakeswap_v3", "sushiswap_v3"]
+    }
+    static_pools["solidly_v2_pools"] = set()
+    mgr = make_manager(static_pools)
+    assert len(mgr.event_routes) == 250  # sushiswap_v3 is not supported
+    assert [ex for _, ex, _ in mgr.event_routes["0xsushiswap_v20"]] == ["sushiswap_v2"]
+
+    addresses = sorted(set().union(*static_pools.values())) + ["0xunknown", NETWORK.CARBON_CONTROLLER_MAPPING["carbon_v1"]]
+    argss = [
+        dict(reserve0=1, reserve1=2),
+        dict(sqrtPriceX96=1, liquidity=2, tick=3),
+        dict(id=1, order0={}, order1={}),
+        dict(id=1, token0="a", token1="b"),
+        dict(pool="0xpool"),
+        dict(_rateN=1, _rateD=2),
+        dict(token=ETH, amount=1),
+        dict(token="0xother", amount=1),
+        dict(meh=1),
+    ]
+    for _ in range(2000):
+        event = make_event(rng.choice(argss), rng.choice(addresses))
+        exchange_name, pool_class = mgr.route_event(event)
+        assert exchange_name == scan_exchange_name_from_event(mgr, event)
+        assert mgr.exchange_name_from_event(event) == exchange_name
+        if exchange_name is not None:
+            assert pool_class is pool_factory.get_pool(exchange_name, mgr.cfg)
+
+
+def test_routes_follow_static_pools():
+    static_pools = {"uniswap_v2_pools": {"0xa"}, "uniswap_v3_pools": set(), "solidly_v2_pools": set(),
+                    "sushiswap_v2_pools": set(), "pancakeswap_v2_pools": set(), "pancakeswap_v3_pools": set()}
+    mgr = make_manager(static_pools)
+    sync = make_event(dict(reserve0=1, reserve1=2), "0xb")
+    assert mgr.exchange_name_from_event(sync) is None
+
+    mgr.static_pools["sushiswap_v2_pools"] = {"0xb"}
+    mgr.build_event_routes()
+    assert mgr.route_event(sync) == ("sushiswap_v2", pool_factory.get_pool("uniswap_v2", mgr.cfg))
+    assert mgr.exchange_name_from_event(make_event(dict(reserve0=1, reserve1=2), "0xa")) == "uniswap_v2"
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from fastlane_bot.events.block_stream import BlockStream
+from fastlane_bot.events.interfaces.event import Event
+from fastlane_bot.events.utils import update_reverted_pools
+
+
+CONFIG = SimpleNamespace(logger=logging.getLogger(__name__))
+
+
+def block_hash(number, fork=0):
+    return "0x" + f"{fork:02x}{number:062x}"
+
+
+def head(number, fork=0, parent_fork=None):
+    parent_fork = fork if parent_fork is None else parent_fork
+    return dict(number=hex(number), hash=block_hash(number, fork), parentHash=block_hash(number - 1, parent_fork))
+
+
+def log(number, index, removed=False, address="0xpool"):
+    return dict(blockNumber=hex(number), logIndex=hex(index), transactionIndex="0x0", topics=["0x01"], data="0x",
+                address=address, removed=removed)
+
+
+class FakeSubscription:
+    topic = "0x01"
+    subscription_id = None
+
+    async def subscribe(self, w3):
+        self.subscription_id = await w3.eth.subscribe("logs", {"topics": [self.topic]})
+
+    def parse_log(self, log):
+        return Event(args={}, event="Sync", log_index=log["logIndex"], transaction_index=0, transaction_hash=None,
+                     address=log["address"], block_hash=None, block_number=log["blockNumber"])
+
+
+class FakeGatherer:
+    """backfills the events of the canonical chain"""
+
+    def __init__(self):
+        self.subscriptions = [FakeSubscription()]
+        self.backfills = []
+
+    async def async_get_all_events(self, from_block, to_block, head=None):
+        self.backfills.append((from_block, to_block))
+        return [FakeSubscription().parse_log(dict(blockNumber=n, logIndex=0, address="0xpool"))
+                for n in range(from_block, to_block + 1)]
+
+
+class FakeW3:
+    def __init__(self):
+        self.messages = asyncio.Queue()
+        self.canonical_fork = {}
+        self.provider = SimpleNamespace(connect=self._noop, disconnect=self._noop)
+        self.eth = SimpleNamespace(subscribe=self._subscribe, get_block=self._get_block)
+        self.ws = SimpleNamespace(process_subscriptions=self._process_subscriptions)
+
+    async def _noop(self):
+        pass
+
+    async def _subscribe(self, kind, params=None):
+        return "heads" if kind == "newHeads" else "logs"
+
+    async def _get_block(self, number):
+        return dict(hash=block_hash(number, self.canonical_fork.get(number, 0)))
+
+    async def _process_subscriptions(self):
+        while True:
+            yield {"params": await self.messages.get()}
+
+    def push(self, subscription, result):
+        self.messages.put_nowait(dict(subscription=subscription, result=result))
+
+
+def blocks(events):
+    return [(e.block_number, e.log_index) for e in events]
+
+
+def test_block_stream():
+    w3, gatherer = FakeW3(), FakeGatherer()
+    stream = BlockStream(CONFIG, w3, gatherer, settle_time=0.01)
+
+    # a block with its logs, which may arrive before or after its head
+    w3.push("logs", log(101, 0))
+    w3.push("heads", head(101))
+    w3.push("logs", log(101, 1))
+    from_block, to_block, events = stream.next_block(100)
+    assert (from_block, to_block) == (101, 101)
+    assert blocks(events) == [(101, 0), (101, 1)]
+
+    # logs of the next block are kept for it
+    w3.push("logs", log(102, 0))
+    w3.push("heads", head(102))
+    w3.push("logs", log(103, 0))
+    assert blocks(stream.next_block(100)[2]) == [(102, 0)]
+    w3.push("heads", head(103))
+    assert stream.next_block(100)[:2] == (103, 103)
+    assert gatherer.backfills == []
+
+    # missed heads are backfilled
+    w3.push("heads", head(106))
+    assert stream.next_block(100)[:2] == (104, 106)
+    assert gatherer.backfills == [(104, 106)]
+
+    # so are late and removed logs
+    w3.push("logs", log(105, 3))
+    w3.push("heads", head(107))
+    assert stream.next_block(100)[:2] == (105, 107)
+    w3.push("logs", log(107, 0, removed=True))
+    w3.push("heads", head(108))
+    assert stream.next_block(100)[:2] == (107, 108)
+
+    # a reorg of blocks 107 and 108 is detected from the parent hash and backfilled from the fork
+    w3.canonical_fork.update({107: 1, 108: 1})
+    w3.push("logs", log(109, 0))
+    w3.push("heads", head(109, fork=1))
+    from_block, to_block, events = stream.next_block(100)
+    assert (from_block, to_block) == (107, 109)
+    assert blocks(events) == [(107, 0), (108, 0), (109, 0)]
+
+    # as is a new head at the same height
+    w3.canonical_fork.update({109: 2})
+    w3.push("heads", head(109, fork=2, parent_fork=1))
+    assert stream.next_block(100)[:2] == (109, 109)
+    assert gatherer.backfills[-1] == (109, 109)
+
+    w3.push("heads", head(110, parent_fork=2))
+    assert stream.next_block(100)[:2] == (110, 110)
+    assert gatherer.backfills[-1] == (109, 109)
+    stream.close()
+
+
+def test_block_stream_reverted_addresses():
+    w3, gatherer = FakeW3(), FakeGatherer()
+    stream = BlockStream(CONFIG, w3, gatherer, settle_time=0.01)
+
+    # a log of another pool is processed, then removed; the backfill has no event for that pool
+    w3.push("logs", log(101, 0, address="0xOther"))
+    w3.push("heads", head(101))
+    assert blocks(stream.next_block(100)[2]) == [(101, 0)]
+    assert stream.pop_reverted_addresses() == set()
+    w3.push("logs", log(101, 0, removed=True, address="0xOther"))
+    w3.push("heads", head(102))
+    from_block, to_block, events = stream.next_block(100)
+    assert (from_block, to_block) == (101, 102)
+    assert {e.address for e in events} == {"0xpool"}
+    assert stream.pop_reverted_addresses() == {"0xother"}
+    assert stream.pop_reverted_addresses() == set()
+
+    # a reorg orphans the processed logs of the blocks after the fork, even if no removed log is pushed
+    w3.push("logs", log(103, 0, address="0xOrphan"))
+    w3.push("heads", head(103))
+    stream.next_block(100)
+    w3.canonical_fork.update({103: 1, 104: 1})
+    w3.push("heads", head(104, fork=1))
+    assert stream.next_block(100)[:2] == (103, 104)
+    assert stream.pop_reverted_addresses() == {"0xorphan"}
+    stream.close()
+
+
+def test_update_reverted_pools():
+    updated, carbon_updated = [], []
+    mgr = SimpleNamespace(
+        cfg=SimpleNamespace(logger=CONFIG.logger, CARBON_V1_FORKS=["carbon_v1"], MULTICALLABLE_EXCHANGES=["balancer"]),
+        pool_data=[
+            dict(address="0xPool", exchange_name="uniswap_v2"),
+            dict(address="0xpool2", exchange_name="uniswap_v2"),
+            dict(address="0xController", exchange_name="carbon_v1"),
+            dict(address="0xController", exchange_name="carbon_v1"),
+            dict(address="0xpool", exchange_name="balancer"),
+        ],
+        update=lambda pool_info, block_number: updated.append((pool_info["address"], block_number)),
+        update_carbon=lambda current_block, exchange_name: carbon_updated.append((exchange_name, current_block)),
+        all_pools_touched=False,
+    )
+    update_reverted_pools(mgr, 1, set(), 110)
+    assert updated == [] and carbon_updated == [] and not mgr.all_pools_touched
+
+    update_reverted_pools(mgr, 1, {"0xpool", "0xcontroller"}, 110)
+    assert updated == [("0xPool", 110)]
+    assert carbon_updated == [("carbon_v1", 110)]
+    assert mgr.all_pools_touched
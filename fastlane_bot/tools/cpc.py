@@ -8,11 +8,12 @@ Licensed under MIT
 NOTE: this class is not part of the API of the Carbon protocol, and you must expect breaking
 changes even in minor version updates. Use at your own risk.
 """
-__VERSION__ = "3.4"
-__DATE__ = "23/Jan/2024"
+__VERSION__ = "3.5"
+__DATE__ = "18/Oct/2026"
 
 from dataclasses import dataclass, field, asdict, InitVar
 from .simplepair import SimplePair as Pair
+from .tokenregistry import TOKENS
 from . import tokenscale as ts
 import random
 from math import sqrt
@@ -398,6 +399,7 @@ class ConstantProductCurve(CurveBase):
             super().__setattr__("pair", "TKNB/TKNQ")
 
         super().__setattr__("pairo", Pair(self.pair))
+        self._register_tokens()
 
         if self.isbigger(big=self.x_act, small=self.x):
             print(f"[ConstantProductCurve] x_act > x in {self.cid}", self.x_act, self.x)
@@ -409,6 +411,33 @@ class ConstantProductCurve(CurveBase):
 
         self.set_tokenscale(self.TOKENSCALE)
 
+    def _register_tokens(self):
+        """sets the token ids from the registry, and the tokens to the canonical registry strings"""
+        tknxid, tknyid = TOKENS.splitpair(self.pair)
+        super().__setattr__("_tknxid", tknxid)
+        super().__setattr__("_tknyid", tknyid)
+        super().__setattr__("_tknx", TOKENS.token(tknxid))
+        super().__setattr__("_tkny", TOKENS.token(tknyid))
+
+    _CACHED = ("_hash", "_arrayrow", "_tknxid", "_tknyid", "_tknx", "_tkny")
+
+    def __getstate__(self):
+        # the cached data is process specific (token ids, string hashes), so it is recalculated on unpickling
+        return {k: v for k, v in self.__dict__.items() if k not in self._CACHED}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._register_tokens()
+
+    def __hash__(self):
+        # curves are frozen, so the hash over the compared fields is only calculated once
+        h = self.__dict__.get("_hash")
+        if h is not None:
+            return h
+        h = hash((self.k, self.x, self.x_act, self.y_act, self.alpha, self.pair, self.cid, self.fee, self.descr))
+        super().__setattr__("_hash", h)
+        return h
+
     def P(self, pstr, defaultval=None):
         """
         convenience function to access parameters
@@ -498,6 +527,7 @@ class ConstantProductCurve(CurveBase):
         """sets the curve id [can only be done once]"""
         assert self.cid is None, "cid can only be set once"
         super().__setattr__("cid", cid)
+        self.__dict__.pop("_hash", None)
         return self
 
     class CPCValidationError(ValueError): pass
@@ -1178,17 +1208,27 @@ class ConstantProductCurve(CurveBase):
     @property
     def tknb(self):
         "base token"
-        return self.pair.split("/")[0]
+        return self._tknx
 
     tknx = tknb
 
     @property
     def tknq(self):
         "quote token"
-        return self.pair.split("/")[1]
+        return self._tkny
 
     tkny = tknq
 
+    @property
+    def tknxid(self):
+        "id of the base token in the token registry (see ``tokenregistry.TOKENS``)"
+        return self._tknxid
+
+    @property
+    def tknyid(self):
+        "id of the quote token in the token registry (see ``tokenregistry.TOKENS``)"
+        return self._tknyid
+
     @property
     def tknbp(self):
         """prettified base token"""
@@ -1379,6 +1419,30 @@ class ConstantProductCurve(CurveBase):
             return sqrt(self.k)
         return self.k**self.alpha
 
+    ARRAYROW_FIELDS = ("kbar", "x", "y", "xmin", "xmax", "ymin", "ymax", "alpha", "eta")
+
+    @property
+    def arrayrow(self):
+        """
+        the data of the curve used by array representations (see ``CurveTable``)
+
+        :returns:   tuple of the values of ``ARRAYROW_FIELDS`` (unbounded bounds are inf)
+
+        NOTE: curves are frozen, so the row is only calculated once; it raises an AssertionError
+        for curves whose bounds are not implemented (eg levered asymmetric curves)
+        """
+        row = self.__dict__.get("_arrayrow")
+        if row is not None:
+            return row
+        inf = lambda v: v if v is not None else float("inf")
+        row = (
+            self.kbar, self.x, self.y,
+            inf(self.x_min), inf(self.x_max), inf(self.y_min), inf(self.y_max),
+            self.alpha, self.eta,
+        )
+        super().__setattr__("_arrayrow", row)
+        return row
+
     def invariant(self, xvec=None, *, include_target=False):
         """
         returns the actual invariant of the curve (eg x*y for constant product)
@@ -1746,6 +1810,120 @@ class ConstantProductCurve(CurveBase):
         return digest(str(datastr).encode()).hexdigest()[:len]
 
 
+@dataclass
+class CurveTable:
+    """
+    struct-of-arrays representation of a sequence of curves (see ``CPCContainer.table``)
+
+    :curves:    tuple of the curves; row i of every array holds the data of curves[i]
+    :tokens:    tuple of the tokens of the curves; the token id of a token is its index in this tuple
+    :tokenid:   dict token -> token id
+    :regid:     registry id of each token in tokens (np.array of int; see ``tokenregistry.TOKENS``)
+    :tknx:      token id of tknx of each curve (np.array of int)
+    :tkny:      token id of tkny of each curve (np.array of int)
+    :sym:       True iff the curve is symmetric (np.array of bool)
+    :hasrow:    True iff the curve has an array row (np.array of bool; see ``ConstantProductCurve.arrayrow``)
+    :kbar...:   the ``ConstantProductCurve.ARRAYROW_FIELDS`` of each curve (np.arrays of float; nan if not hasrow)
+
+    NOTE: the arrays are built from the (cached) array rows of the curves, so building a table for curves
+    that are reused across blocks only costs the conversion to arrays
+    """
+
+    curves: tuple
+    tokens: tuple
+    tokenid: dict
+    regid: np.ndarray
+    tknx: np.ndarray
+    tkny: np.ndarray
+    sym: np.ndarray
+    hasrow: np.ndarray
+    kbar: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    xmin: np.ndarray
+    xmax: np.ndarray
+    ymin: np.ndarray
+    ymax: np.ndarray
+    alpha: np.ndarray
+    eta: np.ndarray
+
+    @classmethod
+    def from_curves(cls, curves):
+        """
+        creates the table of the curves
+
+        :curves:    iterable of ConstantProductCurve objects
+        """
+        curves = tuple(curves)
+        n = len(curves)
+        regids = np.array([c.tknxid for c in curves] + [c.tknyid for c in curves], dtype=int)
+        regid, ix = np.unique(regids, return_inverse=True)
+        tokens = tuple(TOKENS.token(i) for i in regid.tolist())
+        fields = ConstantProductCurve.ARRAYROW_FIELDS
+        nanrow = (np.nan,) * len(fields)
+        rows, hasrow = [], []
+        for c in curves:
+            try:
+                rows.append(c.arrayrow)
+                hasrow.append(True)
+            except AssertionError:
+                rows.append(nanrow)
+                hasrow.append(False)
+        data = np.array(rows, dtype=np.float64).reshape(len(curves), len(fields))
+        return cls(
+            curves=curves,
+            tokens=tokens,
+            tokenid={t: i for i, t in enumerate(tokens)},
+            regid=regid,
+            tknx=ix[:n],
+            tkny=ix[n:],
+            sym=np.array([c.is_symmetric() for c in curves], dtype=bool),
+            hasrow=np.array(hasrow, dtype=bool),
+            **{f: data[:, i] for i, f in enumerate(fields)},
+        )
+
+    def __len__(self):
+        return len(self.curves)
+
+    def tokenids(self, tkns):
+        """returns the token ids of tkns as np.array (tokens not in the table are dropped)"""
+        if isinstance(tkns, str):
+            tkns = (t.strip() for t in tkns.split(","))
+        return np.array([self.tokenid[t] for t in tkns if t in self.tokenid], dtype=int)
+
+    def mask(self, *, tknxs=None, tknys=None, tkns=None):
+        """
+        returns the boolean mask of the curves that match all conditions
+
+        :tknxs:     tknx must be in tknxs (None = no condition)
+        :tknys:     tkny must be in tknys (None = no condition)
+        :tkns:      both tknx and tkny must be in tkns (None = no condition)
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if tknxs is not None:
+            mask &= np.isin(self.tknx, self.tokenids(tknxs))
+        if tknys is not None:
+            mask &= np.isin(self.tkny, self.tokenids(tknys))
+        if tkns is not None:
+            ids = self.tokenids(tkns)
+            mask &= np.isin(self.tknx, ids) & np.isin(self.tkny, ids)
+        return mask
+
+    def select(self, mask):
+        """returns the list of curves selected by a boolean mask or an array of row indices"""
+        return [self.curves[i] for i in np.arange(len(self))[mask]]
+
+    def tokenix(self, tokens_ix):
+        """
+        returns the indices of tknx and tkny of each curve into another token vector
+
+        :tokens_ix:     dict token -> index into the token vector (must contain all tokens of the table)
+        :returns:       tuple (ixx, ixy) of np.arrays of int
+        """
+        remap = np.array([tokens_ix[t] for t in self.tokens], dtype=int)
+        return remap[self.tknx], remap[self.tkny]
+
+
 @dataclass
 class CPCContainer:
     """
@@ -1791,11 +1969,87 @@ class CPCContainer:
         self.curveix_by_curve = {c: i for i, c in enumerate(self.curves)}
         # self.curves_by_primary_pair = {c.pairo.primary: c for c in self.curves}
         self.curves_by_primary_pair = {}
+        self.curves_by_pair = {}
+        self.curves_by_tknx = {}
+        self.curves_by_tkny = {}
+        self.curves_by_exchange = {}
         for c in self.curves:
+            self._index_curve(c)
+        self._table = None
+        self._allpairids = None
+
+    @property
+    def table(self):
+        """
+        the CurveTable of the curves (built on first use after every change of the container)
+        """
+        if self._table is None:
+            self._table = CurveTable.from_curves(self.curves)
+        return self._table
+
+    def _index_keys(self, c):
+        """returns the (index, key) tuples under which c is held in the secondary indexes"""
+        return (
+            (self.curves_by_primary_pair, c.pairo.primary),
+            (self.curves_by_pair, c.pair),
+            (self.curves_by_tknx, c.tknx),
+            (self.curves_by_tkny, c.tkny),
+            (self.curves_by_exchange, c.P("exchange")),
+        )
+
+    def _index_curve(self, c):
+        """
+        adds c to the secondary (bucket) indexes
+
+        NOTE: buckets are dicts cid -> curve kept in container order; c must already be in
+        curveix_by_curve; a curve that comes after all curves of its bucket (eg a curve added to
+        the container) is added in O(1), any other curve needs an ordered insert into its bucket
+        """
+        ix = self.curveix_by_curve.get(c, None)
+        for index, key in self._index_keys(c):
             try:
-                self.curves_by_primary_pair[c.pairo.primary].append(c)
+                bucket = index[key]
             except KeyError:
-                self.curves_by_primary_pair[c.pairo.primary] = [c]
+                index[key] = {c.cid: c}
+                continue
+            if ix is None or self.curveix_by_curve.get(next(reversed(bucket.values())), -1) < ix:
+                bucket[self._bucket_key(bucket, c)] = c
+                continue
+            curves = list(bucket.values())
+            pos = next(
+                (i for i, c1 in enumerate(curves) if self.curveix_by_curve.get(c1, -1) > ix),
+                len(curves),
+            )
+            curves.insert(pos, c)
+            bucket.clear()
+            for c1 in curves:
+                bucket[self._bucket_key(bucket, c1)] = c1
+
+    def _unindex_curve(self, c):
+        """removes c from the secondary (bucket) indexes"""
+        for index, key in self._index_keys(c):
+            bucket = index.get(key, {})
+            bucket.pop(self._bucket_key(bucket, c), None)
+            if not bucket:
+                index.pop(key, None)
+
+    @staticmethod
+    def _bucket_key(bucket, c):
+        """
+        returns the key of c in bucket (whether or not c is in it)
+
+        NOTE: this is the cid of c, unless another curve with the same cid is held under it (the
+        container does not enforce unique cids), in which case it is (cid, id(c))
+        """
+        return c.cid if bucket.get(c.cid, c) is c else (c.cid, id(c))
+
+    def _byindex(self, index, keys):
+        """returns the curves held under any of keys in index, in container order"""
+        buckets = [index[k] for k in keys if k in index]
+        curves = (c for bucket in buckets for c in bucket.values())
+        if len(buckets) > 1:
+            return iter(sorted(curves, key=self.curveix_by_curve.__getitem__))
+        return curves
 
     TOKENSCALE = ts.TokenScale1Data
     # default token scale object is the trivial scale (everything one)
@@ -1866,10 +2120,63 @@ class CPCContainer:
         self.curveix_by_curve[item] = len(self)
         self.curves += [item]
         # print("[add] ", self.curves_by_primary_pair)
-        try:
-            self.curves_by_primary_pair[item.pairo.primary].append(item)
-        except KeyError:
-            self.curves_by_primary_pair[item.pairo.primary] = [item]
+        self._index_curve(item)
+        self._table = None
+        self._allpairids = None
+        return self
+
+    def replace(self, item):
+        """
+        replaces the curve with the same cid as item in place (or adds item if no such curve exists)
+
+        :item:      a ConstantProductCurve object with its cid set
+        :returns:   self
+
+        NOTE: the position of the replaced curve in the container is preserved, and so is its
+        position in the buckets of the secondary indexes if item falls into the same buckets, in
+        which case the replacement is O(1)
+        """
+        old = self.curves_by_cid.get(item.cid, None)
+        if old is None:
+            return self.add(item)
+        keys = self._index_keys(item)
+        same_buckets = [key for _, key in self._index_keys(old)] == [key for _, key in keys]
+        if not same_buckets:
+            self._unindex_curve(old)
+        ix = self.curveix_by_curve.pop(old)
+        self.curves[ix] = item
+        self.curves_by_cid[item.cid] = item
+        self.curveix_by_curve[item] = ix
+        if same_buckets and all(index[key].get(item.cid) is old for index, key in keys):
+            for index, key in keys:
+                index[key][item.cid] = item
+        else:
+            if same_buckets:
+                self._unindex_curve(old)
+            self._index_curve(item)
+        self._table = None
+        self._allpairids = None
+        return self
+
+    def remove(self, cids):
+        """
+        removes the curves with the given cids (the inverse of add)
+
+        :cids:      a single cid or an iterable of cids; unknown cids are ignored
+        :returns:   self
+        """
+        if isinstance(cids, str):
+            cids = [cids]
+        removed = [self.curves_by_cid.pop(cid) for cid in set(cids) if cid in self.curves_by_cid]
+        if not removed:
+            return self
+        for c in removed:
+            self._unindex_curve(c)
+        removed_ids = {id(c) for c in removed}
+        self.curves = [c for c in self.curves if id(c) not in removed_ids]
+        self.curveix_by_curve = {c: i for i, c in enumerate(self.curves)}
+        self._table = None
+        self._allpairids = None
         return self
 
     def price(self, tknb, tknq):
@@ -1878,7 +2185,7 @@ class CPCContainer:
         curves = self.curves_by_primary_pair.get(pairo.primary, None)
         if curves is None:
             return None
-        pp = sum(c.pp for c in curves) / len(curves)
+        pp = sum(c.pp for c in curves.values()) / len(curves)
         return pp if pairo.isprimary else 1 / pp
     
     PR_TUPLE = "tuple"
@@ -1939,7 +2246,7 @@ class CPCContainer:
     def tknys(self, curves=None):
         """returns set of all base tokens (tkny) used by the curves"""
         if curves is None:
-            curves = self.curves
+            return set(self.curves_by_tkny)
         return {c.tkny for c in curves}
 
     def tknyl(self, curves=None):
@@ -1951,7 +2258,7 @@ class CPCContainer:
     def tknxs(self, curves=None):
         """returns set of all quote tokens (tknx) used by the curves"""
         if curves is None:
-            curves = self.curves
+            return set(self.curves_by_tknx)
         return {c.tknx for c in curves}
 
     def tknxl(self, curves=None):
@@ -1992,9 +2299,9 @@ class CPCContainer:
                         canonical pair will be returned
         """
         if standardize:
-            return {c.pairo.primary for c in self}
+            return set(self.curves_by_primary_pair)
         else:
-            return {c.pair for c in self}
+            return set(self.curves_by_pair)
 
     def cids(self, *, asset=False):
         """returns list of all curve ids (as tuple, or set if asset=True)"""
@@ -2021,6 +2328,21 @@ class CPCContainer:
     FP_ANY = "any"
     FP_ALL = "all"
 
+    def _pairids(self, pairs=None):
+        """
+        returns the pairs and the registry ids of their tokens
+
+        :pairs:     iterable of pairs; if None, all (standardized) pairs are used, and the result is cached
+        :returns:   tuple (pairs as np.array of str, np.array of int of shape (len(pairs), 2))
+        """
+        if pairs is None:
+            if self._allpairids is None:
+                self._allpairids = self._pairids(self.pairs())
+            return self._allpairids
+        pairs = list(map(str, pairs))
+        ids = np.fromiter(it.chain.from_iterable(TOKENS.splitpairs(pairs)), dtype=int, count=2 * len(pairs))
+        return np.array(pairs, dtype=object), ids.reshape(-1, 2)
+
     def filter_pairs(self, pairs=None, *, anyall=FP_ALL, **conditions):
         """
         filters the pairs according to the target conditions(s)
@@ -2050,42 +2372,33 @@ class CPCContainer:
         =========   ========================================
         
         """
-        if pairs is None:
-            pairs = self.pairs()
         if not conditions:
-            return pairs
-        pairs = self.Pair.wrap(pairs)
+            return self.pairs() if pairs is None else pairs
+        pairs, ids = self._pairids(pairs)
         results = []
         for condition in conditions:
-            cpairs = self.pairset(conditions[condition])
+            # the conditions are evaluated on token ids; tokens that are not registered match no pair
+            cids = [TOKENS.ids[t] for t in self.pairset(conditions[condition]) if t in TOKENS]
+            inb, inq = np.isin(ids[:, 0], cids), np.isin(ids[:, 1], cids)
             condition0 = condition.split("_")[0]
             # print(f"condition: {condition} | {condition0} [{conditions[condition]}]")
             if condition0 == "bothin":
-                results += [
-                    {str(p) for p in pairs if p.tknb in cpairs and p.tknq in cpairs}
-                ]
+                mask = inb & inq
             elif condition0 == "contains" or condition0 == "onein":
-                results += [
-                    {str(p) for p in pairs if p.tknb in cpairs or p.tknq in cpairs}
-                ]
+                mask = inb | inq
             elif condition0 == "notin":
-                results += [
-                    {
-                        str(p)
-                        for p in pairs
-                        if p.tknb not in cpairs and p.tknq not in cpairs
-                    }
-                ]
+                mask = ~inb & ~inq
             elif condition0 == "tknbin":
-                results += [{str(p) for p in pairs if p.tknb in cpairs}]
+                mask = inb
             elif condition0 == "tknbnotin":
-                results += [{str(p) for p in pairs if p.tknb not in cpairs}]
+                mask = ~inb
             elif condition0 == "tknqin":
-                results += [{str(p) for p in pairs if p.tknq in cpairs}]
+                mask = inq
             elif condition0 == "tknqnotin":
-                results += [{str(p) for p in pairs if p.tknq not in cpairs}]
+                mask = ~inq
             else:
                 raise ValueError(f"unknown condition {condition}")
+            results += [set(pairs[mask])]
 
         # print(f"results: {results}")
         if anyall == self.FP_ANY:
@@ -2396,10 +2709,10 @@ class CPCContainer:
     
     def bypair(self, pair, *, directed=False, asgenerator=None, ascc=None):
         """returns all curves by (possibly directed) pair (as tuple, genator or CC object)"""
-        result = (c for c in self if c.pair == pair)
+        result = (c for c in self.curves_by_pair.get(pair, {}).values())
         if not directed:
-            pairr = "/".join(pair.split("/")[::-1])
-            result = it.chain(result, (c for c in self if c.pair == pairr))
+            pairr = TOKENS.reversepair(pair)
+            result = it.chain(result, (c for c in self.curves_by_pair.get(pairr, {}).values()))
         return self._convert(result, asgenerator=asgenerator, ascc=ascc)
 
     def bp(self, pair, *, directed=False, asgenerator=None, ascc=None):
@@ -2422,10 +2735,10 @@ class CPCContainer:
         else:
             pairs = set(pairs)
             if not directed:
-                rpairs = set(f"{q}/{b}" for b, q in (p.split("/") for p in pairs))
+                rpairs = {TOKENS.reversepair(p) for p in pairs}
                 # print("[CC] bypairs: adding reverse pairs", rpairs)
                 pairs = pairs.union(rpairs)
-            result = (c for c in self if c.pair in pairs)
+            result = self._byindex(self.curves_by_pair, pairs)
         return self._convert(result, asgenerator=asgenerator, ascc=ascc)
 
     def byparams(self, *, _asgenerator=None, _ascc=None, _inv=False, **params):
@@ -2446,6 +2759,8 @@ class CPCContainer:
         pname, pvalue = params_t[0]
         if _inv:
             result = (c for c in self if c.P(pname) != pvalue)
+        elif pname == "exchange":
+            result = self._byindex(self.curves_by_exchange, [pvalue])
         else:
             result = (c for c in self if c.P(pname) == pvalue)
         return self._convert(result, asgenerator=_asgenerator, ascc=_ascc)
@@ -2456,7 +2771,7 @@ class CPCContainer:
 
     def bytknx(self, tknx, *, asgenerator=None, ascc=None):
         """returns all curves by quote token tknx (tknq) (as tuple, generator or CC object)"""
-        result = (c for c in self if c.tknx == tknx)
+        result = (c for c in self.curves_by_tknx.get(tknx, {}).values())
         return self._convert(result, asgenerator=asgenerator, ascc=ascc)
 
     bytknq = bytknx
@@ -2468,14 +2783,14 @@ class CPCContainer:
         if isinstance(tknxs, str):
             tknxs = set(t.strip() for t in tknxs.split(","))
         tknxs = set(tknxs)
-        result = (c for c in self if c.tknx in tknxs)
+        result = self._byindex(self.curves_by_tknx, tknxs)
         return self._convert(result, asgenerator=asgenerator, ascc=ascc)
 
     bytknxs = bytknxs
 
     def bytkny(self, tkny, *, asgenerator=None, ascc=None):
         """returns all curves by base token tkny (tknb) (as tuple, generator or CC object)"""
-        result = (c for c in self if c.tkny == tkny)
+        result = (c for c in self.curves_by_tkny.get(tkny, {}).values())
         return self._convert(result, asgenerator=asgenerator, ascc=ascc)
 
     bytknb = bytkny
@@ -2487,7 +2802,7 @@ class CPCContainer:
         if isinstance(tknys, str):
             tknys = set(t.strip() for t in tknys.split(","))
         tknys = set(tknys)
-        result = (c for c in self if c.tkny in tknys)
+        result = self._byindex(self.curves_by_tkny, tknys)
         return self._convert(result, asgenerator=asgenerator, ascc=ascc)
 
     bytknys = bytknys
@@ -2783,7 +3098,7 @@ class CPCContainer:
         pairs = set(pairs)
 
         if not directed:
-            rpairs = set(f"{q}/{b}" for b, q in (p.split("/") for p in pairs))
+            rpairs = {TOKENS.reversepair(p) for p in pairs}
             # print("[CC] plot: adding reverse pairs", rpairs)
             pairs = pairs.union(rpairs)
 
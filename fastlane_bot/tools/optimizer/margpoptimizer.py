@@ -22,20 +22,30 @@ author is Stefan Loesch <stefan@bancor.network>
 (c) Copyright Bprotocol foundation 2023. 
 Licensed under MIT
 """
-__VERSION__ = "5.2"
-__DATE__ = "15/Sep/2023"
+__VERSION__ = "5.4"
+__DATE__ = "18/Oct/2026"
 
 from dataclasses import dataclass, field, fields, asdict, astuple, InitVar
 import pandas as pd
 import numpy as np
 
 import time
+import warnings
 # import math
 # import numbers
 # import pickle
-from ..cpc import ConstantProductCurve as CPC, CPCInverter, CPCContainer
+from ..cpc import ConstantProductCurve as CPC, CPCInverter, CPCContainer, CurveTable
+from ..tokenregistry import TOKENS
 #from sys import float_info
 
+try:
+    import scipy.sparse as sp
+    import scipy.sparse.linalg as spla
+except ImportError:
+    # scipy is only needed for the sparse Jacobian (see the sparse parameter of optimize); without
+    # it the Jacobian is always dense, which is fine for all but very large markets
+    sp = spla = None
+
 from .dcbase import DCBase
 from .base import OptimizerBase
 from .cpcarboptimizer import CPCArbOptimizer
@@ -83,11 +93,164 @@ class MargPOptimizer(CPCArbOptimizer):
 
     MOEPS = 1e-6
     MOMAXITER = 50
+    MOVECTORIZED = True
+    JAC_ANALYTIC = "analytic"
+    JAC_NUMERIC = "numeric"
+    MOJACOBIAN = JAC_ANALYTIC
+    MOSPARSEMIN = 200
     
     class OptimizationError(Exception): pass
     class ConvergenceError(OptimizationError): pass
     class ParameterError(OptimizationError): pass
 
+    @dataclass
+    class CurveArrays:
+        """
+        array representation of a set of curves for the vectorized target function
+
+        :ixx:       index of tknx of each curve into the price / token vector
+        :ixy:       index of tkny of each curve into the price / token vector
+        :kbar:      kbar of each curve
+        :x, y:      current (virtual) x and y of each curve
+        :xmin...:   bounds of (virtual) x and y of each curve (inf if unbounded)
+        :sym:       True iff the curve is symmetric (alpha=0.5)
+        :alpha:     alpha of each curve
+        :eta:       eta of each curve
+        :ntkns:     length of the token vector
+
+        NOTE: the curves are held in the order in which the (looping) target function sums them,
+        so that both produce numerically identical results
+        """
+        ixx: np.ndarray
+        ixy: np.ndarray
+        kbar: np.ndarray
+        x: np.ndarray
+        y: np.ndarray
+        xmin: np.ndarray
+        xmax: np.ndarray
+        ymin: np.ndarray
+        ymax: np.ndarray
+        sym: np.ndarray
+        alpha: np.ndarray
+        eta: np.ndarray
+        ntkns: int
+
+        @classmethod
+        def from_curves(cls, curves, tokens_ix):
+            """
+            packs the curves into arrays
+
+            :curves:        iterable of ConstantProductCurve objects
+            :tokens_ix:     dict token -> index into the price / token vector
+            """
+            table = CurveTable.from_curves(curves)
+            assert table.hasrow.all(), "curves without array rows (eg levered asymmetric curves)"
+            ixx, ixy = table.tokenix(tokens_ix)
+            return cls(
+                ixx = ixx,
+                ixy = ixy,
+                kbar = table.kbar,
+                x = table.x,
+                y = table.y,
+                xmin = table.xmin,
+                xmax = table.xmax,
+                ymin = table.ymin,
+                ymax = table.ymax,
+                sym = table.sym,
+                alpha = table.alpha,
+                eta = table.eta,
+                ntkns = len(tokens_ix),
+            )
+
+        def _xyfromp_f(self, p):
+            """
+            calculates x, y of all curves for the given curve prices, ignoring the bounds
+
+            :p:         np.array of curve prices (in dy/dx)
+            :returns:   tuple (x, y) of np.arrays
+            """
+            sqrt_p = np.sqrt(p)
+            if not sqrt_p[self.sym].all():
+                # as in ConstantProductCurve.xyfromp_f
+                raise ZeroDivisionError("float division by zero")
+            x = self.kbar / sqrt_p
+            y = self.kbar * sqrt_p
+            if not self.sym.all():
+                # asymmetric curves use scalar powers so that results are bit-identical to
+                # ConstantProductCurve.xyfromp_f
+                for i in np.flatnonzero(~self.sym):
+                    p_, eta, alpha, kbar = p[i], self.eta[i], self.alpha[i], self.kbar[i]
+                    x[i] = (eta/p_)**(1-alpha) * kbar
+                    y[i] = (p_/eta)**alpha * kbar
+            return x, y
+
+        def dxdyfromp_f(self, pfull):
+            """
+            calculates dx, dy of all curves for the given price vector
+
+            :pfull:     price vector (np.array) over the full token vector
+            :returns:   tuple (dx, dy) of np.arrays
+            """
+            return self.dxdyfromcurvep_f(pfull[self.ixx] / pfull[self.ixy])
+
+        def dxdyfromcurvep_f(self, p):
+            """
+            calculates dx, dy of all curves for the given curve prices (see ConstantProductCurve.dxdyfromp_f)
+
+            :p:         np.array of curve prices (in dy/dx)
+            :returns:   tuple (dx, dy) of np.arrays
+            """
+            x, y = self._xyfromp_f(p)
+            x = np.minimum(np.maximum(x, self.xmin), self.xmax)
+            y = np.minimum(np.maximum(y, self.ymin), self.ymax)
+            return x - self.x, y - self.y
+
+        def jacobian(self, pfull, *, sparse=False):
+            """
+            calculates the Jacobian of dtknfromp_f with respect to the log10 prices
+
+            :pfull:     price vector (np.array) over the full token vector
+            :sparse:    if True, return the Jacobian as scipy.sparse csc matrix (requires scipy)
+            :returns:   np.array of shape (ntkns, ntkns) where J[i, j] = d dtkn_i / d log10 p_j
+
+            NOTE: x(p) = kbar (eta/p)^(1-alpha) and y(p) = kbar (p/eta)^alpha, hence
+            dx/dln p = -(1-alpha) x and dy/dln p = alpha y; curves stuck at a bound contribute
+            zero; the curve price is p = p_tknx / p_tkny, hence dln p / dlog10 p_tknx = ln(10)
+            and dln p / dlog10 p_tkny = -ln(10)
+            """
+            x, y = self._xyfromp_f(pfull[self.ixx] / pfull[self.ixy])
+            ln10 = np.log(10)
+            gx = np.where((x < self.xmin) | (x > self.xmax), 0, -(1-self.alpha) * x * ln10)
+            gy = np.where((y < self.ymin) | (y > self.ymax), 0, self.alpha * y * ln10)
+            n = self.ntkns
+            if sparse:
+                # duplicate entries are summed on conversion
+                return sp.csc_matrix((
+                    np.concatenate((gx, -gx, gy, -gy)),
+                    (
+                        np.concatenate((self.ixx, self.ixx, self.ixy, self.ixy)),
+                        np.concatenate((self.ixx, self.ixy, self.ixx, self.ixy)),
+                    )), shape=(n, n))
+            ix = np.concatenate((
+                self.ixx * n + self.ixx, self.ixx * n + self.ixy,
+                self.ixy * n + self.ixx, self.ixy * n + self.ixy,
+            ))
+            jac = np.bincount(ix, weights=np.concatenate((gx, -gx, gy, -gy)), minlength=n*n)
+            return jac.reshape(n, n)
+
+        def dtknfromp_f(self, pfull):
+            """
+            calculates the aggregate change in token amounts for the given price vector
+
+            :pfull:     price vector (np.array) over the full token vector
+            :returns:   np.array of the aggregate change for every token in the token vector
+            """
+            dx, dy = self.dxdyfromp_f(pfull)
+            # bincount sums sequentially in the order dx0, dy0, dx1, dy1, ...
+            ix = np.stack((self.ixx, self.ixy), axis=1).ravel()
+            dxdy = np.stack((dx, dy), axis=1).ravel()
+            return np.bincount(ix, weights=dxdy, minlength=self.ntkns)
+
     def optimize(self, sfc=None, result=None, *, params=None):
         """
         optimal transactions across all curves in the optimizer, extracting targettkn (1)
@@ -128,6 +291,10 @@ class MargPOptimizer(CPCArbOptimizer):
         debug2              more debug output
         raiseonerror        if True, raise an OptimizationError exception on error
         pstart              starting price for optimization (3)
+        vectorized          if True (default: MOVECTORIZED), evaluate the target function on arrays (4)
+        jacobian            JAC_ANALYTIC or JAC_NUMERIC (default: MOJACOBIAN) (5)
+        sparse              if True, use a sparse Jacobian and solver (6); if None (default), only
+                            if there are at least MOSPARSEMIN tokens and scipy is installed
         ==================  =========================================================================
             
 
@@ -142,6 +309,17 @@ class MargPOptimizer(CPCArbOptimizer):
         NOTE 3: can be provided either as dict {tkn:p, ...}, or as df as price estimate as 
         returned by MO_PSTART; excess tokens can be provided but all required tokens 
         must be present
+
+        NOTE 4: the vectorized target function produces results that are numerically identical to
+        the (looping) default; the looping version is always used when debug or debug2 are set
+
+        NOTE 5: the analytic Jacobian sums the closed-form derivatives of x(p) and y(p) of all curves
+        (constant product, Carbon and Uniswap v3 ranges, asymmetric); the numeric one uses finite
+        differences, which is also the fallback for curve types without array support
+
+        NOTE 6: every curve only contributes to the four entries of the Jacobian of its two tokens,
+        so for a large market the Jacobian is mostly zeros; the sparse version is only built with
+        the analytic Jacobian, and it is solved with scipy.sparse.linalg.spsolve (lsqr if singular)
         """
         # data conversion: string to SFC object; note that anything but pure arb not currently supported
         if isinstance(sfc, str):
@@ -164,9 +342,10 @@ class MargPOptimizer(CPCArbOptimizer):
         tokens_t = tuple(t for t in alltokens_s if t != targettkn) # all _other_ tokens...
         tokens_ix = {t: i for i, t in enumerate(tokens_t)}         # ...with index lookup
         pairs = self.curve_container.pairs(standardize=False)
-        curves_by_pair = { 
-            pair: tuple(c for c in curves_t if c.pair == pair) for pair in pairs }
-        pairs_t = tuple(tuple(p.split("/")) for p in pairs)
+        curves_by_pair = {
+            pair: tuple(curves_t.curves_by_pair[pair].values()) for pair in pairs }      # container index, in container order
+        pairs_t = tuple(
+            (TOKENS.token(b), TOKENS.token(q)) for b, q in map(TOKENS.splitpair, pairs)) # cached pair parsing
         
         try:
         
@@ -297,6 +476,59 @@ class MargPOptimizer(CPCArbOptimizer):
                 return np.array(result)
             ## END INNER FUNCTION
 
+            ## VECTORIZED TARGET FUNCTION
+            vectorized = P("vectorized") if P("vectorized") is not None else self.MOVECTORIZED
+            vectorized = vectorized and not (P("debug") or P("debug2"))
+            jacobian = P("jacobian") or self.MOJACOBIAN
+            if not jacobian in (self.JAC_ANALYTIC, self.JAC_NUMERIC):
+                raise self.ParameterError(f"unknown jacobian {jacobian}")
+            sparse = P("sparse")
+            if sparse is None:
+                sparse = sp is not None and len(tokens_t) >= self.MOSPARSEMIN
+                if sp is None and len(tokens_t) >= self.MOSPARSEMIN:
+                    warnings.warn(
+                        f"[margp_optimizer] scipy is not installed, using a dense Jacobian for markets of "
+                        f"{self.MOSPARSEMIN} tokens or more", RuntimeWarning)
+            elif sparse and sp is None:
+                raise self.ParameterError("the sparse Jacobian requires scipy")
+            curve_arrays = None
+            alltokens_ix = {**tokens_ix, targettkn: len(tokens_t)}
+            if vectorized or jacobian == self.JAC_ANALYTIC:
+                try:
+                    curve_arrays = self.CurveArrays.from_curves(
+                        (c for pair in pairs for c in curves_by_pair[pair]), alltokens_ix)
+                except AssertionError:
+                    # curve types without array support (eg levered asymmetric) use the loop
+                    pass
+            
+            if vectorized and curve_arrays is not None:
+                def dtknfromp_f(p, *, islog10=True, asdct=False, quiet=False):
+                    """
+                    vectorized version of the target function dtknfromp_f (same signature)
+                    """
+                    p = np.array(p, dtype=np.float64)
+                    if islog10:
+                        p = np.exp(p * np.log(10))
+                    assert len(p) == len(tokens_t), f"p and tokens_t have different lengths [{p}, {tokens_t}]"
+                    dtkn = curve_arrays.dtknfromp_f(np.append(p, 1.))
+                    result = dtkn[:-1]
+                    if asdct:
+                        sum_by_tkn = {t: float(dtkn[alltokens_ix[t]]) for t in alltokens_s}
+                        return sum_by_tkn, result
+                    return result
+            ## END VECTORIZED TARGET FUNCTION
+
+            ## JACOBIAN
+            if jacobian == self.JAC_ANALYTIC and curve_arrays is not None:
+                def jacobian_f(plog10):
+                    """analytic Jacobian of dtknfromp_f at plog10 (log10 prices)"""
+                    p = np.exp(np.array(plog10, dtype=np.float64) * np.log(10))
+                    return curve_arrays.jacobian(np.append(p, 1.), sparse=sparse)[:-1, :-1]
+            else:
+                # curve types without an analytic Jacobian use finite differences
+                jacobian_f = lambda plog10: self.J(dtknfromp_f, plog10)
+            ## END JACOBIAN
+
             # return the inner function if requested
             if result == self.MO_DTKNFROMPF:
                 return dtknfromp_f
@@ -314,6 +546,7 @@ class MargPOptimizer(CPCArbOptimizer):
                     targettkn=targettkn,
                     pairs_t=pairs_t,
                     dtknfromp_f=dtknfromp_f,
+                    jacobian_f=jacobian_f,
                     optimizer=self,
                 )
 
@@ -348,7 +581,7 @@ class MargPOptimizer(CPCArbOptimizer):
                 # calculate the Jacobian
                 # if P("debug"):
                 #     print("\n[margp_optimizer] ============= JACOBIAN =============>>>")
-                J = self.J(dtknfromp_f, plog10)  
+                J = jacobian_f(plog10)
                     # ATTENTION: dtknfromp_f takes log10(p) as input
                 if P("debug"):
                     # print("==== J ====>")
@@ -358,14 +591,31 @@ class MargPOptimizer(CPCArbOptimizer):
                     print("<<<============= JACOBIAN =============\n")
                 
                 # Update p, dtkn using the Newton-Raphson formula
-                try:
-                    dplog10 = np.linalg.solve(J, -dtkn)
-                except np.linalg.LinAlgError:
-                    if P("verbose") or P("debug"):
-                        print("[margp_optimizer] singular Jacobian, using lstsq instead")
-                    dplog10 = np.linalg.lstsq(J, -dtkn, rcond=None)[0]
-                    # https://numpy.org/doc/stable/reference/generated/numpy.linalg.solve.html
-                    # https://numpy.org/doc/stable/reference/generated/numpy.linalg.lstsq.html
+                if sp is not None and sp.issparse(J):
+                    # tokens whose curves are all at a bound have a zero row and column in J; as
+                    # with lstsq, their prices are left unchanged and the others are solved for
+                    absJ = abs(J)
+                    active = (absJ.sum(axis=0).A1 > 0) & (absJ.sum(axis=1).A1 > 0)
+                    dplog10 = np.zeros(len(dtkn))
+                    with warnings.catch_warnings():
+                        # spsolve warns (and returns nan) if J is singular
+                        warnings.simplefilter("ignore", spla.MatrixRankWarning)
+                        # the structure of J is symmetric, hence the ordering of A^T + A
+                        dplog10[active] = spla.spsolve(
+                            J[active][:, active], -dtkn[active], permc_spec="MMD_AT_PLUS_A")
+                    if not np.isfinite(dplog10).all():
+                        if P("verbose") or P("debug"):
+                            print("[margp_optimizer] singular Jacobian, using lsqr instead")
+                        dplog10 = spla.lsqr(J, -dtkn, atol=1e-12, btol=1e-12)[0]
+                else:
+                    try:
+                        dplog10 = np.linalg.solve(J, -dtkn)
+                    except np.linalg.LinAlgError:
+                        if P("verbose") or P("debug"):
+                            print("[margp_optimizer] singular Jacobian, using lstsq instead")
+                        dplog10 = np.linalg.lstsq(J, -dtkn, rcond=None)[0]
+                        # https://numpy.org/doc/stable/reference/generated/numpy.linalg.solve.html
+                        # https://numpy.org/doc/stable/reference/generated/numpy.linalg.lstsq.html
                 
                 # update log prices, prices and determine the criterium...
                 p0log10 = [*plog10]
@@ -13,8 +13,8 @@ The corresponding author is Stefan Loesch <stefan@bancor.network>
 (c) Copyright Bprotocol foundation 2023. 
 Licensed under MIT
 """
-__VERSION__ = "6.0.1"
-__DATE__ = "21/Sep/2023"
+__VERSION__ = "6.1"
+__DATE__ = "18/Oct/2026"
 
 from dataclasses import dataclass, field, fields, asdict, astuple, InitVar
 #import pandas as pd
@@ -30,6 +30,7 @@ from ..cpc import ConstantProductCurve as CPC, CPCInverter, CPCContainer
 from .dcbase import DCBase
 from .base import OptimizerBase
 from .cpcarboptimizer import CPCArbOptimizer
+from .margpoptimizer import MargPOptimizer
 
 class PairOptimizer(CPCArbOptimizer):
     """
@@ -168,6 +169,7 @@ class PairOptimizer(CPCArbOptimizer):
     #         return CPCArbOptimizer.TradeInstruction.to_format(result, ti_format=ti_format)
 
     PAIROPTIMIZEREPS = 1e-15
+    GOALSEEKMAXITER = 200 # as in OptimizerBase.goalseek
 
     SO_DXDYVECFUNC = "dxdyvecfunc"
     SO_DXDYSUMFUNC = "dxdysumfunc"
@@ -257,32 +259,58 @@ class PairOptimizer(CPCArbOptimizer):
             method = "globalmax-pair"
         
         elif result == self.SO_TARGETTKN:
-            p_min = np.min([c.p for c in curves_t])
-            p_max = np.max([c.p for c in curves_t])
             eps = params.get("eps", self.PAIROPTIMIZEREPS)
-            
-            assert targettkn in {c0.tknx, c0.tkny,}, f"targettkn {targettkn} not in {c0.tknx}, {c0.tkny}"
+            a, b, ix = self._targettkn_bounds(curves_t, targettkn)
             
             # we are now running a goalseek == 0 on the token that is NOT the target token
-            if targettkn == c0.tknx:
-                func = lambda p: dxdyfromp_sum_f(p)[1]
-                p_optimal = self.goalseek(func, p_min * 0.99, p_max * 1.01, eps=eps)
-                p_optimal_t = (1/float(p_optimal),)
-                full_result = dxdyfromp_sum_f(float(p_optimal))
-                opt_result  = full_result[0]
-                
-            else:
-                func = lambda p: dxdyfromp_sum_f(p)[0]
-                p_optimal = self.goalseek(func, p_min * 0.99, p_max * 1.01, eps=eps)
-                p_optimal_t = (float(p_optimal),)
-                full_result = dxdyfromp_sum_f(float(p_optimal))
-                opt_result = full_result[1]
+            func = lambda p: dxdyfromp_sum_f(p)[ix]
+            p_optimal = self.goalseek(func, a, b, eps=eps)
+            p_optimal_t, full_result, opt_result = self._targettkn_optimum(targettkn, c0, p_optimal, dxdyfromp_sum_f)
             #print("[PairOptimizer.optimize] p_optimal", p_optimal, "full_result", full_result)
             method = "margp-pair"
         
         else:
             raise ValueError(f"unknown result type {result}")
 
+        return self._margp_result(
+            method, targettkn, curves_t, p_optimal, p_optimal_t, full_result, opt_result, start_time
+        )
+
+    @staticmethod
+    def _targettkn_bounds(curves_t, targettkn):
+        """
+        returns the bracket of the goal seek of optimize(targettkn)
+
+        :curves_t:      the curves, wrapped in CPCInverter objects
+        :returns:       tuple (a, b, ix); the goal seek is dxdyfromp_sum_f(p)[ix] == 0 for p in [a, b]
+        """
+        c0 = curves_t[0]
+        p_min = np.min([c.p for c in curves_t])
+        p_max = np.max([c.p for c in curves_t])
+        assert targettkn in {c0.tknx, c0.tkny,}, f"targettkn {targettkn} not in {c0.tknx}, {c0.tkny}"
+        ix = 1 if targettkn == c0.tknx else 0
+        return p_min * 0.99, p_max * 1.01, ix
+
+    @staticmethod
+    def _targettkn_optimum(targettkn, c0, p_optimal, dxdyfromp_sum_f):
+        """
+        returns p_optimal_t, full_result and opt_result of optimize(targettkn) for the goal seek result p_optimal
+        """
+        if targettkn == c0.tknx:
+            p_optimal_t = (1/float(p_optimal),)
+            full_result = dxdyfromp_sum_f(float(p_optimal))
+            opt_result  = full_result[0]
+        else:
+            p_optimal_t = (float(p_optimal),)
+            full_result = dxdyfromp_sum_f(float(p_optimal))
+            opt_result = full_result[1]
+        return p_optimal_t, full_result, opt_result
+
+    def _margp_result(self, method, targettkn, curves_t, p_optimal, p_optimal_t, full_result, opt_result, start_time):
+        """
+        returns the MargpOptimizerResult of optimize
+        """
+        c0 = curves_t[0]
         NOMR = lambda x: x
             # allows to mask certain long portions of the result if desired, the same way
             # the main margpoptimizer does it; however, this not currently considered necessary
@@ -315,4 +343,133 @@ class PairOptimizer(CPCArbOptimizer):
             tokens_t=(c0.tknx if targettkn==c0.tkny else c0.tkny,),
             n_iterations=None, # not available
         )
-    
\ No newline at end of file
+    
+
+    @classmethod
+    def optimize_batch(cls, problems, *, params=None):
+        """
+        optimizes many independent single pair problems at once (batch version of optimize(targettkn))
+
+        :problems:      iterable of tuples (curves, targettkn); curves is a CPCContainer or an iterable of
+                        curves on a single pair, and targettkn must be one of the tokens of that pair
+        :params:        dict of parameters (see optimize; only eps is used)
+        :returns:       list of results, one per problem: the result of a problem is the same as that of
+                        cls(CPCContainer(curves)).optimize(targettkn, params=params), or the exception that
+                        this call raises (1)
+
+        NOTE 1: the curves of all problems are packed into arrays (see MargPOptimizer.CurveArrays), and the
+        bisections of all problems run in lockstep, with a single vectorized evaluation of the goal seek
+        functions of all problems per step; the function values are summed curve by curve in the same
+        order as in optimize, so that the bisection steps, and hence the results, are identical to those
+        of the scalar goal seek; problems that can not be packed (eg levered asymmetric curves) or that
+        have a degenerate bracket (eg a zero price) are solved one by one with optimize
+        """
+        start_time = time.time()
+        if params is None:
+            params = dict()
+        eps = params.get("eps", cls.PAIROPTIMIZEREPS)
+
+        results = []
+        setups = []
+        for curves, targettkn in problems:
+            try:
+                O = cls(curves if isinstance(curves, CPCContainer) else CPCContainer(curves))
+                dxdyfromp_sum_f = O.optimize(targettkn, cls.SO_DXDYSUMFUNC)
+                curves_t = CPCInverter.wrap(O.curve_container)
+                a, b, ix = O._targettkn_bounds(curves_t, targettkn)
+            except Exception as e:
+                results += [e]
+                continue
+            results += [None]
+            try:
+                [c.arrayrow for c in O.curve_container]
+                assert 0 < a <= b < np.inf
+            except AssertionError:
+                try:
+                    results[-1] = O.optimize(targettkn, params=params)
+                except Exception as e:
+                    results[-1] = e
+                continue
+            setups += [(len(results) - 1, O, targettkn, curves_t, dxdyfromp_sum_f, a, b, ix)]
+
+        if len(setups) == 0:
+            return results
+
+        # the curves of all problems, and the problem, position and orientation of each curve
+        problem_ix, column_ix, inverted, takedy = [], [], [], []
+        for k, (_, O, _, curves_t, _, _, _, ix) in enumerate(setups):
+            problem_ix += [k] * len(curves_t)
+            column_ix += range(len(curves_t))
+            inverted += [isinstance(c, CPCInverter) for c in curves_t]
+            takedy += [ix == 1] * len(curves_t)
+        curves = CPCInverter.unwrap(c for _, _, _, curves_t, _, _, _, _ in setups for c in curves_t)
+        tokens_ix = {t: i for i, t in enumerate(dict.fromkeys(t for c in curves for t in (c.tknx, c.tkny)))}
+        arrays = MargPOptimizer.CurveArrays.from_curves(curves, tokens_ix)
+        problem_ix, column_ix = np.array(problem_ix), np.array(column_ix)
+        inverted, takedy = np.array(inverted), np.array(takedy)
+        # the CPCInverter swaps dx and dy, and ix selects dx or dy of the (inverted) curve
+        dxmask = inverted == takedy
+        nproblems, ncolumns = len(setups), column_ix.max() + 1
+
+        def func(p):
+            """the goal seek functions of all problems, at the prices p (np.array)"""
+            pc = p[problem_ix]
+            dx, dy = arrays.dxdyfromcurvep_f(np.where(inverted, 1 / pc, pc))
+            dtkn = np.zeros((nproblems, ncolumns))
+            dtkn[problem_ix, column_ix] = np.where(dxmask, dx, dy)
+            total = dtkn[:, 0].copy()
+            for j in range(1, ncolumns):
+                total += dtkn[:, j]
+            return total
+
+        # the bisection of OptimizerBase.goalseek, run on all problems at once
+        a = np.array([setup[5] for setup in setups], dtype=np.float64)
+        b = np.array([setup[6] for setup in setups], dtype=np.float64)
+        fa, fb = func(a), func(b)
+        p_optimal = [None] * nproblems
+        for k in np.flatnonzero(fa * fb > 0):
+            p_optimal[k] = cls.SimpleResult(
+                result=None,
+                errormsg=f"function must have different signs at a,b [{a[k]}, {b[k]}, {fa[k]} {fb[k]}]",
+                method="bisection",
+            )
+        done = fa * fb > 0
+        counter = 0
+        while True:
+            active = ~done & (b/a-1 > eps)
+            for k in np.flatnonzero(~done & ~active):
+                p_optimal[k] = cls.SimpleResult(result=(a[k] + b[k]) / 2, method="bisection")
+            done |= ~active
+            if not active.any():
+                break
+            c = (a + b) / 2
+            fc = func(c)
+            for k in np.flatnonzero(active & (fc == 0)):
+                p_optimal[k] = cls.SimpleResult(result=c[k], method="bisection")
+            done |= active & (fc == 0)
+            active &= fc != 0
+            left = active & (fa * fc < 0)
+            right = active & ~left
+            b = np.where(left, c, b)
+            a = np.where(right, c, a)
+            fa = np.where(right, fc, fa)
+            counter += 1
+            if counter > cls.GOALSEEKMAXITER:
+                for k in np.flatnonzero(active):
+                    p_optimal[k] = ValueError(f"goalseek did not converge; possible epsilon too small [{eps}]")
+                done |= active
+
+        for k, (i, O, targettkn, curves_t, dxdyfromp_sum_f, _, _, _) in enumerate(setups):
+            if isinstance(p_optimal[k], Exception):
+                results[i] = p_optimal[k]
+                continue
+            try:
+                p_optimal_t, full_result, opt_result = O._targettkn_optimum(
+                    targettkn, curves_t[0], p_optimal[k], dxdyfromp_sum_f
+                )
+                results[i] = O._margp_result(
+                    "margp-pair", targettkn, curves_t, p_optimal[k], p_optimal_t, full_result, opt_result, start_time
+                )
+            except Exception as e:
+                results[i] = e
+        return results
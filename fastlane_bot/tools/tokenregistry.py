@@ -0,0 +1,131 @@
+"""
+registry of tokens that gives every token a small integer id, used by cpc and the optimizers
+
+---
+(c) Copyright Bprotocol foundation 2023-24.
+Licensed under MIT
+
+NOTE: this class is not part of the API of the Carbon protocol, and you must expect breaking
+changes even in minor version updates. Use at your own risk.
+"""
+__VERSION__ = "1.0"
+__DATE__ = "18/Oct/2026"
+
+from dataclasses import dataclass, field
+
+
+@dataclass
+class TokenRegistry:
+    """
+    registry of tokens (eg WETH-6Cc2) that gives every token a small integer id
+
+    :tokens:    list of the registered tokens; the id of a token is its index in this list
+    :ids:       dict token -> id (not an init parameter)
+
+    NOTE 1: ids are assigned in order of registration and never change, so they can be used as
+    indices into arrays and as cheap dict keys; the registered token strings are canonical (ie
+    all curves on the same token share the same string object)
+
+    NOTE 2: the pair helpers (splitpair, sortedpair, reversepair) cache their results by pair
+    string, as the same pairs are parsed over and over in the hot loops; the strings are only
+    rendered again at the logging and encoding boundaries
+    """
+
+    __VERSION__ = __VERSION__
+    __DATE__ = __DATE__
+
+    tokens: list = field(default_factory=list)
+    ids: dict = field(init=False)
+
+    def __post_init__(self):
+        tokens = self.tokens
+        self.tokens = []
+        self.ids = {}
+        self._names = []
+        self._pairs = {}
+        self._reversed = {}
+        self._sorted = {}
+        for tkn in tokens:
+            self.id(tkn)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __contains__(self, tkn):
+        return tkn in self.ids
+
+    def id(self, tkn):
+        """returns the id of tkn, registering it if need be"""
+        tid = self.ids.get(tkn)
+        if tid is None:
+            tid = self.ids[tkn] = len(self.tokens)
+            self.tokens.append(tkn)
+            self._names.append(tkn.split("-")[0].split("(")[0])
+        return tid
+
+    def idl(self, tkns):
+        """returns the list of ids of tkns (list or comma-separated string), registering them if need be"""
+        if isinstance(tkns, str):
+            tkns = (t.strip() for t in tkns.split(","))
+        return [self.id(t) for t in tkns]
+
+    def token(self, tid):
+        """returns the (canonical) token string of the id tid"""
+        return self.tokens[tid]
+
+    def canonical(self, tkn):
+        """returns the canonical string object of tkn, registering it if need be"""
+        return self.tokens[self.id(tkn)]
+
+    def name(self, tid):
+        """returns the normalized name of the token with id tid (eg WETH-6Cc2 -> WETH)"""
+        return self._names[tid]
+
+    def splitpair(self, pair):
+        """
+        returns the ids of the tokens of a pair
+
+        :pair:      pair string in notation TKNB/TKNQ
+        :returns:   tuple (tknb id, tknq id)
+        """
+        result = self._pairs.get(pair)
+        if result is None:
+            tknb, tknq = pair.split("/")
+            result = self._pairs[pair] = (self.id(tknb), self.id(tknq))
+        return result
+
+    def splitpairs(self, pairs):
+        """returns the list of the token id tuples of pairs (see splitpair)"""
+        result = list(map(self._pairs.get, pairs))
+        if None in result:
+            result = [r or self.splitpair(pair) for r, pair in zip(result, pairs)]
+        return result
+
+    def pairstr(self, tknbid, tknqid):
+        """returns the pair string TKNB/TKNQ of the token ids tknbid and tknqid"""
+        return f"{self.tokens[tknbid]}/{self.tokens[tknqid]}"
+
+    def pairkey(self, pair):
+        """returns the undirected key of a pair, ie the sorted tuple of its token ids"""
+        b, q = self.splitpair(pair)
+        return (b, q) if b <= q else (q, b)
+
+    def reversepair(self, pair):
+        """returns the reversed pair string TKNQ/TKNB"""
+        result = self._reversed.get(pair)
+        if result is None:
+            b, q = self.splitpair(pair)
+            result = self._reversed[pair] = self.pairstr(q, b)
+        return result
+
+    def sortedpair(self, pair):
+        """returns the pair string with its tokens sorted alphabetically (eg for undirected lookups)"""
+        result = self._sorted.get(pair)
+        if result is None:
+            b, q = self.splitpair(pair)
+            result = self._sorted[pair] = self.pairstr(b, q) if self.tokens[b] <= self.tokens[q] else self.pairstr(q, b)
+        return result
+
+
+TOKENS = TokenRegistry()
+"""the default registry, used by the curves and the optimizers"""
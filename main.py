@@ -5,7 +5,9 @@ This is the main file for configuring the bot and running the fastlane bot.
 (c) Copyright Bprotocol foundation 2023.
 Licensed under MIT
 """
+from fastlane_bot.events.block_stream import BlockStream
 from fastlane_bot.events.event_gatherer import EventGatherer
+from fastlane_bot.events.log_cache import LogCache
 from fastlane_bot.exceptions import ReadOnlyException, FlashloanUnavailableException
 from fastlane_bot.events.version_utils import check_version_requirements
 from fastlane_bot.pool_finder import PoolFinder
@@ -19,17 +21,20 @@ from traceback import format_exc
 
 import pandas as pd
 from dotenv import load_dotenv
-from web3 import Web3, HTTPProvider
+from web3 import AsyncWeb3, Web3, HTTPProvider, WebsocketProviderV2
 
 from fastlane_bot import __version__ as bot_version
+from fastlane_bot.helpers import CurveCache, SolutionCache
 from fastlane_bot.events.async_backdate_utils import (
     async_handle_initial_iteration,
 )
 from fastlane_bot.events.async_event_update_utils import (
     async_update_pools_from_contracts,
 )
+from fastlane_bot.events.journal import PoolJournal
 from fastlane_bot.events.managers.manager import Manager
 from fastlane_bot.events.multicall_utils import multicall_every_iteration
+from fastlane_bot.events.snapshot import PoolSnapshot
 from fastlane_bot.events.utils import (
     add_initial_pool_data,
     get_static_data,
@@ -39,13 +44,21 @@ from fastlane_bot.events.utils import (
     get_config,
     get_loglevel,
     update_pools_from_events,
+    update_reverted_pools,
     process_new_events,
     write_pool_data_to_disk,
+    write_pool_snapshot,
+    read_pool_snapshot,
+    write_pool_journal,
+    read_pool_journal,
     init_bot,
     get_cached_events,
     handle_subsequent_iterations,
     handle_duplicates,
     get_latest_events,
+    stream_latest_events,
+    filter_latest_events,
+    save_events_to_json,
     get_start_block,
     set_network_to_mainnet_if_replay,
     set_network_to_tenderly_if_replay,
@@ -80,6 +93,7 @@ def process_arguments(args):
     transformations = {
         "backdate_pools": is_true,
         "n_jobs": int,
+        "solver_n_jobs": int,
         "polling_interval": int,
         "alchemy_max_block_fetch": int,
         "reorg_delay": int,
@@ -96,6 +110,17 @@ def process_arguments(args):
         "read_only": is_true,
         "is_args_test": is_true,
         "pool_finder_period": int,
+        "curve_rebuild_period": int,
+        "dirty_pairs_only": is_true,
+        "full_sweep_period": int,
+        "warm_start": is_true,
+        "pipeline": is_true,
+        "max_log_requests": int,
+        "push_mode": is_true,
+        "multicall_touched_only": is_true,
+        "multicall_refresh_period": int,
+        "journal_compaction_period": int,
+        "journal_max_checkpoints": int,
     }
 
     # Apply the transformations
@@ -211,6 +236,7 @@ def main(args: argparse.Namespace) -> None:
             static_pool_data_filename: {args.static_pool_data_filename}
             cache_latest_only: {args.cache_latest_only}
             n_jobs: {args.n_jobs}
+            solver_n_jobs: {args.solver_n_jobs}
             polling_interval: {args.polling_interval}
             reorg_delay: {args.reorg_delay}
             use_cached_events: {args.use_cached_events}
@@ -228,6 +254,20 @@ def main(args: argparse.Namespace) -> None:
             self_fund: {args.self_fund}
             read_only: {args.read_only}
             pool_finder_period: {args.pool_finder_period}
+            curve_rebuild_period: {args.curve_rebuild_period}
+            dirty_pairs_only: {args.dirty_pairs_only}
+            full_sweep_period: {args.full_sweep_period}
+            warm_start: {args.warm_start}
+            pipeline: {args.pipeline}
+            log_cache_path: {args.log_cache_path}
+            max_log_requests: {args.max_log_requests}
+            push_mode: {args.push_mode}
+            multicall_touched_only: {args.multicall_touched_only}
+            multicall_refresh_period: {args.multicall_refresh_period}
+            snapshot_path: {args.snapshot_path}
+            journal_path: {args.journal_path}
+            journal_compaction_period: {args.journal_compaction_period}
+            journal_max_checkpoints: {args.journal_max_checkpoints}
 
             +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
             +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -247,16 +287,55 @@ def main(args: argparse.Namespace) -> None:
     if args.is_args_test:
         return
 
-    # Get the static pool data, tokens and uniswap v2 event mappings
-    (
-        static_pool_data,
-        tokens,
-        uniswap_v2_event_mappings,
-        uniswap_v3_event_mappings,
-        solidly_v2_event_mappings,
-    ) = get_static_data(
-        cfg, exchanges, args.blockchain, args.static_pool_data_filename, args.read_only
+    # Resume from the pool snapshot or the pool journal if there is one for this configuration
+    snapshot = PoolSnapshot(args.snapshot_path) if args.snapshot_path else None
+    journal = (
+        PoolJournal(
+            args.journal_path,
+            compaction_period=args.journal_compaction_period,
+            max_checkpoints=args.journal_max_checkpoints or None,
+        )
+        if args.journal_path
+        else None
     )
+    run_info = dict(
+        blockchain=args.blockchain,
+        exchanges=list(exchanges),
+        static_pool_data_filename=args.static_pool_data_filename,
+    )
+    can_resume = not (args.replay_from_block or args.tenderly_fork_id or args.use_cached_events)
+    resumed = None
+    if snapshot is not None and can_resume:
+        resumed = read_pool_snapshot(cfg, snapshot, run_info)
+
+    if resumed is not None:
+        (
+            resume_block,
+            pool_data,
+            tokens,
+            uniswap_v2_event_mappings,
+            uniswap_v3_event_mappings,
+            solidly_v2_event_mappings,
+        ) = resumed
+    else:
+        # Get the static pool data, tokens and uniswap v2 event mappings
+        (
+            static_pool_data,
+            tokens,
+            uniswap_v2_event_mappings,
+            uniswap_v3_event_mappings,
+            solidly_v2_event_mappings,
+        ) = get_static_data(
+            cfg, exchanges, args.blockchain, args.static_pool_data_filename, args.read_only
+        )
+        resume_block = 0
+        pool_data = static_pool_data.to_dict(orient="records")
+        tokens = tokens.to_dict(orient="records")
+
+        # The journal only holds the pool data, the tokens and event mappings are read from the static data
+        journaled = read_pool_journal(cfg, journal, run_info) if journal is not None and can_resume else None
+        if journaled is not None:
+            resume_block, pool_data = journaled
 
     # Break if timeout is hit to test the bot flags
     if args.timeout == 1:
@@ -275,13 +354,13 @@ def main(args: argparse.Namespace) -> None:
         web3=cfg.w3,
         w3_async=cfg.w3_async,
         cfg=cfg,
-        pool_data=static_pool_data.to_dict(orient="records"),
+        pool_data=pool_data,
         SUPPORTED_EXCHANGES=exchanges,
         alchemy_max_block_fetch=args.alchemy_max_block_fetch,
         uniswap_v2_event_mappings=uniswap_v2_event_mappings,
         uniswap_v3_event_mappings=uniswap_v3_event_mappings,
         solidly_v2_event_mappings=solidly_v2_event_mappings,
-        tokens=tokens.to_dict(orient="records"),
+        tokens=tokens,
         replay_from_block=args.replay_from_block,
         target_tokens=args.target_tokens,
         tenderly_fork_id=args.tenderly_fork_id,
@@ -291,17 +370,22 @@ def main(args: argparse.Namespace) -> None:
         blockchain=args.blockchain,
         prefix_path=args.prefix_path,
         read_only=args.read_only,
+        multicall_touched_only=args.multicall_touched_only,
     )
 
     # Add initial pool data to the manager
     add_initial_pool_data(cfg, mgr, args.n_jobs)
 
     # Run the main loop
-    run(mgr, args)
+    run(mgr, args, snapshot=snapshot, journal=journal, run_info=run_info, resume_block=resume_block)
 
 
-def run(mgr, args, tenderly_uri=None) -> None:
-    loop_idx = last_block = last_block_queried = total_iteration_time = 0
+def run(mgr, args, tenderly_uri=None, snapshot=None, journal=None, run_info=None, resume_block=0) -> None:
+    loop_idx = total_iteration_time = 0
+
+    # When resuming from a snapshot or a journal, the pools are up to date with resume_block
+    # (so there is nothing to backdate)
+    last_block = last_block_queried = resume_block
     start_timeout = time.time()
     mainnet_uri = mgr.cfg.w3.provider.endpoint_uri
     handle_static_pools_update(mgr)
@@ -310,6 +394,9 @@ def run(mgr, args, tenderly_uri=None) -> None:
         config=mgr.cfg,
         w3=mgr.w3_async,
         exchanges=mgr.exchanges,
+        log_cache=LogCache(args.log_cache_path) if args.log_cache_path else None,
+        reorg_delay=args.reorg_delay,
+        max_concurrency=args.max_log_requests,
     )
 
     pool_finder = PoolFinder(
@@ -318,9 +405,23 @@ def run(mgr, args, tenderly_uri=None) -> None:
         flashloan_tokens=args.flashloan_tokens,
         exchanges=mgr.exchanges,
         web3=mgr.web3,
-        multicall_address=mgr.cfg.network.MULTICALL_CONTRACT_ADDRESS
+        multicall_address=mgr.cfg.network.MULTICALL_CONTRACT_ADDRESS,
+        w3_async=mgr.w3_async,
     )
 
+    curve_cache = CurveCache(full_rebuild_period=args.curve_rebuild_period)
+    solution_cache = SolutionCache() if args.warm_start else None
+
+    # In push mode, all iterations after the first one wait for new blocks pushed over a websocket
+    block_stream = None
+    if args.push_mode and not (args.use_cached_events or args.replay_from_block or args.tenderly_fork_id):
+        ws_uri = args.ws_uri or mainnet_uri.replace("https://", "wss://").replace("http://", "ws://")
+        block_stream = BlockStream(
+            config=mgr.cfg,
+            w3=AsyncWeb3.persistent_websocket(WebsocketProviderV2(ws_uri)),
+            event_gatherer=event_gatherer,
+        )
+
     while True:
         try:
             # ensure 'last_updated_block' is in pool_data for all pools
@@ -328,57 +429,99 @@ def run(mgr, args, tenderly_uri=None) -> None:
                 if "last_updated_block" not in pool:
                     pool["last_updated_block"] = last_block_queried
 
-            # Get current block number, then adjust to the block number reorg_delay blocks ago to avoid reorgs
-            start_block, replay_from_block = get_start_block(
-                args.alchemy_max_block_fetch,
-                last_block,
-                mgr,
-                args.reorg_delay,
-                args.replay_from_block,
-            )
+            push = block_stream is not None and last_block > 0
+            if push:
+                # Wait for the next block; its events have been pushed over the websocket
+                start_block, current_block, events = block_stream.next_block(last_block)
+                replay_from_block = None
+                mgr.cfg.logger.info(
+                    f"Received events from {start_block} to {current_block}... {last_block}"
+                )
+            else:
+                # Get current block number, then adjust to the block number reorg_delay blocks ago to avoid reorgs
+                start_block, replay_from_block = get_start_block(
+                    args.alchemy_max_block_fetch,
+                    last_block,
+                    mgr,
+                    args.reorg_delay,
+                    args.replay_from_block,
+                )
 
-            # Get all events from the last block to the current block
-            current_block = get_current_block(
-                last_block,
-                mgr,
-                args.reorg_delay,
-                replay_from_block,
-                args.tenderly_fork_id,
-            )
+                # Get all events from the last block to the current block
+                current_block = get_current_block(
+                    last_block,
+                    mgr,
+                    args.reorg_delay,
+                    replay_from_block,
+                    args.tenderly_fork_id,
+                )
 
-            # Log the current start, end and last block
-            mgr.cfg.logger.info(
-                f"Fetching events from {start_block} to {current_block}... {last_block}"
-            )
+                # Log the current start, end and last block
+                mgr.cfg.logger.info(
+                    f"Fetching events from {start_block} to {current_block}... {last_block}"
+                )
 
-            # Set the network connection to Mainnet if replaying from a block
-            set_network_to_mainnet_if_replay(
-                last_block,
-                loop_idx,
-                mainnet_uri,
-                mgr,
-                replay_from_block,
-                args.use_cached_events,
-            )
+                # Set the network connection to Mainnet if replaying from a block
+                set_network_to_mainnet_if_replay(
+                    last_block,
+                    loop_idx,
+                    mainnet_uri,
+                    mgr,
+                    replay_from_block,
+                    args.use_cached_events,
+                )
 
-            # Get the events
-            latest_events = (
-                get_cached_events(mgr, args.logging_path)
-                if args.use_cached_events
-                else get_latest_events(
+            pipeline = args.pipeline and block_stream is None and not (
+                args.use_cached_events or replay_from_block or args.tenderly_fork_id
+            )
+            if push:
+                # Update the pools from the latest pushed (or backfilled) events
+                latest_events = filter_latest_events(mgr, events)
+                save_events_to_json(
+                    args.cache_latest_only,
+                    args.logging_path,
+                    mgr,
+                    latest_events,
+                    start_block,
+                    current_block,
+                )
+                iteration_start_time = time.time()
+                update_pools_from_events(args.n_jobs, mgr, latest_events)
+
+                # Re-read the pools whose events were removed or orphaned by a reorg
+                update_reverted_pools(mgr, args.n_jobs, block_stream.pop_reverted_addresses(), current_block)
+            elif pipeline:
+                # Stream the events into the pools as they arrive, using the ones prefetched during the last search
+                latest_events = stream_latest_events(
                     current_block,
                     mgr,
-                    args.n_jobs,
                     start_block,
                     args.cache_latest_only,
                     args.logging_path,
                     event_gatherer
                 )
-            )
-            iteration_start_time = time.time()
+                iteration_start_time = time.time()
+            else:
+                # Get the events
+                latest_events = (
+                    get_cached_events(mgr, args.logging_path)
+                    if args.use_cached_events
+                    else get_latest_events(
+                        current_block,
+                        mgr,
+                        args.n_jobs,
+                        start_block,
+                        args.cache_latest_only,
+                        args.logging_path,
+                        event_gatherer
+                    )
+                )
+                iteration_start_time = time.time()
 
-            # Update the pools from the latest events
-            update_pools_from_events(args.n_jobs, mgr, latest_events)
+                # Update the pools from the latest events
+                update_pools_from_events(args.n_jobs, mgr, latest_events)
+
+            mgr.cfg.logger.debug(f"[main] eth_getLogs: {event_gatherer.log_fetcher_stats}")
 
             # Update new pool events from contracts
             if len(mgr.pools_to_add_from_contracts) > 0:
@@ -412,26 +555,45 @@ def run(mgr, args, tenderly_uri=None) -> None:
                 start_block=start_block,
             )
 
-            # Run multicall every iteration
-            multicall_every_iteration(current_block=current_block, mgr=mgr)
+            # Run multicall every iteration (for the pools that events touched, or for all of them)
+            touched_pools = mgr.pop_touched_pools()
+            if not args.multicall_touched_only or args.use_cached_events or (
+                args.multicall_refresh_period > 0 and loop_idx % args.multicall_refresh_period == 0
+            ):
+                touched_pools = None
+            multicall_every_iteration(current_block=current_block, mgr=mgr, touched_pools=touched_pools)
+
+            # Get the pairs that changed in this iteration (None means that all pairs are searched)
+            dirty_pairs = mgr.pop_dirty_pairs()
+            if not args.dirty_pairs_only or (
+                args.full_sweep_period > 0 and loop_idx % args.full_sweep_period == 0
+            ):
+                dirty_pairs = None
 
             # Update the last block number
             last_block = current_block
 
             if not mgr.read_only:
-                # Write the pool data to disk
-                write_pool_data_to_disk(
-                    cache_latest_only=args.cache_latest_only,
-                    logging_path=args.logging_path,
-                    mgr=mgr,
-                    current_block=current_block,
-                )
+                # Write the pool data to disk (only the pools that changed when journaling)
+                if journal is not None:
+                    write_pool_journal(journal, mgr, current_block, run_info)
+                else:
+                    write_pool_data_to_disk(
+                        cache_latest_only=args.cache_latest_only,
+                        logging_path=args.logging_path,
+                        mgr=mgr,
+                        current_block=current_block,
+                    )
+
+                # Update the pool snapshot
+                if snapshot is not None:
+                    write_pool_snapshot(snapshot, mgr, current_block, run_info)
 
             # Handle/remove duplicates in the pool data
             handle_duplicates(mgr)
 
             # Re-initialize the bot
-            bot = init_bot(mgr)
+            bot = init_bot(mgr, curve_cache, solution_cache)
 
             if args.use_specific_exchange_for_target_tokens is not None:
                 target_tokens = bot.get_tokens_in_exchange(
@@ -444,6 +606,12 @@ def run(mgr, args, tenderly_uri=None) -> None:
             if not mgr.read_only:
                 handle_tokens_csv(mgr, mgr.prefix_path)
 
+            # Start fetching the next block's events while this block is searched
+            if pipeline:
+                event_gatherer.prefetch_events(
+                    from_block=current_block - args.reorg_delay, reorg_delay=args.reorg_delay
+                )
+
             # Handle subsequent iterations
             handle_subsequent_iterations(
                 arb_mode=args.arb_mode,
@@ -458,10 +626,12 @@ def run(mgr, args, tenderly_uri=None) -> None:
                 tenderly_uri=tenderly_uri,
                 mgr=mgr,
                 forked_from_block=forked_from_block,
+                n_jobs=args.solver_n_jobs,
+                dirty_pairs=dirty_pairs,
             )
 
             # Sleep for the polling interval
-            if not replay_from_block and args.polling_interval > 0:
+            if not replay_from_block and block_stream is None and args.polling_interval > 0:
                 mgr.cfg.logger.info(
                     f"[main] Sleeping for polling_interval={args.polling_interval} seconds..."
                 )
@@ -591,7 +761,9 @@ if __name__ == "__main__":
             "multi_triangle",
             "b3_two_hop",
             "multi_pairwise_pol",
-            "multi_pairwise_all"
+            "multi_pairwise_all",
+            "multi_cycle",
+            "multi_market",
         ],
     )
     parser.add_argument(
@@ -603,6 +775,11 @@ if __name__ == "__main__":
     parser.add_argument(
         "--n_jobs", default=-1, help="Number of parallel jobs to run"
     )
+    parser.add_argument(
+        "--solver_n_jobs",
+        default=1,
+        help="Number of processes solving the arbitrage miniverses (1 solves them in process, -1 uses all CPUs)",
+    )
     parser.add_argument(
         "--exchanges",
         default="carbon_v1,bancor_v3,bancor_v2,bancor_pol,uniswap_v3,uniswap_v2,sushiswap_v2,balancer,pancakeswap_v2,pancakeswap_v3",
@@ -741,6 +918,89 @@ if __name__ == "__main__":
         default=100,
         help="Searches for pools that can service Carbon strategies that do not have viable routes.",
     )
+    parser.add_argument(
+        "--curve_rebuild_period",
+        default=100,
+        help="Curves are built incrementally (only for pools whose state changed); all curves are rebuilt "
+             "from scratch every this many iterations (1 rebuilds them every iteration).",
+    )
+    parser.add_argument(
+        "--dirty_pairs_only",
+        default="False",
+        help="Set to True to only search arbitrage miniverses containing a pair whose pools changed since the "
+             "last iteration.",
+    )
+    parser.add_argument(
+        "--full_sweep_period",
+        default=20,
+        help="With dirty_pairs_only, all miniverses are searched every this many iterations (0 = never).",
+    )
+    parser.add_argument(
+        "--warm_start",
+        default="False",
+        help="Set to True to start the optimizer from the equilibrium prices of the last block, and to skip the "
+             "miniverses whose curves are unchanged and had no arbitrage in the last block.",
+    )
+    parser.add_argument(
+        "--multicall_touched_only",
+        default="False",
+        help="Set to True to only refresh the multicall pools (eg Bancor V3, Bancor POL, Balancer) that events "
+             "touched since the last iteration.",
+    )
+    parser.add_argument(
+        "--multicall_refresh_period",
+        default=20,
+        help="With multicall_touched_only, all multicall pools are refreshed every this many iterations (0 = never).",
+    )
+    parser.add_argument(
+        "--pipeline",
+        default="False",
+        help="Set to True to update the pools with each subscription's events as soon as they arrive, and to "
+             "fetch the next block's events while the arbitrage search runs.",
+    )
+    parser.add_argument(
+        "--log_cache_path",
+        default="",
+        help="Path of an SQLite database in which fetched logs are cached across runs (empty = no cache).",
+    )
+    parser.add_argument(
+        "--max_log_requests",
+        default=8,
+        help="The maximum number of eth_getLogs requests in flight.",
+    )
+    parser.add_argument(
+        "--push_mode",
+        default="False",
+        help="Set to True to wait for new blocks and their logs pushed over a websocket subscription instead of "
+             "polling every polling_interval seconds.",
+    )
+    parser.add_argument(
+        "--snapshot_path",
+        default="",
+        help="Directory of a binary snapshot of the pool state, which is updated every iteration and resumed from "
+             "on restart (empty = no snapshot).",
+    )
+    parser.add_argument(
+        "--journal_path",
+        default="",
+        help="Directory of an append-only journal of the pool state, which replaces the pool data JSON files, "
+             "records only the pools that changed in each block and is resumed from on restart (empty = no journal).",
+    )
+    parser.add_argument(
+        "--journal_compaction_period",
+        default=1000,
+        help="With journal_path, the pool state is compacted into a new checkpoint every this many blocks.",
+    )
+    parser.add_argument(
+        "--journal_max_checkpoints",
+        default=3,
+        help="With journal_path, the number of checkpoints (and their segments) kept on disk (0 = all).",
+    )
+    parser.add_argument(
+        "--ws_uri",
+        default="",
+        help="The websocket endpoint for push_mode (empty = the RPC endpoint with the ws(s) scheme).",
+    )
 
     # Process the arguments
     args = parser.parse_args()
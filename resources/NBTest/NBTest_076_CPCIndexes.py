@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.15.2
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+try:
+    from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer, T, CPCInverter, Pair
+    from fastlane_bot.modes.triangle_multi import ArbitrageFinderTriangleMulti
+    from fastlane_bot.testing import *
+
+except:
+    from tools.cpc import ConstantProductCurve as CPC, CPCContainer, T, CPCInverter, Pair
+    from modes.triangle_multi import ArbitrageFinderTriangleMulti
+    from tools.testing import *
+
+import itertools as it
+import random
+import time
+
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(CPC))
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(CPCContainer))
+
+#plt.style.use('seaborn-dark')
+plt.rcParams['figure.figsize'] = [12,6]
+# from fastlane_bot import __VERSION__
+# require("3.0", __VERSION__)
+# -
+
+# # CPCContainer secondary indexes [NBTest076]
+#
+# The `CPCContainer` query methods `bypair`, `bypairs`, `bytknx(s)`, `bytkny(s)`, `byparams(exchange=...)` and `pairs` are backed by secondary indexes (pair, tknx, tkny, exchange). This notebook checks them against the linear scans they replace, and benchmarks triangle combo generation.
+
+# +
+class ScanCPCContainer(CPCContainer):
+    """reference container that answers the queries with a linear scan (the pre-index implementation)"""
+
+    def bypair(self, pair, *, directed=False, asgenerator=None, ascc=None):
+        result = (c for c in self if c.pair == pair)
+        if not directed:
+            pairr = "/".join(pair.split("/")[::-1])
+            result = it.chain(result, (c for c in self if c.pair == pairr))
+        return self._convert(result, asgenerator=asgenerator, ascc=ascc)
+
+    def bypairs(self, pairs=None, *, directed=False, asgenerator=None, ascc=None):
+        if isinstance(pairs, str):
+            pairs = set(pairs.split(","))
+        if pairs is None:
+            result = (c for c in self)
+        else:
+            pairs = set(pairs)
+            if not directed:
+                pairs = pairs.union(set(f"{q}/{b}" for b, q in (p.split("/") for p in pairs)))
+            result = (c for c in self if c.pair in pairs)
+        return self._convert(result, asgenerator=asgenerator, ascc=ascc)
+
+    def byparams(self, *, _asgenerator=None, _ascc=None, _inv=False, **params):
+        pname, pvalue = tuple(params.items())[0]
+        result = (c for c in self if (c.P(pname) != pvalue if _inv else c.P(pname) == pvalue))
+        return self._convert(result, asgenerator=_asgenerator, ascc=_ascc)
+
+    def bytknx(self, tknx, *, asgenerator=None, ascc=None):
+        return self._convert((c for c in self if c.tknx == tknx), asgenerator=asgenerator, ascc=ascc)
+
+    def bytkny(self, tkny, *, asgenerator=None, ascc=None):
+        return self._convert((c for c in self if c.tkny == tkny), asgenerator=asgenerator, ascc=ascc)
+
+    def pairs(self, *, standardize=True):
+        if standardize:
+            return {c.pairo.primary for c in self}
+        return {c.pair for c in self}
+
+EXCHANGES = ["uniswap_v2", "uniswap_v3", "sushiswap_v2", "pancakeswap_v2"]
+
+def make_curves(ncurves, ntokens, ncarbon, seed=42):
+    """random curves on ntokens tokens, ncarbon of which are carbon_v1 curves"""
+    rng = random.Random(seed)
+    tokens = [f"TKN{i:03d}" for i in range(ntokens)]
+    curves = []
+    for i in range(ncurves):
+        tknb, tknq = rng.sample(tokens, 2)
+        exchange = "carbon_v1" if i < ncarbon else rng.choice(EXCHANGES)
+        curves += [CPC.from_xy(x=rng.uniform(1, 100), y=rng.uniform(1, 100), pair=f"{tknb}/{tknq}",
+                               cid=f"cid{i}", fee=0.003, params=dict(exchange=exchange))]
+    return curves
+
+def cids(result):
+    """list of the cids of the curves in result"""
+    return [c.cid for c in result]
+# -
+
+# ## Queries match the linear scans
+
+# +
+curves = make_curves(2000, 20, 50)
+CC = CPCContainer(curves)
+CCs = ScanCPCContainer(curves)
+
+for pair in list(CCs.pairs(standardize=False))[:50]:
+    assert cids(CC.bypair(pair)) == cids(CCs.bypair(pair))
+    assert cids(CC.bypair(pair, directed=True)) == cids(CCs.bypair(pair, directed=True))
+pairs = list(CCs.pairs(standardize=False))[:10]
+assert cids(CC.bypairs(pairs)) == cids(CCs.bypairs(pairs))
+assert cids(CC.bypairs(",".join(pairs), directed=True)) == cids(CCs.bypairs(",".join(pairs), directed=True))
+assert cids(CC.bypairs()) == cids(CCs.bypairs())
+for tkn in CCs.tokens():
+    assert cids(CC.bytknx(tkn)) == cids(CCs.bytknx(tkn))
+    assert cids(CC.bytkny(tkn)) == cids(CCs.bytkny(tkn))
+assert cids(CC.bytknxs("TKN000,TKN001")) == [c.cid for c in CCs if c.tknx in {"TKN000", "TKN001"}]
+assert cids(CC.bytknys(["TKN002", "TKN003"])) == [c.cid for c in CCs if c.tkny in {"TKN002", "TKN003"}]
+for ex in EXCHANGES + ["carbon_v1", "meh"]:
+    assert cids(CC.byparams(exchange=ex)) == cids(CCs.byparams(exchange=ex))
+    assert cids(CC.byparams(exchange=ex, _inv=True)) == cids(CCs.byparams(exchange=ex, _inv=True))
+assert CC.pairs() == CCs.pairs()
+assert CC.pairs(standardize=False) == CCs.pairs(standardize=False)
+assert type(CC.bypair(pairs[0], directed=True, asgenerator=True)).__name__ == "generator"
+assert type(CC.bytknx("TKN000", ascc=False)) == tuple
+# -
+
+# ## Indexes follow add replace and remove
+
+# +
+curves = make_curves(100, 20, 5)
+CC = CPCContainer(curves)
+c0 = CC[0]
+CC.add(CPC.from_xy(x=1, y=1, pair="NEW/TKN000", cid="new", params=dict(exchange="meh")))
+assert cids(CC.bypair("NEW/TKN000")) == ["new"]
+assert cids(CC.byparams(exchange="meh")) == ["new"]
+assert "NEW/TKN000" in CC.pairs(standardize=False)
+
+c0new = CPC.from_xy(x=1, y=1, pair="NEW/TKN000", cid=c0.cid, params=dict(exchange="meh"))
+CC.replace(c0new)
+assert CC[0] is c0new
+assert cids(CC.bypair("NEW/TKN000")) == [c0.cid, "new"]
+assert cids(CC.byparams(exchange="meh")) == [c0.cid, "new"]
+assert c0.cid not in cids(CC.bypair(c0.pair))
+
+CC.remove([c0.cid, "new"])
+assert CC.bypair("NEW/TKN000", ascc=False) == ()
+assert "NEW/TKN000" not in CC.pairs(standardize=False)
+assert "meh" not in CC.curves_by_exchange
+assert cids(CC.bypairs()) == [c.cid for c in curves[1:]]
+for tkn in CC.tokens():
+    assert cids(CC.bytknx(tkn)) == [c.cid for c in CC if c.tknx == tkn]
+# -
+
+# ## Replacements in the same buckets take constant time
+
+# +
+curves = make_curves(100, 20, 5)
+CC = CPCContainer(curves)
+c = CC[10]
+bucket = CC.curves_by_exchange[c.P("exchange")]
+position = list(bucket).index(c.cid)
+cnew = CPC.from_xy(x=2, y=3, pair=c.pair, cid=c.cid, fee=0.003, params=dict(exchange=c.P("exchange")))
+CC.replace(cnew)
+assert CC.curves_by_exchange[c.P("exchange")] is bucket
+assert list(bucket).index(c.cid) == position and bucket[c.cid] is cnew
+assert cids(CC.bypair(c.pair, directed=True)) == [c1.cid for c1 in CC if c1.pair == c.pair]
+assert cids(CC.byparams(exchange=c.P("exchange"))) == [c1.cid for c1 in CC if c1.P("exchange") == c.P("exchange")]
+# -
+
+# +
+# the container does not enforce unique cids; curves sharing a cid are all indexed
+curves = make_curves(100, 20, 5)
+dups = [CPC.from_xy(x=2, y=3, pair=c.pair, cid=c.cid, fee=0.003, params=dict(exchange="dup")) for c in curves[:3]]
+dups += [CPC.from_xy(x=5, y=7, pair=c.pair, cid=c.cid, fee=0.003, params=dict(exchange="dup")) for c in curves[:3]]
+CC = CPCContainer(curves + dups)
+assert list(CC.byparams(exchange="dup")) == dups
+CC.replace(CPC.from_xy(x=1, y=1, pair=dups[0].pair, cid=dups[0].cid, fee=0.003, params=dict(exchange="dup")))
+assert len(CC.curves_by_exchange["dup"]) == len(dups)
+assert [c.cid for c in CC.byparams(exchange="dup")] == [c.cid for c in dups]
+# -
+
+# +
+def time_replace(ncurves, nreplace=2000):
+    """time per replace of a curve of a container of ncurves curves, all on the same exchange"""
+    curves = make_curves(ncurves, 50, 0)
+    for c in curves:
+        c.params["exchange"] = "uniswap_v2"
+    CC = CPCContainer(curves)
+    new = [CPC.from_xy(x=2, y=3, pair=c.pair, cid=c.cid, fee=0.003, params=dict(exchange="uniswap_v2"))
+           for c in curves[:nreplace]]
+    times = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for c in new:
+            CC.replace(c)
+        times += [(time.perf_counter() - start) / nreplace]
+    return min(times)
+
+t_small, t_large = time_replace(4000), time_replace(40000)
+print(f"replace: {t_small*1e6:.1f}us (4k curves), {t_large*1e6:.1f}us (40k curves)")
+assert t_large < 5 * t_small
+# -
+
+# ## Benchmark triangle combos on 20k curves
+
+# +
+curves = make_curves(20000, 150, 40)
+CC = CPCContainer(curves)
+CCs = ScanCPCContainer(curves)
+flts = ["TKN000", "TKN001"]
+
+start = time.perf_counter()
+combos = ArbitrageFinderTriangleMulti(flts, CC, arb_mode="multi_triangle").get_combos(flts, CC, "multi_triangle")
+time_index = time.perf_counter() - start
+
+start = time.perf_counter()
+combos_s = ArbitrageFinderTriangleMulti(flts, CCs, arb_mode="multi_triangle").get_combos(flts, CCs, "multi_triangle")
+time_scan = time.perf_counter() - start
+
+print(f"{len(combos)} combos; index: {time_index:.3f}s, scan: {time_scan:.3f}s, speedup: {time_scan/time_index:.1f}x")
+assert [(flt, cids(m)) for flt, m in combos] == [(flt, cids(m)) for flt, m in combos_s]
+assert time_index < time_scan
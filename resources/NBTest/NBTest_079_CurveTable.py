@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.15.2
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+
+# +
+try:
+    from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer, CurveTable, T, CPCInverter, Pair
+    from fastlane_bot.tools.optimizer import MargPOptimizer
+    from fastlane_bot.testing import *
+
+except:
+    from tools.cpc import ConstantProductCurve as CPC, CPCContainer, CurveTable, T, CPCInverter, Pair
+    from tools.optimizer import MargPOptimizer
+    from tools.testing import *
+
+import random
+import time
+
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(CPC))
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(CPCContainer))
+
+#plt.style.use('seaborn-dark')
+plt.rcParams['figure.figsize'] = [12,6]
+# from fastlane_bot import __VERSION__
+# require("3.0", __VERSION__)
+# -
+
+# # CurveTable and cached curve data [NBTest079]
+#
+# Curves cache the data derived from their (frozen) fields: the interned tokens, the hash and the array row. The `CurveTable` holds the curves of a container as arrays with integer token ids; it is built lazily by `CPCContainer.table` and used by the MargP optimizer.
+
+# +
+EXCHANGES = ["uniswap_v2", "uniswap_v3", "sushiswap_v2", "carbon_v1"]
+
+def make_curves(ncurves, ntokens, seed=42):
+    """random curves on ntokens tokens, every fourth of them a levered curve"""
+    rng = random.Random(seed)
+    tokens = [f"TKN{i:03d}" for i in range(ntokens)]
+    curves = []
+    for i in range(ncurves):
+        tknb, tknq = rng.sample(tokens, 2)
+        x, y = rng.uniform(1, 100), rng.uniform(1, 100)
+        params = dict(exchange=rng.choice(EXCHANGES))
+        if i % 4 == 0:
+            curves += [CPC.from_univ3(Pmarg=y/x, uniL=100, uniPa=y/x/2, uniPb=y/x*2, pair=f"{tknb}/{tknq}",
+                                      cid=f"cid{i}", fee=0.003, descr="", params=params)]
+        else:
+            curves += [CPC.from_xy(x=x, y=y, pair=f"{tknb}/{tknq}", cid=f"cid{i}", fee=0.003, params=params)]
+    return curves
+# -
+
+# ## Cached curve data
+
+# +
+c = CPC.from_xy(x=100, y=200, pair="ETH/USDC", fee=0.003)
+assert (c.tknx, c.tkny) == ("ETH", "USDC")
+assert (c.tknb, c.tknq) == ("ETH", "USDC")
+assert c.tknx is CPC.from_xy(x=1, y=2, pair="ETH/USDC").tknx
+
+h = hash(c)
+assert hash(c) == h
+assert c == CPC.from_xy(x=100, y=200, pair="ETH/USDC", fee=0.003)
+assert hash(c) == hash(CPC.from_xy(x=100, y=200, pair="ETH/USDC", fee=0.003))
+assert hash(c) != hash(CPC.from_xy(x=100, y=200, pair="ETH/USDC", fee=0.003, cid="cid1"))
+assert len({c, CPC.from_xy(x=100, y=200, pair="ETH/USDC", fee=0.003)}) == 1
+
+assert c.arrayrow == (c.kbar, 100, 200, 0, float("inf"), 0, float("inf"), 0.5, 1)
+assert c.arrayrow is c.arrayrow
+assert len(c.arrayrow) == len(CPC.ARRAYROW_FIELDS)
+c3 = CPC.from_univ3(Pmarg=2000, uniL=100, uniPa=1000, uniPb=4000, pair="ETH/USDC", fee=0.003, cid="cid3", descr="")
+assert c3.arrayrow == (c3.kbar, c3.x, c3.y, c3.x_min, c3.x_max, c3.y_min, c3.y_max, 0.5, 1)
+# -
+
+# ## CurveTable
+
+# +
+curves = make_curves(500, 20)
+table = CurveTable.from_curves(curves)
+assert len(table) == 500
+assert set(table.tokens) == {t for c in curves for t in (c.tknx, c.tkny)}
+for i, c in enumerate(curves):
+    assert table.tokens[table.tknx[i]] == c.tknx
+    assert table.tokens[table.tkny[i]] == c.tkny
+    assert table.hasrow[i] and table.sym[i] == c.is_symmetric()
+    assert tuple(getattr(table, f)[i] for f in CPC.ARRAYROW_FIELDS) == c.arrayrow
+
+assert table.select(table.mask()) == curves
+assert table.select(table.mask(tknxs="TKN000, TKN001")) == [c for c in curves if c.tknx in {"TKN000", "TKN001"}]
+assert table.select(table.mask(tknys=["TKN002"])) == [c for c in curves if c.tkny == "TKN002"]
+tkns = {"TKN000", "TKN001", "TKN002", "TKN003"}
+assert table.select(table.mask(tkns=tkns)) == [c for c in curves if c.tknx in tkns and c.tkny in tkns]
+assert table.select(table.mask(tknxs=["NOTATOKEN"])) == []
+assert table.select([3, 1]) == [curves[3], curves[1]]
+
+tokens_ix = {t: i for i, t in enumerate(sorted(table.tokens))}
+ixx, ixy = table.tokenix(tokens_ix)
+assert list(ixx) == [tokens_ix[c.tknx] for c in curves]
+assert list(ixy) == [tokens_ix[c.tkny] for c in curves]
+# -
+
+# ## The table of a container
+
+# +
+curves = make_curves(500, 20)
+CC = CPCContainer(curves[:100])
+table = CC.table
+assert CC.table is table
+assert table.curves == tuple(curves[:100])
+
+CC.add(curves[100])
+assert CC.table is not table and len(CC.table) == 101
+table = CC.table
+CC.replace(CPC.from_xy(x=1, y=1, pair=curves[5].pair, cid=curves[5].cid, fee=0.003))
+assert CC.table is not table and CC.table.x[5] == 1
+table = CC.table
+CC.remove([curves[7].cid])
+assert CC.table is not table and len(CC.table) == 100
+assert CC.tknxs() == {c.tknx for c in CC} and CC.tknys() == {c.tkny for c in CC}
+# -
+
+# ## Pair filters
+
+# +
+curves = make_curves(500, 20)
+CC = CPCContainer(curves)
+pairs = CC.pairs()
+tkns = {"TKN000", "TKN001", "TKN002", "TKN003"}
+assert CC.filter_pairs(bothin=tkns) == {p for p in pairs if set(p.split("/")) <= tkns}
+assert CC.filter_pairs(onein="TKN000") == {p for p in pairs if "TKN000" in p.split("/")}
+assert CC.filter_pairs(notin=tkns) == {p for p in pairs if not set(p.split("/")) & tkns}
+assert CC.filter_pairs(tknbin="TKN001") == {p for p in pairs if p.split("/")[0] == "TKN001"}
+assert CC.filter_pairs(tknqnotin="TKN001") == {p for p in pairs if p.split("/")[1] != "TKN001"}
+assert CC.filter_pairs(pairs=[Pair("TKN000/TKN001")], onein="TKN000") == {"TKN000/TKN001"}
+# -
+
+# ## MargP curve arrays
+
+# +
+curves = make_curves(500, 20)
+CC = CPCContainer(curves)
+O = MargPOptimizer(CC)
+tokens_ix = {t: i for i, t in enumerate(sorted(CC.tokens()))}
+arrays = O.CurveArrays.from_curves(curves, tokens_ix)
+assert list(arrays.ixx) == [tokens_ix[c.tknx] for c in curves]
+assert list(arrays.ixy) == [tokens_ix[c.tkny] for c in curves]
+for f in ["kbar", "x", "y", "xmin", "xmax", "ymin", "ymax", "alpha", "eta"]:
+    assert list(getattr(arrays, f)) == [c.arrayrow[CPC.ARRAYROW_FIELDS.index(f)] for c in curves]
+assert list(arrays.sym) == [c.is_constant_product() for c in curves]
+assert arrays.ntkns == len(tokens_ix)
+# -
+
+# ## Benchmark
+
+# +
+curves = make_curves(20000, 200)
+CC = CPCContainer(curves)
+start = time.time()
+for _ in range(20):
+    CC.filter_pairs(bothin=[f"TKN{i:03d}" for i in range(20)])
+print(f"filter_pairs x20: {time.time()-start:.3f}s")
+
+start = time.time()
+CurveTable.from_curves(curves)
+t0 = time.time()-start
+start = time.time()
+CurveTable.from_curves(curves)
+t1 = time.time()-start
+print(f"CurveTable: {t0:.3f}s (first), {t1:.3f}s (cached rows)")
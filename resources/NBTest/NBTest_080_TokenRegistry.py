@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.15.2
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+
+# +
+try:
+    from fastlane_bot.tools.cpc import ConstantProductCurve as CPC, CPCContainer, CurveTable, T, CPCInverter, Pair
+    from fastlane_bot.tools.tokenregistry import TokenRegistry, TOKENS
+    from fastlane_bot.modes.base_triangle import sort_pairs, get_triangle_groups
+    from fastlane_bot.testing import *
+
+except:
+    from tools.cpc import ConstantProductCurve as CPC, CPCContainer, CurveTable, T, CPCInverter, Pair
+    from tools.tokenregistry import TokenRegistry, TOKENS
+    from modes.base_triangle import sort_pairs, get_triangle_groups
+    from tools.testing import *
+
+import pickle
+import random
+
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(CPC))
+print("{0.__name__} v{0.__VERSION__} ({0.__DATE__})".format(TokenRegistry))
+
+#plt.style.use('seaborn-dark')
+plt.rcParams['figure.figsize'] = [12,6]
+# from fastlane_bot import __VERSION__
+# require("3.0", __VERSION__)
+# -
+
+# # Token registry [NBTest080]
+#
+# The `TokenRegistry` gives every token a small integer id. Curves get the ids of their tokens from the default registry `TOKENS` when they are created, and the pair helpers of the registry replace the repeated splitting and joining of pair strings.
+
+# ## Registry
+
+# +
+R = TokenRegistry()
+assert R.id("WETH-6Cc2") == 0
+assert R.id("USDC-eB48") == 1
+assert R.id("WETH-6Cc2") == 0
+assert len(R) == 2 and "WETH-6Cc2" in R and not "DAI-1d0F" in R
+assert R.token(1) == "USDC-eB48"
+assert R.name(0) == "WETH"
+assert R.idl("USDC-eB48, DAI-1d0F") == [1, 2]
+
+assert R.splitpair("WETH-6Cc2/USDC-eB48") == (0, 1)
+assert R.splitpair("USDC-eB48/WETH-6Cc2") == (1, 0)
+assert R.splitpairs(["WETH-6Cc2/USDC-eB48", "DAI-1d0F/WETH-6Cc2"]) == [(0, 1), (2, 0)]
+assert R.pairstr(0, 1) == "WETH-6Cc2/USDC-eB48"
+assert R.pairkey("USDC-eB48/WETH-6Cc2") == R.pairkey("WETH-6Cc2/USDC-eB48") == (0, 1)
+assert R.reversepair("WETH-6Cc2/USDC-eB48") == "USDC-eB48/WETH-6Cc2"
+assert R.sortedpair("WETH-6Cc2/USDC-eB48") == "USDC-eB48/WETH-6Cc2"
+assert R.sortedpair("USDC-eB48/WETH-6Cc2") == "USDC-eB48/WETH-6Cc2"
+assert raises(R.splitpair, "WETH-6Cc2")
+
+R2 = TokenRegistry(["A", "B", "A"])
+assert R2.tokens == ["A", "B"] and R2.ids == {"A": 0, "B": 1}
+# -
+
+# ## Curves
+
+# +
+c = CPC.from_xy(x=100, y=200, pair="WETH-6Cc2/USDC-eB48", fee=0.003, cid="1")
+assert (TOKENS.token(c.tknxid), TOKENS.token(c.tknyid)) == ("WETH-6Cc2", "USDC-eB48")
+assert TOKENS.splitpair(c.pair) == (c.tknxid, c.tknyid)
+assert c.tknx is TOKENS.token(c.tknxid)
+cr = CPC.from_xy(x=200, y=100, pair="USDC-eB48/WETH-6Cc2", fee=0.003, cid="2")
+assert (cr.tknxid, cr.tknyid) == (c.tknyid, c.tknxid)
+
+# the cached data is not pickled, but recalculated
+hash(c), c.arrayrow
+state = c.__getstate__()
+assert not {"_hash", "_arrayrow", "_tknxid", "_tknyid", "_tknx", "_tkny"} & set(state)
+c2 = pickle.loads(pickle.dumps(c))
+assert c2 == c and hash(c2) == hash(c)
+assert (c2.tknxid, c2.tknyid) == (c.tknxid, c.tknyid) and c2.tknx is c.tknx
+
+table = CurveTable.from_curves([c, cr])
+assert list(table.regid) == sorted([c.tknxid, c.tknyid])
+assert [table.tokens[i] for i in table.tknx] == ["WETH-6Cc2", "USDC-eB48"]
+# -
+
+# ## Pair filters and lookups
+
+# +
+rng = random.Random(42)
+tokens = [f"TKN{i:03d}" for i in range(20)]
+curves = [
+    CPC.from_xy(x=rng.uniform(1, 100), y=rng.uniform(1, 100), pair="/".join(rng.sample(tokens, 2)), cid=f"cid{i}", fee=0.003)
+    for i in range(500)
+]
+CC = CPCContainer(curves)
+pairs = CC.pairs()
+assert CC.filter_pairs(onein="TKN000") == {p for p in pairs if "TKN000" in p.split("/")}
+assert CC.filter_pairs(onein="TKN000", tknbin="TKN001") == {p for p in pairs if p.startswith("TKN001/TKN000")}
+assert CC.filter_pairs(onein="NOTATOKEN") == set()
+assert CC.filter_pairs(notin="NOTATOKEN") == pairs
+assert CC.filter_pairs(list(pairs)[:10], onein="TKN000") == {p for p in list(pairs)[:10] if "TKN000" in p.split("/")}
+assert CC.filter_pairs([], onein="TKN000") == set()
+
+# the cached pairs are dropped when the container changes
+n = len(CC.filter_pairs(notin="NOTATOKEN"))
+CC.add(CPC.from_xy(x=1, y=1, pair="TKN100/TKN101", cid="new", fee=0.003))
+assert len(CC.filter_pairs(notin="NOTATOKEN")) == n + 1
+
+pair = curves[0].pair
+assert [c.cid for c in CC.bypair(pair)] == [c.cid for c in CC if c.pair == pair] + [c.cid for c in CC if c.pair == TOKENS.reversepair(pair)]
+assert [c.cid for c in CC.bypairs([pair])] == [c.cid for c in CC if c.pair in (pair, TOKENS.reversepair(pair))]
+# -
+
+# ## Modes
+
+# +
+assert sort_pairs(["WETH-6Cc2/USDC-eB48", "DAI-1d0F/USDC-eB48"]) == ["USDC-eB48/WETH-6Cc2", "DAI-1d0F/USDC-eB48"]
+assert get_triangle_groups("USDC-eB48", ["DAI-1d0F/WETH-6Cc2"]) == [
+    ("DAI-1d0F/USDC-eB48", "DAI-1d0F/WETH-6Cc2", "USDC-eB48/WETH-6Cc2")
+]